@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import contextlib
+import importlib.util
+import subprocess
+import time
+
+import yt_dlp.aes
+
+
+def load_module(revision):
+    source = subprocess.check_output(['git', 'show', f'{revision}:yt_dlp/aes.py'], text=True)
+    spec = importlib.util.spec_from_loader('yt_dlp._baseline_aes', loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = 'yt_dlp'
+    exec(source, module.__dict__)
+    return module
+
+
+def modes(module):
+    """Return the native implementation of each mode as a function of (data, key, iv)"""
+    return {
+        'cbc decrypt': lambda data, key, iv: module.aes_cbc_decrypt(list(data), list(key), list(iv)),
+        'cbc encrypt': lambda data, key, iv: module.aes_cbc_encrypt(list(data), list(key), list(iv)),
+        'ctr': lambda data, key, iv: module.aes_ctr_decrypt(list(data), list(key), list(iv)),
+        'gcm': lambda data, key, iv: module.aes_gcm_decrypt_and_verify(
+            list(data), list(key), [0] * 16, list(iv[:12])),
+    }
+
+
+def throughput(func, data, key, iv):
+    start = time.perf_counter()
+    with contextlib.suppress(ValueError):  # The authentication tag is not valid
+        func(data, key, iv)
+    return len(data) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the native AES implementation')
+    parser.add_argument('--baseline', metavar='REV', help='Also time yt_dlp/aes.py as of this git revision')
+    parser.add_argument('--size', type=int, default=256, help='Size of the data to process, in KiB')
+    parser.add_argument('--key-size', type=int, default=16, choices=(16, 24, 32), help='Size of the key, in bytes')
+    args = parser.parse_args()
+
+    implementations = {}
+    if args.baseline:
+        implementations[args.baseline] = modes(load_module(args.baseline))
+    implementations['current'] = modes(yt_dlp.aes)
+
+    data, key, iv = os.urandom(args.size * 1024), os.urandom(args.key_size), os.urandom(16)
+    print(f'{"mode":<16}' + ''.join(f'{name:>16}' for name in implementations))
+    for mode in implementations['current']:
+        speeds = [throughput(funcs[mode], data, key, iv) for funcs in implementations.values()]
+        print(f'{mode:<16}' + ''.join(f'{speed / 1e6:>12.3f}MB/s' for speed in speeds))
+
+
+if __name__ == '__main__':
+    main()
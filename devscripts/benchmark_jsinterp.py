@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import importlib.util
+import io
+import subprocess
+import time
+import unittest
+
+import test.test_jsinterp
+import yt_dlp.jsinterp
+
+
+def load_baseline(revision):
+    source = subprocess.check_output(['git', 'show', f'{revision}:yt_dlp/jsinterp.py'], text=True)
+    spec = importlib.util.spec_from_loader('yt_dlp._baseline_jsinterp', loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = 'yt_dlp'
+    exec(source, module.__dict__)
+    # The tests compare the results against the current sentinel
+    module.JS_Undefined = yt_dlp.jsinterp.JS_Undefined
+    return module.JSInterpreter
+
+
+def run_tests(interpreter, repeat):
+    """Return the first and the best time of running the JSInterpreter tests with the interpreter class"""
+    test.test_jsinterp.JSInterpreter = interpreter
+    timings = []
+    for _ in range(repeat):
+        # A test suite can only be run once
+        suite = unittest.defaultTestLoader.loadTestsFromTestCase(test.test_jsinterp.TestJSInterpreter)
+        start = time.perf_counter()
+        result = unittest.TextTestRunner(stream=io.StringIO()).run(suite)
+        timings.append(time.perf_counter() - start)
+        if not result.wasSuccessful():
+            sys.exit(f'The tests failed with {interpreter.__module__}.{interpreter.__qualname__}')
+    return timings[0], min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSInterpreter on the code in test/test_jsinterp.py')
+    parser.add_argument('--baseline', metavar='REV', help='Also time JSInterpreter as of this git revision')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of times to run the tests')
+    args = parser.parse_args()
+
+    implementations = {}
+    if args.baseline:
+        implementations[args.baseline] = load_baseline(args.baseline)
+    implementations['current'] = yt_dlp.jsinterp.JSInterpreter
+
+    print(f'{"":<20}{"first":>10}{"best":>12}')
+    for name, interpreter in implementations.items():
+        first, best = run_tests(interpreter, args.repeat)
+        print(f'{name:<20}{first * 1e3:>8.2f}ms{best * 1e3:>10.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import importlib.util
+import json
+import re
+import subprocess
+import timeit
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import int_or_none, str_or_none
+from yt_dlp.utils.traversal import compile_path, traverse_obj
+
+# Paths in the style of those used by the YouTube extractors on ytInitialData
+PATHS = {
+    'tabs': ('contents', 'twoColumnBrowseResultsRenderer', 'tabs', ..., 'tabRenderer'),
+    'selected tab': ('contents', 'twoColumnBrowseResultsRenderer', 'tabs', lambda _, v: v['tabRenderer']['selected']),
+    'rich grid': (
+        'contents', 'twoColumnBrowseResultsRenderer', 'tabs', ..., 'tabRenderer', 'content',
+        'richGridRenderer', 'contents', ..., 'richItemRenderer', 'content'),
+    'lockup ids': (
+        'contents', 'twoColumnBrowseResultsRenderer', 'tabs', ..., 'tabRenderer', 'content',
+        ('richGridRenderer', ('sectionListRenderer', 'contents', ..., 'itemSectionRenderer', 'contents', 0)),
+        'contents', ..., ('richItemRenderer', None), 'content', 'lockupViewModel', 'contentId', {str}),
+    'video renderers': {
+        'id': ('videoId', {str}),
+        'title': ('title', 'runs', 0, 'text', {str_or_none}),
+        'views': ('viewCountText', 'simpleText', {lambda x: int_or_none(re.sub(r'\D', '', x))}),
+    },
+    'metadata': ('metadata', 'channelMetadataRenderer', 'title'),
+    'microformat': ('microformat', 'microformatDataRenderer', ('urlCanonical', 'title'), {str}),
+    'header': ('header', ('c4TabbedHeaderRenderer', 'pageHeaderRenderer'), 'title', any),
+    'continuation': (
+        'onResponseReceivedActions', ..., ('appendContinuationItemsAction', 'reloadContinuationItemsCommand'),
+        'continuationItems', -1, 'continuationItemRenderer', 'continuationEndpoint',
+        'continuationCommand', 'token', {str}, any),
+}
+
+
+def load_baseline(revision):
+    source = subprocess.check_output(['git', 'show', f'{revision}:yt_dlp/utils/traversal.py'], text=True)
+    spec = importlib.util.spec_from_loader('yt_dlp.utils._baseline_traversal', loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = 'yt_dlp.utils'
+    exec(source, module.__dict__)
+    return module.traverse_obj
+
+
+def load_payload(source, ydl):
+    if not re.match(r'https?://', source):
+        with open(source, encoding='utf-8') as f:
+            return json.load(f)
+    webpage = ydl.urlopen(source).read().decode()
+    start = re.search(r'ytInitialData\s*=\s*', webpage).end()
+    return json.JSONDecoder().raw_decode(webpage, start)[0]
+
+
+def find_renderer(obj, name='videoRenderer'):
+    if isinstance(obj, dict):
+        if isinstance(obj.get(name), dict):
+            return obj[name]
+        obj = obj.values()
+    elif not isinstance(obj, list):
+        return None
+    for value in obj:
+        if (renderer := find_renderer(value, name)) is not None:
+            return renderer
+    return None
+
+
+def measure(func, obj, path, duration):
+    timer = timeit.Timer(lambda: func(obj, path))
+    number, _ = timer.autorange()
+    number = max(1, int(number * duration / 0.2))
+    return min(timer.repeat(3, number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark traverse_obj on ytInitialData payloads')
+    parser.add_argument('sources', nargs='+', metavar='FILE|URL', help=(
+        'JSON file with a ytInitialData payload, or the URL of a YouTube page to download it from'))
+    parser.add_argument('--baseline', metavar='REV', help='Also time traverse_obj as of this git revision')
+    parser.add_argument('--duration', type=float, default=0.2, help='Approximate seconds to run each measurement')
+    args = parser.parse_args()
+
+    compiled = {id(path): compile_path(path) for path in PATHS.values()}
+    implementations = {}
+    if args.baseline:
+        implementations[args.baseline] = load_baseline(args.baseline)
+    implementations['current'] = traverse_obj
+    implementations['compiled'] = lambda obj, path: traverse_obj(obj, compiled[id(path)])
+
+    with YoutubeDL({'quiet': True}) as ydl:
+        for source in args.sources:
+            payload = load_payload(source, ydl)
+            # The video renderers are traversed one by one, like the extractors do
+            renderer = find_renderer(payload) or {}
+            print(f'{source}:')
+            print(f'{"path":<20}' + ''.join(f'{name:>14}' for name in implementations))
+            for name, path in PATHS.items():
+                obj = renderer if name == 'video renderers' else payload
+                timings = [measure(func, obj, path, args.duration) for func in implementations.values()]
+                print(f'{name:<20}' + ''.join(f'{timing * 1e6:>12.2f}us' for timing in timings))
+            print()
+
+
+if __name__ == '__main__':
+    main()
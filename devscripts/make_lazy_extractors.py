@@ -21,6 +21,9 @@
     'age_limit',  # Used for --age-limit (evaluated)
     '_RETURN_TYPE',  # Accessed in CLI only with instance (evaluated)
 ]
+PRECOMPUTED_CLASS_PROPERTIES = [
+    '_VALID_URL_HOSTS',  # Used for indexing URL matching (always written since it need not match the parent's)
+]
 CLASS_METHODS = [
     'ie_key', 'suitable', '_match_valid_url',  # Used for URL matching
     'working', 'get_temp_id', '_match_id',  # Accessed just before instance creation
@@ -60,6 +63,8 @@ def extra_ie_code(ie, base=None):
         val = getattr(ie, var)
         if val != (getattr(base, var) if base else NO_ATTR):
             yield f'    {var} = {val!r}'
+    for var in PRECOMPUTED_CLASS_PROPERTIES:
+        yield f'    {var} = {getattr(ie, var)!r}'
     yield ''
 
     for name in CLASS_METHODS:
@@ -14,15 +14,21 @@
 import contextlib
 import copy
 import json
+import re
+import tempfile
+import threading
 
 from test.helper import FakeYDL, assertRegexpMatches, try_rm
 from yt_dlp import YoutubeDL
+from yt_dlp.YoutubeDL import _compile_outtmpl
 from yt_dlp.extractor.common import InfoExtractor
 from yt_dlp.postprocessor.common import PostProcessor
 from yt_dlp.utils import (
     ExtractorError,
     LazyList,
     OnDemandPagedList,
+    PostProcessingError,
+    RejectedVideoReached,
     int_or_none,
     match_filter_func,
 )
@@ -265,6 +271,20 @@ def test_format_selection_by_vcodec_sort(self):
         downloaded = ydl.downloaded_info_dicts[0]
         self.assertEqual(downloaded['format_id'], 'vp9-sdr-format')
 
+    def test_format_selection_reuse(self):
+        formats = [
+            {'format_id': 'low', 'ext': 'mp4', 'height': 360, 'url': TEST_URL},
+            {'format_id': 'high', 'ext': 'mp4', 'height': 1080, 'url': TEST_URL},
+        ]
+        ydl = YDL({'format': 'best'})
+        self.assertIs(ydl.build_format_selector('bv*+ba/b'), ydl.build_format_selector('bv*+ba/b'))
+
+        # The sort order given by an extractor must not leak into other videos
+        for sort_fields, expected in ((['res:480'], 'low'), ([], 'high'), (['res:480'], 'low')):
+            ydl.process_ie_result(_make_result(copy.deepcopy(formats), _format_sort_fields=sort_fields))
+            self.assertEqual(ydl.downloaded_info_dicts[-1]['format_id'], expected)
+        self.assertEqual(len(ydl._format_sorters), 2)
+
     def test_format_selection_string_ops(self):
         formats = [
             {'format_id': 'abc-cba', 'ext': 'mp4', 'url': TEST_URL},
@@ -369,6 +389,66 @@ def test_format_not_available(self):
         ydl = YDL({'format': 'best[height>360]'})
         self.assertRaises(ExtractorError, ydl.process_ie_result, info_dict.copy())
 
+    def test_check_formats(self):
+        class CheckingYDL(YDL):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.tested = []
+                self.lock = threading.Lock()
+
+            def _test_format(self, f):
+                with self.lock:
+                    self.tested.append(f['format_id'])
+                return f['format_id'] not in ('5', '4')
+
+        formats = [{'format_id': str(i), 'ext': 'mp4', 'height': i * 100, 'url': f'{TEST_URL}?{i}'} for i in range(6)]
+
+        ydl = CheckingYDL({'format': 'best', 'check_formats': 'selected'})
+        ydl.process_ie_result(_make_result(copy.deepcopy(formats)))
+        self.assertEqual(ydl.downloaded_info_dicts[0]['format_id'], '3')
+        self.assertEqual(ydl.tested, ['5', '4', '3'])
+
+        # The next formats are tested while waiting, but no further
+        ydl = CheckingYDL({'format': 'best', 'check_formats': 'selected', 'concurrent_format_checks': 2})
+        ydl.process_ie_result(_make_result(copy.deepcopy(formats)))
+        self.assertEqual(ydl.downloaded_info_dicts[0]['format_id'], '3')
+        self.assertLessEqual({'5', '4', '3'}, set(ydl.tested))
+        self.assertLessEqual(set(ydl.tested), {'5', '4', '3', '2'})
+
+        # The results are kept for the other videos
+        ydl.tested.clear()
+        ydl.process_ie_result(_make_result(copy.deepcopy(formats), id='otherid'))
+        self.assertEqual(ydl.downloaded_info_dicts[1]['format_id'], '3')
+        self.assertEqual(ydl.tested, [])
+
+        # Only the formats that need it are tested
+        formats[5]['__needs_testing'] = formats[3]['__needs_testing'] = True
+        ydl = CheckingYDL({'format': 'best', 'check_formats': None, 'concurrent_format_checks': 4})
+        ydl.process_ie_result(_make_result(copy.deepcopy(formats)))
+        self.assertEqual(ydl.downloaded_info_dicts[0]['format_id'], '4')
+        self.assertEqual(ydl.tested, ['5'])
+
+        # The running tests are cancelled and waited for once the consumer stops
+        class BlockingYDL(YDL):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.started = threading.Barrier(3, timeout=10)
+                self.cancelled = []
+
+            def _test_format(self, f):
+                self.started.wait()
+                if f['format_id'] == '5':
+                    return True
+                self.cancelled.append((f['format_id'], self._thread_state.format_test_cancelled.wait(10)))
+                return False
+
+        ydl = BlockingYDL({'concurrent_format_checks': 3})
+        checked = ydl._check_formats(copy.deepcopy(formats[::-1]))
+        self.assertEqual(next(checked)['format_id'], '5')
+        checked.close()
+        self.assertEqual(sorted(ydl.cancelled), [('3', True), ('4', True)])
+        self.assertEqual(ydl._format_checks, {ydl._format_check_key(formats[5]): True})
+
     def test_format_selection_issue_10083(self):
         # See https://github.com/ytdl-org/youtube-dl/issues/10083
         formats = [
@@ -857,6 +937,14 @@ def gen():
         test('%(title3)s', ('foo/bar\\test', 'foo⧸bar⧹test'))
         test('folder/%(title3)s', ('folder/foo/bar\\test', f'folder{os.path.sep}foo⧸bar⧹test'))
 
+    def test_outtmpl_compiled_once(self):
+        ydl = YoutubeDL()
+        tmpl = '%(title,id)s - %(duration-10>%M)s %(x|def)s'
+        self.assertIs(_compile_outtmpl(tmpl), _compile_outtmpl(tmpl))
+        # The compiled template only depends on the template
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {'id': 'a', 'duration': 70}), 'a - 01 def')
+        self.assertEqual(ydl.evaluate_outtmpl(tmpl, {'title': 't', 'x': 'y'}), 't - NA y')
+
     def test_format_note(self):
         ydl = YoutubeDL()
         self.assertEqual(ydl._format_note({}), '')
@@ -1362,6 +1450,158 @@ def close_hook_two():
         self.assertTrue(close_hook_called, 'Close hook was not called')
         self.assertTrue(close_hook_two_called, 'Close hook two was not called')
 
+    def test_concurrent_downloads(self):
+        started = threading.Barrier(3, timeout=10)
+
+        class BarrierIE(InfoExtractor):
+            _VALID_URL = r'barrier:(?P<id>\w+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                self.to_screen(f'{video_id}: Waiting')
+                # Deadlocks unless the URLs are extracted concurrently
+                started.wait()
+                self.to_screen(f'{video_id}: Extracted')
+                return {'id': video_id, 'title': video_id, 'url': TEST_URL}
+
+        messages = []
+        ydl = YoutubeDL({
+            'simulate': True,
+            'concurrent_downloads': 3,
+            'forceprint': {'video': ['id']},
+            'outtmpl': '%(id)s',
+        }, auto_init=False)
+        ydl.add_info_extractor(BarrierIE())
+        with patch('yt_dlp.YoutubeDL.write_string', lambda s, **kwargs: messages.append(s.strip())):
+            ydl.download(['barrier:a', 'barrier:b', 'barrier:c'])
+        # The output of each URL must not be interleaved with that of the others
+        self.assertEqual(messages, [line for video_id in 'abc' for line in (
+            f'[Barrier] Extracting URL: barrier:{video_id}',
+            f'[Barrier] {video_id}: Waiting',
+            f'[Barrier] {video_id}: Extracted',
+            f'[info] {video_id}: Downloading 1 format(s): 0',
+            video_id,
+        )])
+
+    def test_concurrent_downloads_in_order(self):
+        class TestIE(InfoExtractor):
+            _VALID_URL = r'test:(?P<id>\w+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                return {'id': video_id, 'title': video_id, 'url': TEST_URL}
+
+        messages = []
+        ydl = YoutubeDL({
+            'simulate': True,
+            'concurrent_downloads': 3,
+            'match_filter': match_filter_func(None, ['id!=b']),
+            'breaking_match_filter': ['id!=b'],
+            'forceprint': {'video': ['id']},
+            'outtmpl': '%(id)s',
+        }, auto_init=False)
+        ydl.add_info_extractor(TestIE())
+        with (patch.object(YoutubeDL, '_map_concurrently') as map_concurrently,
+              patch('yt_dlp.YoutubeDL.write_string', lambda s, **kwargs: messages.append(s.strip())),
+              self.assertRaises(RejectedVideoReached)):
+            ydl.download(['test:a', 'test:b', 'test:c'])
+        map_concurrently.assert_not_called()
+        self.assertEqual([message for message in messages if len(message) == 1], ['a'])
+
+    def test_concurrent_playlist_entries(self):
+        started = threading.Barrier(3, timeout=10)
+
+        class BarrierIE(InfoExtractor):
+            _VALID_URL = r'barrier:(?P<id>\w+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                # Deadlocks unless the entries are extracted concurrently
+                started.wait()
+                return {'id': video_id, 'title': video_id, 'url': TEST_URL}
+
+        class PlaylistIE(InfoExtractor):
+            _VALID_URL = r'playlist:'
+
+            def _real_extract(self, url):
+                return self.playlist_result(
+                    [self.url_result(f'barrier:{video_id}', BarrierIE) for video_id in 'abc'], 'pl')
+
+        messages = []
+        ydl = YoutubeDL({
+            'simulate': True,
+            'concurrent_playlist_entries': 3,
+            'forceprint': {'video': ['id']},
+        }, auto_init=False)
+        ydl.add_info_extractor(PlaylistIE())
+        ydl.add_info_extractor(BarrierIE())
+        with patch('yt_dlp.YoutubeDL.write_string', lambda s, **kwargs: messages.append(s.strip())):
+            res = ydl.extract_info('playlist:')
+        self.assertEqual([entry['playlist_index'] for entry in res['entries']], [1, 2, 3])
+        # The entries are still processed in order
+        self.assertEqual(messages[-13:], [
+            *(line for index, video_id in enumerate('abc', 1) for line in (
+                f'[download] Downloading item {index} of 3',
+                f'[Barrier] Extracting URL: barrier:{video_id}',
+                f'[info] {video_id}: Downloading 1 format(s): 0',
+                video_id,
+            )),
+            '[download] Finished downloading playlist: pl',
+        ])
+
+
+    def test_concurrent_postprocessing(self):
+        downloaded = {video_id: threading.Event() for video_id in 'ab'}
+        events = []
+
+        class TestIE(InfoExtractor):
+            _VALID_URL = r'test:(?P<id>\w+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                return {'id': video_id, 'title': video_id, 'url': TEST_URL, 'ext': 'mp4'}
+
+        class FakeDownloadYDL(YoutubeDL):
+            def dl(self, name, info, subtitle=False, test=False):
+                with open(name, 'w') as f:
+                    f.write(info['id'])
+                downloaded[info['id']].set()
+                return True, True
+
+        class WaitingPP(PostProcessor):
+            def run(self, info):
+                # Deadlocks unless the next video is downloaded in the meantime
+                if info['id'] == 'a' and not downloaded['b'].wait(10):
+                    raise PostProcessingError('The next video was not downloaded')
+                events.append(f'postprocess {info["id"]} in {threading.current_thread().name}')
+                return [], info
+
+        class AfterVideoPP(PostProcessor):
+            def run(self, info):
+                events.append(f'after_video {info["id"]}')
+                return [], info
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = os.path.join(tmpdir, 'archive.txt')
+            ydl = FakeDownloadYDL({
+                'concurrent_postprocessing': 1,
+                'download_archive': archive,
+                'outtmpl': os.path.join(tmpdir, '%(id)s.%(ext)s'),
+                'quiet': True,
+                'noprogress': True,
+            }, auto_init=False)
+            ydl.add_info_extractor(TestIE())
+            ydl.add_post_processor(WaitingPP())
+            ydl.add_post_processor(AfterVideoPP(), when='after_video')
+            self.assertEqual(ydl.download(['test:a', 'test:b']), 0)
+            with open(archive) as f:
+                self.assertEqual(f.read().splitlines(), ['test a', 'test b'])
+
+        # The videos are still post-processed in order
+        self.assertEqual([re.sub(r'_\d+$', '', event) for event in events], [
+            'postprocess a in yt-dlp-postprocess', 'after_video a',
+            'postprocess b in yt-dlp-postprocess', 'after_video b',
+        ])
 
 if __name__ == '__main__':
     unittest.main()
@@ -51,6 +51,26 @@ def test_cbc_decrypt(self):
             decrypted = aes_cbc_decrypt_bytes(data, bytes(self.key), bytes(self.iv))
             self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
 
+    def test_key_sizes(self):
+        # Compare the modes to the reference block functions
+        data = list(range(100))
+        for key_size in (16, 24, 32):
+            key = list(range(key_size))
+            expanded_key = key_expansion(key)
+            expected, previous = [], self.iv
+            for i in range(0, len(data), 16):
+                previous = aes_encrypt([x ^ y for x, y in zip(pad_block(data[i:i + 16], 'pkcs7'), previous, strict=True)], expanded_key)
+                expected += previous
+            encrypted = aes_cbc_encrypt(data, key, self.iv)
+            self.assertEqual(encrypted, expected)
+            self.assertEqual(aes_cbc_decrypt(encrypted, key, self.iv)[:len(data)], data)
+            self.assertEqual(aes_cbc_decrypt_bytes(bytes(encrypted), bytes(key), bytes(self.iv))[:len(data)], bytes(data))
+            self.assertEqual(aes_ecb_decrypt(encrypted[16:32], key), aes_decrypt(encrypted[16:32], expanded_key))
+
+            counter_blocks = aes_ecb_encrypt([*self.iv[:15], 0, *self.iv[:15], 1], key)
+            self.assertEqual(aes_ctr_encrypt(data[:32], key, [*self.iv[:15], 0]),
+                             [x ^ y for x, y in zip(data[:32], counter_blocks, strict=True)])
+
     def test_cbc_encrypt(self):
         data = list(self.secret_msg)
         encrypted = bytes(aes_cbc_encrypt(data, self.key, self.iv))
@@ -11,7 +11,9 @@
 import collections
 
 from test.helper import gettestcases
-from yt_dlp.extractor import FacebookIE, YoutubeIE, gen_extractors
+from yt_dlp.extractor import FacebookIE, GenericIE, YoutubeIE, gen_extractors
+from yt_dlp.extractor._dispatch import ExtractorIndex, valid_url_hosts
+from yt_dlp.extractor.common import InfoExtractor
 
 
 class TestAllURLsMatching(unittest.TestCase):
@@ -82,6 +84,50 @@ def test_no_duplicates(self):
                         ie.suitable(url),
                         f'{type(ie).__name__} should not match URL {url!r} . That URL belongs to {tc["name"]}.')
 
+    def test_host_index(self):
+        index = ExtractorIndex({ie.ie_key(): ie for ie in self.ies})
+        for tc in gettestcases(include_onlymatching=True):
+            candidates = index.candidates(tc['url'])
+            self.assertIn(tc['name'], candidates, f'{tc["name"]}IE is not indexed for URL {tc["url"]!r}')
+            self.assertEqual(candidates[-1], 'Generic')
+
+    def test_valid_url_hosts(self):
+        self.assertEqual(valid_url_hosts([r'https?://(?:www\.)?example\.com/(?P<id>\d+)']), ('example.com', 'www.example.com'))
+        self.assertEqual(valid_url_hosts([r'https?://(?:[^/]+\.)?example\.(?:com|net)/']), ('example.com', 'example.net'))
+        self.assertEqual(valid_url_hosts([r'(?:example:|https?://example\.com/v/)(?P<id>\d+)']), ('example.com',))
+        self.assertEqual(valid_url_hosts([r'https?://example\.com(?:[/?#]|$)']), ('example.com',))
+        self.assertEqual(valid_url_hosts([r'(?:https?:)?//example\.com/', r'https?://example\.org/']), ('example.com', 'example.org'))
+        self.assertEqual(valid_url_hosts([r'ytsearch(?P<prefix>|\d+|all):(?P<query>[\s\S]+)']), None)
+        self.assertEqual(valid_url_hosts([r'https?://(?:www\.)?example\.com']), None)
+        self.assertEqual(valid_url_hosts([r'https?://.+\.example\.com/']), None)
+        self.assertEqual(valid_url_hosts([r'https?://(?:\w+\.)+example\.com/']), ('example.com',))
+        self.assertEqual(valid_url_hosts([r'https?://[a-z]+example\.com/']), ('*example/com',))
+        self.assertEqual(valid_url_hosts([r'https?://example\d*\.com/']), ('example*/com', 'example.com'))
+        self.assertEqual(valid_url_hosts([r'https?://example\.[a-z]+/']), None)
+
+    def test_host_index_wildcards(self):
+        class TestIE(InfoExtractor):
+            _VALID_URL = r'https?://(?:example[^/]+|[a-z]+sample)\.com/'
+
+        class OverrideIE(TestIE):
+            @classmethod
+            def suitable(cls, url):
+                return False if 'x' in url else super().suitable(url)
+
+        class WideningIE(TestIE):
+            @classmethod
+            def suitable(cls, url):
+                return super().suitable(url) or url.startswith('test:')
+
+        self.assertEqual(OverrideIE._VALID_URL_HOSTS, TestIE._VALID_URL_HOSTS)
+        self.assertIsNone(WideningIE._VALID_URL_HOSTS)
+        index = ExtractorIndex({'Test': TestIE, 'Generic': GenericIE})
+        for url in ('https://example2.com/', 'https://example.test.com/', 'https://testsample.com/'):
+            self.assertTrue(TestIE.suitable(url), url)
+            self.assertEqual(index.candidates(url), ('Test', 'Generic'), url)
+        for url in ('https://com/', 'https://test.com/', 'https://www.sample.org/'):
+            self.assertEqual(index.candidates(url), ('Generic',), url)
+
     def test_keywords(self):
         self.assertMatch(':ytsubs', ['youtube:subscriptions'])
         self.assertMatch(':ytsubscriptions', ['youtube:subscriptions'])
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import shutil
+import time
+
+from test.helper import FakeYDL
+from yt_dlp.archive import SQLiteArchive
+from yt_dlp.dependencies import sqlite3
+
+
+@unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+class TestSQLiteArchive(unittest.TestCase):
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.test_dir = os.path.join(TEST_DIR, 'testdata', 'archive_test')
+        self.tearDown()
+        os.makedirs(self.test_dir)
+        self.db = os.path.join(self.test_dir, 'archive.db')
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_archive(self):
+        archive = SQLiteArchive(self.db)
+        archive.BATCH_INTERVAL = float('inf')
+        self.assertNotIn('youtube a', archive)
+        archive.add('youtube a')
+        self.assertIn('youtube a', archive)
+        archive.update(['youtube b', 'youtube a'])
+
+        # Pending IDs are written when the archive is closed
+        other = SQLiteArchive(self.db)
+        archive.add('youtube c')
+        self.assertNotIn('youtube c', other)
+        archive.close()
+        self.assertIn('youtube c', other)
+        self.assertEqual(list(other), ['youtube a', 'youtube b', 'youtube c'])
+        self.assertEqual(len(other), 3)
+        other.close()
+
+    def test_batch_interval(self):
+        archive, other = SQLiteArchive(self.db), SQLiteArchive(self.db)
+        archive.BATCH_INTERVAL = 0.1
+        archive.add('youtube a')
+        self.assertNotIn('youtube a', other)
+        # The pending ID is written even though no other ID is added
+        time.sleep(0.5)
+        self.assertIn('youtube a', other)
+        archive.close()
+        other.close()
+
+    def test_import_export(self):
+        text_archive = os.path.join(self.test_dir, 'archive.txt')
+        with open(text_archive, 'w', encoding='utf-8') as f:
+            f.write('youtube a\nyoutube b\n\n')
+
+        with FakeYDL({'download_archive': f'sqlite:{self.db}'}) as ydl:
+            self.assertIsInstance(ydl.archive, SQLiteArchive)
+            ydl.record_download_archive({'id': 'b', 'extractor_key': 'Youtube'})
+            self.assertEqual(ydl.import_download_archive(text_archive), 1)
+            self.assertTrue(ydl.in_download_archive({'id': 'a', 'extractor_key': 'Youtube'}))
+            ydl.record_download_archive({'id': 'c', 'extractor_key': 'Youtube'})
+            self.assertEqual(ydl.export_download_archive(text_archive), 3)
+
+        with open(text_archive, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\nyoutube b\nyoutube c\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
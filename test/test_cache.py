@@ -9,9 +9,11 @@
 
 
 import shutil
+import time
 
 from test.helper import FakeYDL
 from yt_dlp.cache import Cache
+from yt_dlp.dependencies import sqlite3
 
 
 def _is_empty(d):
@@ -52,6 +54,62 @@ def test_cache(self):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_many(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        c.store_many('test_cache', {'a': 1, 'b': [2], 'ä': {'c': 3}})
+        self.assertEqual(c.load_many('test_cache', ['a', 'ä', 'd'], default=0), {'a': 1, 'ä': {'c': 3}, 'd': 0})
+        self.assertEqual(c.load('test_cache', 'b'), [2])
+        self.assertEqual(c.load('test_cache', 'b', min_ver='9999.01.01'), None)
+        c.close()
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_migration(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        os.makedirs(os.path.join(self.test_dir, 'test_cache'))
+        with open(c._get_cache_fn('test_cache', 'k', 'json'), 'w', encoding='utf-8') as f:
+            f.write('{"yt-dlp_version": "2024.01.01", "data": {"x": 1}}')
+        with open(c._get_cache_fn('test_cache', 'old', 'json'), 'w', encoding='utf-8') as f:
+            f.write('[1]')
+        with open(c._get_cache_fn('test_cache', 'invalid', 'json'), 'w', encoding='utf-8') as f:
+            f.write('{"yt-dlp_version": "2024.01.01"}')
+
+        # Files without data are skipped
+        self.assertEqual(c.load_many('test_cache', ['k', 'invalid'], default=0, min_ver='2023.01.01'),
+                         {'k': {'x': 1}, 'invalid': 0})
+        os.remove(c._get_cache_fn('test_cache', 'invalid', 'json'))
+        self.assertEqual(c.load('test_cache', 'k', min_ver='2023.01.01'), {'x': 1})
+        self.assertEqual(c.load('test_cache', 'k', min_ver='2025.01.01'), None)
+        self.assertEqual(c.load('test_cache', 'old'), [1])
+        # The files are moved into the database
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'test_cache')))
+        self.assertEqual(c.load('test_cache', 'old'), [1])
+        c.close()
+
+    @unittest.skipUnless(sqlite3, 'sqlite3 is not available')
+    def test_eviction(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        c.MAX_SIZE = 2500
+        for key in ('a', 'b', 'a', 'c'):
+            c.store('test_cache', key, 'x' * 1000)
+            time.sleep(0.01)
+        # "b" was the least recently used
+        self.assertEqual(c.load_many('test_cache', 'abc'), {'a': 'x' * 1000, 'b': None, 'c': 'x' * 1000})
+
+        # Other instances see the same entries
+        other = Cache(ydl)
+        self.assertEqual(other.load('test_cache', 'c'), 'x' * 1000)
+        other.close()
+        c.close()
+
 
 if __name__ == '__main__':
     unittest.main()
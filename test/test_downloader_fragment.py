@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import concurrent.futures.process
+import glob
+import http.server
+import threading
+import time
+from unittest import mock
+
+from test.helper import http_server_port, try_rm
+from yt_dlp import YoutubeDL
+from yt_dlp.aes import aes_cbc_encrypt_bytes
+from yt_dlp.downloader.dash import DashSegmentsFD
+from yt_dlp.downloader.hls import HlsFD
+from yt_dlp.utils._utils import _YDLLogger as FakeLogger
+
+FRAGMENT_COUNT = 20
+KEY, IV = bytes(range(16)), bytes(range(16, 32))
+
+
+def fragment_content(index):
+    return f'fragment {index};'.encode() * 100
+
+
+class BrokenPool(concurrent.futures.Executor):
+    def __init__(self, on_submit):
+        self.on_submit = on_submit
+
+    def submit(self, fn, /, *args, **kwargs):
+        error = concurrent.futures.process.BrokenProcessPool('A process terminated abruptly')
+        if self.on_submit:
+            raise error
+        future = concurrent.futures.Future()
+        future.set_exception(error)
+        return future
+
+
+class HTTPTestRequestHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/index.m3u8':
+            self.send_content('#EXTM3U\n#EXT-X-TARGETDURATION:1\n#EXT-X-KEY:METHOD=AES-128,URI="key",IV=0x{}\n{}{}'.format(
+                IV.hex(), ''.join(f'#EXTINF:1,\nencrypted/{index}\n' for index in range(FRAGMENT_COUNT)),
+                '#EXT-X-ENDLIST\n').encode())
+            return
+        elif self.path == '/key':
+            self.send_content(KEY)
+            return
+        directory, _, index = self.path.rpartition('/')
+        index = int(index)
+        # Make the earlier fragments finish last
+        time.sleep((FRAGMENT_COUNT - index) * 0.005)
+        content = fragment_content(index)
+        if directory == '/encrypted':
+            padding = 16 - len(content) % 16
+            content = aes_cbc_encrypt_bytes(content + bytes([padding]) * padding, KEY, IV)
+        self.send_content(content)
+
+    def send_content(self, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestFragmentFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+
+    def download(self, params, hls=False):
+        params['logger'] = FakeLogger()
+        ydl = YoutubeDL(params)
+        filename = 'testfile.mp4'
+        try_rm(filename)
+        if hls:
+            self.assertTrue(HlsFD(ydl, params).real_download(filename, {
+                'protocol': 'm3u8_native',
+                'url': f'http://127.0.0.1:{self.port}/index.m3u8',
+                'ext': 'mp4',
+                # Without pycryptodomex, the download is otherwise delegated to ffmpeg if it is available
+                'hls_aes': {'uri': f'http://127.0.0.1:{self.port}/key'},
+            }))
+        else:
+            self.assertTrue(DashSegmentsFD(ydl, params).real_download(filename, {
+                'protocol': 'http_dash_segments',
+                'fragment_base_url': f'http://127.0.0.1:{self.port}/',
+                'fragments': [{'path': str(index)} for index in range(FRAGMENT_COUNT)],
+            }))
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(map(fragment_content, range(FRAGMENT_COUNT))))
+        fragment_files = glob.glob(f'{filename}*-Frag*')
+        try_rm(filename)
+        for fragment_file in fragment_files:
+            try_rm(fragment_file)
+        return fragment_files
+
+    def test_sequential(self):
+        self.assertEqual(self.download({}), [])
+
+    def test_concurrent(self):
+        self.assertEqual(self.download({'concurrent_fragment_downloads': 4}), [])
+
+    def test_decrypt(self):
+        self.assertEqual(self.download({}, hls=True), [])
+        self.assertEqual(self.download({'concurrent_fragment_downloads': 4}, hls=True), [])
+
+    def test_decrypt_broken_pool(self):
+        # The pool is not used outside of the CLI, since its processes import __main__
+        self.assertIsNone(HlsFD(YoutubeDL({'logger': FakeLogger()}), {})._decryption_pool(4))
+        # The fragments are decrypted in this process if the pool cannot be used
+        for on_submit in (False, True):
+            with mock.patch.object(HlsFD, '_decryption_pool', lambda self, max_workers: BrokenPool(on_submit)):
+                self.assertEqual(self.download({'concurrent_fragment_downloads': 4}, hls=True), [])
+
+    def test_keep_fragments(self):
+        self.assertEqual(len(self.download({'keep_fragments': True})), FRAGMENT_COUNT)
+        self.assertEqual(len(self.download({'concurrent_fragment_downloads': 4, 'keep_fragments': True})), FRAGMENT_COUNT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,10 +11,16 @@
 import http.server
 import re
 import threading
+from unittest.mock import patch
 
 from test.helper import http_server_port, try_rm
 from yt_dlp import YoutubeDL
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.external import FFmpegFD
 from yt_dlp.downloader.http import HttpFD
+from yt_dlp.downloader.merge import MergeFD
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor, FFmpegPostProcessorError
+from yt_dlp.utils import DownloadError
 from yt_dlp.utils._utils import _YDLLogger as FakeLogger
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -43,8 +49,8 @@ def send_content_range(self, total=None):
             self.send_header('Content-Range', content_range)
         return (end - start + 1) if valid_range else total
 
-    def serve(self, range=True, content_length=True):
-        self.send_response(200)
+    def serve(self, range=True, content_length=True, partial=False):
+        self.send_response(206 if partial and self.headers.get('Range') else 200)
         self.send_header('Content-Type', 'video/mp4')
         size = TEST_SIZE
         if range:
@@ -63,13 +69,15 @@ def do_GET(self):
             self.serve(range=False)
         elif self.path == '/no-range-no-content-length':
             self.serve(range=False, content_length=False)
+        elif self.path == '/partial':
+            self.serve(partial=True)
         else:
             assert False
 
 
 class TestHttpFD(unittest.TestCase):
     def setUp(self):
-        self.httpd = http.server.HTTPServer(
+        self.httpd = http.server.ThreadingHTTPServer(
             ('127.0.0.1', 0), HTTPTestRequestHandler)
         self.port = http_server_port(self.httpd)
         self.server_thread = threading.Thread(target=self.httpd.serve_forever)
@@ -80,6 +88,7 @@ def download(self, params, ep):
         params['logger'] = FakeLogger()
         ydl = YoutubeDL(params)
         downloader = HttpFD(ydl, params)
+        downloader._MIN_SEGMENT_SIZE = 1024
         filename = 'testfile.mp4'
         try_rm(filename)
         self.assertTrue(downloader.real_download(filename, {
@@ -89,7 +98,7 @@ def download(self, params, ep):
         try_rm(filename)
 
     def download_all(self, params):
-        for ep in ('regular', 'no-content-length', 'no-range', 'no-range-no-content-length'):
+        for ep in ('regular', 'no-content-length', 'no-range', 'no-range-no-content-length', 'partial'):
             self.download(params, ep)
 
     def test_regular(self):
@@ -100,6 +109,112 @@ def test_chunked(self):
             'http_chunk_size': 1000,
         })
 
+    def test_multiple_connections(self):
+        self.download_all({
+            'http_connections': 4,
+        })
+        self.download_all({
+            'http_connections': 4,
+            'http_chunk_size': 1000,
+        })
+
+    def test_segment_state(self):
+        states = []
+        write_segment_state = HttpFD._write_segment_state
+
+        def check_segment_state(downloader, filename, size, missing):
+            # The ranges that are not missing must already be in the file
+            with open(downloader.temp_name(filename), 'rb') as f:
+                data = bytearray(f.read())
+            for start, end in missing:
+                data[start:end] = b'#' * (end - start)
+            self.assertEqual(data, b'#' * size)
+            states.append(missing)
+            return write_segment_state(downloader, filename, size, missing)
+
+        with patch.object(HttpFD, '_write_segment_state', check_segment_state):
+            # Slowed down, so that the state is also written during the download
+            self.download({'http_connections': 4, 'ratelimit': 8 * 1024, 'buffersize': 512}, 'partial')
+        self.assertGreater(len(states), 3)
+        self.assertEqual(states[-1], [])
+
+
+class TestMergeFD(unittest.TestCase):
+    setUp = TestHttpFD.setUp
+
+    def merge_info(self, container='mp4_dash'):
+        url = f'http://127.0.0.1:{self.port}/regular'
+        return {
+            'id': 'test',
+            'ext': 'mp4',
+            'protocol': 'http+http',
+            'requested_formats': [{
+                'format_id': 'video', 'url': url, 'protocol': 'http', 'ext': 'mp4',
+                'container': container, 'vcodec': 'avc1', 'acodec': 'none',
+            }, {
+                'format_id': 'audio', 'url': url, 'protocol': 'http', 'ext': 'm4a',
+                'container': 'm4a_dash', 'vcodec': 'none', 'acodec': 'mp4a',
+            }],
+        }
+
+    def merge(self, real_run_ffmpeg):
+        params = {'logger': FakeLogger(), 'merge_while_downloading': True}
+        ydl = YoutubeDL(params)
+        filename = 'testfile.mp4'
+        try_rm(filename)
+        with (patch.object(FFmpegFD, 'available', return_value=True),
+              patch.object(FFmpegPostProcessor, 'real_run_ffmpeg', real_run_ffmpeg)):
+            self.assertIs(get_suitable_downloader(self.merge_info(), params), MergeFD)
+            # ffmpeg may have to seek in a regular mp4
+            self.assertIsNone(get_suitable_downloader(self.merge_info(container=None), params))
+            self.assertIsNone(get_suitable_downloader(self.merge_info(), {}))
+            try:
+                return MergeFD(ydl, params).real_download(filename, self.merge_info()), filename
+            except BaseException:
+                try_rm(filename)
+                raise
+
+    def test_merge_while_downloading(self):
+        merges = []
+
+        def real_run_ffmpeg(pp, input_path_opts, output_path_opts, **kwargs):
+            (out_path, opts), = output_path_opts
+            merges.append(opts)
+            # The formats arrive through pipes while they are being downloaded
+            with open(out_path, 'wb') as out:
+                for path, _ in input_path_opts:
+                    self.assertRegex(path, r'^/dev/fd/\d+$')
+                    with open(path, 'rb') as f:
+                        out.write(f.read())
+
+        success, filename = self.merge(real_run_ffmpeg)
+        self.assertTrue(success)
+        self.assertEqual(merges, [['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0', '-f', 'mp4']])
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), b'#' * TEST_SIZE * 2)
+        try_rm(filename)
+
+    def test_keep_fragments(self):
+        info = self.merge_info()
+        for fmt in info['requested_formats']:
+            fmt.update({
+                'protocol': 'http_dash_segments',
+                'fragment_base_url': f'http://127.0.0.1:{self.port}/',
+                'fragments': [{'path': 'regular'}],
+            })
+        params = {'merge_while_downloading': True}
+        with patch.object(FFmpegFD, 'available', return_value=True):
+            self.assertIs(get_suitable_downloader(info, params), MergeFD)
+            self.assertIsNone(get_suitable_downloader(info, {**params, 'keep_fragments': True}))
+
+    def test_merge_error(self):
+        def real_run_ffmpeg(pp, input_path_opts, output_path_opts, **kwargs):
+            raise FFmpegPostProcessorError('Invalid data found when processing input')
+
+        with self.assertRaisesRegex(DownloadError, 'Invalid data found'):
+            self.merge(real_run_ffmpeg)
+        self.assertFalse(os.path.exists('testfile.mp4.part'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import contextlib
+import gzip
+import http.server
+import io
+import json
+import select
+import socket
+import ssl
+import threading
+import time
+
+from test.helper import FakeYDL, http_server_port, validate_and_send
+from yt_dlp.cookies import YoutubeDLCookieJar
+from yt_dlp.dependencies import h2
+from yt_dlp.networking import Request
+from yt_dlp.networking.common import _REQUEST_HANDLERS, _RH_PREFERENCES
+from yt_dlp.networking.exceptions import CertificateVerifyError, HTTPError, TransportError
+
+if h2:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+LARGE_BODY = bytes(range(256)) * 8192
+
+
+def _server_ssl_context(alpn_protocols):
+    sslctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    sslctx.load_cert_chain(os.path.join(TEST_DIR, 'testcert.pem'), None)
+    if alpn_protocols:
+        sslctx.set_alpn_protocols(alpn_protocols)
+    return sslctx
+
+
+class H2TestServer:
+    """An HTTP/2 server that handles each stream in a separate thread"""
+
+    def __init__(self):
+        self.connections = 0
+        self._sslctx = _server_ssl_context(['h2'])
+        self._sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self._sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        try:
+            sock = self._sslctx.wrap_socket(sock, server_side=True)
+        except (OSError, ssl.SSLError):
+            return
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        # The responses are prepared by other threads, but only this thread uses the socket
+        lock = threading.Lock()
+        wakeup_reader, wakeup_writer = socket.socketpair()
+        requests, pending = {}, {}
+
+        def respond(stream_id):
+            status, headers, body = self._handle(**requests.pop(stream_id))
+            with lock, contextlib.suppress(h2.exceptions.H2Error):  # The client went away
+                conn.send_headers(stream_id, [(':status', str(status)), *headers])
+                pending[stream_id] = body
+            with contextlib.suppress(OSError):
+                wakeup_writer.send(b'\0')
+
+        def receive(data):
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    requests[event.stream_id] = {'headers': dict(event.headers), 'body': b''}
+                elif isinstance(event, h2.events.DataReceived):
+                    requests[event.stream_id]['body'] += event.data
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    threading.Thread(target=respond, args=(event.stream_id,), daemon=True).start()
+                elif isinstance(event, h2.events.StreamReset):
+                    pending.pop(event.stream_id, None)
+
+        def flush():
+            for stream_id, data in list(pending.items()):
+                while size := min(len(data), conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size):
+                    conn.send_data(stream_id, data[:size])
+                    data = pending[stream_id] = data[size:]
+                if not data:
+                    del pending[stream_id]
+                    conn.end_stream(stream_id)
+            sock.sendall(conn.data_to_send())
+
+        try:
+            with lock:
+                conn.initiate_connection()
+                flush()
+            while True:
+                readable, _, _ = select.select([sock, wakeup_reader], [], [])
+                if wakeup_reader in readable:
+                    wakeup_reader.recv(1024)
+                if sock in readable:
+                    data = sock.recv(65536)
+                    while sock.pending():
+                        data += sock.recv(sock.pending())
+                    if not data:
+                        break
+                    with lock:
+                        receive(data)
+                with lock:
+                    flush()
+        except (OSError, h2.exceptions.H2Error):
+            pass
+        finally:
+            sock.close()
+            wakeup_reader.close()
+            wakeup_writer.close()
+
+    def _handle(self, headers, body):
+        path = headers[':path']
+        if path == '/headers':
+            return 200, [('content-type', 'application/json')], json.dumps(headers).encode()
+        elif path == '/echo':
+            return 200, [('x-method', headers[':method'])], body
+        elif path == '/delay':
+            time.sleep(0.5)
+            return 200, [], b'done'
+        elif path == '/large':
+            return 200, [('content-length', str(len(LARGE_BODY)))], LARGE_BODY
+        elif path.startswith('/redirect/'):
+            return int(path.split('/')[-1]), [('location', '/echo')], b''
+        elif path == '/cookies':
+            return 200, [('set-cookie', 'first=1; Path=/'), ('set-cookie', 'second=2; Path=/')], b''
+        elif path == '/gzip':
+            return 200, [('content-encoding', 'gzip')], gzip.compress(b'<html>compressed</html>')
+        return 404, [], b'not found'
+
+
+class HTTP1TestRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        payload = json.dumps({'protocol': self.request_version}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.mark.skipif(not h2, reason='h2 is not installed')
+@pytest.mark.parametrize('handler', ['H2'], indirect=True)
+class TestH2RequestHandler:
+    @classmethod
+    def setup_class(cls):
+        cls.server = H2TestServer()
+        cls.base_url = f'https://127.0.0.1:{cls.server.port}'
+
+        # HTTPS server without HTTP/2 support
+        cls.http1_httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), HTTP1TestRequestHandler)
+        cls.http1_httpd.socket = _server_ssl_context(None).wrap_socket(cls.http1_httpd.socket, server_side=True)
+        cls.http1_url = f'https://127.0.0.1:{http_server_port(cls.http1_httpd)}'
+        threading.Thread(target=cls.http1_httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.server.close()
+        cls.http1_httpd.shutdown()
+
+    def test_verify_cert(self, handler):
+        with handler() as rh:
+            with pytest.raises(CertificateVerifyError):
+                validate_and_send(rh, Request(f'{self.base_url}/headers'))
+
+    def test_headers(self, handler):
+        with handler(verify=False, headers={'Connection': 'keep-alive', 'X-Test': 'handler'}) as rh:
+            res = validate_and_send(rh, Request(f'{self.base_url}/headers', headers={'X-Request': 'request'}))
+            assert res.status == 200
+            headers = json.loads(res.read())
+            assert headers[':authority'] == f'127.0.0.1:{self.server.port}'
+            assert headers['x-test'] == 'handler'
+            assert headers['x-request'] == 'request'
+            assert 'connection' not in headers
+
+    def test_multiplexing(self, handler):
+        connections = self.server.connections
+        with handler(verify=False) as rh:
+            results = []
+
+            def send():
+                with validate_and_send(rh, Request(f'{self.base_url}/delay')) as res:
+                    results.append(res.read())
+
+            start = time.monotonic()
+            threads = [threading.Thread(target=send) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == [b'done'] * 8
+            assert time.monotonic() - start < 8 * 0.5
+        assert self.server.connections == connections + 1
+
+    def test_flow_control(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'{self.base_url}/large'))
+            assert res.read(100) == LARGE_BODY[:100]
+            assert res.read() == LARGE_BODY[100:]
+            assert res.closed
+
+            # The request body is larger than the initial window of the server
+            res = validate_and_send(rh, Request(f'{self.base_url}/echo', data=LARGE_BODY))
+            assert res.read() == LARGE_BODY
+            res = validate_and_send(rh, Request(f'{self.base_url}/echo', data=io.BytesIO(LARGE_BODY)))
+            assert res.read() == LARGE_BODY
+
+    def test_close_before_end(self, handler):
+        with handler(verify=False) as rh:
+            for _ in range(3):
+                res = validate_and_send(rh, Request(f'{self.base_url}/large'))
+                res.read(100)
+                res.close()
+            assert validate_and_send(rh, Request(f'{self.base_url}/echo', data=b'test')).read() == b'test'
+
+    @pytest.mark.parametrize('status,method', [(302, 'GET'), (303, 'GET'), (307, 'POST'), (308, 'POST')])
+    def test_redirect(self, handler, status, method):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'{self.base_url}/redirect/{status}', data=b'data'))
+            assert res.url == f'{self.base_url}/echo'
+            assert res.get_header('x-method') == method
+            assert res.read() == (b'data' if method == 'POST' else b'')
+
+    def test_cookies(self, handler):
+        cookiejar = YoutubeDLCookieJar()
+        with handler(verify=False, cookiejar=cookiejar) as rh:
+            validate_and_send(rh, Request(f'{self.base_url}/cookies')).close()
+            assert cookiejar.get_cookie_header(self.base_url) == 'first=1; second=2'
+            headers = json.loads(validate_and_send(rh, Request(f'{self.base_url}/headers')).read())
+            assert headers['cookie'] == 'first=1; second=2'
+
+            headers = json.loads(validate_and_send(
+                rh, Request(f'{self.base_url}/headers', headers={'Cookie': 'test=1'})).read())
+            assert headers['cookie'] == 'test=1'
+
+    def test_content_encoding(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'{self.base_url}/gzip'))
+            assert res.read() == b'<html>compressed</html>'
+
+    def test_http_error(self, handler):
+        with handler(verify=False) as rh:
+            with pytest.raises(HTTPError) as exc_info:
+                validate_and_send(rh, Request(f'{self.base_url}/missing'))
+            assert exc_info.value.status == 404
+            assert exc_info.value.response.read() == b'not found'
+
+    def test_closed_connection(self, handler):
+        with handler(verify=False) as rh:
+            assert validate_and_send(rh, Request(f'{self.base_url}/echo', data=b'1')).read() == b'1'
+            for connection in rh._connections.values():
+                connection._sock.shutdown(socket.SHUT_RDWR)
+            time.sleep(0.1)
+            # A new connection is opened once the previous one is closed
+            assert validate_and_send(rh, Request(f'{self.base_url}/echo', data=b'2')).read() == b'2'
+
+    def test_timeout(self, handler):
+        with handler(verify=False, timeout=0.1) as rh:
+            with pytest.raises(TransportError):
+                validate_and_send(rh, Request(f'{self.base_url}/delay'))
+
+    def test_http1_fallback(self, handler):
+        with handler(verify=False) as rh:
+            assert rh.supports_http2(self.http1_url)
+            res = validate_and_send(rh, Request(f'{self.http1_url}/'))
+            assert json.loads(res.read()) == {'protocol': 'HTTP/1.1'}
+            assert not rh.supports_http2(self.http1_url)
+            assert rh.supports_http2(self.base_url)
+
+    @pytest.mark.parametrize('prefer_http2', [False, True])
+    def test_preference(self, prefer_http2):
+        with FakeYDL({'nocheckcertificate': True, 'prefer_http2': prefer_http2}) as ydl:
+            director = ydl.build_request_director([_REQUEST_HANDLERS[key] for key in ('H2', 'Urllib')], _RH_PREFERENCES)
+        expected = 'H2' if prefer_http2 else 'Urllib'
+        assert director._get_handlers(Request(f'{self.base_url}/'))[0].RH_KEY == expected
+
+        director.handlers['H2'].send(Request(f'{self.http1_url}/')).close()
+        assert director._get_handlers(Request(f'{self.http1_url}/'))[0].RH_KEY == 'Urllib'
+        director.close()
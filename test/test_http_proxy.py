@@ -246,7 +246,7 @@ def ctx(request):
 
 
 @pytest.mark.parametrize(
-    'handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+    'handler', ['Urllib', 'Requests', 'CurlCFFI', 'Asyncio'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 @pytest.mark.parametrize('ctx', ['http'], indirect=True)  # pure http proxy can only support http
 class TestHTTPProxy:
@@ -284,6 +284,7 @@ def test_http_source_address(self, handler, ctx):
                 assert proxy_info['client_address'][0] == source_address
 
     @pytest.mark.skip_handler('Urllib', 'urllib does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio handler does not support https proxies')
     def test_https(self, handler, ctx):
         with ctx.http_server(HTTPSProxyHandler) as server_address:
             with handler(verify=False, proxies={ctx.REQUEST_PROTO: f'https://{server_address}'}) as rh:
@@ -293,6 +294,7 @@ def test_https(self, handler, ctx):
                 assert 'Proxy-Authorization' not in proxy_info['headers']
 
     @pytest.mark.skip_handler('Urllib', 'urllib does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio handler does not support https proxies')
     def test_https_verify_failed(self, handler, ctx):
         with ctx.http_server(HTTPSProxyHandler) as server_address:
             with handler(verify=True, proxies={ctx.REQUEST_PROTO: f'https://{server_address}'}) as rh:
@@ -315,6 +317,8 @@ def test_http_with_idn(self, handler, ctx):
     'handler,ctx', [
         ('Requests', 'https'),
         ('CurlCFFI', 'https'),
+        ('H2', 'https'),
+        ('Asyncio', 'https'),
     ], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 class TestHTTPConnectProxy:
@@ -350,6 +354,8 @@ def test_http_connect_source_address(self, handler, ctx):
                 assert proxy_info['proxy'] == server_address
                 assert proxy_info['client_address'][0] == source_address
 
+    @pytest.mark.skip_handler('H2', 'h2 handler does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio handler does not support https proxies')
     @pytest.mark.skipif(urllib3 is None, reason='requires urllib3 to test')
     def test_https_connect_proxy(self, handler, ctx):
         with ctx.http_server(HTTPSConnectProxyHandler) as server_address:
@@ -359,6 +365,8 @@ def test_https_connect_proxy(self, handler, ctx):
                 assert proxy_info['connect'] is True
                 assert 'Proxy-Authorization' not in proxy_info['headers']
 
+    @pytest.mark.skip_handler('H2', 'h2 handler does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio handler does not support https proxies')
     @pytest.mark.skipif(urllib3 is None, reason='requires urllib3 to test')
     def test_https_connect_verify_failed(self, handler, ctx):
         with ctx.http_server(HTTPSConnectProxyHandler) as server_address:
@@ -369,6 +377,8 @@ def test_https_connect_verify_failed(self, handler, ctx):
                 with pytest.raises((ProxyError, SSLError)):
                     ctx.proxy_info_request(rh)
 
+    @pytest.mark.skip_handler('H2', 'h2 handler does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio handler does not support https proxies')
     @pytest.mark.skipif(urllib3 is None, reason='requires urllib3 to test')
     def test_https_connect_proxy_auth(self, handler, ctx):
         with ctx.http_server(HTTPSConnectProxyHandler, username='test', password='test') as server_address:
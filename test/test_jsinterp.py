@@ -541,6 +541,21 @@ def test_undefined_varnames(self):
         self._test(jsi, [JS_Undefined, JS_Undefined])
         self.assertEqual(jsi._undefined_varnames, {'b'})
 
+    def test_parse_cache(self):
+        # The parsed statements are reused, but the values must not be
+        code = 'function f(x){ var a = [x]; for (var i = 0; i < x; i++) { a.push(i * x) }; return a; }'
+        jsi = JSInterpreter(code)
+        self._test(jsi, [2, 0, 2], args=[2])
+        self._test(jsi, [3, 0, 3, 6], args=[3])
+        self._test(jsi, [1, 0], args=[1])
+        self._test(code, [1, 0], args=[1])
+        jsi = JSInterpreter('function f(){ return obj.v; }', {'obj': {'v': 1}})
+        self._test(jsi, 1)
+        jsi = JSInterpreter('function f(){ return obj.v; }', {'obj': {'v': 2}})
+        self._test(jsi, 2)
+        self._test('function f(){ return 1; }', 1)
+        self._test('function f(){ return 2; }', 2)
+
 
 if __name__ == '__main__':
     unittest.main()
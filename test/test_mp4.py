@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import io
+import struct
+import tempfile
+from unittest import mock
+
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.ism import write_piff_header
+from yt_dlp.mp4 import (
+    MP4Error,
+    box,
+    defragment,
+    full_box,
+    is_mp4,
+    iter_boxes,
+    parse_boxes,
+    remux,
+    u16,
+    u32,
+    u64,
+)
+from yt_dlp.mpegts import PACKET_SIZE, iter_pes
+from yt_dlp.postprocessor import FFmpegFixupM3u8PP, FFmpegFixupM4aPP, FFmpegPostProcessor
+
+TRACK_ID = 1
+TIMESCALE = 48000
+
+
+def _init_segment(**params):
+    stream = io.BytesIO()
+    write_piff_header(stream, {
+        'track_id': TRACK_ID,
+        'fourcc': 'AACL',
+        'duration': 0,
+        'timescale': TIMESCALE,
+        'stream_type': 'audio',
+        'codec_private_data': '1190',
+        'sampling_rate': TIMESCALE,
+        **params,
+    })
+    return stream.getvalue()
+
+
+def _fragment(sequence_number, decode_time, samples, duration=1024):
+    def moof(data_offset):
+        trun = u32.pack(len(samples)) + struct.pack('>i', data_offset) + b''.join(
+            u32.pack(duration) + u32.pack(len(sample)) for sample in samples)
+        return box(b'moof', full_box(b'mfhd', 0, 0, u32.pack(sequence_number)) + box(b'traf', b''.join((
+            full_box(b'tfhd', 0, 0x20000, u32.pack(TRACK_ID)),
+            full_box(b'tfdt', 1, 0, u64.pack(decode_time)),
+            full_box(b'trun', 0, 0x301, trun)))))
+
+    moof_size = len(moof(0))
+    return moof(moof_size + 8) + box(b'mdat', b''.join(samples))
+
+
+def _fragmented_file(fragments):
+    init = _init_segment()
+    data, decode_time = init, 0
+    for index, samples in enumerate(fragments, 1):
+        data += _fragment(index, decode_time, samples)
+        decode_time += 1024 * len(samples)
+    return data
+
+
+def _find(boxes, *path):
+    for box_type, payload in boxes:
+        if box_type == path[0]:
+            return payload if len(path) == 1 else _find(parse_boxes(payload), *path[1:])
+
+
+def _ts_timestamp(prefix, timestamp):
+    return bytes((
+        prefix << 4 | (timestamp >> 29) & 0xE | 1, (timestamp >> 22) & 0xFF,
+        (timestamp >> 14) & 0xFE | 1, (timestamp >> 7) & 0xFF, (timestamp << 1) & 0xFE | 1))
+
+
+class _TSMuxer:
+    PMT_PID = 0x1000
+
+    def __init__(self, streams):
+        self.streams = streams
+        self.data = bytearray()
+        self._counters = {}
+        pat = struct.pack('>BHHBBBHH', 0x00, 0xB000 | 13, 1, 0xC1, 0, 0, 1, 0xE000 | self.PMT_PID) + bytes(4)
+        self._write(0, b'\0' + pat)
+        pmt = b''.join(struct.pack('>BHH', stream_type, 0xE000 | pid, 0xF000) for pid, stream_type in streams.items())
+        pmt = struct.pack('>BHHBBBHH', 0x02, 0xB000 | (13 + len(pmt)), 1, 0xC1, 0, 0, 0xE000 | 0x100, 0xF000) + pmt
+        self._write(self.PMT_PID, b'\0' + pmt + bytes(4))
+
+    def _write(self, pid, payload):
+        first = True
+        while first or payload:
+            chunk, payload = payload[:184], payload[184:]
+            counter = self._counters[pid] = (self._counters.get(pid, -1) + 1) % 16
+            header = struct.pack('>BH', 0x47, (0x4000 if first else 0) | pid)
+            if len(chunk) < 184:
+                # Stuffing in the adaptation field
+                stuffing = 183 - len(chunk)
+                self.data += header + bytes((0x30 | counter, stuffing)) + (b'\0' + b'\xFF' * (stuffing - 1) if stuffing else b'')
+            else:
+                self.data += header + bytes((0x10 | counter,))
+            self.data += chunk
+            first = False
+
+    def pes(self, pid, data, pts, dts=None):
+        stream_id = 0xE0 if self.streams[pid] == 0x1B else 0xC0
+        if dts is None:
+            header = bytes((0x80, 0x80, 5)) + _ts_timestamp(0x2, pts)
+        else:
+            header = bytes((0x80, 0xC0, 10)) + _ts_timestamp(0x3, pts) + _ts_timestamp(0x1, dts)
+        self._write(pid, b'\0\0\1' + bytes((stream_id,)) + u16.pack(0) + header + data)
+
+
+def _exp_golomb(value):
+    code = f'{value + 1:b}'
+    return '0' * (len(code) - 1) + code
+
+
+def _sps(width_in_mbs, height_in_mbs, crop_bottom):
+    # Constrained baseline profile, with frame cropping and without VUI
+    bits = ''.join((
+        f'{66:08b}{0xC0:08b}{40:08b}', _exp_golomb(0), _exp_golomb(0), _exp_golomb(2), _exp_golomb(1), '0',
+        _exp_golomb(width_in_mbs - 1), _exp_golomb(height_in_mbs - 1), '111',
+        _exp_golomb(0), _exp_golomb(0), _exp_golomb(0), _exp_golomb(crop_bottom), '0', '1'))
+    bits += '0' * (-len(bits) % 8)
+    return b'\x67' + int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+def _adts(data):
+    # AAC LC, 48 kHz, 2 channels
+    size = 7 + len(data)
+    return bytes((0xFF, 0xF1, 0x4C, 0x80 | size >> 11, (size >> 3) & 0xFF, (size & 0x7) << 5 | 0x1F, 0xFC)) + data
+
+
+def _trak_by_handler(boxes, handler):
+    for box_type, payload in parse_boxes(_find(boxes, b'moov')):
+        if box_type == b'trak' and _find(parse_boxes(payload), b'mdia', b'hdlr')[8:12] == handler:
+            return parse_boxes(payload)
+
+
+class TestMP4(unittest.TestCase):
+    FRAGMENTS = [[b'a' * 10, b'bb' * 10], [b'c' * 30], [b'd' * 5, b'e' * 5, b'f' * 5]]
+    # The access unit delimiter and parameter sets of 1920x1080 H.264 video
+    AUD, SPS, PPS = b'\x09\xF0', _sps(120, 68, 4), b'\x68\xCE\x38\x80'
+
+    def _defragment(self, data):
+        dst = io.BytesIO()
+        defragment(io.BytesIO(data), dst)
+        return dst.getvalue()
+
+    def test_iter_boxes(self):
+        stream = io.BytesIO(box(b'ftyp', b'isom') + u32.pack(1) + b'free' + u64.pack(20) + b'test' + box(b'mdat', b''))
+        self.assertTrue(is_mp4(stream))
+        stream.seek(0)
+        self.assertEqual(list(iter_boxes(stream)), [(b'ftyp', 0, 4), (b'free', 12, 4), (b'mdat', 32, 0)])
+        self.assertFalse(is_mp4(io.BytesIO(b'\x47' * 188)))
+
+    def test_defragment(self):
+        data = self._defragment(_fragmented_file(self.FRAGMENTS))
+        boxes = parse_boxes(data)
+        self.assertEqual([box_type for box_type, _ in boxes], [b'ftyp', b'moov', b'mdat'])
+        self.assertIsNone(_find(boxes, b'moov', b'mvex'))
+
+        samples = [sample for fragment in self.FRAGMENTS for sample in fragment]
+        self.assertEqual(_find(boxes, b'mdat'), b''.join(samples))
+
+        stbl = parse_boxes(_find(boxes, b'moov', b'trak', b'mdia', b'minf', b'stbl'))
+        stsz = _find(stbl, b'stsz')
+        self.assertEqual(struct.unpack_from(f'>{len(samples) + 2}I', stsz, 4), (
+            0, len(samples), *map(len, samples)))
+        self.assertEqual(struct.unpack_from('>II', _find(stbl, b'stts'), 4), (1, len(samples)))
+        self.assertEqual(struct.unpack_from('>10I', _find(stbl, b'stsc'), 4), (3, 1, 2, 1, 2, 1, 1, 3, 3, 1))
+
+        stco = _find(stbl, b'stco')
+        chunk_offsets = struct.unpack_from('>4I', stco, 4)
+        self.assertEqual(chunk_offsets[0], len(self.FRAGMENTS))
+        for offset, fragment in zip(chunk_offsets[1:], self.FRAGMENTS, strict=True):
+            self.assertEqual(data[offset:offset + len(b''.join(fragment))], b''.join(fragment))
+
+        mdhd = _find(boxes, b'moov', b'trak', b'mdia', b'mdhd')
+        self.assertEqual(mdhd[0], 0)
+        self.assertEqual(struct.unpack_from('>II', mdhd, 12), (TIMESCALE, 1024 * len(samples)))
+
+    def test_defragment_duplicate_moov(self):
+        data = _fragmented_file(self.FRAGMENTS)
+        init = _init_segment()
+        moov = init[init.index(b'moov') - 4:]
+        first_fragment = len(init) + len(_fragment(1, 0, self.FRAGMENTS[0]))
+        self.assertEqual(
+            self._defragment(data[:first_fragment] + moov + data[first_fragment:]), self._defragment(data))
+
+        different_moov = _init_segment(sampling_rate=44100)
+        different_moov = different_moov[different_moov.index(b'moov') - 4:]
+        with self.assertRaisesRegex(MP4Error, 'different initialization segments'):
+            self._defragment(data[:first_fragment] + different_moov + data[first_fragment:])
+
+    def test_defragment_errors(self):
+        with self.assertRaisesRegex(MP4Error, 'no movie fragments'):
+            self._defragment(_init_segment())
+        with self.assertRaisesRegex(MP4Error, 'not continuous'):
+            self._defragment(_init_segment() + _fragment(1, 0, [b'a']) + _fragment(2, 5000, [b'b']))
+        with self.assertRaises(MP4Error):
+            self._defragment(b'\x47' * 188)
+        with self.assertRaisesRegex(MP4Error, 'outside of the media data'):
+            self._defragment(_init_segment() + _fragment(1, 0, [b'a'])[:-9] + box(b'mdat', b'') + box(b'free', b'a'))
+        with self.assertRaisesRegex(MP4Error, 'Truncated file'):
+            self._defragment(_fragmented_file(self.FRAGMENTS)[:-1])
+
+    def _mpegts(self, video_stream_type=0x1B):
+        muxer = _TSMuxer({0x100: video_stream_type, 0x101: 0x0F, 0x102: 0x15})
+        # I, P and B frames, after 10 seconds, and with the video starting 1/30 s after the audio
+        start, frame_duration = 900000, 3003
+        muxer.pes(0x100, b''.join(b'\0\0\0\1' + nal_unit for nal_unit in (
+            self.AUD, self.SPS, self.PPS, b'\x65' + b'I' * 300)), start + frame_duration, start)
+        muxer.pes(0x101, _adts(b'a' * 20) + _adts(b'b' * 21), start)
+        muxer.pes(0x102, b'ID3', start)
+        muxer.pes(0x100, b'\0\0\0\1' + self.AUD + b'\0\0\1\x41' + b'P' * 100,
+                  start + 3 * frame_duration, start + frame_duration)
+        muxer.pes(0x101, _adts(b'c' * 22), start + 2 * 1920)
+        muxer.pes(0x100, b'\0\0\1\x01' + b'B' * 50, start + 2 * frame_duration, start + 2 * frame_duration)
+        return bytes(muxer.data)
+
+    def test_remux_mpegts(self):
+        dst = io.BytesIO()
+        remux(io.BytesIO(self._mpegts()), dst)
+        data = dst.getvalue()
+        boxes = parse_boxes(data)
+        self.assertEqual([box_type for box_type, _ in boxes], [b'ftyp', b'free', b'mdat', b'moov'])
+
+        video = _trak_by_handler(boxes, b'vide')
+        self.assertEqual(struct.unpack_from('>II', _find(video, b'tkhd'), 76), (1920 << 16, 1080 << 16))
+        # The video starts 33 ms after the audio, with the composition offset of its first frame
+        self.assertEqual(struct.unpack_from('>I6i', _find(video, b'edts', b'elst'), 4),
+                         (2, 33, -1, 0x10000, 66, 3003, 0x10000))
+        stbl = parse_boxes(_find(video, b'mdia', b'minf', b'stbl'))
+        avcc = parse_boxes(_find(stbl, b'stsd')[8 + 8 + 78:])
+        self.assertEqual(_find(avcc, b'avcC'), b'\x01\x42\xC0\x28\xFF\xE1' + u16.pack(len(self.SPS)) + self.SPS
+                         + b'\x01' + u16.pack(len(self.PPS)) + self.PPS)
+        self.assertEqual(struct.unpack_from('>III', _find(stbl, b'stts'), 4), (1, 3, 3003))
+        self.assertEqual(struct.unpack_from('>7I', _find(stbl, b'ctts'), 4), (3, 1, 3003, 1, 6006, 1, 0))
+        self.assertEqual(struct.unpack_from('>II', _find(stbl, b'stss'), 4), (1, 1))
+        # The access unit delimiters and parameter sets are left out, and the start codes replaced by lengths
+        samples = [u32.pack(301) + b'\x65' + b'I' * 300, u32.pack(101) + b'\x41' + b'P' * 100,
+                   u32.pack(51) + b'\x01' + b'B' * 50]
+        self.assertEqual(struct.unpack_from('>5I', _find(stbl, b'stsz'), 4), (0, 3, *map(len, samples)))
+        for offset, sample in zip(struct.unpack_from('>4I', _find(stbl, b'stco'), 4)[1:], samples, strict=True):
+            self.assertEqual(data[offset:offset + len(sample)], sample)
+
+        audio = _trak_by_handler(boxes, b'soun')
+        self.assertEqual(struct.unpack_from('>I3i', _find(audio, b'edts', b'elst'), 4), (1, 64, 0, 0x10000))
+        mdhd = _find(audio, b'mdia', b'mdhd')
+        self.assertEqual(struct.unpack_from('>II', mdhd, 12), (48000, 3 * 1024))
+        stbl = parse_boxes(_find(audio, b'mdia', b'minf', b'stbl'))
+        # The audio specific config of AAC LC, 48 kHz, 2 channels
+        self.assertTrue(_find(stbl, b'stsd').endswith(b'\x05\x02\x11\x90\x06\x01\x02'))
+        self.assertEqual(struct.unpack_from('>5I', _find(stbl, b'stsz'), 4), (0, 3, 20, 21, 22))
+        chunk_offsets = struct.unpack_from('>3I', _find(stbl, b'stco'), 4)
+        self.assertEqual(chunk_offsets[0], 2)
+        self.assertEqual(data[chunk_offsets[1]:chunk_offsets[1] + 41], b'a' * 20 + b'b' * 21)
+        self.assertEqual(data[chunk_offsets[2]:chunk_offsets[2] + 22], b'c' * 22)
+
+    def test_remux_errors(self):
+        dst = io.BytesIO()
+        with self.assertRaisesRegex(MP4Error, 'Unsupported stream type 0x24'):
+            remux(io.BytesIO(self._mpegts(video_stream_type=0x24)), dst)
+        with self.assertRaisesRegex(MP4Error, 'neither'):
+            remux(io.BytesIO(b'test'), dst)
+        with self.assertRaisesRegex(MP4Error, 'no movie fragments'):
+            remux(io.BytesIO(_init_segment()), dst)
+
+        def video(*access_units):
+            muxer = _TSMuxer({0x100: 0x1B})
+            for index, access_unit in enumerate(access_units):
+                muxer.pes(0x100, b''.join(b'\0\0\0\1' + nal_unit for nal_unit in access_unit), 3003 * index)
+            return io.BytesIO(bytes(muxer.data))
+
+        frames = [(b'\x65' + b'I' * 10,), (b'\x41' + b'P' * 10,), (b'\x41' + b'P' * 10,)]
+        with self.assertRaisesRegex(MP4Error, 'no parameter sets'):
+            remux(video(*frames), dst)
+        with self.assertRaisesRegex(MP4Error, 'Truncated parameter set'):
+            remux(video((b'\x67\x42', self.PPS, *frames[0]), *frames[1:]), dst)
+
+    def test_mpegts_packets(self):
+        def video(value):
+            muxer = _TSMuxer({0x100: 0x1B})
+            muxer.pes(0x100, b'\0\0\1\x41' + bytes([value]) * 10, 0)
+            return bytes(muxer.data)
+
+        # The continuity counters restart in each segment
+        data = video(1) + video(2)
+        self.assertEqual([pes[4][-1] for pes in iter_pes(io.BytesIO(data))], [1, 2])
+        # A packet that is sent twice is left out
+        data = video(1)
+        self.assertEqual(len(list(iter_pes(io.BytesIO(data + data[-PACKET_SIZE:])))), 1)
+
+    def test_fixup_without_ffmpeg(self):
+        ydl = YoutubeDL({'quiet': True})
+        pp = FFmpegFixupM4aPP(ydl)
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch.object(FFmpegPostProcessor, 'available', False):
+            path = os.path.join(tmpdir, 'test.m4a')
+            with open(path, 'wb') as f:
+                f.write(_fragmented_file(self.FRAGMENTS))
+            pp.run({'filepath': path, 'ext': 'm4a', 'vcodec': 'none', 'container': 'm4a_dash'})
+            with open(path, 'rb') as f:
+                self.assertEqual([box_type for box_type, _, _ in iter_boxes(f)], [b'ftyp', b'moov', b'mdat'])
+            self.assertEqual(os.listdir(tmpdir), ['test.m4a'])
+
+            path = os.path.join(tmpdir, 'test.mp4')
+            with open(path, 'wb') as f:
+                f.write(self._mpegts())
+            FFmpegFixupM3u8PP(ydl).run({'filepath': path, 'ext': 'mp4', 'protocol': 'm3u8_native'})
+            with open(path, 'rb') as f:
+                self.assertEqual([box_type for box_type, _, _ in iter_boxes(f)], [b'ftyp', b'free', b'mdat', b'moov'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,7 @@
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import asyncio
 import gzip
 import http.client
 import http.cookiejar
@@ -38,6 +39,8 @@
 from yt_dlp.cookies import YoutubeDLCookieJar
 from yt_dlp.dependencies import brotli, curl_cffi, requests, urllib3
 from yt_dlp.networking import (
+    AsyncRequestHandler,
+    AsyncResponse,
     HEADRequest,
     PATCHRequest,
     PUTRequest,
@@ -311,7 +314,7 @@ def setup_class(cls):
         cls.https_server_thread.start()
 
 
-@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI', 'Asyncio'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', os.name == 'nt', reason='segfaults')
 class TestHTTPRequestHandler(TestRequestHandlerBase):
 
@@ -755,6 +758,20 @@ def test_partial_read_then_full_read(self, handler):
                 assert res.read(0) == b''
                 assert res.read() == b'<video src="/vid.mp4" /></html>'
 
+    def test_readinto(self, handler):
+        with handler() as rh:
+            for encoding in ('', 'gzip'):
+                res = validate_and_send(rh, Request(
+                    f'http://127.0.0.1:{self.http_port}/content-encoding',
+                    headers={'ytdl-encoding': encoding}))
+                buffer = bytearray(6)
+                assert res.readinto(buffer) == 6
+                assert buffer == b'<html>'
+                buffer = bytearray(512)
+                size = res.readinto(memoryview(buffer))
+                assert buffer[:size] == b'<video src="/vid.mp4" /></html>'
+                assert res.readinto(buffer) == 0
+
     def test_partial_read_greater_than_response_then_full_read(self, handler):
         with handler() as rh:
             for encoding in ('', 'gzip', 'deflate'):
@@ -767,7 +784,7 @@ def test_partial_read_greater_than_response_then_full_read(self, handler):
                 assert res.read() == b''
 
 
-@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI', 'Asyncio'], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 class TestClientCertificate:
     @classmethod
@@ -1034,6 +1051,21 @@ def request(self, *args, **kwargs):
 
             assert exc_info.type is expected
 
+    @pytest.mark.parametrize('pool_size,connections', [(None, 14), (12, 12)])
+    def test_connection_pool(self, handler, pool_size, connections):
+        with handler(pool_size=pool_size) as rh:
+            for _ in range(2):
+                responses = [
+                    validate_and_send(rh, Request(f'http://127.0.0.1:{self.http_port}/headers'))
+                    for _ in range(12)]
+                for response in responses:
+                    response.read()
+                    response.close()
+            # The stats of a pool are counted once it is discarded
+            rh._clear_instances()
+            # The connections that do not fit in the pool are not reused
+            assert rh._connection_stats == {'requests': 24, 'connections': connections}
+
     @pytest.mark.parametrize('raised,expected,match', [
         (lambda: urllib3.exceptions.SSLError(), SSLError, None),
         (lambda: urllib3.exceptions.TimeoutError(), TransportError, None),
@@ -1268,6 +1300,76 @@ def test_http_response_auto_close(self, handler):
             assert res.closed
 
 
+@pytest.mark.parametrize('handler', ['Asyncio'], indirect=True)
+class TestAsyncioRequestHandler(TestRequestHandlerBase):
+    def test_asend(self, handler):
+        async def send(rh):
+            async with await rh.asend(Request(f'http://127.0.0.1:{self.http_port}/gen_200')) as res:
+                assert isinstance(res, AsyncResponse)
+                assert res.status == 200
+                assert res.get_header('Content-Type') == 'text/html; charset=utf-8'
+                assert b''.join([chunk async for chunk in res]) == b'<html></html>'
+                assert res.closed
+
+        with handler() as rh:
+            asyncio.run(send(rh))
+
+    def test_content_encoding(self, handler):
+        async def send(rh, encoding):
+            res = await rh.asend(Request(
+                f'http://127.0.0.1:{self.http_port}/content-encoding', headers={'ytdl-encoding': encoding}))
+            assert await res.read(6) == b'<html>'
+            assert await res.read() == b'<video src="/vid.mp4" /></html>'
+
+        with handler() as rh:
+            for encoding in ('gzip', 'deflate', 'gzip, deflate'):
+                asyncio.run(send(rh, encoding))
+
+    def test_connection_reuse(self, handler):
+        async def send(rh):
+            for _ in range(3):
+                res = await rh.asend(Request(f'http://127.0.0.1:{self.http_port}/gen_200'))
+                assert await res.read() == b'<html></html>'
+                # The connection is released once the response is read
+                assert [len(connections) for connections in rh._get_pool().values()] == [1]
+
+        with handler() as rh:
+            asyncio.run(send(rh))
+
+    def test_concurrent_requests(self, handler):
+        async def send(rh):
+            async def get():
+                res = await rh.asend(Request(f'http://127.0.0.1:{self.http_port}/timeout_1'))
+                return await res.read()
+            return await asyncio.gather(*(get() for _ in range(4)))
+
+        with handler() as rh:
+            start = time.monotonic()
+            assert len(asyncio.run(send(rh))) == 4
+            assert time.monotonic() - start < 4
+
+    def test_http_error(self, handler):
+        async def send(rh):
+            with pytest.raises(HTTPError) as exc_info:
+                await rh.asend(Request(f'http://127.0.0.1:{self.http_port}/gen_404'))
+            assert exc_info.value.status == 404
+            assert exc_info.value.handler is rh
+            assert await exc_info.value.response.read() == b'<html></html>'
+
+        with handler() as rh:
+            asyncio.run(send(rh))
+
+    def test_incomplete_read(self, handler):
+        async def send(rh):
+            res = await rh.asend(Request(f'http://127.0.0.1:{self.http_port}/incompleteread'))
+            with pytest.raises(IncompleteRead):
+                await res.read()
+            assert res.closed
+
+        with handler() as rh:
+            asyncio.run(send(rh))
+
+
 def run_validation(handler, error, req, **handler_kwargs):
     with handler(**handler_kwargs) as rh:
         if error:
@@ -1316,6 +1418,15 @@ class HTTPSupportedRH(ValidationRH):
             ('http', False, {}),
             ('https', False, {}),
         ]),
+        ('H2', [
+            ('http', UnsupportedRequest, {}),
+            ('https', False, {}),
+        ]),
+        ('Asyncio', [
+            ('http', False, {}),
+            ('https', False, {}),
+            ('ws', UnsupportedRequest, {}),
+        ]),
         (NoCheckRH, [('http', False, {})]),
         (ValidationRH, [('http', UnsupportedRequest, {})]),
     ]
@@ -1347,6 +1458,22 @@ class HTTPSupportedRH(ValidationRH):
             ('socks5', False),
             ('socks5h', False),
         ]),
+        ('H2', 'https', [
+            ('http', False),
+            ('https', UnsupportedRequest),
+            ('socks4', False),
+            ('socks4a', False),
+            ('socks5', False),
+            ('socks5h', False),
+        ]),
+        ('Asyncio', 'http', [
+            ('http', False),
+            ('https', UnsupportedRequest),
+            ('socks4', False),
+            ('socks4a', False),
+            ('socks5', False),
+            ('socks5h', False),
+        ]),
         ('Websockets', 'ws', [
             ('http', UnsupportedRequest),
             ('https', UnsupportedRequest),
@@ -1375,6 +1502,14 @@ class HTTPSupportedRH(ValidationRH):
             ('all', 'http', False),
             ('unrelated', 'http', False),
         ]),
+        ('H2', 'https', [
+            ('all', 'http', False),
+            ('unrelated', 'http', False),
+        ]),
+        ('Asyncio', 'http', [
+            ('all', 'http', False),
+            ('unrelated', 'http', False),
+        ]),
         ('Websockets', 'ws', [
             ('all', 'socks5', False),
             ('unrelated', 'socks5', False),
@@ -1426,6 +1561,28 @@ class HTTPSupportedRH(ValidationRH):
             ({'legacy_ssl': True}, False),
             ({'legacy_ssl': 'notabool'}, AssertionError),
         ]),
+        ('H2', 'https', [
+            ({'cookiejar': 'notacookiejar'}, AssertionError),
+            ({'cookiejar': YoutubeDLCookieJar()}, False),
+            ({'timeout': 1}, False),
+            ({'timeout': 'notatimeout'}, AssertionError),
+            ({'unsupported': 'value'}, UnsupportedRequest),
+            ({'legacy_ssl': False}, False),
+            ({'legacy_ssl': True}, False),
+            ({'legacy_ssl': 'notabool'}, AssertionError),
+            ({'keep_header_casing': True}, UnsupportedRequest),
+        ]),
+        ('Asyncio', 'http', [
+            ({'cookiejar': 'notacookiejar'}, AssertionError),
+            ({'cookiejar': YoutubeDLCookieJar()}, False),
+            ({'timeout': 1}, False),
+            ({'timeout': 'notatimeout'}, AssertionError),
+            ({'unsupported': 'value'}, UnsupportedRequest),
+            ({'legacy_ssl': False}, False),
+            ({'legacy_ssl': True}, False),
+            ({'keep_header_casing': True}, False),
+            ({'keep_header_casing': 'notabool'}, AssertionError),
+        ]),
         (NoCheckRH, 'http', [
             ({'cookiejar': 'notacookiejar'}, False),
             ({'somerandom': 'test'}, False),  # but any extension is allowed through
@@ -1443,6 +1600,8 @@ class HTTPSupportedRH(ValidationRH):
         ('Urllib', False, 'http'),
         ('Requests', False, 'http'),
         ('CurlCFFI', False, 'http'),
+        ('H2', False, 'https'),
+        ('Asyncio', False, 'http'),
         ('Websockets', False, 'ws'),
     ], indirect=['handler'])
     def test_no_proxy(self, handler, fail, scheme):
@@ -1454,6 +1613,8 @@ def test_no_proxy(self, handler, fail, scheme):
         (HTTPSupportedRH, 'http'),
         ('Requests', 'http'),
         ('CurlCFFI', 'http'),
+        ('H2', 'https'),
+        ('Asyncio', 'http'),
         ('Websockets', 'ws'),
     ], indirect=['handler'])
     def test_empty_proxy(self, handler, scheme):
@@ -1466,6 +1627,8 @@ def test_empty_proxy(self, handler, scheme):
         (HTTPSupportedRH, 'http'),
         ('Requests', 'http'),
         ('CurlCFFI', 'http'),
+        ('H2', 'https'),
+        ('Asyncio', 'http'),
         ('Websockets', 'ws'),
     ], indirect=['handler'])
     def test_invalid_proxy_url(self, handler, scheme, proxy_url):
@@ -1665,6 +1828,81 @@ def mock_close(*args, **kwargs):
         director.close()
         assert called
 
+    def test_max_connections_per_host(self):
+        class StatusRH(FakeRH):
+            def _send(self, request: Request):
+                response = FakeResponse(request)
+                if request.url.endswith('/error'):
+                    raise HTTPError(response)
+                return response
+
+        director = RequestDirector(logger=FakeLogger(), max_connections_per_host=2)
+        director.add_handler(StatusRH(logger=FakeLogger(), timeout=5))
+        first = director.send(Request('http://example.com/1'))
+        second = director.send(Request('http://EXAMPLE.com/2'))
+        # Other hosts and non-HTTP urls are not limited
+        director.send(Request('http://example.org/'))
+        director.send(Request('any://example.com/'))
+
+        sent = threading.Event()
+
+        def send():
+            director.send(Request('http://example.com/3'))
+            sent.set()
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        assert not sent.wait(0.2)
+        first.close()
+        assert sent.wait(5)
+        thread.join()
+
+        # The slot of the response of an HTTPError is only released once it is closed
+        with pytest.raises(HTTPError) as exc_info:
+            director.send(Request('http://example.org/error'))
+        director.send(Request('http://example.org/'))
+        exc_info.value.close()
+        second.close()
+        assert director._host_stats['example.com'] == {'requests': 3, 'waits': 1}
+
+    def test_max_connections_per_host_timeout(self):
+        director = RequestDirector(logger=FakeLogger(), max_connections_per_host=1)
+        director.add_handler(FakeRH(logger=FakeLogger(), timeout=0.1))
+        director.send(Request('http://example.com/1'))
+        # A response that is never closed does not block other requests forever
+        director.send(Request('http://example.com/2'))
+
+    def test_asend(self):
+        class FakeAsyncResponse(AsyncResponse):
+            async def read(self, amt=None):
+                return b'async'
+
+        class FakeAsyncRH(AsyncRequestHandler):
+            def _validate(self, request):
+                return
+
+            async def _asend(self, request):
+                return FakeAsyncResponse(url=request.url, headers={})
+
+        async def send(director):
+            # Blocking handlers are run in a thread
+            res = await director.asend(Request('http://'))
+            assert isinstance(res, AsyncResponse)
+            assert isinstance(res.response, FakeResponse)
+            assert await res.read() == b''
+
+            # Asynchronous handlers are tried first
+            director.add_handler(FakeAsyncRH(logger=FakeLogger()))
+            assert await (await director.asend(Request('http://'))).read() == b'async'
+
+        director = RequestDirector(logger=FakeLogger())
+        director.add_handler(FakeRH(logger=FakeLogger()))
+        asyncio.run(send(director))
+        # Asynchronous handlers can also be used as blocking handlers
+        director.handlers.pop(FakeRH.RH_KEY)
+        assert director.send(Request('http://')).read() == b'async'
+        director.close()
+
 
 # XXX: do we want to move this to test_YoutubeDL.py?
 class TestYoutubeDLNetworking:
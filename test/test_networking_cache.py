@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import time
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+from yt_dlp.dependencies import sqlite3
+from yt_dlp.networking import Request, Response
+from yt_dlp.networking.cache import ResponseCache
+from yt_dlp.networking.exceptions import HTTPError
+
+
+class FakeServer:
+    def __init__(self):
+        self.requests = []
+        self.headers = {}
+        self.body = b'body'
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.headers.get('ETag') and request.headers.get('If-None-Match') == self.headers['ETag']:
+            raise HTTPError(Response(io.BytesIO(b''), request.url, {}, 304))
+        return Response(io.BytesIO(self.body), request.url, self.headers)
+
+
+@pytest.mark.skipif(not sqlite3, reason='sqlite3 is not available')
+class TestResponseCache:
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'http.sqlite'))
+        yield cache
+        cache.close()
+
+    def test_fresh(self, cache):
+        server = FakeServer()
+        for _ in range(2):
+            assert cache.urlopen(Request('https://example.com/'), server).read() == b'body'
+        assert len(server.requests) == 1
+
+        # The request headers, method and data are part of the key
+        cache.urlopen(Request('https://example.com/', headers={'Accept': 'text/html'}), server)
+        cache.urlopen(Request('https://example.com/', data=b'data'), server)
+        cache.urlopen(Request('https://example.com/', data=b'data'), server)
+        assert len(server.requests) == 4
+
+    def test_cache_control(self, cache):
+        server = FakeServer()
+        server.headers = {'Cache-Control': 'no-store'}
+        cache.urlopen(Request('https://example.com/'), server)
+        cache.urlopen(Request('https://example.com/'), server)
+        assert len(server.requests) == 2
+
+        server.headers = {'Cache-Control': 'max-age=0'}
+        cache.urlopen(Request('https://example.com/a'), server)
+        cache.urlopen(Request('https://example.com/a'), server)
+        assert len(server.requests) == 4
+
+    def test_ttl(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'http.sqlite'), ttls={'example.com': 0, 'test': 3600})
+        server = FakeServer()
+        server.headers = {'Cache-Control': 'no-cache'}
+        # Configured TTLs take precedence over the server's
+        cache.urlopen(Request('https://www.example.com/'), server, ie_key='Test')
+        cache.urlopen(Request('https://www.example.com/'), server, ie_key='Test')
+        assert len(server.requests) == 1
+        cache.urlopen(Request('https://www.example.com/'), server)
+        assert len(server.requests) == 2
+        cache.close()
+
+    def test_revalidation(self, cache):
+        server = FakeServer()
+        server.headers = {'Cache-Control': 'no-cache', 'ETag': '"1"'}
+        assert cache.urlopen(Request('https://example.com/'), server).read() == b'body'
+        server.body = b'changed'
+        response = cache.urlopen(Request('https://example.com/'), server)
+        assert server.requests[-1].headers['If-None-Match'] == '"1"'
+        assert response.read() == b'body'
+        assert response.status == 200
+
+        server.headers['ETag'] = '"2"'
+        assert cache.urlopen(Request('https://example.com/'), server).read() == b'changed'
+        assert len(server.requests) == 3
+
+    def test_cookies(self, cache):
+        server = FakeServer()
+        server.headers = {'Set-Cookie': 'name=value; Domain=.example.com; Path=/'}
+        cookiejar = YoutubeDLCookieJar()
+        cache.urlopen(Request('https://example.com/'), server, cookiejar=cookiejar)
+        assert not cookiejar.get_cookie_header('https://example.com/')
+        cache.urlopen(Request('https://example.com/'), server, cookiejar=cookiejar)
+        assert cookiejar.get_cookie_header('https://example.com/') == 'name=value'
+        assert len(server.requests) == 1
+
+        # Responses are not shared with requests that send different cookies
+        cache.urlopen(Request('https://example.com/'), server, cookiejar=cookiejar)
+        assert len(server.requests) == 2
+        cache.urlopen(Request('https://example.com/'), server, cookiejar=YoutubeDLCookieJar())
+        cache.urlopen(Request('https://example.com/', extensions={'cookiejar': cookiejar}), server)
+        assert len(server.requests) == 2
+
+    def test_unkeyed_headers(self, cache):
+        server = FakeServer()
+        cache.urlopen(Request('https://example.com/', headers={'X-Forwarded-For': '1.2.3.4'}), server)
+        cache.urlopen(Request('https://example.com/', headers={'X-Forwarded-For': '5.6.7.8'}), server)
+        assert len(server.requests) == 1
+
+    def test_eviction(self, cache):
+        server = FakeServer()
+        server.body = os.urandom(1000)
+        cache.max_size = 2500
+        for path in ('a', 'b', 'a', 'c'):
+            cache.urlopen(Request(f'https://example.com/{path}'), server)
+            time.sleep(0.01)
+        # "b" was the least recently used
+        cache.urlopen(Request('https://example.com/a'), server)
+        cache.urlopen(Request('https://example.com/b'), server)
+        assert [request.url.rpartition('/')[2] for request in server.requests] == ['a', 'b', 'c', 'b']
@@ -10,12 +10,16 @@
 
 import io
 import random
+import socket
 import ssl
+import threading
+import time
 
 from yt_dlp.cookies import YoutubeDLCookieJar
 from yt_dlp.dependencies import certifi
 from yt_dlp.networking import Response
 from yt_dlp.networking._helper import (
+    DNSCache,
     InstanceStoreMixin,
     add_accept_encoding_header,
     get_redirect_method,
@@ -132,6 +136,73 @@ def test_add_accept_encoding_header(self, headers, supported_encodings, expected
         assert headers == HTTPHeaderDict(expected)
 
 
+def _addrinfo(address):
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    return family, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (address, 443)
+
+
+class TestDNSCache:
+    @pytest.fixture
+    def lookups(self, monkeypatch):
+        lookups = []
+
+        def getaddrinfo(host, *args):
+            lookups.append(host)
+            if host == 'missing.invalid':
+                raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+            if host == 'failing.invalid':
+                raise socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+            time.sleep(0.1)
+            return [_addrinfo(address) for address in ('::1', '::2', '127.0.0.1', '127.0.0.2')]
+
+        monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+        return lookups
+
+    def test_cache(self, lookups):
+        cache = DNSCache(ttl=0.2)
+        expected = [_addrinfo(address) for address in ('::1', '127.0.0.1', '::2', '127.0.0.2')]
+        assert cache.getaddrinfo('example.com', 443) == expected
+        assert cache.getaddrinfo('example.com', 443) == expected
+        assert lookups == ['example.com']
+        cache.getaddrinfo('example.com', 443, socket.AF_INET)
+        assert len(lookups) == 2
+        time.sleep(0.2)
+        cache.getaddrinfo('example.com', 443)
+        assert len(lookups) == 3
+        assert cache.stats == {'hits': 1, 'misses': 3}
+
+    def test_negative_cache(self, lookups):
+        cache = DNSCache()
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                cache.getaddrinfo('missing.invalid', 443)
+            with pytest.raises(socket.gaierror):
+                cache.getaddrinfo('failing.invalid', 443)
+        # Temporary failures are not cached
+        assert lookups == ['missing.invalid', 'failing.invalid', 'failing.invalid']
+        assert cache.stats['negative_hits'] == 1
+
+    def test_concurrent_lookups(self, lookups):
+        cache = DNSCache()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.getaddrinfo('example.com', 443)))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert lookups == ['example.com']
+        assert len(results) == 5 and all(result == results[0] for result in results)
+
+    def test_report_failure(self, lookups):
+        cache = DNSCache()
+        addrinfos = cache.getaddrinfo('example.com', 443)
+        cache.report_failure('example.com', 443, addrinfos[0])
+        assert cache.getaddrinfo('example.com', 443) == [*addrinfos[1:], addrinfos[0]]
+        assert cache.stats['failures'] == 1
+
+
 class TestInstanceStoreMixin:
 
     class FakeInstanceStoreMixin(InstanceStoreMixin):
@@ -8,13 +8,22 @@
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import json
 import subprocess
+import tempfile
+from unittest import mock
 
 from yt_dlp import YoutubeDL
 from yt_dlp.utils import shell_quote
 from yt_dlp.postprocessor import (
     ExecPP,
+    FFmpegEmbedSubtitlePP,
+    FFmpegFixupM3u8PP,
+    FFmpegFixupM4aPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
     FFmpegThumbnailsConvertorPP,
+    FFmpegVideoRemuxerPP,
     MetadataFromFieldPP,
     MetadataParserPP,
     ModifyChaptersPP,
@@ -87,6 +96,123 @@ def test_parse_cmd(self):
         self.assertEqual(pp.parse_cmd('echo %(filepath)q', info), cmd)
 
 
+class TestFFmpegFusedPP(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.commands = []
+
+    def _path(self, filename, create=False):
+        path = os.path.join(self._tmpdir.name, filename)
+        if create:
+            open(path, 'w').close()
+        return path
+
+    def _run_all_pps(self, ydl, info, pps):
+        def real_run_ffmpeg(pp, input_path_opts, output_path_opts, **kwargs):
+            self.commands.append((
+                [path for path, _ in input_path_opts if path], [*output_path_opts[0][1]], output_path_opts[0][0]))
+            open(output_path_opts[0][0], 'w').close()
+
+        with (mock.patch.object(FFmpegPostProcessor, 'real_run_ffmpeg', real_run_ffmpeg),
+              mock.patch.object(FFmpegPostProcessor, 'available', True)):
+            return ydl.run_all_pps('post_process', info, additional_pps=pps)
+
+    def _video_info(self):
+        return {
+            'id': 'test',
+            'title': 'Test',
+            'filepath': self._path('test.mp4', create=True),
+            'ext': 'mp4',
+            'vcodec': 'avc1',
+            'acodec': 'mp4a.40.2',
+            'chapters': [{'start_time': 0, 'end_time': 10, 'title': 'Intro'}],
+            'requested_subtitles': {'en': {'ext': 'vtt', 'filepath': self._path('test.en.vtt', create=True)}},
+        }
+
+    def test_fused_stream_copies(self):
+        ydl = YoutubeDL({'quiet': True})
+        info = self._run_all_pps(ydl, self._video_info(), [
+            FFmpegVideoRemuxerPP(ydl, 'mkv'), FFmpegEmbedSubtitlePP(ydl), FFmpegMetadataPP(ydl)])
+
+        self.assertEqual(len(self.commands), 1)
+        inputs, opts, out_path = self.commands[0]
+        self.assertEqual(inputs, [self._path('test.mp4'), self._path('test.en.vtt'), self._path('test.meta')])
+        self.assertEqual(out_path, self._path('test.mkv'))
+        self.assertEqual(opts[:16], [
+            '-map', '0', '-dn', '-ignore_unknown', '-c', 'copy',
+            '-map', '-0:s', '-map', '1:0', '-metadata:s:s:0', 'language=eng',
+            '-map_metadata', '2', '-write_id3v1', '1'])
+        self.assertIn('title=Test', opts)
+
+        self.assertEqual((info['filepath'], info['ext']), (self._path('test.mkv'), 'mkv'))
+        self.assertNotIn('__ffmpeg_fused_pp', info)
+        for filename in ('test.mp4', 'test.en.vtt', 'test.meta'):
+            self.assertFalse(os.path.exists(self._path(filename)))
+
+    def test_unfusable_stream_copies(self):
+        ydl = YoutubeDL({'quiet': True})
+        info = self._video_info()
+        info.update({
+            'filepath': self._path('test.m4a', create=True),
+            'ext': 'm4a',
+            'vcodec': 'none',
+            'container': 'm4a_dash',
+        })
+        info = self._run_all_pps(ydl, info, [FFmpegFixupM4aPP(ydl), FFmpegVideoRemuxerPP(ydl, 'mka')])
+
+        self.assertEqual(self.commands, [
+            ([self._path('test.m4a')], ['-map', '0', '-dn', '-ignore_unknown', '-c', 'copy', '-f', 'mp4'],
+             self._path('test.temp.m4a')),
+            ([self._path('test.m4a')], ['-map', '0', '-dn', '-ignore_unknown', '-c', 'copy'],
+             self._path('test.mka')),
+        ])
+        self.assertEqual(info['filepath'], self._path('test.mka'))
+
+    def test_fusion_disabled(self):
+        ydl = YoutubeDL({'quiet': True, 'compat_opts': ['no-fused-postprocessors']})
+        self._run_all_pps(ydl, self._video_info(), [FFmpegVideoRemuxerPP(ydl, 'mkv'), FFmpegEmbedSubtitlePP(ydl)])
+
+        self.assertEqual([out_path for _, _, out_path in self.commands], [
+            self._path('test.mkv'), self._path('test.temp.mkv')])
+
+
+class TestFFmpegProbeCache(unittest.TestCase):
+    def test_probe_cache(self):
+        ydl = YoutubeDL({'quiet': True})
+        pp, other_pp = FFmpegMetadataPP(ydl), FFmpegFixupM3u8PP(ydl)
+        pp.probe_basename = other_pp.probe_basename = 'ffprobe'
+        commands = []
+
+        def run(cmd, **kwargs):
+            commands.append(cmd)
+            return json.dumps({'streams': [
+                {'codec_type': 'video', 'codec_name': 'h264'},
+                {'codec_type': 'audio', 'codec_name': 'aac'},
+            ]}), '', 0
+
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch('yt_dlp.postprocessor.ffmpeg.Popen.run', run):
+            path = os.path.join(tmpdir, 'test.mp4')
+            with open(path, 'w') as f:
+                f.write('test')
+
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(other_pp._get_probe_result(path)['streams'][0]['codec_name'], 'h264')
+            self.assertEqual(len(commands), 1)
+
+            pp.try_utime(path, 0, 0)
+            self.assertEqual(other_pp.get_audio_codec(path), 'aac')
+            self.assertEqual(len(commands), 2)
+
+            with open(path, 'a') as f:
+                f.write('test')
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(len(commands), 3)
+
+        self.assertEqual((pp._probe_cache.hits, pp._probe_cache.misses), (1, 3))
+        self.assertIsNot(pp._probe_cache, FFmpegMetadataPP(YoutubeDL({'quiet': True}))._probe_cache)
+
+
 class TestModifyChaptersPP(unittest.TestCase):
     def setUp(self):
         self._pp = ModifyChaptersPP(YoutubeDL())
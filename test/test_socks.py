@@ -294,6 +294,7 @@ def ctx(request):
         ('Requests', 'http'),
         ('Websockets', 'ws'),
         ('CurlCFFI', 'http'),
+        ('Asyncio', 'http'),
     ], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 class TestSocks4Proxy:
@@ -370,6 +371,7 @@ def test_timeout(self, handler, ctx):
         ('Requests', 'http'),
         ('Websockets', 'ws'),
         ('CurlCFFI', 'http'),
+        ('Asyncio', 'http'),
     ], indirect=True)
 @pytest.mark.handler_flaky('CurlCFFI', reason='segfaults')
 class TestSocks5Proxy:
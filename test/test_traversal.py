@@ -13,6 +13,7 @@
     str_or_none,
 )
 from yt_dlp.utils.traversal import (
+    compile_path,
     find_element,
     find_elements,
     require,
@@ -439,6 +440,25 @@ def test_traversal_filter(self):
         assert traverse_obj(data, [..., filter]) == [True, 1, 1.1, 'str', {0: 0}, [1]], \
             '`filter` should filter falsy values'
 
+    def test_traversal_compiled(self):
+        path = compile_path(('urls', ..., {'index': 'index', 'url': ('url', {str})}))
+        assert traverse_obj(_TEST_DATA, path) == _TEST_DATA['urls'], \
+            'compiled path should traverse like the path'
+        assert traverse_obj(_TEST_DATA, 'fail', path) == _TEST_DATA['urls'], \
+            'compiled path should be usable as alternative'
+        assert traverse_obj(_TEST_DATA, path, get_all=False) == _TEST_DATA['urls'][0], \
+            'compiled path should respect traversal options'
+        assert compile_path(path) is path, \
+            'compiling a compiled path should return it'
+
+        constant_path = ('urls', 0, 'url')
+        assert compile_path(constant_path) is compile_path(constant_path), \
+            'constant paths should be cached by identity'
+        assert compile_path(('urls', 0, {str})) is not compile_path(('urls', 0, {str})), \
+            'paths with sets should not be cached'
+        assert traverse_obj({'a': 0, 'A': 1}, ('A',), casesense=False) == 0, \
+            'cached paths should respect casesense'
+
 
 class TestTraversalHelpers:
     def test_traversal_require(self):
@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 import contextlib
 import copy
 import datetime as dt
@@ -19,18 +20,22 @@
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import tokenize
 import traceback
 import unicodedata
 
+from .archive import SQLiteArchive
 from .cache import Cache
 from .compat import urllib  # isort: split
 from .compat import urllib_req_to_req
 from .cookies import CookieLoadError, LenientSimpleCookie, load_cookies
 from .downloader import FFmpegFD, get_suitable_downloader, shorten_protocol_name
+from .downloader.merge import MergeFD
 from .downloader.rtmp import rtmpdump_version
 from .extractor import gen_extractor_classes, get_info_extractor, import_extractors
+from .extractor._dispatch import ExtractorIndex
 from .extractor.common import UnsupportedURLIE
 from .extractor.openload import PhantomJSwrapper
 from .globals import (
@@ -47,6 +52,7 @@
 )
 from .minicurses import format_text
 from .networking import HEADRequest, Request, RequestDirector
+from .networking.cache import ResponseCache
 from .networking.common import _REQUEST_HANDLERS, _RH_PREFERENCES
 from .networking.exceptions import (
     HTTPError,
@@ -65,6 +71,7 @@
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
     FFmpegFixupTimestampPP,
+    FFmpegFusedPP,
     FFmpegMergerPP,
     FFmpegPostProcessor,
     FFmpegVideoConvertorPP,
@@ -116,6 +123,7 @@
     YoutubeDLError,
     age_restricted,
     bug_reports_message,
+    compile_path,
     date_from_str,
     deprecation_warning,
     determine_ext,
@@ -196,6 +204,261 @@ def wrapper(self, *args, **kwargs):
     return wrapper
 
 
+_OUTTMPL_MATH_FUNCTIONS = {
+    '+': float.__add__,
+    '-': float.__sub__,
+    '*': float.__mul__,
+}
+# Field is of the form key1.key2...
+# where keys (except first) can be string, int, slice or "{field, ...}"
+_OUTTMPL_FIELD_INNER_RE = r'(?:\w+|%(num)s|%(num)s?(?::%(num)s?){1,2})' % {'num': r'(?:-?\d+)'}  # noqa: UP031
+_OUTTMPL_FIELD_RE = r'\w*(?:\.(?:%(inner)s|{%(field)s(?:,%(field)s)*}))*' % {  # noqa: UP031
+    'inner': _OUTTMPL_FIELD_INNER_RE,
+    'field': rf'\w*(?:\.{_OUTTMPL_FIELD_INNER_RE})*',
+}
+_OUTTMPL_MATH_FIELD_RE = rf'(?:{_OUTTMPL_FIELD_RE}|-?{NUMBER_RE})'
+_OUTTMPL_MATH_OPERATORS_RE = r'(?:{})'.format('|'.join(map(re.escape, _OUTTMPL_MATH_FUNCTIONS.keys())))
+_OUTTMPL_INTERNAL_FORMAT_RE = re.compile(rf'''(?xs)
+    (?P<negate>-)?
+    (?P<fields>{_OUTTMPL_FIELD_RE})
+    (?P<maths>(?:{_OUTTMPL_MATH_OPERATORS_RE}{_OUTTMPL_MATH_FIELD_RE})*)
+    (?:>(?P<strf_format>.+?))?
+    (?P<remaining>
+        (?P<alternate>(?<!\\),[^|&)]+)?
+        (?:&(?P<replacement>.*?))?
+        (?:\|(?P<default>.*?))?
+    )$''')
+_OUTTMPL_EXTERNAL_FORMAT_RE = re.compile(STR_FORMAT_RE_TMPL.format('[^)]*', f'[{STR_FORMAT_TYPES}ljhqBUDS]'))
+
+_OuttmplField = collections.namedtuple('_OuttmplField', ('prefix', 'format', 'flags', 'key', 'alternatives'))
+_OuttmplAlternative = collections.namedtuple('_OuttmplAlternative', (
+    'field', 'path', 'negate', 'maths', 'strf_format', 'alternate', 'replacement', 'default'))
+
+
+def _outtmpl_field_path(fields):
+    """Parse a field of the form key1.key2... into a compiled traversal path"""
+    def from_user_input(field):
+        if field == ':':
+            return ...
+        elif ':' in field:
+            return slice(*map(int_or_none, field.split(':')))
+        elif int_or_none(field) is not None:
+            return int(field)
+        return field
+
+    fields = [f for x in re.split(r'\.({.+?})\.?', fields)
+              for f in ([x] if x.startswith('{') else x.split('.'))]
+    for i in (0, -1):
+        if fields and not fields[i]:
+            fields.pop(i)
+
+    for i, f in enumerate(fields):
+        if not f.startswith('{'):
+            fields[i] = from_user_input(f)
+            continue
+        assert f.endswith('}'), f'No closing brace for {f} in {fields}'
+        fields[i] = {k: list(map(from_user_input, k.split('.'))) for k in f[1:-1].split(',')}
+
+    return compile_path(fields)
+
+
+def _outtmpl_maths(offset_key):
+    """Parse the maths of a field into a tuple of (operator, multiplier, number or path)"""
+    maths, operator = [], None
+    while offset_key:
+        item = re.match(
+            _OUTTMPL_MATH_FIELD_RE if operator else _OUTTMPL_MATH_OPERATORS_RE,
+            offset_key).group(0)
+        offset_key = offset_key[len(item):]
+        if operator is None:
+            operator = _OUTTMPL_MATH_FUNCTIONS[item]
+            continue
+        item, multiplier = (item[1:], -1) if item[0] == '-' else (item, 1)
+        offset = float_or_none(item)
+        maths.append((operator, multiplier, _outtmpl_field_path(item) if offset is None else offset))
+        operator = None
+    return tuple(maths)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_outtmpl(outtmpl):
+    """Split an output template into literal strings and parsed fields, so that it is parsed only once"""
+    segments, end = [], 0
+    for outer_mobj in _OUTTMPL_EXTERNAL_FORMAT_RE.finditer(outtmpl):
+        segments.append(outtmpl[end:outer_mobj.start()])
+        end = outer_mobj.end()
+        if not outer_mobj.group('has_key'):
+            segments.append(outer_mobj.group(0))
+            continue
+
+        key = outer_mobj.group('key')
+        alternatives = []
+        mobj = _OUTTMPL_INTERNAL_FORMAT_RE.match(key)
+        while mobj:
+            maths = mobj['maths'] or None
+            # Invalid maths are kept as a string so that they fail only when they are evaluated
+            with contextlib.suppress(Exception):
+                maths = maths and _outtmpl_maths(maths)
+            alternatives.append(_OuttmplAlternative(
+                mobj['fields'], _outtmpl_field_path(mobj['fields']), bool(mobj['negate']), maths,
+                mobj['strf_format'] and mobj['strf_format'].replace('\\,', ','),
+                bool(mobj['alternate']), mobj['replacement'], mobj['default']))
+            mobj = mobj['alternate'] and _OUTTMPL_INTERNAL_FORMAT_RE.match(mobj['remaining'][1:])
+
+        segments.append(_OuttmplField(
+            outer_mobj.group('prefix'), outer_mobj.group('format'), outer_mobj.group('conversion') or '',
+            '{}\0{}'.format(key.replace('%', '%\0'), outer_mobj.group('format')), tuple(alternatives)))
+    segments.append(outtmpl[end:])
+    return tuple(segment for segment in segments if segment)
+
+
+@functools.lru_cache(maxsize=256)
+def _escape_outtmpl(outtmpl):
+    return re.sub(
+        STR_FORMAT_RE_TMPL.format('', '(?![%(\0])'),
+        lambda mobj: ('' if mobj.group('has_key') else '%') + mobj.group(0),
+        outtmpl)
+
+
+def _dumpjson_default(obj):
+    if isinstance(obj, (set, LazyList)):
+        return list(obj)
+    return repr(obj)
+
+
+class _ReplacementFormatter(string.Formatter):
+    def get_field(self, field_name, args, kwargs):
+        if field_name.isdigit():
+            return args[0], -1
+        raise ValueError('Unsupported field')
+
+
+class _ThreadState(threading.local):
+    def __init__(self):
+        self.output = None
+        self.playlist_level = 0
+        self.playlist_urls = set()
+        self.prefetcher = None
+        self.testing_format = False
+        # Set to stop the format test of the thread
+        self.format_test_cancelled = None
+        self.deferred_postprocessing = None
+
+
+class _HeldOutput:
+    """Output of a concurrent job, which is held back until all the jobs before it are done"""
+
+    def __init__(self, write, parent=None):
+        self._write = parent.write if parent else write
+        self._parent = parent
+        self._lock = threading.Lock()
+        self._messages = []
+        self._released = False
+
+    @property
+    def live(self):
+        return self._released and (not self._parent or self._parent.live)
+
+    def write(self, message, out):
+        with self._lock:
+            if not self._released:
+                self._messages.append((message, out))
+                return
+        self._write(message, out)
+
+    def release(self):
+        with self._lock:
+            for message, out in self._messages:
+                self._write(message, out)
+            self._messages.clear()
+            self._released = True
+
+
+class _EntryPrefetcher:
+    """
+    Extracts the upcoming entries of a playlist in the background
+
+    Only the extraction of the entry URLs is done ahead of time; the extracted
+    info is handed over when the entry is processed (see `YoutubeDL.__extract_info`)
+    and everything else still happens in the playlist order
+    """
+
+    def __init__(self, ydl, entries, max_workers):
+        self._ydl, self._entries = ydl, entries
+        self._window = 2 * max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='yt-dlp-prefetch')
+        self._jobs = {}
+        self._next = 0
+
+    def advance(self, position):
+        """Start extracting the entries following the position, and discard the ones before it"""
+        for key, (job, _, job_position) in list(self._jobs.items()):
+            if job_position < position:
+                job.cancel()
+                del self._jobs[key]
+        self._next = max(self._next, position)
+        while self._next < min(position + self._window, len(self._entries)):
+            key = self._ydl._prefetch_key(self._entries[self._next][1])
+            if key and key not in self._jobs:
+                self._jobs[key] = (*self._ydl._submit_job(self._executor, self._ydl._prefetch_entry, *key), self._next)
+            self._next += 1
+
+    def pop(self, ie_key, url):
+        """Return the job extracting the URL, if any, releasing its output"""
+        job, output, _ = self._jobs.pop((ie_key, url), (None, None, None))
+        if output:
+            output.release()
+        return job
+
+    def close(self):
+        for job, _, _ in self._jobs.values():
+            job.cancel()
+        self._jobs.clear()
+        self._executor.shutdown(wait=True)
+
+
+class _PostprocessingQueue:
+    """
+    Post-processes the downloaded videos in the background, while the next ones are downloaded
+
+    The output of each job is held back until it is done, and is then released
+    along with its error, if any, in the order the jobs were submitted
+    """
+
+    def __init__(self, ydl, max_workers):
+        self._ydl, self._max_workers = ydl, max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='yt-dlp-postprocess')
+        self._jobs = collections.deque()
+
+    def submit(self, func, *args):
+        """Run func in the background, after waiting for the oldest job if all the workers are busy"""
+        self._finish(self._max_workers - 1)
+        self._jobs.append(self._ydl._submit_job(self._executor, func, *args))
+
+    def _finish(self, max_jobs):
+        # Jobs that are already done are finished too, so that their output is not delayed
+        while len(self._jobs) > max_jobs or (self._jobs and self._jobs[0][0].done()):
+            job, output = self._jobs.popleft()
+            concurrent.futures.wait([job])
+            output.release()
+            job.result()
+
+    def wait(self):
+        """Wait for all the jobs, raising the first error"""
+        self._finish(0)
+
+    def close(self, cancel=False):
+        """Wait for the jobs, or cancel the ones that have not started. Their errors are not raised"""
+        if cancel:
+            for job, _ in self._jobs:
+                job.cancel()
+        for job, output in self._jobs:
+            concurrent.futures.wait([job])
+            output.release()
+        self._jobs.clear()
+        self._executor.shutdown(wait=True)
+
+
 class YoutubeDL:
     """YoutubeDL class.
 
@@ -270,6 +533,9 @@ class YoutubeDL:
                        Can be True (check all), False (check none),
                        'selected' (check selected formats),
                        or None (check only if requested by extractor)
+    concurrent_format_checks: Number of formats to check concurrently (default 1).
+                       HTTP formats are checked by requesting their first byte,
+                       and the others with a test download
     paths:             Dictionary of output paths. The allowed keys are 'home'
                        'temp' and the keys of OUTTMPL_TYPES (in utils/_utils.py)
     outtmpl:           Dictionary of templates for output names. Allowed keys
@@ -328,6 +594,12 @@ class YoutubeDL:
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    http_cache:        Whether to cache the responses to extractor requests in the cachedir
+    http_cache_ttl:    Dictionary of the time in seconds for which cached responses are
+                       used without revalidation, by lowercase extractor key or by host.
+                       The key "default" applies to the rest of the responses that
+                       do not have a max-age (see yt_dlp/networking/cache.py)
+    http_cache_size:   Maximum size of the HTTP cache in bytes
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -342,10 +614,24 @@ class YoutubeDL:
                        downloaded. None for no limit.
     download_archive:  A set, or the name of a file where all downloads are recorded.
                        Videos already present in the file are not downloaded again.
+                       A name prefixed with "sqlite:" is used as an SQLite database
     break_on_existing: Stop the download process after attempting to download a
                        file that is in the archive.
     break_per_url:     Whether break_on_reject and break_on_existing
                        should act on each input URL as opposed to for the entire queue
+    concurrent_downloads: Number of input URLs to extract and download concurrently.
+                       The output of each URL is printed in the order of the URLs.
+                       Ignored with max_downloads, break_on_existing,
+                       break_on_reject, breaking_match_filter or break_per_url
+    concurrent_playlist_entries: Number of upcoming playlist entries to extract
+                       concurrently. The entries are still processed in order.
+                       Ignored with lazy_playlist
+    concurrent_postprocessing: Number of downloaded videos that download() can
+                       post-process in the background while the next ones are
+                       downloaded (default 0). The download archive, the
+                       "after_video" postprocessors and the errors of a video are
+                       handled once it is post-processed.
+                       Ignored with concurrent_downloads
     cookiefile:        File name or text stream from where cookies should be read and dumped to
     cookiesfrombrowser:  A tuple containing the name of the browser, the profile
                        name/path from where cookies are loaded, the name of the keyring,
@@ -424,6 +710,9 @@ class YoutubeDL:
                        Progress hooks are guaranteed to be called at least twice
                        (with status "started" and "finished") if the processing is successful.
     merge_output_format: "/" separated list of extensions to use when merging formats.
+    merge_while_downloading: Download the formats to merge at the same time, piping
+                       them into ffmpeg. Formats that ffmpeg may need to seek in
+                       are downloaded separately and merged afterwards
     final_ext:         Expected final extension; used to detect when the file was
                        already downloaded and converted
     fixup:             Automatically correct known faults of the file.
@@ -433,6 +722,10 @@ class YoutubeDL:
                        - "detect_or_warn": check whether we can do anything
                                            about it, warn otherwise (default)
     source_address:    Client-side IP address to bind to.
+    max_connections_per_host: Maximum number of concurrent HTTP connections
+                       to each host. Unlimited if None
+    prefer_http2:      Prefer HTTP/2 for https requests, if the h2 package is available.
+                       Concurrent requests to a host then share one connection
     impersonate:       Client to impersonate for requests.
                        An ImpersonateTarget (from yt_dlp.networking.impersonate)
     sleep_interval_requests: Number of seconds to sleep between requests
@@ -461,6 +754,8 @@ class YoutubeDL:
                        - Raise utils.DownloadCancelled(msg) to abort remaining
                          downloads when a video is rejected.
                        match_filter_func in utils/_utils.py is one example for this.
+    breaking_match_filter: The filters that match_filter aborts the remaining
+                       downloads with, if any. Only used to process the URLs in order
     color:             A Dictionary with output stream names as keys
                        and their respective color policy as values.
                        Can also just be a single color policy,
@@ -512,7 +807,7 @@ class YoutubeDL:
     the downloader (see yt_dlp/downloader/common.py):
     nopart, updatetime, buffersize, ratelimit, throttledratelimit, min_filesize,
     max_filesize, test, noresizebuffer, retries, file_access_retries, fragment_retries,
-    continuedl, hls_use_mpegts, http_chunk_size, external_downloader_args,
+    continuedl, hls_use_mpegts, http_chunk_size, http_connections, external_downloader_args,
     concurrent_fragment_downloads, progress_delta.
 
     The following options are used by the post processors:
@@ -636,6 +931,7 @@ def __init__(self, params=None, auto_init=True):
         self.params = params
         self._ies = {}
         self._ies_instances = {}
+        self._ie_index = None
         self._pps = {k: [] for k in POSTPROCESS_WHEN}
         self._printed_messages = set()
         self._first_webpage_request = True
@@ -646,8 +942,12 @@ def __init__(self, params=None, auto_init=True):
         self._download_retcode = 0
         self._num_downloads = 0
         self._num_videos = 0
-        self._playlist_level = 0
-        self._playlist_urls = set()
+        self._thread_state = _ThreadState()
+        self._postprocessing_queue = None
+        self._download_lock = threading.Lock()
+        self._format_checks = {}
+        self._format_selectors = {}
+        self._format_sorters = {}
         self.cache = Cache(self)
         self.__header_cookies = []
 
@@ -837,6 +1137,11 @@ def preload_download_archive(fn):
                 return archive
             elif not is_path_like(fn):
                 return fn
+            elif isinstance(fn, str) and fn.startswith('sqlite:'):
+                self.write_debug(f'Opening archive database {fn[7:]!r}')
+                archive = SQLiteArchive(fn[7:])
+                self.add_close_hook(archive.close)
+                return archive
 
             self.write_debug(f'Loading archive file {fn!r}')
             try:
@@ -898,6 +1203,9 @@ def warn_if_short_id(self, argv):
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         ie_key = ie.ie_key()
+        old_ie = self._ies.get(ie_key)
+        if old_ie is None or old_ie._VALID_URL_HOSTS != ie._VALID_URL_HOSTS:
+            self._ie_index = None
         self._ies[ie_key] = ie
         if not isinstance(ie, type):
             self._ies_instances[ie_key] = ie
@@ -915,6 +1223,13 @@ def get_info_extractor(self, ie_key):
             self.add_info_extractor(ie)
         return ie
 
+    def _suitable_ies(self, url):
+        """Yield the (ie_key, ie) of the extractors that may be suitable for the URL, in priority order"""
+        if self._ie_index is None:
+            self._ie_index = ExtractorIndex(self._ies)
+        for ie_key in self._ie_index.candidates(url):
+            yield ie_key, self._ies[ie_key]
+
     def add_default_info_extractors(self):
         """
         Add the InfoExtractors returned by gen_extractors to the end of the list
@@ -977,6 +1292,12 @@ def _write_string(self, message, out=None, only_once=False):
             if message in self._printed_messages:
                 return
             self._printed_messages.add(message)
+        if self._thread_state.output:
+            self._thread_state.output.write(message, out)
+        else:
+            self.__write_string(message, out)
+
+    def __write_string(self, message, out):
         write_string(message, out=out, encoding=self.params.get('encoding'))
 
     def to_stdout(self, message, skip_eol=False, quiet=None):
@@ -1055,6 +1376,10 @@ def close(self):
         if '_request_director' in self.__dict__:
             self._request_director.close()
             del self._request_director
+        if self.__dict__.get('_http_cache'):
+            self._http_cache.close()
+            del self._http_cache
+        self.cache.close()
 
         for close_hook in self._close_hooks:
             close_hook()
@@ -1091,7 +1416,8 @@ def trouble(self, message=None, tb=None, is_error=True):
             else:
                 exc_info = sys.exc_info()
             raise DownloadError(message, exc_info)
-        self._download_retcode = 1
+        if not self._thread_state.testing_format:
+            self._download_retcode = 1
 
     Styles = Namespace(
         HEADERS='yellow',
@@ -1229,10 +1555,7 @@ def _outtmpl_expandpath(outtmpl):
     @staticmethod
     def escape_outtmpl(outtmpl):
         """ Escape any remaining strings like %s, %abc% etc. """
-        return re.sub(
-            STR_FORMAT_RE_TMPL.format('', '(?![%(\0])'),
-            lambda mobj: ('' if mobj.group('has_key') else '%') + mobj.group(0),
-            outtmpl)
+        return _escape_outtmpl(outtmpl)
 
     @classmethod
     def validate_outtmpl(cls, outtmpl):
@@ -1252,6 +1575,7 @@ def _copy_infodict(info_dict):
         info_dict = dict(info_dict)
         info_dict.pop('__postprocessors', None)
         info_dict.pop('__pending_error', None)
+        info_dict.pop('__ffmpeg_fused_pp', None)
         return info_dict
 
     def prepare_outtmpl(self, outtmpl, info_dict, sanitize=False):
@@ -1279,91 +1603,28 @@ def prepare_outtmpl(self, outtmpl, info_dict, sanitize=False):
             'autonumber': self.params.get('autonumber_size') or 5,
         }
 
-        TMPL_DICT = {}
-        EXTERNAL_FORMAT_RE = re.compile(STR_FORMAT_RE_TMPL.format('[^)]*', f'[{STR_FORMAT_TYPES}ljhqBUDS]'))
-        MATH_FUNCTIONS = {
-            '+': float.__add__,
-            '-': float.__sub__,
-            '*': float.__mul__,
-        }
-        # Field is of the form key1.key2...
-        # where keys (except first) can be string, int, slice or "{field, ...}"
-        FIELD_INNER_RE = r'(?:\w+|%(num)s|%(num)s?(?::%(num)s?){1,2})' % {'num': r'(?:-?\d+)'}  # noqa: UP031
-        FIELD_RE = r'\w*(?:\.(?:%(inner)s|{%(field)s(?:,%(field)s)*}))*' % {  # noqa: UP031
-            'inner': FIELD_INNER_RE,
-            'field': rf'\w*(?:\.{FIELD_INNER_RE})*',
-        }
-        MATH_FIELD_RE = rf'(?:{FIELD_RE}|-?{NUMBER_RE})'
-        MATH_OPERATORS_RE = r'(?:{})'.format('|'.join(map(re.escape, MATH_FUNCTIONS.keys())))
-        INTERNAL_FORMAT_RE = re.compile(rf'''(?xs)
-            (?P<negate>-)?
-            (?P<fields>{FIELD_RE})
-            (?P<maths>(?:{MATH_OPERATORS_RE}{MATH_FIELD_RE})*)
-            (?:>(?P<strf_format>.+?))?
-            (?P<remaining>
-                (?P<alternate>(?<!\\),[^|&)]+)?
-                (?:&(?P<replacement>.*?))?
-                (?:\|(?P<default>.*?))?
-            )$''')
-
-        def _from_user_input(field):
-            if field == ':':
-                return ...
-            elif ':' in field:
-                return slice(*map(int_or_none, field.split(':')))
-            elif int_or_none(field) is not None:
-                return int(field)
-            return field
-
-        def _traverse_infodict(fields):
-            fields = [f for x in re.split(r'\.({.+?})\.?', fields)
-                      for f in ([x] if x.startswith('{') else x.split('.'))]
-            for i in (0, -1):
-                if fields and not fields[i]:
-                    fields.pop(i)
-
-            for i, f in enumerate(fields):
-                if not f.startswith('{'):
-                    fields[i] = _from_user_input(f)
-                    continue
-                assert f.endswith('}'), f'No closing brace for {f} in {fields}'
-                fields[i] = {k: list(map(_from_user_input, k.split('.'))) for k in f[1:-1].split(',')}
-
-            return traverse_obj(info_dict, fields, traverse_string=True)
-
-        def get_value(mdict):
+        def get_value(alternative):
             # Object traversal
-            value = _traverse_infodict(mdict['fields'])
+            value = traverse_obj(info_dict, alternative.path, traverse_string=True)
             # Negative
-            if mdict['negate']:
+            if alternative.negate:
                 value = float_or_none(value)
                 if value is not None:
                     value *= -1
             # Do maths
-            offset_key = mdict['maths']
-            if offset_key:
+            if alternative.maths is not None:
                 value = float_or_none(value)
-                operator = None
-                while offset_key:
-                    item = re.match(
-                        MATH_FIELD_RE if operator else MATH_OPERATORS_RE,
-                        offset_key).group(0)
-                    offset_key = offset_key[len(item):]
-                    if operator is None:
-                        operator = MATH_FUNCTIONS[item]
-                        continue
-                    item, multiplier = (item[1:], -1) if item[0] == '-' else (item, 1)
-                    offset = float_or_none(item)
-                    if offset is None:
-                        offset = float_or_none(_traverse_infodict(item))
+                maths = alternative.maths
+                for operator, multiplier, offset in _outtmpl_maths(maths) if isinstance(maths, str) else maths:
+                    if not isinstance(offset, float):
+                        offset = float_or_none(traverse_obj(info_dict, offset, traverse_string=True))
                     try:
                         value = operator(value, multiplier * offset)
                     except (TypeError, ZeroDivisionError):
                         return None
-                    operator = None
             # Datetime formatting
-            if mdict['strf_format']:
-                value = strftime_or_none(value, mdict['strf_format'].replace('\\,', ','))
+            if alternative.strf_format:
+                value = strftime_or_none(value, alternative.strf_format)
 
             # XXX: Workaround for https://github.com/yt-dlp/yt-dlp/issues/4485
             if sanitize and value == '':
@@ -1390,33 +1651,16 @@ def sanitize(key, value):
             def sanitize(key, value):
                 return filename_sanitizer(key, value, restricted=self.params.get('restrictfilenames'))
 
-        def _dumpjson_default(obj):
-            if isinstance(obj, (set, LazyList)):
-                return list(obj)
-            return repr(obj)
-
-        class _ReplacementFormatter(string.Formatter):
-            def get_field(self, field_name, args, kwargs):
-                if field_name.isdigit():
-                    return args[0], -1
-                raise ValueError('Unsupported field')
-
+        TMPL_DICT = {}
         replacement_formatter = _ReplacementFormatter()
 
-        def create_key(outer_mobj):
-            if not outer_mobj.group('has_key'):
-                return outer_mobj.group(0)
-            key = outer_mobj.group('key')
-            mobj = re.match(INTERNAL_FORMAT_RE, key)
+        def create_key(field):
             value, replacement, default, last_field = None, None, na, ''
-            while mobj:
-                mobj = mobj.groupdict()
-                default = mobj['default'] if mobj['default'] is not None else default
-                value = get_value(mobj)
-                last_field, replacement = mobj['fields'], mobj['replacement']
-                if value is None and mobj['alternate']:
-                    mobj = re.match(INTERNAL_FORMAT_RE, mobj['remaining'][1:])
-                else:
+            for alternative in field.alternatives:
+                default = alternative.default if alternative.default is not None else default
+                value = get_value(alternative)
+                last_field, replacement = alternative.field, alternative.replacement
+                if value is not None or not alternative.alternate:
                     break
 
             if None not in (value, replacement):
@@ -1425,11 +1669,11 @@ def create_key(outer_mobj):
                 except ValueError:
                     value, default = None, na
 
-            fmt = outer_mobj.group('format')
+            fmt = field.format
             if fmt == 's' and last_field in field_size_compat_map and isinstance(value, int):
                 fmt = f'0{field_size_compat_map[last_field]:d}d'
 
-            flags = outer_mobj.group('conversion') or ''
+            flags = field.flags
             str_fmt = f'{fmt[:-1]}s'
             if value is None:
                 value, fmt = default, 's'
@@ -1479,11 +1723,12 @@ def create_key(outer_mobj):
                 if fmt[-1] in 'csra':
                     value = sanitize(last_field, value)
 
-            key = '{}\0{}'.format(key.replace('%', '%\0'), outer_mobj.group('format'))
-            TMPL_DICT[key] = value
-            return '{prefix}%({key}){fmt}'.format(key=key, fmt=fmt, prefix=outer_mobj.group('prefix'))
+            TMPL_DICT[field.key] = value
+            return f'{field.prefix}%({field.key}){fmt}'
 
-        return EXTERNAL_FORMAT_RE.sub(create_key, outtmpl), TMPL_DICT
+        return ''.join(
+            segment if isinstance(segment, str) else create_key(segment)
+            for segment in _compile_outtmpl(outtmpl)), TMPL_DICT
 
     def evaluate_outtmpl(self, outtmpl, info_dict, *args, **kwargs):
         outtmpl, info_dict = self.prepare_outtmpl(outtmpl, info_dict, *args, **kwargs)
@@ -1663,11 +1908,11 @@ def extract_info(self, url, download=True, ie_key=None, extra_info=None,
             ie_key = 'Generic'
 
         if ie_key:
-            ies = {ie_key: self._ies[ie_key]} if ie_key in self._ies else {}
+            ies = [(ie_key, self._ies[ie_key])] if ie_key in self._ies else []
         else:
-            ies = self._ies
+            ies = self._suitable_ies(url)
 
-        for key, ie in ies.items():
+        for key, ie in ies:
             if not ie.suitable(url):
                 continue
 
@@ -1827,8 +2072,10 @@ def _apply_header_cookies(self, url, cookies=None):
     def __extract_info(self, url, ie, download, extra_info, process):
         self._apply_header_cookies(url)
 
+        prefetcher = self._thread_state.prefetcher
+        prefetched = prefetcher and prefetcher.pop(ie.ie_key(), url)
         try:
-            ie_result = ie.extract(url)
+            ie_result = prefetched.result() if prefetched else ie.extract(url)
         except UserNotLive as e:
             if process:
                 if self.params.get('wait_for_video'):
@@ -1967,22 +2214,22 @@ def process_ie_result(self, ie_result, download=True, extra_info=None):
             # Protect from infinite recursion due to recursively nested playlists
             # (see https://github.com/ytdl-org/youtube-dl/issues/27833)
             webpage_url = ie_result.get('webpage_url')  # Playlists maynot have webpage_url
-            if webpage_url and webpage_url in self._playlist_urls:
+            if webpage_url and webpage_url in self._thread_state.playlist_urls:
                 self.to_screen(
                     '[download] Skipping already downloaded playlist: {}'.format(
                         ie_result.get('title')) or ie_result.get('id'))
                 return
 
-            self._playlist_level += 1
-            self._playlist_urls.add(webpage_url)
+            self._thread_state.playlist_level += 1
+            self._thread_state.playlist_urls.add(webpage_url)
             self._fill_common_fields(ie_result, False)
             self._sanitize_thumbnails(ie_result)
             try:
                 return self.__process_playlist(ie_result, download)
             finally:
-                self._playlist_level -= 1
-                if not self._playlist_level:
-                    self._playlist_urls.clear()
+                self._thread_state.playlist_level -= 1
+                if not self._thread_state.playlist_level:
+                    self._thread_state.playlist_urls.clear()
         elif result_type == 'compat_list':
             self.report_warning(
                 'Extractor {} returned a compat_list result. '
@@ -2100,44 +2347,60 @@ def __process_playlist(self, ie_result, download):
 
         failures = 0
         max_failures = self.params.get('skip_playlist_after_errors') or float('inf')
-        for i, (playlist_index, entry) in enumerate(entries):
-            if lazy:
-                resolved_entries.append((playlist_index, entry))
-            if not entry:
-                continue
+        max_workers = self.params.get('concurrent_playlist_entries') or 1
+        prefetcher = None
+        if max_workers > 1 and not lazy and self.params.get('extract_flat') not in (True, 'in_playlist'):
+            prefetcher = _EntryPrefetcher(self, entries, max_workers)
+        outer_prefetcher, self._thread_state.prefetcher = self._thread_state.prefetcher, prefetcher
+        try:
+            for i, (playlist_index, entry) in enumerate(entries):
+                if prefetcher:
+                    prefetcher.advance(i)
+                if lazy:
+                    resolved_entries.append((playlist_index, entry))
+                if not entry:
+                    continue
 
-            entry['__x_forwarded_for_ip'] = ie_result.get('__x_forwarded_for_ip')
-            if not lazy and 'playlist-index' in self.params['compat_opts']:
-                playlist_index = ie_result['requested_entries'][i]
+                entry['__x_forwarded_for_ip'] = ie_result.get('__x_forwarded_for_ip')
+                if not lazy and 'playlist-index' in self.params['compat_opts']:
+                    playlist_index = ie_result['requested_entries'][i]
 
-            entry_copy = collections.ChainMap(entry, {
-                **common_info,
-                'n_entries': int_or_none(n_entries),
-                'playlist_index': playlist_index,
-                'playlist_autonumber': i + 1,
-            })
+                entry_copy = collections.ChainMap(entry, {
+                    **common_info,
+                    'n_entries': int_or_none(n_entries),
+                    'playlist_index': playlist_index,
+                    'playlist_autonumber': i + 1,
+                })
 
-            if self._match_entry(entry_copy, incomplete=True) is not None:
-                # For compatabilty with youtube-dl. See https://github.com/yt-dlp/yt-dlp/issues/4369
-                resolved_entries[i] = (playlist_index, NO_DEFAULT)
-                continue
+                if self._match_entry(entry_copy, incomplete=True) is not None:
+                    # For compatabilty with youtube-dl. See https://github.com/yt-dlp/yt-dlp/issues/4369
+                    resolved_entries[i] = (playlist_index, NO_DEFAULT)
+                    continue
 
-            self.to_screen(
-                f'[download] Downloading item {self._format_screen(i + 1, self.Styles.ID)} '
-                f'of {self._format_screen(n_entries, self.Styles.EMPHASIS)}')
-
-            entry_result = self.__process_iterable_entry(entry, download, collections.ChainMap({
-                'playlist_index': playlist_index,
-                'playlist_autonumber': i + 1,
-            }, extra))
-            if not entry_result:
-                failures += 1
-            if failures >= max_failures:
-                self.report_error(
-                    f'Skipping the remaining entries in playlist "{title}" since {failures} items failed extraction')
-                break
-            if keep_resolved_entries:
-                resolved_entries[i] = (playlist_index, entry_result)
+                self.to_screen(
+                    f'[download] Downloading item {self._format_screen(i + 1, self.Styles.ID)} '
+                    f'of {self._format_screen(n_entries, self.Styles.EMPHASIS)}')
+
+                entry_result = self.__process_iterable_entry(entry, download, collections.ChainMap({
+                    'playlist_index': playlist_index,
+                    'playlist_autonumber': i + 1,
+                }, extra))
+                if not entry_result:
+                    failures += 1
+                if failures >= max_failures:
+                    self.report_error(
+                        f'Skipping the remaining entries in playlist "{title}" since {failures} items failed extraction')
+                    break
+                if keep_resolved_entries:
+                    resolved_entries[i] = (playlist_index, entry_result)
+        finally:
+            self._thread_state.prefetcher = outer_prefetcher
+            if prefetcher:
+                prefetcher.close()
+
+        # The entries must be fully processed before the playlist is
+        if self._postprocessing_queue:
+            self._postprocessing_queue.wait()
 
         # Update with processed data
         ie_result['entries'] = [e for _, e in resolved_entries if e is not NO_DEFAULT]
@@ -2161,6 +2424,30 @@ def __process_iterable_entry(self, entry, download, extra_info):
         return self.process_ie_result(
             entry, download=download, extra_info=extra_info)
 
+    def _prefetch_key(self, entry):
+        """Return the (ie_key, url) that a playlist entry will be extracted with, if it can be extracted ahead"""
+        if not isinstance(entry, dict) or entry.get('_type') not in ('url', 'url_transparent'):
+            return None
+        elif not isinstance(entry.get('url'), str):
+            return None
+        url = sanitize_url(entry['url'], scheme='http' if self.params.get('prefer_insecure') else 'https')
+        ie_key = entry.get('ie_key')
+        if ie_key:
+            ies = [(ie_key, self._ies[ie_key])] if ie_key in self._ies else []
+        else:
+            ies = self._suitable_ies(url)
+        key = next((key for key, ie in ies if ie.suitable(url)), None)
+        if key is None:
+            return None
+        temp_id = self.get_info_extractor(key).get_temp_id(url)
+        if temp_id is not None and self.in_download_archive({'id': temp_id, 'ie_key': key}):
+            return None
+        return key, url
+
+    def _prefetch_entry(self, ie_key, url):
+        self._apply_header_cookies(url)
+        return self.get_info_extractor(ie_key).extract(url)
+
     def _build_format_filter(self, filter_spec):
         " Returns a function to filter the formats according to the filter_spec "
 
@@ -2228,44 +2515,114 @@ def _filter(f):
             return op(actual_value, comparison_value)
         return _filter
 
-    def _check_formats(self, formats, warning=True):
-        for f in formats:
+    def _test_format(self, f):
+        """Return whether the format can be downloaded"""
+        if (determine_protocol(f) in ('http', 'https') and f.get('request_data') is None
+                and not f.get('impersonate') and not f.get('has_drm')):
+            # Requesting the first byte is enough, without going through a test download
+            request = Request(f['url'], headers=HTTPHeaderDict(f.get('http_headers'), {'Range': 'bytes=0-0'}))
+            try:
+                with contextlib.closing(self.urlopen(request)) as response:
+                    return bool(response.read(1))
+            except (OSError, ValueError, *network_exceptions):
+                return False
+
+        path = self.get_output_path('temp')
+        if not self._ensure_dir_exists(f'{path}/'):
+            return None
+        temp_file = tempfile.NamedTemporaryFile(suffix='.tmp', delete=False, dir=path or None)
+        temp_file.close()
+        # If FragmentFD fails when testing a fragment, it will wrongly set a non-zero return code.
+        # See https://github.com/yt-dlp/yt-dlp/issues/13750
+        self._thread_state.testing_format = True
+        try:
+            success, _ = self.dl(temp_file.name, f, test=True)
+        except (DownloadError, DownloadCancelled, OSError, ValueError, *network_exceptions):
+            success = False
+        finally:
+            self._thread_state.testing_format = False
+            if os.path.exists(temp_file.name):
+                try:
+                    os.remove(temp_file.name)
+                except OSError:
+                    self.report_warning(f'Unable to delete temporary file "{temp_file.name}"')
+        return success
+
+    def _check_formats(self, formats, warning=True, should_test=None):
+        """
+        Yield the formats that can be downloaded, in order
+
+        While waiting for a format to be tested, up to concurrent_format_checks of the next ones are
+        tested too. Once the consumer stops, the running tests are cancelled and waited for.
+        The results are kept for the rest of the run
+
+        @param should_test  Function that returns whether a format needs testing; the others are yielded as is
+        """
+        max_workers = self.params.get('concurrent_format_checks') or 1
+        pool = max_workers > 1 and concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='yt-dlp-check')
+        output = self._thread_state.output
+        formats, pending = iter(formats), collections.deque()
+        cancelled = threading.Event()
+
+        def test_format(f):
+            if cancelled.is_set():
+                return None
+            self._thread_state.output = output
+            self._thread_state.format_test_cancelled = cancelled
+            try:
+                return self._test_format(f)
+            finally:
+                self._thread_state.format_test_cancelled = None
+
+        def submit(f):
+            if should_test and not should_test(f):
+                return None
             working = f.get('__working')
-            if working is not None:
+            if working is None:
+                working = self._format_checks.get(self._format_check_key(f))
+            if working is None:
+                self.to_screen('[info] Testing format {}'.format(f['format_id']))
+                if pool:
+                    return pool.submit(test_format, f)
+            future = concurrent.futures.Future()
+            future.set_result(self._test_format(f) if working is None else working)
+            return future
+
+        try:
+            while True:
+                if not pending:
+                    pending.extend((f, submit(f)) for f in itertools.islice(formats, 1))
+                    if not pending:
+                        break
+                if pending[0][1] and not pending[0][1].done():
+                    # Test the next formats while waiting for this one
+                    pending.extend((f, submit(f)) for f in itertools.islice(formats, max_workers - len(pending)))
+                f, job = pending.popleft()
+                if job is None:
+                    yield f
+                    continue
+                working = job.result()
+                if working is None:  # The temporary directory could not be created
+                    continue
+                if f.get('__working') is None:
+                    self._format_checks[self._format_check_key(f)] = f['__working'] = working
+                    if not working:
+                        msg = f'Unable to download format {f["format_id"]}. Skipping...'
+                        if warning:
+                            self.report_warning(msg)
+                        else:
+                            self.to_screen(f'[info] {msg}')
                 if working:
+                    f.pop('__needs_testing', None)
                     yield f
-                continue
-            self.to_screen('[info] Testing format {}'.format(f['format_id']))
-            path = self.get_output_path('temp')
-            if not self._ensure_dir_exists(f'{path}/'):
-                continue
-            temp_file = tempfile.NamedTemporaryFile(suffix='.tmp', delete=False, dir=path or None)
-            temp_file.close()
-            # If FragmentFD fails when testing a fragment, it will wrongly set a non-zero return code.
-            # Save the actual return code for later. See https://github.com/yt-dlp/yt-dlp/issues/13750
-            original_retcode = self._download_retcode
-            try:
-                success, _ = self.dl(temp_file.name, f, test=True)
-            except (DownloadError, OSError, ValueError, *network_exceptions):
-                success = False
-            finally:
-                if os.path.exists(temp_file.name):
-                    try:
-                        os.remove(temp_file.name)
-                    except OSError:
-                        self.report_warning(f'Unable to delete temporary file "{temp_file.name}"')
-            # Restore the actual return code
-            self._download_retcode = original_retcode
-            f['__working'] = success
-            if success:
-                f.pop('__needs_testing', None)
-                yield f
-            else:
-                msg = f'Unable to download format {f["format_id"]}. Skipping...'
-                if warning:
-                    self.report_warning(msg)
-                else:
-                    self.to_screen(f'[info] {msg}')
+        finally:
+            if pool:
+                cancelled.set()
+                pool.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _format_check_key(f):
+        return f.get('protocol'), f.get('url'), f.get('manifest_url'), f.get('format_id')
 
     def _select_formats(self, formats, selector):
         return list(selector({
@@ -2300,6 +2657,14 @@ def can_merge():
                 else 'bestvideo*+bestaudio/best')
 
     def build_format_selector(self, format_spec):
+        # The same selectors are built for every video, e.g. for the default format spec
+        key = (format_spec, self.params.get('allow_multiple_audio_streams', False),
+               self.params.get('allow_multiple_video_streams', False))
+        if key not in self._format_selectors:
+            self._format_selectors[key] = self._build_format_selector(format_spec)
+        return self._format_selectors[key]
+
+    def _build_format_selector(self, format_spec):
         def syntax_error(note, start):
             message = (
                 'Invalid format specification: '
@@ -2495,11 +2860,7 @@ def _check_formats(formats):
                 yield from formats
                 return
 
-            for f in formats:
-                if f.get('has_drm') or f.get('__needs_testing'):
-                    yield from self._check_formats([f])
-                else:
-                    yield f
+            yield from self._check_formats(formats, should_test=lambda f: f.get('has_drm') or f.get('__needs_testing'))
 
         def _build_selector_function(selector):
             if isinstance(selector, list):  # ,
@@ -2791,8 +3152,15 @@ def _raise_pending_errors(self, info):
 
     def sort_formats(self, info_dict):
         formats = self._get_formats(info_dict)
-        formats.sort(key=FormatSorter(
-            self, info_dict.get('_format_sort_fields') or []).calculate_preference)
+        sort_fields = tuple(info_dict.get('_format_sort_fields') or ())
+        key = (sort_fields, tuple(self.params.get('format_sort') or ()),
+               self.params.get('format_sort_force', False), self.params.get('prefer_free_formats', False))
+        sorter = self._format_sorters.get(key)
+        if sorter is None:
+            sorter = self._format_sorters[key] = FormatSorter(self, sort_fields)
+        elif self.params.get('verbose'):
+            sorter.print_verbose_info(self.write_debug)
+        formats.sort(key=sorter.calculate_preference)
 
     def process_video_result(self, info_dict, download=True):
         assert info_dict.get('_type', 'video') == 'video'
@@ -3068,44 +3436,76 @@ def to_screen(*msg):
                     to_screen(f'Downloading {len(requested_ranges)} time ranges:',
                               (f'{c["start_time"]:.1f}-{c["end_time"]:.1f}' for c in requested_ranges))
             max_downloads_reached = False
+            deferred_postprocessing = [] if self._postprocessing_queue else None
 
-            for fmt, chapter in itertools.product(formats_to_download, requested_ranges):
-                new_info = self._copy_infodict(info_dict)
-                new_info.update(fmt)
-                offset, duration = info_dict.get('section_start') or 0, info_dict.get('duration') or float('inf')
-                end_time = offset + min(chapter.get('end_time', duration), duration)
-                # duration may not be accurate. So allow deviations <1sec
-                if end_time == float('inf') or end_time > offset + duration + 1:
-                    end_time = None
-                if chapter or offset:
-                    new_info.update({
-                        'section_start': offset + chapter.get('start_time', 0),
-                        'section_end': end_time,
-                        'section_title': chapter.get('title'),
-                        'section_number': chapter.get('index'),
-                    })
-                downloaded_formats.append(new_info)
-                try:
-                    self.process_info(new_info)
-                except MaxDownloadsReached:
-                    max_downloads_reached = True
-                self._raise_pending_errors(new_info)
-                # Remove copied info
+            def remove_copied_info(new_info):
                 for key, val in tuple(new_info.items()):
                     if info_dict.get(key) == val:
                         new_info.pop(key)
-                if max_downloads_reached:
-                    break
 
-            write_archive = {f.get('__write_download_archive', False) for f in downloaded_formats}
-            assert write_archive.issubset({True, False, 'ignore'})
-            if True in write_archive and False not in write_archive:
-                self.record_download_archive(info_dict)
+            def post_process_formats():
+                for post_process in deferred_postprocessing:
+                    post_process()
+
+            try:
+                for fmt, chapter in itertools.product(formats_to_download, requested_ranges):
+                    new_info = self._copy_infodict(info_dict)
+                    new_info.update(fmt)
+                    offset, duration = info_dict.get('section_start') or 0, info_dict.get('duration') or float('inf')
+                    end_time = offset + min(chapter.get('end_time', duration), duration)
+                    # duration may not be accurate. So allow deviations <1sec
+                    if end_time == float('inf') or end_time > offset + duration + 1:
+                        end_time = None
+                    if chapter or offset:
+                        new_info.update({
+                            'section_start': offset + chapter.get('start_time', 0),
+                            'section_end': end_time,
+                            'section_title': chapter.get('title'),
+                            'section_number': chapter.get('index'),
+                        })
+                    downloaded_formats.append(new_info)
+                    self._thread_state.deferred_postprocessing = deferred_postprocessing
+                    try:
+                        self.process_info(new_info)
+                    except MaxDownloadsReached:
+                        max_downloads_reached = True
+                    finally:
+                        self._thread_state.deferred_postprocessing = None
+                    self._raise_pending_errors(new_info)
+                    if deferred_postprocessing is None:
+                        remove_copied_info(new_info)
+                    if max_downloads_reached:
+                        break
+            except BaseException:
+                # Post-process what was downloaded, as if the error had happened afterwards
+                if deferred_postprocessing:
+                    self._postprocessing_queue.submit(post_process_formats)
+                raise
 
-            info_dict['requested_downloads'] = downloaded_formats
-            info_dict = self.run_all_pps('after_video', info_dict)
+            def finish_video(info_dict):
+                if deferred_postprocessing is not None:
+                    post_process_formats()
+                    for new_info in downloaded_formats:
+                        remove_copied_info(new_info)
+
+                write_archive = {f.get('__write_download_archive', False) for f in downloaded_formats}
+                assert write_archive.issubset({True, False, 'ignore'})
+                if True in write_archive and False not in write_archive:
+                    self.record_download_archive(info_dict)
+
+                info_dict['requested_downloads'] = downloaded_formats
+                info_dict = self.run_all_pps('after_video', info_dict)
+                # We update the info dict with the selected best quality format (backwards compatibility)
+                info_dict.update(best_format)
+                return info_dict
+
+            if deferred_postprocessing is None:
+                info_dict = finish_video(info_dict)
+            else:
+                self._postprocessing_queue.submit(finish_video, info_dict)
             if max_downloads_reached:
                 raise MaxDownloadsReached
+            return info_dict
 
         # We update the info dict with the selected best quality format (backwards compatibility)
         info_dict.update(best_format)
@@ -3258,11 +3658,22 @@ def dl(self, name, info, subtitle=False, test=False):
                 'overwrites': True,
                 '_no_ytdl_file': True,
             }
+        elif self._thread_state.output and not self._thread_state.output.live:
+            # Progress of a held back job would only garble the output of the current one
+            params = {**self.params, 'noprogress': True}
         else:
             params = self.params
 
         fd = get_suitable_downloader(info, params, to_stdout=(name == '-'))(self, params)
-        if not test:
+        if test and self._thread_state.format_test_cancelled:
+            cancelled = self._thread_state.format_test_cancelled
+
+            def check_cancelled(status):
+                if cancelled.is_set():
+                    raise DownloadCancelled('The format test was cancelled')
+
+            fd.add_progress_hook(check_cancelled)
+        elif not test:
             for ph in self._progress_hooks:
                 fd.add_progress_hook(ph)
             urls = '", "'.join(
@@ -3313,7 +3724,8 @@ def replace_info_dict(new_info):
 
         new_info, _ = self.pre_process(info_dict, 'video')
         replace_info_dict(new_info)
-        self._num_downloads += 1
+        with self._download_lock:
+            self._num_downloads += 1
 
         # info_dict['_filename'] needs to be set for backward compatibility
         info_dict['_filename'] = full_filename = self.prepare_filename(info_dict, warn=True)
@@ -3474,7 +3886,7 @@ def correct_ext(filename, ext=new_ext):
                     if dl_filename is not None:
                         self.report_file_already_downloaded(dl_filename)
                     elif fd:
-                        for f in info_dict['requested_formats'] if fd != FFmpegFD else []:
+                        for f in info_dict['requested_formats'] if fd not in (FFmpegFD, MergeFD) else []:
                             f['filepath'] = fname = prepend_extension(
                                 correct_ext(temp_filename, info_dict['ext']),
                                 'f{}'.format(f['format_id']), info_dict['ext'])
@@ -3574,7 +3986,7 @@ def ffmpeg_fixup(cndn, msg, cls):
                             self.report_warning(f'{vid}: {msg}')
                             return
                         pp = cls(self)
-                        if pp.available:
+                        if pp.available or pp._NATIVE:
                             info_dict['__postprocessors'].append(pp)
                         else:
                             self.report_warning(f'{vid}: {msg}. Install ffmpeg to fix this automatically')
@@ -3610,18 +4022,27 @@ def ffmpeg_fixup(cndn, msg, cls):
                     ffmpeg_fixup(downloader == 'web_socket_fragment', 'Malformed duration detected', FFmpegFixupDurationPP)
 
                 fixup()
-                try:
-                    replace_info_dict(self.post_process(dl_filename, info_dict, files_to_move))
-                except PostProcessingError as err:
-                    self.report_error(f'Postprocessing: {err}')
-                    return
-                try:
-                    for ph in self._post_hooks:
-                        ph(info_dict['filepath'])
-                except Exception as err:
-                    self.report_error(f'post hooks: {err}')
+
+                def post_process():
+                    try:
+                        replace_info_dict(self.post_process(dl_filename, info_dict, files_to_move))
+                    except PostProcessingError as err:
+                        self.report_error(f'Postprocessing: {err}')
+                        return False
+                    try:
+                        for ph in self._post_hooks:
+                            ph(info_dict['filepath'])
+                    except Exception as err:
+                        self.report_error(f'post hooks: {err}')
+                        return False
+                    info_dict['__write_download_archive'] = True
+                    return True
+
+                # See process_video_result
+                if self._thread_state.deferred_postprocessing is not None:
+                    self._thread_state.deferred_postprocessing.append(post_process)
+                elif not post_process():
                     return
-                info_dict['__write_download_archive'] = True
 
         assert info_dict is original_infodict  # Make sure the info_dict was modified in-place
         if self.params.get('force_write_download_archive'):
@@ -3644,6 +4065,8 @@ def wrapper(*args, **kwargs):
                 self._num_downloads = 0
             else:
                 if self.params.get('dump_single_json', False):
+                    if self._postprocessing_queue:
+                        self._postprocessing_queue.wait()
                     self.post_extract(res)
                     self.to_stdout(json.dumps(self.sanitize_info(res)))
         return wrapper
@@ -3658,12 +4081,100 @@ def download(self, url_list):
                 and self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
-        for url in url_list:
-            self.__download_wrapper(self.extract_info)(
-                url, force_generic_extractor=self.params.get('force_generic_extractor', False))
+        download_url = functools.partial(
+            self.__download_wrapper(self.extract_info),
+            force_generic_extractor=self.params.get('force_generic_extractor', False))
+        max_workers = self.params.get('concurrent_downloads') or 1
+        # The outcome of these options depends on the order in which the URLs are finished
+        ordered_opts = ('max_downloads', 'break_on_existing', 'break_on_reject', 'breaking_match_filter', 'break_per_url')
+        if max_workers > 1 and outtmpl != '-' and not any(map(self.params.get, ordered_opts)):
+            collections.deque(self._map_concurrently(download_url, url_list, max_workers), maxlen=0)
+        else:
+            with self._postprocess_in_background():
+                for url in url_list:
+                    download_url(url)
 
         return self._download_retcode
 
+    @contextlib.contextmanager
+    def _postprocess_in_background(self):
+        """Post-process the downloaded videos in the background within the context. See concurrent_postprocessing"""
+        max_workers = self.params.get('concurrent_postprocessing')
+        if not max_workers or self._postprocessing_queue:
+            yield
+            return
+        queue = self._postprocessing_queue = _PostprocessingQueue(self, max_workers)
+        try:
+            yield
+            queue.wait()
+        except KeyboardInterrupt:
+            queue.close(cancel=True)
+            raise
+        finally:
+            queue.close()
+            self._postprocessing_queue = None
+
+    def _map_concurrently(self, func, iterable, max_workers):
+        """
+        Apply func to the items in a pool of threads, yielding the results in order
+
+        The output of each job is held back until all the jobs before it are done,
+        so that it is printed as if the items were processed one after another.
+        Closing the generator, or an exception in a job, cancels the remaining jobs
+        """
+        cancelled = threading.Event()
+
+        def check_cancelled(_):
+            if cancelled.is_set():
+                raise DownloadCancelled
+
+        def run(item):
+            if cancelled.is_set():
+                raise DownloadCancelled
+            return func(item)
+
+        items, jobs = iter(iterable), collections.deque()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='yt-dlp-job')
+        self._progress_hooks.append(check_cancelled)
+        try:
+            while True:
+                for item in itertools.islice(items, 2 * max_workers - len(jobs)):
+                    jobs.append(self._submit_job(executor, run, item))
+                if not jobs:
+                    break
+                job, output = jobs.popleft()
+                output.release()
+                yield job.result()
+        finally:
+            cancelled.set()
+            for job, _ in jobs:
+                job.cancel()
+            executor.shutdown(wait=True)
+            self._progress_hooks.remove(check_cancelled)
+
+    def _submit_job(self, executor, func, *args):
+        """
+        Run func in the executor with the playlist state of the current thread
+
+        @returns    (future, output), where output is the `_HeldOutput` of the job
+        """
+        parent = self._thread_state
+        output = _HeldOutput(self.__write_string, parent.output)
+        playlist_level, playlist_urls = parent.playlist_level, set(parent.playlist_urls)
+
+        def run():
+            state = self._thread_state
+            state.output, state.playlist_level, state.playlist_urls = output, playlist_level, playlist_urls
+            try:
+                return func(*args)
+            finally:
+                state.output, state.playlist_level, state.playlist_urls = None, 0, set()
+
+        # These are created lazily; make sure they are shared by all the jobs
+        self._request_director  # noqa: B018
+        self._http_cache  # noqa: B018
+        return executor.submit(run), output
+
     def download_with_info_file(self, info_filename):
         with contextlib.closing(fileinput.FileInput(
                 [info_filename], mode='r',
@@ -3778,8 +4289,25 @@ def run_pp(self, pp, infodict):
     def run_all_pps(self, key, info, *, additional_pps=None):
         if key != 'video':
             self._forceprint(key, info)
-        for pp in (additional_pps or []) + self._pps[key]:
-            info = self.run_pp(pp, info)
+        pps = (additional_pps or []) + self._pps[key]
+        if ('no-fused-postprocessors' not in self.params['compat_opts']
+                and any(getattr(pp, '_FUSABLE', False) for pp in pps)):
+            info['__ffmpeg_fused_pp'] = FFmpegFusedPP(self)
+        try:
+            for pp in pps:
+                if not getattr(pp, '_FUSABLE', False):
+                    info = self._run_fused_pp(info)
+                info = self.run_pp(pp, info)
+            info = self._run_fused_pp(info)
+        finally:
+            info.pop('__ffmpeg_fused_pp', None)
+        return info
+
+    def _run_fused_pp(self, info):
+        """Run the stream copies deferred by the previous postprocessors. See FFmpegFusedPP"""
+        fused_pp = info.get('__ffmpeg_fused_pp')
+        if fused_pp and fused_pp.pending:
+            info = self.run_pp(fused_pp, info)
         return info
 
     def pre_process(self, ie_info, key='pre_process', files_to_move=None):
@@ -3814,7 +4342,7 @@ def _make_archive_id(self, info_dict):
             if not url:
                 return
             # Try to find matching extractor for the URL and take its ie_key
-            for ie_key, ie in self._ies.items():
+            for ie_key, ie in self._suitable_ies(url):
                 if ie.suitable(url):
                     extractor = ie_key
                     break
@@ -3838,10 +4366,32 @@ def record_download_archive(self, info_dict):
         assert vid_id
 
         self.write_debug(f'Adding to archive: {vid_id}')
-        if is_path_like(fn):
-            with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-                archive_file.write(vid_id + '\n')
-        self.archive.add(vid_id)
+        with self._download_lock:
+            if is_path_like(fn) and not isinstance(self.archive, SQLiteArchive):
+                with locked_file(fn, 'a', encoding='utf-8') as archive_file:
+                    archive_file.write(vid_id + '\n')
+            self.archive.add(vid_id)
+
+    def import_download_archive(self, fn):
+        """Add the IDs listed in an archive file to the download archive, returning the number of new IDs"""
+        with locked_file(fn, 'r', encoding='utf-8') as archive_file:
+            vid_ids = {line.strip() for line in archive_file} - {''}
+        with self._download_lock:
+            new_ids = [vid_id for vid_id in vid_ids if vid_id not in self.archive]
+            archive_fn = self.params.get('download_archive')
+            if is_path_like(archive_fn) and not isinstance(self.archive, SQLiteArchive):
+                with locked_file(archive_fn, 'a', encoding='utf-8') as archive_file:
+                    archive_file.writelines(f'{vid_id}\n' for vid_id in new_ids)
+            self.archive.update(new_ids)
+        return len(new_ids)
+
+    def export_download_archive(self, fn):
+        """Write the IDs in the download archive to an archive file, returning their number"""
+        with self._download_lock:
+            vid_ids = sorted(self.archive)
+        with locked_file(fn, 'w', encoding='utf-8') as archive_file:
+            archive_file.writelines(f'{vid_id}\n' for vid_id in vid_ids)
+        return len(vid_ids)
 
     @staticmethod
     def format_resolution(format, default='unknown'):
@@ -4299,7 +4849,15 @@ def build_request_director(self, handlers, preferences=None):
         clean_headers(headers)
         clean_proxies(proxies, headers)
 
-        director = RequestDirector(logger=logger, verbose=self.params.get('debug_printtraffic'))
+        max_connections_per_host = self.params.get('max_connections_per_host')
+        # Keep a connection alive for each of the requests that can be made to a host at once
+        pool_size = max_connections_per_host or (self.params.get('concurrent_downloads') or 1) * max(
+            self.params.get(key) or 1
+            for key in ('concurrent_fragment_downloads', 'http_connections', 'concurrent_format_checks'))
+
+        director = RequestDirector(
+            logger=logger, verbose=self.params.get('debug_printtraffic'),
+            max_connections_per_host=max_connections_per_host)
         for handler in handlers:
             director.add_handler(handler(
                 logger=logger,
@@ -4308,6 +4866,7 @@ def build_request_director(self, handlers, preferences=None):
                 proxies=proxies,
                 prefer_system_certs='no-certifi' in self.params['compat_opts'],
                 verify=not self.params.get('nocheckcertificate'),
+                pool_size=pool_size,
                 **traverse_obj(self.params, {
                     'verbose': 'debug_printtraffic',
                     'source_address': 'source_address',
@@ -4325,12 +4884,29 @@ def build_request_director(self, handlers, preferences=None):
         director.preferences.update(preferences or [])
         if 'prefer-legacy-http-handler' in self.params['compat_opts']:
             director.preferences.add(lambda rh, _: 500 if rh.RH_KEY == 'Urllib' else 0)
+        if self.params.get('prefer_http2'):
+            # Unless the server is known not to support HTTP/2
+            director.preferences.add(
+                lambda rh, request: 500 if rh.RH_KEY == 'H2' and rh.supports_http2(request.url) else 0)
         return director
 
     @functools.cached_property
     def _request_director(self):
         return self.build_request_director(_REQUEST_HANDLERS.values(), _RH_PREFERENCES)
 
+    @functools.cached_property
+    def _http_cache(self):
+        if not self.params.get('http_cache') or not self.cache.enabled:
+            return None
+        path = os.path.join(self.cache._get_root_dir(), 'http.sqlite')
+        self.write_debug(f'Opening HTTP cache {path!r}')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return ResponseCache(
+                path, self.params.get('http_cache_size') or 256 * 1024 * 1024, self.params.get('http_cache_ttl'))
+        except Exception as e:
+            self.report_warning(f'Unable to open the HTTP cache: {e}')
+
     def encode(self, s):
         if isinstance(s, bytes):
             return s  # Already encoded
@@ -217,6 +217,12 @@ def validate_minmax(min_val, max_val, min_name, max_name=None):
     validate_positive('autonumber start', opts.autonumber_start)
     validate_positive('autonumber size', opts.autonumber_size, True)
     validate_positive('concurrent fragments', opts.concurrent_fragment_downloads, True)
+    validate_positive('concurrent downloads', opts.concurrent_downloads, True)
+    validate_positive('concurrent playlist entries', opts.concurrent_playlist_entries, True)
+    validate_positive('concurrent postprocessing', opts.concurrent_postprocessing)
+    validate_positive('concurrent format checks', opts.concurrent_format_checks, True)
+    validate_positive('http connections', opts.http_connections, True)
+    validate_positive('max connections per host', opts.max_connections_per_host, True)
     validate_positive('playlist start', opts.playliststart, True)
     if opts.playlistend != -1:
         validate_minmax(opts.playliststart, opts.playlistend, 'playlist start', 'playlist end')
@@ -320,6 +326,7 @@ def validate_bytes(name, value, strict_positive=False):
     opts.max_filesize = validate_bytes('max filesize', opts.max_filesize)
     opts.buffersize = validate_bytes('buffer size', opts.buffersize, True)
     opts.http_chunk_size = validate_bytes('http chunk size', opts.http_chunk_size)
+    opts.http_cache_size = validate_bytes('http cache size', opts.http_cache_size)
 
     # Output templates
     def validate_outtmpl(tmpl, msg):
@@ -468,7 +475,16 @@ def metadataparser_actions(f):
     opts.match_filter = match_filter_func(opts.match_filter, opts.breaking_match_filter)
 
     if opts.download_archive is not None:
-        opts.download_archive = expand_path(opts.download_archive)
+        if opts.download_archive.startswith('sqlite:'):
+            opts.download_archive = f'sqlite:{expand_path(opts.download_archive[7:])}'
+        else:
+            opts.download_archive = expand_path(opts.download_archive)
+    if opts.import_download_archive is not None:
+        opts.import_download_archive = expand_path(opts.import_download_archive)
+    if opts.export_download_archive is not None:
+        opts.export_download_archive = expand_path(opts.export_download_archive)
+    if (opts.import_download_archive or opts.export_download_archive) and opts.download_archive is None:
+        raise ValueError('--import-download-archive and --export-download-archive require --download-archive')
 
     if opts.ffmpeg_location is not None:
         opts.ffmpeg_location = expand_path(opts.ffmpeg_location)
@@ -552,6 +568,11 @@ def report_conflict(arg1, opt1, arg2='--allow-unplayable-formats', opt2='allow_u
                     '"--exec before_dl:"', 'exec_cmd', val2=opts.exec_cmd.get('before_dl'))
     report_conflict('--id', 'useid', '--output', 'outtmpl', val2=opts.outtmpl.get('default'))
     report_conflict('--remux-video', 'remuxvideo', '--recode-video', 'recodevideo')
+    # These depend on the order in which the input URLs are finished
+    for arg, opt in (('--max-downloads', 'max_downloads'), ('--break-on-existing', 'break_on_existing'),
+                     ('--break-match-filters', 'breaking_match_filter'), ('--break-per-input', 'break_per_url')):
+        report_conflict('--concurrent-downloads', 'concurrent_downloads', arg, opt,
+                        val1=opts.concurrent_downloads > 1, default=1)
 
     # Conflicts with --allow-unplayable-formats
     report_conflict('--embed-metadata', 'addmetadata')
@@ -823,6 +844,7 @@ def parse_options(argv=None):
         'allow_multiple_video_streams': opts.allow_multiple_video_streams,
         'allow_multiple_audio_streams': opts.allow_multiple_audio_streams,
         'check_formats': opts.check_formats,
+        'concurrent_format_checks': opts.concurrent_format_checks,
         'listformats': opts.listformats,
         'listformats_table': opts.listformats_table,
         'outtmpl': opts.outtmpl,
@@ -846,9 +868,13 @@ def parse_options(argv=None):
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
         'concurrent_fragment_downloads': opts.concurrent_fragment_downloads,
+        'concurrent_downloads': opts.concurrent_downloads,
+        'concurrent_playlist_entries': opts.concurrent_playlist_entries,
+        'concurrent_postprocessing': opts.concurrent_postprocessing,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'http_chunk_size': opts.http_chunk_size,
+        'http_connections': opts.http_connections,
         'continuedl': opts.continue_dl,
         'noprogress': opts.quiet if opts.noprogress is None else opts.noprogress,
         'progress_with_newline': opts.progress_with_newline,
@@ -898,6 +924,9 @@ def parse_options(argv=None):
         'max_views': opts.max_views,
         'daterange': opts.date,
         'cachedir': opts.cachedir,
+        'http_cache': opts.http_cache,
+        'http_cache_ttl': opts.http_cache_ttl,
+        'http_cache_size': opts.http_cache_size,
         'age_limit': opts.age_limit,
         'download_archive': opts.download_archive,
         'break_on_existing': opts.break_on_existing,
@@ -924,10 +953,13 @@ def parse_options(argv=None):
         'wait_for_video': opts.wait_for_video,
         'mark_watched': opts.mark_watched,
         'merge_output_format': opts.merge_output_format,
+        'merge_while_downloading': opts.merge_while_downloading,
         'final_ext': final_ext,
         'postprocessors': postprocessors,
         'fixup': opts.fixup,
         'source_address': opts.source_address,
+        'max_connections_per_host': opts.max_connections_per_host,
+        'prefer_http2': opts.prefer_http2,
         'impersonate': opts.impersonate,
         'sleep_interval_requests': opts.sleep_interval_requests,
         'sleep_interval': opts.sleep_interval,
@@ -939,6 +971,7 @@ def parse_options(argv=None):
         'list_thumbnails': opts.list_thumbnails,
         'playlist_items': opts.playlist_items,
         'match_filter': opts.match_filter,
+        'breaking_match_filter': opts.breaking_match_filter,
         'color': opts.color,
         'ffmpeg_location': opts.ffmpeg_location,
         'hls_prefer_native': opts.hls_prefer_native,
@@ -979,12 +1012,20 @@ def _real_main(argv=None):
         _load_all_plugins()
 
     with YoutubeDL(ydl_opts) as ydl:
-        pre_process = opts.update_self or opts.rm_cachedir
+        pre_process = (opts.update_self or opts.rm_cachedir
+                       or opts.import_download_archive or opts.export_download_archive)
         actual_use = all_urls or opts.load_info_filename
 
         if opts.rm_cachedir:
             ydl.cache.remove()
 
+        if opts.import_download_archive:
+            count = ydl.import_download_archive(opts.import_download_archive)
+            ydl.to_screen(f'[info] Imported {count} new IDs from {opts.import_download_archive!r}')
+        if opts.export_download_archive:
+            count = ydl.export_download_archive(opts.export_download_archive)
+            ydl.to_screen(f'[info] Exported {count} IDs to {opts.export_download_archive!r}')
+
         try:
             updater = Updater(ydl, opts.update_self)
             if opts.update_self and updater.update() and actual_use and updater.cmd:
@@ -1,5 +1,7 @@
+import array
 import base64
-from math import ceil
+import functools
+import sys
 
 from .compat import compat_ord
 from .dependencies import Cryptodome
@@ -16,15 +18,15 @@ def aes_gcm_decrypt_and_verify_bytes(data, key, tag, nonce):
 else:
     def aes_cbc_decrypt_bytes(data, key, iv):
         """ Decrypt bytes with AES-CBC using native implementation since pycryptodome is unavailable """
-        return bytes(aes_cbc_decrypt(*map(list, (data, key, iv))))
+        return _cbc_decrypt(bytes(data), bytes(key), bytes(iv))
 
     def aes_gcm_decrypt_and_verify_bytes(data, key, tag, nonce):
         """ Decrypt bytes with AES-GCM using native implementation since pycryptodome is unavailable """
-        return bytes(aes_gcm_decrypt_and_verify(*map(list, (data, key, tag, nonce))))
+        return _gcm_decrypt_and_verify(*map(bytes, (data, key, tag, nonce)))
 
 
-def aes_cbc_encrypt_bytes(data, key, iv, **kwargs):
-    return bytes(aes_cbc_encrypt(*map(list, (data, key, iv)), **kwargs))
+def aes_cbc_encrypt_bytes(data, key, iv, *, padding_mode='pkcs7'):
+    return _cbc_encrypt(bytes(data), bytes(key), bytes(iv), padding_mode)
 
 
 BLOCK_SIZE_BYTES = 16
@@ -82,15 +84,10 @@ def aes_ecb_encrypt(data, key, iv=None):
     @param {int[]} iv          Unused for this mode
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = ceil(len(data) / BLOCK_SIZE_BYTES)
-
-    encrypted_data = []
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        encrypted_data += aes_encrypt(pkcs7_padding(block), expanded_key)
-
-    return encrypted_data
+    remainder = len(data) % BLOCK_SIZE_BYTES
+    if remainder:
+        data = data[:len(data) - remainder] + pkcs7_padding(data[len(data) - remainder:])
+    return list(_ecb_encrypt(bytes(data), bytes(key)))
 
 
 def aes_ecb_decrypt(data, key, iv=None):
@@ -102,14 +99,7 @@ def aes_ecb_decrypt(data, key, iv=None):
     @param {int[]} iv          Unused for this mode
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = ceil(len(data) / BLOCK_SIZE_BYTES)
-
-    encrypted_data = []
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        encrypted_data += aes_decrypt(block, expanded_key)
-    return encrypted_data[:len(data)]
+    return list(_ecb_decrypt(bytes(data), bytes(key)))
 
 
 def aes_ctr_decrypt(data, key, iv):
@@ -133,19 +123,7 @@ def aes_ctr_encrypt(data, key, iv):
     @param {int[]} iv          16-Byte initialization vector
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = ceil(len(data) / BLOCK_SIZE_BYTES)
-    counter = iter_vector(iv)
-
-    encrypted_data = []
-    for i in range(block_count):
-        counter_block = next(counter)
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        encrypted_data += xor(block, cipher_counter_block)
-    return encrypted_data[:len(data)]
+    return list(_ctr_crypt(bytes(data), bytes(key), bytes(iv)))
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -157,19 +135,7 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = ceil(len(data) / BLOCK_SIZE_BYTES)
-
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    return decrypted_data[:len(data)]
+    return list(_cbc_decrypt(bytes(data), bytes(key), bytes(iv)))
 
 
 def aes_cbc_encrypt(data, key, iv, *, padding_mode='pkcs7'):
@@ -182,23 +148,7 @@ def aes_cbc_encrypt(data, key, iv, *, padding_mode='pkcs7'):
     @param padding_mode        Padding mode to use
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = ceil(len(data) / BLOCK_SIZE_BYTES)
-
-    encrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block = pad_block(block, padding_mode)
-
-        mixed_block = xor(block, previous_cipher_block)
-
-        encrypted_block = aes_encrypt(mixed_block, expanded_key)
-        encrypted_data += encrypted_block
-
-        previous_cipher_block = encrypted_block
-
-    return encrypted_data
+    return list(_cbc_encrypt(bytes(data), bytes(key), bytes(iv), padding_mode))
 
 
 def aes_gcm_decrypt_and_verify(data, key, tag, nonce):
@@ -212,36 +162,7 @@ def aes_gcm_decrypt_and_verify(data, key, tag, nonce):
     @returns {int[]}           decrypted data
     """
 
-    # XXX: check aes, gcm param
-
-    hash_subkey = aes_encrypt([0] * BLOCK_SIZE_BYTES, key_expansion(key))
-
-    if len(nonce) == 12:
-        j0 = [*nonce, 0, 0, 0, 1]
-    else:
-        fill = (BLOCK_SIZE_BYTES - (len(nonce) % BLOCK_SIZE_BYTES)) % BLOCK_SIZE_BYTES + 8
-        ghash_in = nonce + [0] * fill + list((8 * len(nonce)).to_bytes(8, 'big'))
-        j0 = ghash(hash_subkey, ghash_in)
-
-    # TODO: add nonce support to aes_ctr_decrypt
-
-    # nonce_ctr = j0[:12]
-    iv_ctr = inc(j0)
-
-    decrypted_data = aes_ctr_decrypt(data, key, iv_ctr + [0] * (BLOCK_SIZE_BYTES - len(iv_ctr)))
-    pad_len = (BLOCK_SIZE_BYTES - (len(data) % BLOCK_SIZE_BYTES)) % BLOCK_SIZE_BYTES
-    s_tag = ghash(
-        hash_subkey,
-        data
-        + [0] * pad_len                                  # pad
-        + list((0 * 8).to_bytes(8, 'big')                # length of associated data
-               + ((len(data) * 8).to_bytes(8, 'big'))),  # length of data
-    )
-
-    if tag != aes_ctr_encrypt(s_tag, key, j0):
-        raise ValueError('Mismatching authentication tag')
-
-    return decrypted_data
+    return list(_gcm_decrypt_and_verify(*map(bytes, (data, key, tag, nonce))))
 
 
 def aes_encrypt(data, expanded_key):
@@ -420,12 +341,6 @@ def key_expansion(data):
     return data[:expanded_key_size_bytes]
 
 
-def iter_vector(iv):
-    while True:
-        yield iv
-        iv = inc(iv)
-
-
 def sub_bytes(data):
     return [SBOX[x] for x in data]
 
@@ -469,66 +384,221 @@ def shift_rows_inv(data):
     return [data[((column - row) & 0b11) * 4 + row] for column in range(4) for row in range(4)]
 
 
-def shift_block(data):
-    data_shifted = []
-
-    bit = 0
-    for n in data:
-        if bit:
-            n |= 0x100
-        bit = n & 1
-        n >>= 1
-        data_shifted.append(n)
-
-    return data_shifted
-
-
-def inc(data):
-    data = data[:]  # copy
-    for i in range(len(data) - 1, -1, -1):
-        if data[i] == 255:
-            data[i] = 0
-        else:
-            data[i] = data[i] + 1
-            break
-    return data
-
-
-def block_product(block_x, block_y):
-    # NIST SP 800-38D, Algorithm 1
-
-    if len(block_x) != BLOCK_SIZE_BYTES or len(block_y) != BLOCK_SIZE_BYTES:
-        raise ValueError(f'Length of blocks need to be {BLOCK_SIZE_BYTES} bytes')
-
-    block_r = [0xE1] + [0] * (BLOCK_SIZE_BYTES - 1)
-    block_v = block_y[:]
-    block_z = [0] * BLOCK_SIZE_BYTES
-
-    for i in block_x:
-        for bit in range(7, -1, -1):
-            if i & (1 << bit):
-                block_z = xor(block_z, block_v)
-
-            do_xor = block_v[-1] & 1
-            block_v = shift_block(block_v)
-            if do_xor:
-                block_v = xor(block_v, block_r)
-
-    return block_z
-
-
-def ghash(subkey, data):
-    # NIST SP 800-38D, Algorithm 2
-
-    if len(data) % BLOCK_SIZE_BYTES:
-        raise ValueError(f'Length of data should be {BLOCK_SIZE_BYTES} bytes')
+# Word-oriented implementation of the modes, used instead of the per-byte reference
+# functions above. Each round is done with four lookups per column in tables that combine
+# SubBytes, ShiftRows and MixColumns ("T-tables"), on big-endian 32-bit words
+
+def _gf_mul(a, b):
+    if not a or not b:
+        return 0
+    return RIJNDAEL_EXP_TABLE[(RIJNDAEL_LOG_TABLE[a] + RIJNDAEL_LOG_TABLE[b]) % 0xFF]
+
+
+def _t_tables(sbox, coefficients):
+    table = []
+    for value in sbox:
+        word = 0
+        for coefficient in coefficients:
+            word = word << 8 | _gf_mul(value, coefficient)
+        table.append(word)
+    tables = [tuple(table)]
+    for _ in range(3):
+        tables.append(tuple(word >> 8 | (word & 0xFF) << 24 for word in tables[-1]))
+    return tables
+
+
+# MixColumns multiplies each byte of a column by the first column of the matrix
+_TE = _t_tables(SBOX, [row[0] for row in MIX_COLUMN_MATRIX])
+_TD = _t_tables(SBOX_INV, [row[0] for row in MIX_COLUMN_MATRIX_INV])
+_WORD_TYPE = next(code for code in 'ILQ' if array.array(code).itemsize == 4)
+
+
+def _to_words(data):
+    words = array.array(_WORD_TYPE, data)
+    if sys.byteorder == 'little':
+        words.byteswap()
+    return words
+
+
+def _from_words(words):
+    if sys.byteorder == 'little':
+        words.byteswap()
+    return words.tobytes()
+
+
+def _zero_pad(data):
+    return data + bytes(-len(data) % BLOCK_SIZE_BYTES)
+
+
+@functools.lru_cache(maxsize=16)
+def _block_functions(key):
+    """Return functions that encrypt and decrypt a block given as four words"""
+    if len(key) not in (16, 24, 32):
+        raise ValueError(f'Invalid AES key length: {len(key)}')
+    round_keys = tuple(_to_words(bytes(key_expansion(list(key)))))
+    rounds = len(round_keys) // 4 - 1
+    te0, te1, te2, te3 = _TE
+    td0, td1, td2, td3 = _TD
+    sbox, sbox_inv = SBOX, SBOX_INV
+
+    # The equivalent inverse cipher uses the round keys in reverse order, with InvMixColumns applied
+    inverse_keys = list(round_keys[-4:])
+    for i in range(rounds - 1, 0, -1):
+        inverse_keys.extend(
+            td0[sbox[w >> 24]] ^ td1[sbox[w >> 16 & 0xFF]] ^ td2[sbox[w >> 8 & 0xFF]] ^ td3[sbox[w & 0xFF]]
+            for w in round_keys[i * 4:i * 4 + 4])
+    inverse_keys.extend(round_keys[:4])
+    # Group the keys of the middle rounds, to unpack them in the loops
+    first, final = round_keys[:4], round_keys[-4:]
+    middle = tuple(round_keys[i:i + 4] for i in range(4, rounds * 4, 4))
+    inverse_first, inverse_final = inverse_keys[:4], inverse_keys[-4:]
+    inverse_middle = tuple(inverse_keys[i:i + 4] for i in range(4, rounds * 4, 4))
+
+    def encrypt(s0, s1, s2, s3):
+        s0 ^= first[0]
+        s1 ^= first[1]
+        s2 ^= first[2]
+        s3 ^= first[3]
+        for k0, k1, k2, k3 in middle:
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[s1 >> 16 & 0xFF] ^ te2[s2 >> 8 & 0xFF] ^ te3[s3 & 0xFF] ^ k0,
+                te0[s1 >> 24] ^ te1[s2 >> 16 & 0xFF] ^ te2[s3 >> 8 & 0xFF] ^ te3[s0 & 0xFF] ^ k1,
+                te0[s2 >> 24] ^ te1[s3 >> 16 & 0xFF] ^ te2[s0 >> 8 & 0xFF] ^ te3[s1 & 0xFF] ^ k2,
+                te0[s3 >> 24] ^ te1[s0 >> 16 & 0xFF] ^ te2[s1 >> 8 & 0xFF] ^ te3[s2 & 0xFF] ^ k3)
+        return (
+            (sbox[s0 >> 24] << 24 | sbox[s1 >> 16 & 0xFF] << 16 | sbox[s2 >> 8 & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ final[0],
+            (sbox[s1 >> 24] << 24 | sbox[s2 >> 16 & 0xFF] << 16 | sbox[s3 >> 8 & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ final[1],
+            (sbox[s2 >> 24] << 24 | sbox[s3 >> 16 & 0xFF] << 16 | sbox[s0 >> 8 & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ final[2],
+            (sbox[s3 >> 24] << 24 | sbox[s0 >> 16 & 0xFF] << 16 | sbox[s1 >> 8 & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ final[3])
+
+    def decrypt(s0, s1, s2, s3):
+        s0 ^= inverse_first[0]
+        s1 ^= inverse_first[1]
+        s2 ^= inverse_first[2]
+        s3 ^= inverse_first[3]
+        for k0, k1, k2, k3 in inverse_middle:
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[s3 >> 16 & 0xFF] ^ td2[s2 >> 8 & 0xFF] ^ td3[s1 & 0xFF] ^ k0,
+                td0[s1 >> 24] ^ td1[s0 >> 16 & 0xFF] ^ td2[s3 >> 8 & 0xFF] ^ td3[s2 & 0xFF] ^ k1,
+                td0[s2 >> 24] ^ td1[s1 >> 16 & 0xFF] ^ td2[s0 >> 8 & 0xFF] ^ td3[s3 & 0xFF] ^ k2,
+                td0[s3 >> 24] ^ td1[s2 >> 16 & 0xFF] ^ td2[s1 >> 8 & 0xFF] ^ td3[s0 & 0xFF] ^ k3)
+        return (
+            (sbox_inv[s0 >> 24] << 24 | sbox_inv[s3 >> 16 & 0xFF] << 16
+             | sbox_inv[s2 >> 8 & 0xFF] << 8 | sbox_inv[s1 & 0xFF]) ^ inverse_final[0],
+            (sbox_inv[s1 >> 24] << 24 | sbox_inv[s0 >> 16 & 0xFF] << 16
+             | sbox_inv[s3 >> 8 & 0xFF] << 8 | sbox_inv[s2 & 0xFF]) ^ inverse_final[1],
+            (sbox_inv[s2 >> 24] << 24 | sbox_inv[s1 >> 16 & 0xFF] << 16
+             | sbox_inv[s0 >> 8 & 0xFF] << 8 | sbox_inv[s3 & 0xFF]) ^ inverse_final[2],
+            (sbox_inv[s3 >> 24] << 24 | sbox_inv[s2 >> 16 & 0xFF] << 16
+             | sbox_inv[s1 >> 8 & 0xFF] << 8 | sbox_inv[s0 & 0xFF]) ^ inverse_final[3])
+
+    return encrypt, decrypt
+
+
+def _ecb_encrypt(data, key):
+    encrypt = _block_functions(key)[0]
+    words = _to_words(_zero_pad(data))
+    for i in range(0, len(words), 4):
+        words[i:i + 4] = array.array(_WORD_TYPE, encrypt(*words[i:i + 4]))
+    return _from_words(words)[:len(data)]
+
+
+def _ecb_decrypt(data, key):
+    decrypt = _block_functions(key)[1]
+    words = _to_words(_zero_pad(data))
+    for i in range(0, len(words), 4):
+        words[i:i + 4] = array.array(_WORD_TYPE, decrypt(*words[i:i + 4]))
+    return _from_words(words)[:len(data)]
+
+
+def _cbc_decrypt(data, key, iv):
+    decrypt = _block_functions(key)[1]
+    words = _to_words(_zero_pad(data))
+    p0, p1, p2, p3 = _to_words(_zero_pad(iv[:BLOCK_SIZE_BYTES]))
+    for i in range(0, len(words), 4):
+        c0, c1, c2, c3 = words[i:i + 4]
+        s0, s1, s2, s3 = decrypt(c0, c1, c2, c3)
+        words[i] = s0 ^ p0
+        words[i + 1] = s1 ^ p1
+        words[i + 2] = s2 ^ p2
+        words[i + 3] = s3 ^ p3
+        p0, p1, p2, p3 = c0, c1, c2, c3
+    return _from_words(words)[:len(data)]
+
+
+def _cbc_encrypt(data, key, iv, padding_mode='pkcs7'):
+    encrypt = _block_functions(key)[0]
+    remainder = len(data) % BLOCK_SIZE_BYTES
+    if remainder:
+        data = data[:len(data) - remainder] + bytes(pad_block(list(data[len(data) - remainder:]), padding_mode))
+    words = _to_words(data)
+    s0, s1, s2, s3 = _to_words(_zero_pad(iv[:BLOCK_SIZE_BYTES]))
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = encrypt(s0 ^ words[i], s1 ^ words[i + 1], s2 ^ words[i + 2], s3 ^ words[i + 3])
+        words[i:i + 4] = array.array(_WORD_TYPE, (s0, s1, s2, s3))
+    return _from_words(words)
+
+
+def _ctr_crypt(data, key, iv):
+    encrypt = _block_functions(key)[0]
+    words = _to_words(_zero_pad(data))
+    counter = int.from_bytes(_zero_pad(iv[:BLOCK_SIZE_BYTES]), 'big')
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = encrypt(counter >> 96, counter >> 64 & 0xFFFFFFFF, counter >> 32 & 0xFFFFFFFF, counter & 0xFFFFFFFF)
+        words[i] ^= s0
+        words[i + 1] ^= s1
+        words[i + 2] ^= s2
+        words[i + 3] ^= s3
+        counter = (counter + 1) & (1 << 128) - 1
+    return _from_words(words)[:len(data)]
+
+
+def _ghash(subkey, data):
+    """GHASH (NIST SP 800-38D, Algorithm 2) of zero-padded data, with 4-bit multiplication tables"""
+    # The powers subkey * x^i, where x^0 is the most significant bit of the block
+    powers = [int.from_bytes(subkey, 'big')]
+    for _ in range(127):
+        value = powers[-1]
+        powers.append(value >> 1 ^ (0xE1 << 120 if value & 1 else 0))
+    tables = []
+    for shift in range(0, 128, 4):
+        # The products of subkey with each value of the nibble at this bit offset
+        bits = powers[124 - shift:128 - shift][::-1]
+        table = [0] * 16
+        for nibble in range(1, 16):
+            low = nibble & -nibble
+            table[nibble] = table[nibble ^ low] ^ bits[low.bit_length() - 1]
+        tables.append(table)
+
+    result = 0
+    for block in _zero_pad_chunks(data):
+        value = result ^ int.from_bytes(block, 'big')
+        result = 0
+        for table in tables:
+            result ^= table[value & 0xF]
+            value >>= 4
+    return result
+
+
+def _zero_pad_chunks(data):
+    data = _zero_pad(data)
+    return (data[i:i + BLOCK_SIZE_BYTES] for i in range(0, len(data), BLOCK_SIZE_BYTES))
+
+
+def _gcm_decrypt_and_verify(data, key, tag, nonce):
+    hash_subkey = _ecb_encrypt(bytes(BLOCK_SIZE_BYTES), key)
+    if len(nonce) == 12:
+        j0 = nonce + b'\0\0\0\1'
+    else:
+        j0 = _ghash(hash_subkey, _zero_pad(nonce) + (8 * len(nonce)).to_bytes(16, 'big')).to_bytes(16, 'big')
 
-    last_y = [0] * BLOCK_SIZE_BYTES
-    for i in range(0, len(data), BLOCK_SIZE_BYTES):
-        block = data[i: i + BLOCK_SIZE_BYTES]
-        last_y = block_product(xor(last_y, block), subkey)
+    counter = (int.from_bytes(j0, 'big') + 1) & (1 << 128) - 1
+    decrypted_data = _ctr_crypt(data, key, counter.to_bytes(16, 'big'))
+    s_tag = _ghash(hash_subkey, _zero_pad(data) + (len(data) * 8).to_bytes(16, 'big'))
+    if tag != _ctr_crypt(s_tag.to_bytes(16, 'big'), key, j0):
+        raise ValueError('Mismatching authentication tag')
 
-    return last_y
+    return decrypted_data
 
 
 __all__ = [
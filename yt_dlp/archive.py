@@ -0,0 +1,109 @@
+import contextlib
+import math
+import threading
+import time
+
+from .dependencies import sqlite3
+from .utils import YoutubeDLError
+
+
+class SQLiteArchive:
+    """
+    A download archive kept in an SQLite database
+
+    It can be used in place of the set of archive IDs. Membership is looked up in
+    the database, so the archive does not have to be loaded in memory, and new IDs
+    are written in batches, at most BATCH_INTERVAL seconds after they are added.
+    The database can be shared by several processes
+    """
+
+    BATCH_SIZE = 100
+    BATCH_INTERVAL = 1  # seconds
+
+    def __init__(self, path):
+        if not sqlite3:
+            raise YoutubeDLError(
+                'Cannot use an SQLite download archive without sqlite3 support. '
+                'Please use a Python interpreter compiled with sqlite3 support')
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY NOT NULL) WITHOUT ROWID')
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            return vid_id in self._pending or bool(
+                self._conn.execute('SELECT 1 FROM archive WHERE id = ?', (vid_id,)).fetchone())
+
+    def __iter__(self):
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute('SELECT id FROM archive ORDER BY id').fetchall()
+        return (vid_id for vid_id, in rows)
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM archive').fetchone()[0]
+
+    def __bool__(self):
+        return True
+
+    def add(self, vid_id):
+        with self._lock:
+            self._pending.add(vid_id)
+            if (len(self._pending) >= self.BATCH_SIZE
+                    or time.monotonic() - self._last_flush >= self.BATCH_INTERVAL):
+                self._write(self._pending)
+            elif not self._timer and math.isfinite(self.BATCH_INTERVAL):
+                # Other processes should see the ID even if nothing else is added for a while
+                self._timer = threading.Timer(
+                    self.BATCH_INTERVAL - (time.monotonic() - self._last_flush), self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def update(self, vid_ids):
+        """Add all the IDs in a single transaction"""
+        with self._lock:
+            self._pending.update(vid_ids)
+            self._write(self._pending)
+
+    def flush(self):
+        with self._lock:
+            self._write(self._pending)
+
+    def _flush_in_background(self):
+        with self._lock:
+            if self._timer is not threading.current_thread() or not self._conn:
+                return
+            self._timer = None
+            # On failure, the IDs are still pending and are written with the next batch
+            with contextlib.suppress(sqlite3.Error):
+                self._write(self._pending)
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._write(self._pending)
+                self._conn.close()
+                self._conn = None
+
+    def _write(self, vid_ids):
+        if vid_ids:
+            # Take the write lock up front so that concurrent writers wait for each other
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany('INSERT OR IGNORE INTO archive (id) VALUES (?)', ((i,) for i in vid_ids))
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            vid_ids.clear()
+        self._last_flush = time.monotonic()
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
@@ -3,16 +3,36 @@
 import os
 import re
 import shutil
+import threading
+import time
 import traceback
 import urllib.parse
 
+from .dependencies import sqlite3
 from .utils import expand_path, traverse_obj, version_tuple, write_json_file
 from .version import __version__
 
 
 class Cache:
+    """
+    A persistent key-value store, grouped in sections
+
+    Entries are kept in a single SQLite database in the cache directory, which can be
+    shared by several processes. The least recently used entries are evicted once the
+    stored data exceeds MAX_SIZE. Entries stored as separate JSON files by older
+    versions are moved into the database when they are loaded. Without sqlite3
+    support, the JSON files are used instead
+    """
+
+    MAX_SIZE = 64 * 1024 * 1024
+
+    _DB_NAME = 'cache.sqlite'
+
     def __init__(self, ydl):
         self._ydl = ydl
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_failed = False
 
     def _get_root_dir(self):
         res = self._ydl.params.get('cachedir')
@@ -30,20 +50,92 @@ def _get_cache_fn(self, section, key, dtype):
     def enabled(self):
         return self._ydl.params.get('cachedir') is not False
 
+    def _connect(self):
+        """Return the database connection, or None if the JSON files must be used. Must hold the lock"""
+        if self._conn or self._db_failed or not sqlite3:
+            return self._conn
+        path = os.path.join(self._get_root_dir(), self._DB_NAME)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS cache (
+                section TEXT NOT NULL, key TEXT NOT NULL, version TEXT, data TEXT, size INTEGER, used REAL,
+                PRIMARY KEY (section, key)) WITHOUT ROWID''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS cache_used ON cache (used)')
+        except Exception as e:
+            self._db_failed = True
+            self._ydl.report_warning(f'Unable to open the cache database {path!r}, falling back to files: {e}')
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def _write(self, section, entries):
+        """Insert (key, version, data) entries in a single transaction. Must hold the lock"""
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)',
+                ((section, key, version, data, len(data), now) for key, version, data in entries))
+            total = self._conn.execute('SELECT SUM(size) FROM cache').fetchone()[0] or 0
+            if total > self.MAX_SIZE:
+                # Evict down to 90% of the limit so that eviction does not run on every store
+                excess = total - int(self.MAX_SIZE * 0.9)
+                evicted = []
+                for old_section, old_key, size in self._conn.execute(
+                        'SELECT section, key, size FROM cache ORDER BY used'):
+                    if excess <= 0:
+                        break
+                    evicted.append((old_section, old_key))
+                    excess -= size
+                self._conn.executemany('DELETE FROM cache WHERE section = ? AND key = ?', evicted)
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
     def store(self, section, key, data, dtype='json'):
+        self.store_many(section, {key: data}, dtype)
+
+    def store_many(self, section, entries, dtype='json'):
+        """Store a dictionary of entries in the section"""
         assert dtype in ('json',)
 
-        if not self.enabled:
+        if not self.enabled or not entries:
             return
 
-        fn = self._get_cache_fn(section, key, dtype)
-        try:
-            os.makedirs(os.path.dirname(fn), exist_ok=True)
-            self._ydl.write_debug(f'Saving {section}.{key} to cache')
-            write_json_file({'yt-dlp_version': __version__, 'data': data}, fn)
-        except Exception:
-            tb = traceback.format_exc()
-            self._ydl.report_warning(f'Writing cache to {fn!r} failed: {tb}')
+        with self._lock:
+            conn = self._connect()
+            if conn:
+                self._ydl.write_debug(f'Saving {section}.{", ".join(entries)} to cache')
+                try:
+                    self._write(section, [(key, __version__, json.dumps(data)) for key, data in entries.items()])
+                except Exception:
+                    tb = traceback.format_exc()
+                    self._ydl.report_warning(f'Writing cache to {self._DB_NAME!r} failed: {tb}')
+                    return
+                # An outdated file would otherwise be migrated if the entry is evicted
+                for key in entries:
+                    self._remove_file(self._get_cache_fn(section, key, dtype))
+                return
+
+        for key, data in entries.items():
+            fn = self._get_cache_fn(section, key, dtype)
+            try:
+                os.makedirs(os.path.dirname(fn), exist_ok=True)
+                self._ydl.write_debug(f'Saving {section}.{key} to cache')
+                write_json_file({'yt-dlp_version': __version__, 'data': data}, fn)
+            except Exception:
+                tb = traceback.format_exc()
+                self._ydl.report_warning(f'Writing cache to {fn!r} failed: {tb}')
 
     def _validate(self, data, min_ver):
         version = traverse_obj(data, 'yt-dlp_version')
@@ -53,18 +145,24 @@ def _validate(self, data, min_ver):
             return data['data']
         self._ydl.write_debug(f'Discarding old cache from version {version} (needs {min_ver})')
 
-    def load(self, section, key, dtype='json', default=None, *, min_ver=None):
-        assert dtype in ('json',)
-
-        if not self.enabled:
-            return default
+    @staticmethod
+    def _remove_file(fn):
+        with contextlib.suppress(OSError):
+            os.remove(fn)
+            # Remove the section directory once it has been migrated entirely
+            os.rmdir(os.path.dirname(fn))
 
+    def _load_file(self, section, key, dtype):
+        """Return the contents of the cache file for the key, or None"""
         cache_fn = self._get_cache_fn(section, key, dtype)
         with contextlib.suppress(OSError):
             try:
                 with open(cache_fn, encoding='utf-8') as cachef:
                     self._ydl.write_debug(f'Loading {section}.{key} from cache')
-                    return self._validate(json.load(cachef), min_ver)
+                    data = json.load(cachef)
+                if not traverse_obj(data, 'yt-dlp_version'):  # Backward compatibility
+                    return {'yt-dlp_version': '2022.08.19', 'data': data}
+                return {'yt-dlp_version': data['yt-dlp_version'], 'data': data['data']}
             except (ValueError, KeyError):
                 try:
                     file_size = os.path.getsize(cache_fn)
@@ -72,7 +170,56 @@ def load(self, section, key, dtype='json', default=None, *, min_ver=None):
                     file_size = str(oe)
                 self._ydl.report_warning(f'Cache retrieval from {cache_fn} failed ({file_size})')
 
-        return default
+    def load(self, section, key, dtype='json', default=None, *, min_ver=None):
+        return self.load_many(section, [key], dtype, default, min_ver=min_ver)[key]
+
+    def load_many(self, section, keys, dtype='json', default=None, *, min_ver=None):
+        """Return a dictionary of the entries of the section for the keys, with default for the missing ones"""
+        assert dtype in ('json',)
+
+        keys = list(keys)
+        if not self.enabled:
+            return dict.fromkeys(keys, default)
+
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            if conn:
+                try:
+                    for i in range(0, len(keys), 500):  # Stay below SQLITE_MAX_VARIABLE_NUMBER
+                        batch = keys[i:i + 500]
+                        placeholders = ', '.join('?' * len(batch))
+                        for key, version, data in conn.execute(
+                                f'SELECT key, version, data FROM cache WHERE section = ? AND key IN ({placeholders})',
+                                (section, *batch)):
+                            found[key] = {'yt-dlp_version': version, 'data': json.loads(data)}
+                    if found:
+                        self._ydl.write_debug(f'Loading {section}.{", ".join(found)} from cache')
+                        conn.executemany(
+                            'UPDATE cache SET used = ? WHERE section = ? AND key = ?',
+                            ((time.time(), section, key) for key in found))
+                except Exception as e:
+                    self._ydl.report_warning(f'Cache retrieval from {self._DB_NAME!r} failed: {e}')
+
+            migrated = {}
+            for key in keys:
+                if key in found:
+                    continue
+                data = self._load_file(section, key, dtype)
+                if data is None:
+                    continue
+                found[key] = migrated[key] = data
+            if conn and migrated:
+                try:
+                    self._write(section, [
+                        (key, data['yt-dlp_version'], json.dumps(data['data'])) for key, data in migrated.items()])
+                except Exception as e:
+                    self._ydl.report_warning(f'Unable to move cache files into {self._DB_NAME!r}: {e}')
+                else:
+                    for key in migrated:
+                        self._remove_file(self._get_cache_fn(section, key, dtype))
+
+        return {key: self._validate(found[key], min_ver) if key in found else default for key in keys}
 
     def remove(self):
         if not self.enabled:
@@ -85,6 +232,7 @@ def remove(self):
 
         self._ydl.to_screen(
             f'Removing cache dir {cachedir} .', skip_eol=True)
+        self.close()
         if os.path.exists(cachedir):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
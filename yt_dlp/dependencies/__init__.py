@@ -79,6 +79,11 @@
 except ImportError:
     curl_cffi = None
 
+try:
+    import h2
+except ImportError:
+    h2 = None
+
 from . import Cryptodome
 
 try:
@@ -17,6 +17,8 @@ def get_suitable_downloader(info_dict, params={}, default=NO_DEFAULT, protocol=N
         return DashSegmentsFD
     elif len(downloaders) == 1:
         return downloaders[0]
+    elif MergeFD.can_merge_formats(info_copy, params):
+        return MergeFD
     return None
 
 
@@ -29,6 +31,7 @@ def get_suitable_downloader(info_dict, params={}, default=NO_DEFAULT, protocol=N
 from .hls import HlsFD
 from .http import HttpFD
 from .ism import IsmFD
+from .merge import MergeFD
 from .mhtml import MhtmlFD
 from .niconico import NiconicoLiveFD
 from .rtmp import RtmpFD
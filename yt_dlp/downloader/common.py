@@ -72,6 +72,8 @@ class FileDownloader:
     http_chunk_size:    Size of a chunk for chunk-based HTTP downloading. May be
                         useful for bypassing bandwidth throttling imposed by
                         a webserver (experimental)
+    http_connections:   Number of connections to download a file over HTTP with.
+                        Each connection fetches a different range of the file
     progress_template:  See YoutubeDL.py
     retry_sleep_functions: See YoutubeDL.py
 
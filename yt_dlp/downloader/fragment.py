@@ -1,21 +1,55 @@
+import collections
 import concurrent.futures
 import contextlib
+import io
+import itertools
 import json
 import math
+import multiprocessing
 import os
+import shutil
 import struct
+import sys
+import threading
 import time
 
 from .common import FileDownloader
 from .http import HttpFD
 from ..aes import aes_cbc_decrypt_bytes, unpad_pkcs7
+from ..dependencies import Cryptodome
+from ..globals import IN_CLI
 from ..networking import Request
 from ..networking.exceptions import HTTPError, IncompleteRead
-from ..utils import DownloadError, RetryManager, traverse_obj
+from ..utils import DownloadError, RetryManager, timeconvert, traverse_obj
 from ..utils.networking import HTTPHeaderDict
 from ..utils.progress import ProgressCalculator
 
 
+def _decrypt_aes128(frag_content, key, iv):
+    return unpad_pkcs7(aes_cbc_decrypt_bytes(frag_content, key, iv))
+
+
+def _copy_file(src, dst):
+    """Copy the rest of the file src to dst, in the kernel where possible"""
+    dst.flush()
+    offset = src.tell()
+    try:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        size = os.fstat(src_fd).st_size
+        while offset < size:
+            if hasattr(os, 'copy_file_range'):
+                copied = os.copy_file_range(src_fd, dst_fd, size - offset, offset)
+            else:
+                copied = os.sendfile(dst_fd, src_fd, offset, size - offset)
+            if not copied:
+                break
+            offset += copied
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        # e.g. copying across file systems, or to a pipe or socket
+        src.seek(offset)
+        shutil.copyfileobj(src, dst)
+
+
 class HttpQuietDownloader(HttpFD):
     def to_screen(self, *args, **kargs):
         pass
@@ -23,6 +57,32 @@ def to_screen(self, *args, **kargs):
     to_console_title = to_screen
 
 
+class _FragmentBuffer(io.BytesIO):
+    def close(self):
+        # HttpFD closes the stream when done; the content is taken afterwards
+        pass
+
+
+class HttpMemoryDownloader(HttpQuietDownloader):
+    """Downloads fragments into memory instead of into files"""
+
+    def __init__(self, ydl, params):
+        super().__init__(ydl, {**params, 'continuedl': False, 'overwrites': True, 'nopart': True})
+        self._buffers = {}
+
+    def sanitize_open(self, filename, open_mode):
+        self._buffers[filename] = stream = _FragmentBuffer()
+        return stream, filename
+
+    def try_utime(self, filename, last_modified_hdr):
+        # There is no file to update; the time is applied to the final file instead
+        return (last_modified_hdr and timeconvert(last_modified_hdr)) or None
+
+    def pop_content(self, filename):
+        stream = self._buffers.pop(filename, None)
+        return stream and stream.getvalue()
+
+
 class FragmentFD(FileDownloader):
     """
     A base file downloader class for fragmented media (e.g. f4m/m3u8 manifests).
@@ -121,16 +181,23 @@ def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_dat
             frag_resume_len = self.filesize_or_none(self.temp_name(fragment_filename))
         fragment_info_dict['frag_resume_len'] = ctx['frag_resume_len'] = frag_resume_len
 
+        ctx.pop('fragment_content', None)
         success, _ = ctx['dl'].download(fragment_filename, fragment_info_dict)
+        in_memory = isinstance(ctx['dl'], HttpMemoryDownloader)
+        frag_content = ctx['dl'].pop_content(fragment_filename) if in_memory else None
         if not success:
             return False
+        if in_memory:
+            ctx['fragment_content'] = frag_content
         if fragment_info_dict.get('filetime'):
             ctx['fragment_filetime'] = fragment_info_dict.get('filetime')
         ctx['fragment_filename_sanitized'] = fragment_filename
         return True
 
     def _read_fragment(self, ctx):
-        if not ctx.get('fragment_filename_sanitized'):
+        if 'fragment_content' in ctx:
+            return ctx.pop('fragment_content')
+        elif not ctx.get('fragment_filename_sanitized'):
             return None
         try:
             down, frag_sanitized = self.sanitize_open(ctx['fragment_filename_sanitized'], 'rb')
@@ -143,9 +210,28 @@ def _read_fragment(self, ctx):
         down.close()
         return frag_content
 
+    def _append_fragment_file(self, ctx):
+        """Append the fragment file as it is, without reading it into memory. Returns False if it is missing or empty"""
+        try:
+            down, frag_sanitized = self.sanitize_open(ctx['fragment_filename_sanitized'], 'rb')
+        except FileNotFoundError:
+            return False
+        ctx['fragment_filename_sanitized'] = frag_sanitized
+        if not os.fstat(down.fileno()).st_size:
+            down.close()
+            return False
+        self._append_fragment(ctx, down)
+        return True
+
     def _append_fragment(self, ctx, frag_content):
         try:
-            ctx['dest_stream'].write(frag_content)
+            if hasattr(frag_content, 'read'):
+                try:
+                    _copy_file(frag_content, ctx['dest_stream'])
+                finally:
+                    frag_content.close()
+            else:
+                ctx['dest_stream'].write(frag_content)
             ctx['dest_stream'].flush()
         finally:
             if self.__do_ytdl_file(ctx):
@@ -164,10 +250,13 @@ def _prepare_frag_download(self, ctx):
             total_frags_str = 'unknown (live)'
         self.to_screen(f'[{self.FD_NAME}] Total fragments: {total_frags_str}')
         self.report_destination(ctx['filename'])
-        dl = HttpQuietDownloader(self.ydl, {
+        # Fragments only need to be written to disk if they are kept
+        downloader = HttpQuietDownloader if self.params.get('keep_fragments') else HttpMemoryDownloader
+        dl = downloader(self.ydl, {
             **self.params,
             'noprogress': True,
             'test': False,
+            'http_connections': 1,
             'sleep_interval': 0,
             'max_sleep_interval': 0,
             'sleep_interval_subtitles': 0,
@@ -338,13 +427,20 @@ def _prepare_external_frag_download(self, ctx):
             'fragment_index': 0,
         })
 
-    def decrypter(self, info_dict):
-        _key_cache = {}
+    def decrypter(self, info_dict, executor=None):
+        """
+        Return a function that decrypts the content of a fragment
+
+        If an executor is given, the function submits the decryption to it
+        and returns a future of the content instead
+        """
+        _key_cache, _key_lock = {}, threading.Lock()
 
         def _get_key(url):
-            if url not in _key_cache:
-                _key_cache[url] = self.ydl.urlopen(self._prepare_url(info_dict, url)).read()
-            return _key_cache[url]
+            with _key_lock:
+                if url not in _key_cache:
+                    _key_cache[url] = self.ydl.urlopen(self._prepare_url(info_dict, url)).read()
+                return _key_cache[url]
 
         def decrypt_fragment(fragment, frag_content):
             if frag_content is None:
@@ -360,9 +456,41 @@ def decrypt_fragment(fragment, frag_content):
             # not what it decrypts to.
             if self.params.get('test', False):
                 return frag_content
-            return unpad_pkcs7(aes_cbc_decrypt_bytes(frag_content, decrypt_info['KEY'], iv))
+            if executor:
+                return executor.submit(_decrypt_aes128, frag_content, decrypt_info['KEY'], iv)
+            return _decrypt_aes128(frag_content, decrypt_info['KEY'], iv)
+
+        if not executor:
+            return decrypt_fragment
+
+        def submit_fragment(fragment, frag_content):
+            result = decrypt_fragment(fragment, frag_content)
+            if isinstance(result, concurrent.futures.Future):
+                return result
+            future = concurrent.futures.Future()
+            future.set_result(result)
+            return future
+
+        return submit_fragment
 
-        return decrypt_fragment
+    def _decryption_pool(self, max_workers):
+        """
+        Return a process pool for decrypting fragments, or None if they should be decrypted in the appending thread
+
+        The native AES implementation holds the GIL, so it would otherwise serialize the concurrent downloads
+        """
+        # The spawned processes import __main__, which only the CLI is known to guard.
+        # Frozen executables include pycryptodomex, and would need multiprocessing.freeze_support
+        if (Cryptodome.AES or max_workers <= 1 or self.params.get('test')
+                or not IN_CLI.value or getattr(sys, 'frozen', False)):
+            return None
+        try:
+            # The pool starts its processes from the download threads, which forking is not safe with
+            return concurrent.futures.ProcessPoolExecutor(
+                min(max_workers, os.cpu_count() or 1), mp_context=multiprocessing.get_context('spawn'))
+        except (ImportError, NotImplementedError, OSError) as err:
+            self.write_debug(f'Unable to start processes for decryption: {err}')
+            return None
 
     def download_and_append_fragments_multiple(self, *args, **kwargs):
         """
@@ -430,7 +558,7 @@ def interrupt_trigger_iter(fg):
 
     def download_and_append_fragments(
             self, ctx, fragments, info_dict, *, is_fatal=(lambda idx: False),
-            pack_func=(lambda content, idx: content), finish_func=None,
+            pack_func=None, finish_func=None,
             tpe=None, interrupt_trigger=(True, )):
 
         if not self.params.get('skip_unavailable_fragments', True):
@@ -469,9 +597,16 @@ def error_callback(err, count, retries):
                     if fatal:
                         raise
 
+        def copy_fragment(fragment, ctx):
+            # Fragments that are kept on disk and need no processing are appended without being read
+            if (pack_func or 'fragment_content' in ctx or not ctx.get('fragment_filename_sanitized')
+                    or traverse_obj(fragment, ('decrypt_info', 'METHOD')) == 'AES-128'):
+                return False
+            return self._append_fragment_file(ctx)
+
         def append_fragment(frag_content, frag_index, ctx):
             if frag_content:
-                self._append_fragment(ctx, pack_func(frag_content, frag_index))
+                self._append_fragment(ctx, pack_func(frag_content, frag_index) if pack_func else frag_content)
             elif not is_fatal(frag_index - 1):
                 self.report_skip_fragment(frag_index, 'fragment not found')
             else:
@@ -485,19 +620,72 @@ def append_fragment(frag_content, frag_index, ctx):
         max_workers = math.ceil(
             self.params.get('concurrent_fragment_downloads', 1) / ctx.get('max_progress', 1))
         if max_workers > 1:
+            # (pool, submit_fragment), once a fragment has to be decrypted
+            decryption, decryption_lock = None, threading.Lock()
+
+            def get_submit_fragment():
+                nonlocal decryption
+                with decryption_lock:
+                    if decryption is None:
+                        decryption_pool = self._decryption_pool(max_workers)
+                        decryption = decryption_pool, decryption_pool and self.decrypter(info_dict, decryption_pool)
+                    return decryption[1]
+
+            def stop_decryption_pool(err):
+                nonlocal decryption
+                with decryption_lock:
+                    if decryption and decryption[0]:
+                        self.write_debug(f'Decrypting fragments in this process since the decryption processes failed: {err}')
+                        decryption[0].shutdown(wait=False, cancel_futures=True)
+                    decryption = None, None
+
             def _download_fragment(fragment):
                 ctx_copy = ctx.copy()
                 download_fragment(fragment, ctx_copy)
-                return fragment, fragment['frag_index'], ctx_copy.get('fragment_filename_sanitized')
+                submit_fragment = (traverse_obj(fragment, ('decrypt_info', 'METHOD')) == 'AES-128'
+                                   and get_submit_fragment())
+                if not submit_fragment:
+                    return ctx_copy.get('fragment_filename_sanitized'), ctx_copy.get('fragment_content'), None
+                # Hand the content over to the decryption processes, so that this thread can fetch the next fragment.
+                # The content is kept to decrypt it here if they fail
+                frag_content = self._read_fragment(ctx_copy)
+                try:
+                    decrypted = submit_fragment(fragment, frag_content)
+                except (concurrent.futures.BrokenExecutor, OSError, RuntimeError) as err:
+                    stop_decryption_pool(err)
+                    decrypted = None
+                return ctx_copy.get('fragment_filename_sanitized'), frag_content, decrypted
 
+            fragments, pending = iter(fragments), collections.deque()
             with tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
                 try:
-                    for fragment, frag_index, frag_filename in pool.map(_download_fragment, fragments):
+                    while True:
+                        # Keep every worker busy while waiting for the oldest fragment. Fragments that
+                        # finish early are held until they can be appended, at most 2 * max_workers of them
+                        for fragment in itertools.islice(fragments, 2 * max_workers - len(pending)):
+                            pending.append((fragment, pool.submit(_download_fragment, fragment)))
+                        if not pending:
+                            break
+                        fragment, job = pending.popleft()
+                        frag_filename, frag_content, decrypted = job.result()
+                        frag_index = fragment['frag_index']
                         ctx.update({
                             'fragment_filename_sanitized': frag_filename,
                             'fragment_index': frag_index,
                         })
-                        if not append_fragment(decrypt_fragment(fragment, self._read_fragment(ctx)), frag_index, ctx):
+                        if decrypted:
+                            try:
+                                frag_content = decrypted.result()
+                            except concurrent.futures.BrokenExecutor as err:
+                                stop_decryption_pool(err)
+                                frag_content = decrypt_fragment(fragment, frag_content)
+                        elif frag_content is None and copy_fragment(fragment, ctx):
+                            continue
+                        else:
+                            if frag_content is not None:
+                                ctx['fragment_content'] = frag_content
+                            frag_content = decrypt_fragment(fragment, self._read_fragment(ctx))
+                        if not append_fragment(frag_content, frag_index, ctx):
                             return False
                 except KeyboardInterrupt:
                     self._finish_multiline_status()
@@ -505,13 +693,18 @@ def _download_fragment(fragment):
                         'Interrupted by user. Waiting for all threads to shutdown...', is_error=False, tb=False)
                     pool.shutdown(wait=False)
                     raise
+                finally:
+                    for _, job in pending:
+                        job.cancel()
+                    if decryption and decryption[0]:
+                        decryption[0].shutdown(wait=False, cancel_futures=True)
         else:
             for fragment in fragments:
                 if not interrupt_trigger[0]:
                     break
                 try:
                     download_fragment(fragment, ctx)
-                    result = append_fragment(
+                    result = copy_fragment(fragment, ctx) or append_fragment(
                         decrypt_fragment(fragment, self._read_fragment(ctx)), fragment['frag_index'], ctx)
                 except KeyboardInterrupt:
                     if info_dict.get('is_live'):
@@ -1,5 +1,8 @@
+import concurrent.futures
+import json
 import os
 import random
+import threading
 import time
 
 from .common import FileDownloader
@@ -56,10 +59,24 @@ class DownloadContext(dict):
         # parse given Range
         req_start, req_end, _ = parse_http_range(headers.get('Range'))
 
+        connections = self.params.get('http_connections') or 1
+        if (connections > 1 and not is_test and ctx.tmpfilename != '-' and req_start is None
+                and self.params.get('min_filesize') is None and self.params.get('max_filesize') is None):
+            result = self._download_segmented(
+                filename, info_dict, Request(url, request_data, headers, extensions=request_extensions),
+                connections, chunk_size)
+            if result is not None:
+                return result
+
         if self.params.get('continuedl', True):
             # Establish possible resume length
             if os.path.isfile(ctx.tmpfilename):
                 ctx.resume_len = os.path.getsize(ctx.tmpfilename)
+            # A file left by a segmented download has holes; it can not be resumed sequentially
+            if ctx.resume_len and self._read_segment_state(filename) is not None:
+                self.report_unable_to_resume()
+                ctx.resume_len = 0
+                self.try_remove(self.ytdl_filename(filename))
 
         ctx.is_resume = ctx.resume_len > 0
 
@@ -228,6 +245,8 @@ def download():
 
             byte_counter = 0 + ctx.resume_len
             block_size = ctx.block_size
+            # The blocks are read into the same buffer, which is only replaced when the block size outgrows it
+            buffer = bytearray(block_size)
             start = time.time()
 
             # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
@@ -246,9 +265,12 @@ def retry(e):
                 raise RetryDownload(e)
 
             while True:
+                if block_size > len(buffer):
+                    buffer = bytearray(block_size)
+                view = memoryview(buffer)[:block_size if not is_test else min(block_size, data_len - byte_counter)]
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if not is_test else min(block_size, data_len - byte_counter))
+                    data_block = view[:ctx.data.readinto(view)]
                 except TransportError as err:
                     retry(err)
 
@@ -374,3 +396,216 @@ def retry(e):
                 close_stream()
                 raise
         return False
+
+    _MIN_SEGMENT_SIZE = 1024 * 1024
+
+    def _read_segment_state(self, filename):
+        """Return the (size, missing ranges) of an interrupted segmented download, if any"""
+        try:
+            with open(self.ytdl_filename(filename), encoding='utf-8') as f:
+                state = json.load(f)['downloader']['http_segments']
+            size, missing = int(state['size']), [(int(start), int(end)) for start, end in state['missing']]
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        if self.filesize_or_none(self.temp_name(filename)) != size:
+            return None
+        return size, missing
+
+    def _write_segment_state(self, filename, size, missing):
+        if self.params.get('_no_ytdl_file'):
+            return
+        stream, _ = self.sanitize_open(self.ytdl_filename(filename), 'w')
+        with stream:
+            json.dump({'downloader': {'http_segments': {'size': size, 'missing': missing}}}, stream)
+
+    def _download_segmented(self, filename, info_dict, request, connections, chunk_size):
+        """
+        Download the file over several connections, each fetching a range of it
+
+        @returns    None if the server does not support range requests or the file is
+                    too small to split; otherwise whether the download succeeded
+        """
+        probe = request.copy()
+        probe.headers['Range'] = 'bytes=0-0'
+        try:
+            with self.ydl.urlopen(probe) as response:
+                content_start, _, size = parse_http_range(response.headers.get('Content-Range'))
+                last_modified = response.headers.get('last-modified')
+        except (HTTPError, TransportError):
+            return None
+        if response.status != 206 or content_start != 0 or not size:
+            return None
+        connections = min(connections, size // self._MIN_SEGMENT_SIZE)
+        if connections < 2:
+            return None
+
+        tmpfilename = self.temp_name(filename)
+        state = self.params.get('continuedl', True) and self._read_segment_state(filename)
+        if state and state[0] == size:
+            missing = state[1]
+            self.report_resuming_byte(size - sum(end - start for start, end in missing))
+        else:
+            missing = [(0, size)]
+            with open(tmpfilename, 'wb') as f:
+                f.truncate(size)
+            self._write_segment_state(filename, size, missing)
+        self.report_destination(filename)
+        self.to_screen(f'[download] Downloading with {connections} connections')
+
+        scheduler = _SegmentScheduler(missing, self._MIN_SEGMENT_SIZE)
+        resume_len = scheduler.downloaded = size - scheduler.remaining()
+        start = time.time()
+        stop = threading.Event()
+
+        def fetch(segment, stream):
+            block_size = self.params.get('buffersize', 1024)
+            buffer = bytearray(block_size)
+            while not stop.is_set() and segment.remaining():
+                segment_request = request.copy()
+                position, end = segment.start, segment.end
+                if chunk_size:
+                    end = min(end, position + random.randint(int(chunk_size * 0.95), chunk_size))
+                segment_request.headers['Range'] = f'bytes={position}-{end - 1}'
+                with self.ydl.urlopen(segment_request) as response:
+                    if parse_http_range(response.headers.get('Content-Range'))[0] != position:
+                        raise ContentTooShortError(position, end)
+                    while not stop.is_set() and position < min(end, segment.end):
+                        before = time.time()
+                        if block_size > len(buffer):
+                            buffer = bytearray(block_size)
+                        view = memoryview(buffer)[:min(block_size, end - position)]
+                        data = view[:response.readinto(view)]
+                        if not data:
+                            raise ContentTooShortError(position, end)
+                        position = scheduler.write(segment, stream, data)
+                        self.slow_down(start, None, scheduler.downloaded - resume_len)
+                        if not self.params.get('noresizebuffer', False):
+                            block_size = self.best_block_size(time.time() - before, len(data))
+
+        def worker():
+            # Unbuffered, so that the data is in the file once the scheduler counts it
+            with open(tmpfilename, 'r+b', buffering=0) as stream:
+                while not stop.is_set() and (segment := scheduler.next_segment()):
+                    for retry in RetryManager(self.params.get('retries'), self.report_retry):
+                        try:
+                            fetch(segment, stream)
+                        except HTTPError as err:
+                            if err.status < 500 or err.status >= 600:
+                                raise
+                            retry.error = err
+                        except (TransportError, ContentTooShortError) as err:
+                            retry.error = err
+                    if segment.remaining():
+                        return False
+                    scheduler.finish(segment)
+            return True
+
+        def report_progress(status='downloading'):
+            now = time.time()
+            downloaded = scheduler.downloaded
+            self._hook_progress({
+                'status': status,
+                'downloaded_bytes': downloaded,
+                'total_bytes': size,
+                'tmpfilename': tmpfilename,
+                'filename': filename,
+                'eta': self.calc_eta(start, now, size - resume_len, downloaded - resume_len),
+                'speed': self.calc_speed(start, now, downloaded - resume_len),
+                'elapsed': now - start,
+                'ctx_id': info_dict.get('ctx_id'),
+            }, info_dict)
+
+        def write_state(stream):
+            missing = scheduler.missing()
+            # The data must be on disk before the state marks it as downloaded
+            os.fsync(stream.fileno())
+            self._write_segment_state(filename, size, missing)
+
+        with (open(tmpfilename, 'r+b') as stream,
+              concurrent.futures.ThreadPoolExecutor(connections, thread_name_prefix='yt-dlp-http') as pool):
+            jobs = [pool.submit(worker) for _ in range(connections)]
+            try:
+                while True:
+                    done, pending = concurrent.futures.wait(
+                        jobs, timeout=0.5, return_when=concurrent.futures.FIRST_EXCEPTION)
+                    write_state(stream)
+                    if not pending or any(job.exception() for job in done):
+                        break
+                    report_progress()
+            finally:
+                stop.set()
+            write_state(stream)
+            success = all(job.result() for job in jobs)
+
+        if not success or scheduler.remaining():
+            return False
+        self.try_remove(self.ytdl_filename(filename))
+        self.try_rename(tmpfilename, filename)
+        if self.params.get('updatetime'):
+            info_dict['filetime'] = self.try_utime(filename, last_modified)
+        report_progress('finished')
+        return True
+
+
+class _Segment:
+    def __init__(self, start, end):
+        self.start, self.end = start, end
+
+    def remaining(self):
+        return self.end - self.start
+
+
+class _SegmentScheduler:
+    """
+    Hands out the ranges of a segmented download to the connections
+
+    When there is nothing left to hand out, the range with the most remaining bytes is
+    split, and its second half is given to the idle connection. Data is written under
+    a lock so that the missing ranges are always consistent with the file
+    """
+
+    def __init__(self, ranges, min_size):
+        self._lock = threading.Lock()
+        self._queue = [_Segment(start, end) for start, end in ranges]
+        self._active = []
+        self._min_size = min_size
+        self.downloaded = 0
+
+    def next_segment(self):
+        with self._lock:
+            if self._queue:
+                segment = self._queue.pop(0)
+            else:
+                largest = max(self._active, key=_Segment.remaining, default=None)
+                if not largest or largest.remaining() < 2 * self._min_size:
+                    return None
+                segment = _Segment((largest.start + largest.end) // 2, largest.end)
+                largest.end = segment.start
+            self._active.append(segment)
+            return segment
+
+    def finish(self, segment):
+        with self._lock:
+            self._active.remove(segment)
+
+    def write(self, segment, stream, data):
+        """Write the data at the start of the segment and return the new start"""
+        with self._lock:
+            data = data[:segment.remaining()]
+            stream.seek(segment.start)
+            written = 0
+            # An unbuffered stream may write only part of the data
+            while written < len(data):
+                written += stream.write(data[written:])
+            segment.start += len(data)
+            self.downloaded += len(data)
+            return segment.start
+
+    def missing(self):
+        with self._lock:
+            return sorted([segment.start, segment.end] for segment in (*self._queue, *self._active)
+                          if segment.remaining())
+
+    def remaining(self):
+        with self._lock:
+            return sum(segment.remaining() for segment in (*self._queue, *self._active))
@@ -0,0 +1,173 @@
+import concurrent.futures
+import contextlib
+import io
+import os
+import threading
+import time
+
+from . import get_suitable_downloader
+from .common import FileDownloader
+from .dash import DashSegmentsFD
+from .external import FFmpegFD
+from .http import HttpFD
+from ..postprocessor.ffmpeg import EXT_TO_OUT_FORMATS, FFmpegMergerPP, FFmpegPostProcessorError
+
+
+class _MergeAborted(Exception):
+    pass
+
+
+class _MergeInput(io.BufferedWriter):
+    """The write end of the pipe that ffmpeg reads a format from"""
+
+    def __init__(self, fd, aborted):
+        super().__init__(io.FileIO(fd, 'wb'))
+        self._aborted = aborted
+
+    def write(self, data):
+        if self._aborted.is_set():
+            raise _MergeAborted
+        try:
+            return super().write(data)
+        except BrokenPipeError:
+            # ffmpeg has exited; its error is reported instead
+            raise _MergeAborted from None
+
+
+class MergeFD(FileDownloader):
+    """
+    Download the formats to be merged at the same time, muxing them with ffmpeg as they arrive
+
+    Each format is downloaded by its native downloader into a pipe that ffmpeg reads from,
+    so only formats that can be demuxed without seeking are downloaded this way
+    """
+
+    # These can be read from start to end; e.g. a regular mp4 may have its index at the end
+    _STREAMABLE_CONTAINERS = ('mp4_dash', 'm4a_dash', 'webm_dash')
+
+    @classmethod
+    def can_merge_formats(cls, info_dict, params):
+        return (
+            params.get('merge_while_downloading')
+            # The pipes are passed to ffmpeg as /dev/fd/N
+            and os.name != 'nt' and os.path.isdir('/dev/fd')
+            and not info_dict.get('to_stdout')
+            and len(info_dict.get('requested_formats') or []) > 1
+            and not params.get('allow_unplayable_formats')
+            and not (info_dict.get('section_start') or info_dict.get('section_end'))
+            # The kept fragments would be named after the filename "-" of every format
+            and not params.get('keep_fragments')
+            and all(cls._can_stream(fmt, params) for fmt in cls._format_infos(info_dict))
+            and FFmpegFD.available())
+
+    @classmethod
+    def _can_stream(cls, fmt, params):
+        protocol = fmt.get('protocol')
+        if fmt.get('is_live') or protocol not in ('http', 'https', 'http_dash_segments'):
+            return False
+        elif protocol != 'http_dash_segments' and fmt.get('container') not in cls._STREAMABLE_CONTAINERS:
+            return False
+        fd = get_suitable_downloader(fmt, params, to_stdout=True)
+        if fd is DashSegmentsFD:
+            return not get_suitable_downloader(fmt, params, None, protocol='dash_frag_urls', to_stdout=True)
+        return fd is HttpFD
+
+    @staticmethod
+    def _format_infos(info_dict):
+        for fmt in info_dict['requested_formats']:
+            fmt_info = {**info_dict, **fmt}
+            fmt_info.pop('requested_formats')
+            yield fmt_info
+
+    def _format_downloader(self, fmt, stream, progress_idx):
+        fd = get_suitable_downloader(fmt, self.params, to_stdout=True)(self.ydl, {
+            **self.params,
+            'noprogress': True,
+            'sleep_interval': 0,
+            'max_sleep_interval': 0,
+        })
+        # What would be written to stdout goes into the pipe instead
+        open_file = fd.sanitize_open
+        fd.sanitize_open = lambda filename, open_mode: (
+            (stream, filename) if filename == '-' else open_file(filename, open_mode))
+        fd.report_destination = lambda filename: None
+
+        def progress_hook(status):
+            status['progress_idx'] = progress_idx
+            self._hook_progress(status, status['info_dict'])
+
+        fd._progress_hooks = [progress_hook]
+        return fd
+
+    def real_download(self, filename, info_dict):
+        formats = list(self._format_infos(info_dict))
+        tmpfilename = self.temp_name(filename)
+        ext = info_dict['ext']
+        started = time.time()
+
+        self.report_destination(filename)
+        self.to_screen(f'[{self.FD_NAME}] Merging {len(formats)} formats while downloading them')
+        self._prepare_multiline_status(len(formats))
+
+        # Set when a download fails, and after ffmpeg exits
+        aborted = threading.Event()
+        pipes = [os.pipe() for _ in formats]
+        output = self.ydl._thread_state.output
+
+        def download(idx, fmt, write_fd):
+            self.ydl._thread_state.output = output
+            stream = _MergeInput(write_fd, aborted)
+            try:
+                success, _ = self._format_downloader(fmt, stream, idx).download('-', fmt)
+            except _MergeAborted:
+                return False
+            except BaseException:
+                aborted.set()
+                raise
+            finally:
+                self.ydl._thread_state.output = None
+                # ffmpeg reads the end of the format when the pipe is closed
+                with contextlib.suppress(OSError):
+                    stream.close()
+            if not success:
+                aborted.set()
+            return success
+
+        with concurrent.futures.ThreadPoolExecutor(len(formats), thread_name_prefix='yt-dlp-merge') as pool:
+            futures = [pool.submit(download, idx, fmt, write_fd) for idx, (fmt, (_, write_fd)) in enumerate(
+                zip(formats, pipes, strict=True))]
+            merge_error = None
+            try:
+                FFmpegMergerPP(self.ydl).merge(
+                    formats, [f'/dev/fd/{read_fd}' for read_fd, _ in pipes], tmpfilename,
+                    ['-f', EXT_TO_OUT_FORMATS.get(ext, ext)], pass_fds=[read_fd for read_fd, _ in pipes])
+            except FFmpegPostProcessorError as err:
+                # If a download has failed, that error has been reported instead
+                if not aborted.is_set():
+                    merge_error = err
+            finally:
+                aborted.set()
+                for read_fd, _ in pipes:
+                    os.close(read_fd)
+            if merge_error:
+                self.try_remove(tmpfilename)
+                self.report_error(f'Unable to merge the formats while downloading: {merge_error}')
+                return False
+        # Raise the first error of a download, if any
+        results = [future.result() for future in futures]
+        if not all(results):
+            self.try_remove(tmpfilename)
+            return False
+
+        self._finish_multiline_status()
+        self._prepare_multiline_status()
+        self.try_rename(tmpfilename, filename)
+        fsize = os.path.getsize(filename)
+        self._hook_progress({
+            'downloaded_bytes': fsize,
+            'total_bytes': fsize,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - started,
+        }, info_dict)
+        return True
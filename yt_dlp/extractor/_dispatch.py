@@ -0,0 +1,298 @@
+"""Host-based prefilter for matching URLs against extractor `_VALID_URL`s
+
+Each `_VALID_URL` is analysed once to find the host suffixes that any URL it
+matches must have (see `valid_url_hosts`). `ExtractorIndex` then narrows a URL
+down to the extractors registered for its host, plus the ones whose patterns
+could not be analysed, while keeping the original priority order.
+"""
+
+import ast
+import inspect
+import itertools
+import re
+import textwrap
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+_MAX_ALTERNATIVES = 256
+_MAX_CACHED_HOSTS = 1024
+_SCHEME_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789+.-')
+_URL_HOST_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*://([^/]*)')
+
+# Tokens of an expanded pattern are either single (casefolded) literal characters,
+# or one of the markers below
+_WILD = 'wild'  # Any run of characters other than '/'
+_WILD_SLASH = 'wild/'  # Any run of characters, possibly including '/'
+_END = 'end'  # End of the URL
+
+_SCHEME, _SLASHES, _HOST, _DONE = 'scheme', 'slashes', 'host', 'done'
+
+_NOOP_OPS = {sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT}
+_REPEAT_OPS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)}
+_END_AT_CODES = {sre_parse.AT_END, sre_parse.AT_END_STRING}
+
+
+class _Unindexable(Exception):
+    pass
+
+
+def _class_matches_slash(items):
+    negate = bool(items) and items[0][0] is sre_parse.NEGATE
+    for op, av in items:
+        if ((op is sre_parse.LITERAL and av == ord('/'))
+                or (op is sre_parse.RANGE and av[0] <= ord('/') <= av[1])
+                or (op is sre_parse.CATEGORY and '_NOT_' in av.name)):
+            return not negate
+    return negate
+
+
+def _matches_slash(items):
+    """Whether the parsed items can match a '/' anywhere"""
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            matches = av == ord('/')
+        elif op is sre_parse.NOT_LITERAL:
+            matches = av != ord('/')
+        elif op is sre_parse.IN:
+            matches = _class_matches_slash(av)
+        elif op is sre_parse.SUBPATTERN:
+            matches = _matches_slash(av[-1])
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            matches = _matches_slash(av)
+        elif op is sre_parse.BRANCH:
+            matches = any(map(_matches_slash, av[1]))
+        elif op is sre_parse.GROUPREF_EXISTS:
+            matches = _matches_slash(av[1]) or _matches_slash(av[2] or [])
+        elif op in _REPEAT_OPS:
+            matches = av[1] != 0 and _matches_slash(av[2])
+        else:
+            matches = op not in _NOOP_OPS
+        if matches:
+            return True
+    return False
+
+
+def _wild_label_key(start, end, suffix):
+    """
+    The key of hosts with a label starting with `start`, or ending with `end`, that is followed
+    by the labels of `suffix`. A wildcard after the start of the label may span several labels
+    """
+    return f'{start}*{end}/{suffix}'
+
+
+def _host_key(tokens):
+    """
+    The key of a host: the labels after the last wildcard, or the whole host if there is none
+
+    If only a single label, i.e. the public suffix, would be left, the literal start or end of
+    the label with the wildcard is included in the key (see `_wild_label_key`)
+    """
+    if _WILD not in tokens:
+        return ''.join(tokens)
+    wild = len(tokens) - 1 - tokens[::-1].index(_WILD)
+    label_end, _, key = ''.join(tokens[wild + 1:]).partition('.')
+    if '.' in key:
+        return key
+    start = wild
+    while start and tokens[start - 1] != '.':
+        start -= 1
+    label_start = ''.join(itertools.takewhile(lambda token: token is not _WILD, tokens[start:wild]))
+    if not label_start and not label_end:
+        raise _Unindexable
+    return _wild_label_key(label_start, '' if label_start else label_end, key)
+
+
+def _advance(state, token):
+    """
+    Advance the state of a partial match by one token
+
+    States are tuples of (phase, value); the scheme is matched first, then the '//' and
+    then the host, after which the state is final and holds the host key. A key of None
+    means that the alternative cannot match any URL with a scheme
+    """
+    phase, value = state
+    if phase is _DONE:
+        return state
+    elif phase is _HOST:
+        if token in ('/', '?', '#', _END):
+            return _DONE, _host_key(value)
+        elif token is _WILD_SLASH:
+            raise _Unindexable
+        return _HOST, (*value, token)
+    elif token is _WILD_SLASH or (token is _WILD and phase is _SCHEME):
+        raise _Unindexable
+    elif phase is _SLASHES:
+        if token != '/':
+            return _DONE, None
+        return (_HOST, ()) if value else (_SLASHES, 1)
+    elif token == ':' and value:
+        return _SLASHES, 0
+    elif token in _SCHEME_CHARS and (value or token.isalpha()):
+        return _SCHEME, value + 1
+    return _DONE, None
+
+
+def _expand(items, alternatives):
+    """Advance each unfinished alternative by the token sequences that can match the parsed items"""
+    for op, av in items:
+        done = [alt for alt in alternatives if alt[0] is _DONE]
+        pending = [alt for alt in alternatives if alt[0] is not _DONE]
+        if not pending:
+            break
+
+        if op is sre_parse.LITERAL:
+            pending = [_advance(alt, chr(av).casefold()) for alt in pending]
+        elif op is sre_parse.NOT_LITERAL:
+            pending = [_advance(alt, _WILD if av == ord('/') else _WILD_SLASH) for alt in pending]
+        elif op is sre_parse.ANY:
+            pending = [_advance(alt, _WILD_SLASH) for alt in pending]
+        elif op is sre_parse.IN:
+            if len(av) <= 4 and all(item_op is sre_parse.LITERAL for item_op, _ in av):
+                pending = [_advance(alt, chr(char).casefold()) for alt in pending for _, char in av]
+            else:
+                token = _WILD_SLASH if _class_matches_slash(av) else _WILD
+                pending = [_advance(alt, token) for alt in pending]
+        elif op is sre_parse.SUBPATTERN:
+            pending = _expand(av[-1], pending)
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            pending = _expand(av, pending)
+        elif op is sre_parse.BRANCH:
+            pending = [alt for branch in av[1] for alt in _expand(branch, pending)]
+        elif op is sre_parse.GROUPREF_EXISTS:
+            pending = [*_expand(av[1], pending), *_expand(av[2] or [], pending)]
+        elif op in _REPEAT_OPS:
+            min_count, max_count, sub = av
+            if max_count == 0:
+                continue
+            if max_count == 1:
+                repeated = _expand(sub, pending)
+            elif _matches_slash(sub):
+                # The first repetition may end the host
+                repeated = [_advance(alt, _WILD_SLASH) for alt in _expand(sub, pending)]
+            else:
+                # The last repetition is kept, so that e.g. (?:\w+\.)+ still ends a label
+                repeated = _expand(sub, [_advance(alt, _WILD) for alt in pending])
+            pending = [*pending, *repeated] if min_count == 0 else repeated
+        elif op is sre_parse.AT and av in _END_AT_CODES:
+            pending = [_advance(alt, _END) for alt in pending]
+        elif op not in _NOOP_OPS:
+            pending = [_advance(alt, _WILD_SLASH) for alt in pending]
+
+        alternatives = list(dict.fromkeys([*done, *pending]))
+        if len(alternatives) > _MAX_ALTERNATIVES:
+            raise _Unindexable
+    return alternatives
+
+
+def valid_url_hosts(patterns):
+    """
+    Find the host suffixes that any URL with a scheme must have to match one of the given regexes
+
+    A URL can only match if one of the suffixes returned is one of its host keys (see `_host_keys`).
+    @returns    A sorted tuple of keys, or None if the patterns are too complex to analyse
+    """
+    hosts = set()
+    for pattern in patterns:
+        try:
+            for phase, key in _expand(sre_parse.parse(pattern), [(_SCHEME, 0)]):
+                if phase is not _DONE:
+                    raise _Unindexable
+                elif key is not None:
+                    hosts.add(key)
+        except (_Unindexable, re.error, RecursionError):
+            return None
+    return tuple(sorted(hosts))
+
+
+def _host_keys(host):
+    """Yield the keys a URL with the given host part (everything up to the first '/') is looked up by"""
+    host = host.casefold()
+    for end in (*(i for i, char in enumerate(host) if char in '?#'), len(host)):
+        labels = host[:end].split('.')
+        for i, label in enumerate(labels):
+            yield '.'.join(labels[i:])
+            rest = '.'.join(labels[i + 1:])
+            yield from (_wild_label_key('', label[j:], rest) for j in range(len(label)))
+            # The wildcard after the start of a label may span several labels
+            for rest in ('.'.join(labels[k:]) for k in range(i + 1, len(labels) + 1)):
+                yield from (_wild_label_key(label[:j], '', rest) for j in range(1, len(label) + 1))
+
+
+def _is_narrowing(node, cls_name, url_name):
+    """Whether the expression is falsy unless the URL matches the `_VALID_URL` of the class"""
+    if isinstance(node, ast.Constant):
+        return not node.value
+    elif isinstance(node, ast.IfExp):
+        return _is_narrowing(node.body, cls_name, url_name) and _is_narrowing(node.orelse, cls_name, url_name)
+    elif isinstance(node, ast.BoolOp):
+        check = any if isinstance(node.op, ast.And) else all
+        return check(_is_narrowing(value, cls_name, url_name) for value in node.values)
+    elif not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+        return False
+    elif len(node.args) != 1 or node.keywords or not isinstance(node.args[0], ast.Name) or node.args[0].id != url_name:
+        return False
+    # super().suitable(url), super(Base, cls).suitable(url) or cls._match_valid_url(url)
+    obj = node.func.value
+    if node.func.attr == 'suitable':
+        return isinstance(obj, ast.Call) and isinstance(obj.func, ast.Name) and obj.func.id == 'super'
+    return node.func.attr == '_match_valid_url' and isinstance(obj, ast.Name) and obj.id == cls_name
+
+
+def suitable_narrows(func):
+    """
+    Whether an override of `suitable` only rejects URLs that the inherited one accepts,
+    e.g. `return False if OtherIE.suitable(url) else super().suitable(url)`
+    """
+    try:
+        func_def = ast.parse(textwrap.dedent(inspect.getsource(func))).body[0]
+    except (OSError, TypeError, SyntaxError):
+        return False
+    if not isinstance(func_def, ast.FunctionDef) or len(func_def.args.args) != 2:
+        return False
+    names = [arg.arg for arg in func_def.args.args]
+    for node in ast.walk(func_def):
+        if isinstance(node, ast.Name) and node.id in names and not isinstance(node.ctx, ast.Load):
+            return False
+        elif isinstance(node, ast.Return) and node.value and not _is_narrowing(node.value, *names):
+            return False
+    return True
+
+
+class ExtractorIndex:
+    """
+    An index of extractors by the hosts their URLs can have
+
+    @param ies  An ordered mapping of ie_key to extractor; the order is the matching priority
+    """
+
+    def __init__(self, ies):
+        self._keys = tuple(ies)
+        self._by_host, unindexed = {}, set()
+        for position, ie in enumerate(ies.values()):
+            hosts = ie._VALID_URL_HOSTS
+            if hosts is None:
+                unindexed.add(position)
+            for host in hosts or ():
+                self._by_host.setdefault(host, set()).add(position)
+        self._unindexed = frozenset(unindexed)
+        self._cache = {}
+
+    def _candidates(self, host):
+        if host not in self._cache:
+            if len(self._cache) >= _MAX_CACHED_HOSTS:
+                self._cache.clear()
+            positions = set(self._unindexed)
+            for key in _host_keys(host):
+                positions.update(self._by_host.get(key, ()))
+            self._cache[host] = tuple(self._keys[position] for position in sorted(positions))
+        return self._cache[host]
+
+    def candidates(self, url):
+        """Return the ie_keys of the extractors that may be suitable for the URL, in priority order"""
+        mobj = _URL_HOST_RE.match(url)
+        if not mobj or '\n' in url:
+            return self._keys
+        return self._candidates(mobj.group(1))
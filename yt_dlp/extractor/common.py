@@ -22,6 +22,7 @@
 import urllib.request
 import xml.etree.ElementTree
 
+from ._dispatch import suitable_narrows, valid_url_hosts
 from ..compat import (
     compat_etree_fromstring,
     compat_expanduser,
@@ -630,6 +631,23 @@ def suitable(cls, url):
         # so that lazy_extractors works correctly
         return cls._match_valid_url(url) is not None
 
+    @classproperty(cache=True)
+    def _VALID_URL_HOSTS(cls):
+        """
+        Host suffixes that URLs accepted by this IE must have; used to index extractors by URL.
+        None if they cannot be determined or the IE overrides URL matching to accept other URLs
+        """
+        if cls._match_valid_url.__func__ is not InfoExtractor._match_valid_url.__func__:
+            return None
+        elif not all(suitable_narrows(klass.__dict__['suitable'].__func__) for klass in cls.__mro__
+                     if klass is not InfoExtractor and 'suitable' in klass.__dict__):
+            return None
+        elif cls._VALID_URL is False:
+            return ()
+        elif not cls._VALID_URL:
+            return None
+        return valid_url_hosts(variadic(cls._VALID_URL))
+
     @classmethod
     def _match_id(cls, url):
         return cls._match_valid_url(url).group('id')
@@ -906,7 +924,11 @@ def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fa
                 self._downloader._unavailable_targets_message(requested_targets, note=msg), only_once=True)
 
         try:
-            return self._downloader.urlopen(self._create_request(url_or_request, data, headers, query, extensions))
+            request = self._create_request(url_or_request, data, headers, query, extensions)
+            if self._downloader._http_cache:
+                return self._downloader._http_cache.urlopen(
+                    request, self._downloader.urlopen, self.ie_key(), self.cookiejar)
+            return self._downloader.urlopen(request)
         except network_exceptions as err:
             if isinstance(err, HTTPError):
                 if self.__can_accept_status_code(err, expected_status):
@@ -1,5 +1,6 @@
 import collections
 import contextlib
+import functools
 import itertools
 import json
 import math
@@ -190,6 +191,40 @@ def js_number_to_string(val: float, radix: int = 10):
 _QUOTES = '\'"/'
 _NESTED_BRACKETS = r'[^[\]]+(?:\[[^[\]]+(?:\[[^\]]+\])?\])?'
 
+# Compiled once, since every statement is matched against these
+_STATEMENT_RE = re.compile(r'(?P<var>(?:var|const|let)\s)|return(?:\s+|(?=["\'])|$)|(?P<throw>throw\s+)')
+_BLOCK_RE = re.compile(r'''(?x)
+    (?P<try>try)\s*\{|
+    (?P<if>if)\s*\(|
+    (?P<switch>switch)\s*\(|
+    (?P<for>for)\s*\(
+    ''')
+_ELSE_RE = re.compile(r'else\s*{')
+_CATCH_RE = re.compile(fr'catch\s*(?P<err>\(\s*{_NAME_RE}\s*\))?\{{')
+_FINALLY_RE = re.compile(r'finally\s*\{')
+_SWITCH_RE = re.compile(r'switch\s*\(')
+_ASSIGNMENT_RE = re.compile(fr'''(?x)
+    (?P<out>{_NAME_RE})(?:\[(?P<index>{_NESTED_BRACKETS})\])?\s*
+    (?P<op>{"|".join(map(re.escape, set(_OPERATORS) - _COMP_OPERATORS))})?
+    =(?!=)(?P<expr>.*)$
+    ''')
+_INCREMENT_RE = re.compile(rf'''(?x)
+    (?P<pre_sign>\+\+|--)(?P<var1>{_NAME_RE})|
+    (?P<var2>{_NAME_RE})(?P<post_sign>\+\+|--)''')
+_EXPRESSION_RE = re.compile(fr'''(?x)
+    (?P<return>
+        (?!if|return|true|false|null|undefined|NaN)(?P<name>{_NAME_RE})$
+    )|(?P<attribute>
+        (?P<var>{_NAME_RE})(?:
+            (?P<nullish>\?)?\.(?P<member>[^(]+)|
+            \[(?P<member2>{_NESTED_BRACKETS})\]
+        )\s*
+    )|(?P<indexing>
+        (?P<in>{_NAME_RE})\[(?P<idx>.+)\]$
+    )|(?P<function>
+        (?P<fname>{_NAME_RE})\((?P<args>.*)\)$
+    )''')
+
 
 class JS_Undefined:
     pass
@@ -280,6 +315,11 @@ def __init__(self, code, objects=None):
         self.code, self._functions = code, {}
         self._objects = {} if objects is None else objects
         self._undefined_varnames = set()
+        # The statements of a function are split again whenever it runs. The splits are cached
+        # for each interpreter, so that they are not kept after its code is no longer used
+        self._separate = functools.lru_cache(maxsize=4096)(self._separate)
+        self._split_at_operator = functools.lru_cache(maxsize=4096)(self._split_at_operator)
+        self._separate_at_paren = functools.lru_cache(maxsize=4096)(self._separate_at_paren)
 
     class Exception(ExtractorError):  # noqa: A001
         def __init__(self, msg, expr=None, *args, **kwargs):
@@ -308,6 +348,29 @@ def _regex_flags(cls, expr):
 
     @staticmethod
     def _separate(expr, delim=',', max_split=None):
+        """Split the expression at the top-level delimiters"""
+        return tuple(JSInterpreter._iter_separate(expr, delim, max_split))
+
+    @staticmethod
+    def _split_at_operator(expr):
+        """Return (operator, left expression, right expression) for the operator with the lowest precedence"""
+        for op in _OPERATORS:
+            separated = list(JSInterpreter._separate(expr, op))
+            right_expr = separated.pop()
+            while True:
+                if op in '?<>*-' and len(separated) > 1 and not separated[-1].strip():
+                    separated.pop()
+                elif not (separated and op == '?' and right_expr.startswith('.')):
+                    break
+                right_expr = f'{op}{right_expr}'
+                if op != '-':
+                    right_expr = f'{separated.pop()}{op}{right_expr}'
+            if separated:
+                return op, op.join(separated), right_expr
+        return None
+
+    @staticmethod
+    def _iter_separate(expr, delim, max_split):
         OP_CHARS = '+-*/%&|^=<>!,;{}:['
         if not expr:
             return
@@ -404,7 +467,7 @@ def interpret_statement(self, stmt, local_vars, allow_recursion=100, _is_var_dec
             if should_return:
                 return ret, should_return
 
-        m = re.match(r'(?P<var>(?:var|const|let)\s)|return(?:\s+|(?=["\'])|$)|(?P<throw>throw\s+)', stmt)
+        m = _STATEMENT_RE.match(stmt)
         if m:
             expr = stmt[len(m.group(0)):].strip()
             if m.group('throw'):
@@ -478,19 +541,14 @@ def dict_item(key, val):
                 for item in self._separate(inner)])
             expr = name + outer
 
-        m = re.match(r'''(?x)
-                (?P<try>try)\s*\{|
-                (?P<if>if)\s*\(|
-                (?P<switch>switch)\s*\(|
-                (?P<for>for)\s*\(
-                ''', expr)
+        m = _BLOCK_RE.match(expr)
         md = m.groupdict() if m else {}
         if md.get('if'):
             cndn, expr = self._separate_at_paren(expr[m.end() - 1:])
             if_expr, expr = self._separate_at_paren(expr.lstrip())
             # TODO: "else if" is not handled
             else_expr = None
-            m = re.match(r'else\s*{', expr)
+            m = _ELSE_RE.match(expr)
             if m:
                 else_expr, expr = self._separate_at_paren(expr[m.end() - 1:])
             cndn = _js_ternary(self.interpret_expression(cndn, local_vars, allow_recursion))
@@ -511,7 +569,7 @@ def dict_item(key, val):
                 err = e
 
             pending = (None, False)
-            m = re.match(fr'catch\s*(?P<err>\(\s*{_NAME_RE}\s*\))?\{{', expr)
+            m = _CATCH_RE.match(expr)
             if m:
                 sub_expr, expr = self._separate_at_paren(expr[m.end() - 1:])
                 if err:
@@ -521,7 +579,7 @@ def dict_item(key, val):
                     catch_vars = local_vars.new_child(catch_vars)
                     err, pending = None, self.interpret_statement(sub_expr, catch_vars, allow_recursion)
 
-            m = re.match(r'finally\s*\{', expr)
+            m = _FINALLY_RE.match(expr)
             if m:
                 sub_expr, expr = self._separate_at_paren(expr[m.end() - 1:])
                 ret, should_abort = self.interpret_statement(sub_expr, local_vars, allow_recursion)
@@ -540,7 +598,7 @@ def dict_item(key, val):
             if remaining.startswith('{'):
                 body, expr = self._separate_at_paren(remaining)
             else:
-                switch_m = re.match(r'switch\s*\(', remaining)  # FIXME: ?
+                switch_m = _SWITCH_RE.match(remaining)  # FIXME: ?
                 if switch_m:
                     switch_val, remaining = self._separate_at_paren(remaining[switch_m.end() - 1:])
                     body, expr = self._separate_at_paren(remaining, '}')
@@ -601,11 +659,7 @@ def dict_item(key, val):
                     return ret, True
             return ret, False
 
-        m = re.match(fr'''(?x)
-                (?P<out>{_NAME_RE})(?:\[(?P<index>{_NESTED_BRACKETS})\])?\s*
-                (?P<op>{"|".join(map(re.escape, set(_OPERATORS) - _COMP_OPERATORS))})?
-                =(?!=)(?P<expr>.*)$
-            ''', expr)
+        m = _ASSIGNMENT_RE.match(expr)
         if m:  # We are assigning a value to a variable
             left_val = local_vars.get(m.group('out'))
 
@@ -628,9 +682,7 @@ def dict_item(key, val):
                 m.group('op'), self._index(left_val, idx), m.group('expr'), expr, local_vars, allow_recursion)
             return left_val[idx], should_return
 
-        for m in re.finditer(rf'''(?x)
-                (?P<pre_sign>\+\+|--)(?P<var1>{_NAME_RE})|
-                (?P<var2>{_NAME_RE})(?P<post_sign>\+\+|--)''', expr):
+        for m in _INCREMENT_RE.finditer(expr):
             var = m.group('var1') or m.group('var2')
             start, end = m.span()
             sign = m.group('pre_sign') or m.group('post_sign')
@@ -643,19 +695,7 @@ def dict_item(key, val):
         if not expr:
             return None, should_return
 
-        m = re.match(fr'''(?x)
-            (?P<return>
-                (?!if|return|true|false|null|undefined|NaN)(?P<name>{_NAME_RE})$
-            )|(?P<attribute>
-                (?P<var>{_NAME_RE})(?:
-                    (?P<nullish>\?)?\.(?P<member>[^(]+)|
-                    \[(?P<member2>{_NESTED_BRACKETS})\]
-                )\s*
-            )|(?P<indexing>
-                (?P<in>{_NAME_RE})\[(?P<idx>.+)\]$
-            )|(?P<function>
-                (?P<fname>{_NAME_RE})\((?P<args>.*)\)$
-            )''', expr)
+        m = _EXPRESSION_RE.match(expr)
         if expr.isdigit():
             return int(expr), should_return
 
@@ -691,20 +731,10 @@ def dict_item(key, val):
             idx = self.interpret_expression(m.group('idx'), local_vars, allow_recursion)
             return self._index(val, idx), should_return
 
-        for op in _OPERATORS:
-            separated = list(self._separate(expr, op))
-            right_expr = separated.pop()
-            while True:
-                if op in '?<>*-' and len(separated) > 1 and not separated[-1].strip():
-                    separated.pop()
-                elif not (separated and op == '?' and right_expr.startswith('.')):
-                    break
-                right_expr = f'{op}{right_expr}'
-                if op != '-':
-                    right_expr = f'{separated.pop()}{op}{right_expr}'
-            if not separated:
-                continue
-            left_val = self.interpret_expression(op.join(separated), local_vars, allow_recursion)
+        split = self._split_at_operator(expr)
+        if split:
+            op, left_expr, right_expr = split
+            left_val = self.interpret_expression(left_expr, local_vars, allow_recursion)
             return self._operator(op, left_val, right_expr, expr, local_vars, allow_recursion), should_return
 
         if m and m.group('attribute'):
@@ -920,7 +950,8 @@ def extract_function_code(self, funcname):
             self.code)
         if func_m is None:
             raise self.Exception(f'Could not find JS function "{funcname}"')
-        code, _ = self._separate_at_paren(func_m.group('code'))
+        # Not cached, since the match runs to the end of the code
+        code, _ = JSInterpreter._separate_at_paren(func_m.group('code'))
         return [x.strip() for x in func_m.group('args').split(',')], code
 
     def extract_function(self, funcname, *global_stack):
@@ -947,13 +978,13 @@ def call_function(self, funcname, *args):
 
     def build_function(self, argnames, code, *global_stack):
         global_stack = list(global_stack) or [{}]
-        argnames = tuple(argnames)
+        argnames, code = tuple(argnames), code.replace('\n', ' ')
 
         def resf(args, kwargs={}, allow_recursion=100):
             global_stack[0].update(itertools.zip_longest(argnames, args, fillvalue=None))
             global_stack[0].update(kwargs)
             var_stack = LocalNameSpace(*global_stack)
-            ret, should_abort = self.interpret_statement(code.replace('\n', ' '), var_stack, allow_recursion - 1)
+            ret, should_abort = self.interpret_statement(code, var_stack, allow_recursion - 1)
             if should_abort:
                 return ret
         return resf
@@ -0,0 +1,965 @@
+"""
+A streaming reader and writer of ISO base media files (MP4), as specified in ISO/IEC 14496-12.
+
+Supports building boxes, and rewriting fragmented MP4 files (as downloaded from DASH
+and HLS manifests) as regular ones in a single pass over the file, keeping only the
+tables of the samples in memory.
+"""
+
+import array
+import bisect
+import collections
+import fractions
+import io
+import struct
+import sys
+
+from .mpegts import (
+    DATA_STREAM_TYPES,
+    STREAM_TYPE_AAC,
+    STREAM_TYPE_H264,
+    MPEGTSError,
+    is_mpegts,
+    iter_pes,
+)
+
+u8 = struct.Struct('>B')
+u88 = struct.Struct('>Bx')
+u16 = struct.Struct('>H')
+u1616 = struct.Struct('>Hxx')
+u32 = struct.Struct('>I')
+u64 = struct.Struct('>Q')
+
+s88 = struct.Struct('>bx')
+s16 = struct.Struct('>h')
+s1616 = struct.Struct('>hxx')
+s32 = struct.Struct('>i')
+
+_box_header = struct.Struct('>I4s')
+
+# Boxes that can start a file
+_FILE_BOXES = (b'ftyp', b'styp', b'moov', b'sidx', b'free', b'skip', b'pdin')
+
+# Flags of the samples in movie fragments
+_SAMPLE_IS_NON_SYNC = 0x10000
+
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+class MP4Error(Exception):
+    """The file is not an MP4 file that can be processed"""
+
+
+def box(box_type, payload):
+    return u32.pack(8 + len(payload)) + box_type + payload
+
+
+def full_box(box_type, version, flags, payload):
+    return box(box_type, u8.pack(version) + u32.pack(flags)[1:] + payload)
+
+
+def extract_box_data(data, box_sequence):
+    data_reader = io.BytesIO(data)
+    while True:
+        box_size = u32.unpack(data_reader.read(4))[0]
+        box_type = data_reader.read(4)
+        if box_type == box_sequence[0]:
+            box_data = data_reader.read(box_size - 8)
+            if len(box_sequence) == 1:
+                return box_data
+            return extract_box_data(box_data, box_sequence[1:])
+        data_reader.seek(box_size - 8, 1)
+
+
+def is_mp4(stream):
+    """Whether the stream, at its current position, looks like the start of an MP4 file"""
+    header = stream.read(_box_header.size)
+    return len(header) == _box_header.size and _box_header.unpack(header)[1] in _FILE_BOXES
+
+
+def iter_boxes(stream, end=None):
+    """
+    Iterate over the boxes of the stream, from its current position until end
+
+    The stream is positioned at the payload of each box when it is yielded;
+    the payload does not have to be read before resuming the iteration
+
+    @returns    An iterator of (box_type, box_offset, payload_size)
+    """
+    offset = stream.tell()
+    while end is None or offset < end:
+        header = stream.read(_box_header.size)
+        if not header and end is None:
+            return
+        elif len(header) < _box_header.size:
+            raise MP4Error('Truncated box header')
+        size, box_type = _box_header.unpack(header)
+        header_size = _box_header.size
+        if size == 1:
+            size = u64.unpack(_read_exactly(stream, u64.size))[0]
+            header_size += u64.size
+        elif size == 0:
+            size = (stream.seek(0, io.SEEK_END) if end is None else end) - offset
+            stream.seek(offset + header_size)
+        if size < header_size:
+            raise MP4Error(f'Invalid size of {box_type.decode("latin-1")} box')
+        yield box_type, offset, size - header_size
+        offset += size
+        stream.seek(offset)
+
+
+def parse_boxes(data):
+    """Split the payload of a container box into a list of (box_type, payload)"""
+    boxes, offset = [], 0
+    while offset < len(data):
+        if len(data) - offset < _box_header.size:
+            raise MP4Error('Truncated box header')
+        size, box_type = _box_header.unpack_from(data, offset)
+        header_size = _box_header.size
+        if size == 1:
+            size = u64.unpack_from(data, offset + header_size)[0]
+            header_size += u64.size
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size or offset + size > len(data):
+            raise MP4Error(f'Invalid size of {box_type.decode("latin-1")} box')
+        boxes.append((box_type, data[offset + header_size:offset + size]))
+        offset += size
+    return boxes
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise MP4Error('Truncated file')
+    return data
+
+
+def _find_box(boxes, box_type):
+    for child_type, payload in boxes:
+        if child_type == box_type:
+            return payload
+    raise MP4Error(f'Missing {box_type.decode("latin-1")} box')
+
+
+def _full_box_header(payload):
+    """@returns (version, flags) of the full box; its fields start at offset 4"""
+    if len(payload) < 4:
+        raise MP4Error('Truncated full box')
+    return payload[0], u32.unpack(b'\0' + payload[1:4])[0]
+
+
+def _pack_table(fmt, values):
+    table = array.array(fmt, values)
+    if sys.byteorder == 'little':
+        table.byteswap()
+    return table.tobytes()
+
+
+def _with_duration(box_type, payload, duration):
+    """Set the duration of a mvhd, tkhd or mdhd box, upgrading it to version 1 if needed"""
+    version, flags = _full_box_header(payload)
+    # The field before the duration: timescale, or track_ID and a reserved field
+    middle_size = 8 if box_type == b'tkhd' else 4
+    time_fmt = '>QQ' if version == 1 else '>II'
+    creation_time, modification_time = struct.unpack_from(time_fmt, payload, 4)
+    offset = 4 + struct.calcsize(time_fmt)
+    middle = payload[offset:offset + middle_size]
+    offset += middle_size + (8 if version == 1 else 4)
+    if max(creation_time, modification_time, duration) > 0xFFFFFFFF:
+        version, time_fmt, duration_fmt = 1, '>QQ', '>Q'
+    else:
+        version, time_fmt, duration_fmt = 0, '>II', '>I'
+    return full_box(box_type, version, flags, b''.join((
+        struct.pack(time_fmt, creation_time, modification_time), middle,
+        struct.pack(duration_fmt, duration), payload[offset:])))
+
+
+def _field_after_times(payload):
+    """The offset of the field after the creation and modification times of a mvhd, tkhd or mdhd box"""
+    return 20 if _full_box_header(payload)[0] == 1 else 12
+
+
+class _Track:
+    def __init__(self, track_id, timescale, defaults=(1, 0, 0, 0)):
+        self.track_id, self.timescale = track_id, timescale
+        (self.default_sample_description_index, self.default_sample_duration,
+         self.default_sample_size, self.default_sample_flags) = defaults
+        # The boxes of the track, whose sample table is written from the samples that are added
+        self.trak = self.stsd = None
+
+        self.sample_count = self.duration = 0
+        self.first_decode_time = None
+        self.sample_sizes = array.array('I')
+        self.sync_samples = array.array('I')
+        self.has_non_sync_samples = False
+        # Run-length encoded, as flat lists of count and value
+        self.sample_durations, self.composition_offsets = [], []
+        # (offset in the file, size, number of samples, sample description index)
+        self.chunks = []
+
+    @classmethod
+    def from_trak(cls, trak, trexs):
+        """Create the track of a fragmented file from its trak box, and the trex boxes by track ID"""
+        boxes = parse_boxes(trak)
+        tkhd = _find_box(boxes, b'tkhd')
+        track_id = u32.unpack_from(tkhd, _field_after_times(tkhd))[0]
+        trex = trexs.get(track_id)
+        if not trex:
+            raise MP4Error(f'Missing trex box of track {track_id}')
+
+        mdia = parse_boxes(_find_box(boxes, b'mdia'))
+        mdhd = _find_box(mdia, b'mdhd')
+        timescale = u32.unpack_from(mdhd, _field_after_times(mdhd))[0]
+        if not timescale:
+            raise MP4Error(f'Invalid timescale of track {track_id}')
+        stbl = parse_boxes(_find_box(parse_boxes(_find_box(mdia, b'minf')), b'stbl'))
+        stsd = _find_box(stbl, b'stsd')
+        for sample_entry_type, _ in parse_boxes(stsd[8:]):
+            if sample_entry_type in (b'encv', b'enca', b'encs', b'enct'):
+                raise MP4Error('The file is encrypted')
+        for box_type, payload in stbl:
+            # Then the movie box is not just the initialization of the fragments
+            if box_type in (b'stsz', b'stz2') and u32.unpack_from(payload, 8)[0]:
+                raise MP4Error('The file has samples outside of the movie fragments')
+
+        track = cls(track_id, timescale, struct.unpack_from('>IIII', trex, 8))
+        track.trak, track.stsd = boxes, stsd
+        return track
+
+    @property
+    def tkhd(self):
+        return _find_box(self.trak, b'tkhd')
+
+    @staticmethod
+    def _add_run_length(runs, value):
+        if runs and runs[-1] == value:
+            runs[-2] += 1
+        else:
+            runs.extend((1, value))
+
+    def add_samples(self, decode_time, data_offset, sample_description_index, samples):
+        """
+        Add the samples of a track fragment run, as (duration, size, flags, composition offset)
+
+        @returns    The size of their data
+        """
+        if self.first_decode_time is None:
+            self.first_decode_time = decode_time or 0
+        elif decode_time is not None and decode_time != self.first_decode_time + self.duration:
+            raise MP4Error(f'The timestamps of track {self.track_id} are not continuous')
+
+        data_size = 0
+        for duration, size, flags, composition_offset in samples:
+            self.sample_count += 1
+            self.sample_sizes.append(size)
+            self._add_run_length(self.sample_durations, duration)
+            self._add_run_length(self.composition_offsets, composition_offset)
+            if flags & _SAMPLE_IS_NON_SYNC:
+                self.has_non_sync_samples = True
+            else:
+                self.sync_samples.append(self.sample_count)
+            self.duration += duration
+            data_size += size
+        if not data_size:
+            return 0
+        if self.chunks:
+            # Samples that follow the previous ones in the file are in the same chunk
+            offset, size, sample_count, last_description_index = self.chunks[-1]
+            if offset + size == data_offset and last_description_index == sample_description_index:
+                self.chunks[-1] = (offset, size + data_size, sample_count + len(samples), sample_description_index)
+                return data_size
+        self.chunks.append((data_offset, data_size, len(samples), sample_description_index))
+        return data_size
+
+
+def _parse_moof(payload, moof_offset, tracks):
+    trafs = [parse_boxes(traf) for box_type, traf in parse_boxes(payload) if box_type == b'traf']
+    data_end = moof_offset
+    for index, traf in enumerate(trafs):
+        tfhd = _find_box(traf, b'tfhd')
+        _, flags = _full_box_header(tfhd)
+        track = tracks.get(u32.unpack_from(tfhd, 4)[0])
+        if not track:
+            raise MP4Error('Movie fragment of an unknown track')
+        offset = 8
+
+        def tfhd_field(flag, fmt, default):
+            nonlocal offset
+            if not flags & flag:
+                return default
+            value = struct.unpack_from(fmt, tfhd, offset)[0]
+            offset += struct.calcsize(fmt)
+            return value
+
+        # Without an explicit base, the data of the first track fragment is relative to the movie
+        # fragment, and the data of the others follows that of the previous track fragment
+        base_offset = tfhd_field(0x1, '>Q', moof_offset if flags & 0x20000 or not index else data_end)
+        sample_description_index = tfhd_field(0x2, '>I', track.default_sample_description_index)
+        default_duration = tfhd_field(0x8, '>I', track.default_sample_duration)
+        default_size = tfhd_field(0x10, '>I', track.default_sample_size)
+        default_flags = tfhd_field(0x20, '>I', track.default_sample_flags)
+
+        decode_time, data_end = None, base_offset
+        for box_type, child in traf:
+            if box_type in (b'senc', b'saiz', b'saio'):
+                raise MP4Error('The file is encrypted')
+            elif box_type == b'tfdt':
+                version, _ = _full_box_header(child)
+                decode_time = struct.unpack_from('>Q' if version == 1 else '>I', child, 4)[0]
+            elif box_type == b'trun':
+                data_end = _parse_trun(child, track, decode_time, base_offset, data_end, (
+                    sample_description_index, default_duration, default_size, default_flags))
+                decode_time = None
+
+
+def _parse_trun(trun, track, decode_time, base_offset, data_offset, defaults):
+    """@returns The end of the data of the track fragment run"""
+    sample_description_index, default_duration, default_size, default_flags = defaults
+    version, flags = _full_box_header(trun)
+    sample_count = u32.unpack_from(trun, 4)[0]
+    offset = 8
+    if flags & 0x1:
+        data_offset = base_offset + s32.unpack_from(trun, offset)[0]
+        offset += 4
+    first_sample_flags = default_flags
+    if flags & 0x4:
+        first_sample_flags = u32.unpack_from(trun, offset)[0]
+        offset += 4
+
+    has_duration, has_size, has_flags, has_composition_offset = (
+        bool(flags & flag) for flag in (0x100, 0x200, 0x400, 0x800))
+    sample = struct.Struct('>' + ''.join(fmt for fmt, present in zip(
+        ('I', 'I', 'I', 'i' if version else 'I'),
+        (has_duration, has_size, has_flags, has_composition_offset), strict=True) if present))
+    end = offset + sample_count * sample.size
+    if end > len(trun):
+        raise MP4Error('Truncated track fragment run')
+
+    def samples():
+        fields = sample.iter_unpack(trun[offset:end]) if sample.size else [()] * sample_count
+        for index, values in enumerate(fields):
+            values = iter(values)
+            yield (
+                next(values) if has_duration else default_duration,
+                next(values) if has_size else default_size,
+                next(values) if has_flags else first_sample_flags if index == 0 else default_flags,
+                next(values) if has_composition_offset else 0)
+
+    return data_offset + track.add_samples(decode_time, data_offset, sample_description_index, list(samples()))
+
+
+def _stbl(track, chunk_offsets):
+    tables = [box(b'stsd', track.stsd)]
+    tables.append(full_box(b'stts', 0, 0, u32.pack(len(track.sample_durations) // 2)
+                           + _pack_table('I', track.sample_durations)))
+    if any(track.composition_offsets[1::2]):
+        version = 1 if min(track.composition_offsets[1::2]) < 0 else 0
+        tables.append(full_box(b'ctts', version, 0, u32.pack(len(track.composition_offsets) // 2)
+                               + _pack_table('i' if version else 'I', track.composition_offsets)))
+    if track.has_non_sync_samples:
+        tables.append(full_box(b'stss', 0, 0, u32.pack(len(track.sync_samples)) + _pack_table('I', track.sync_samples)))
+
+    sample_to_chunk = []
+    for index, (_, _, sample_count, sample_description_index) in enumerate(track.chunks, 1):
+        if sample_to_chunk[-2:] != [sample_count, sample_description_index]:
+            sample_to_chunk.extend((index, sample_count, sample_description_index))
+    tables.append(full_box(b'stsc', 0, 0, u32.pack(len(sample_to_chunk) // 3) + _pack_table('I', sample_to_chunk)))
+
+    sample_sizes = set(track.sample_sizes)
+    if len(sample_sizes) == 1:
+        tables.append(full_box(b'stsz', 0, 0, u32.pack(sample_sizes.pop()) + u32.pack(track.sample_count)))
+    else:
+        tables.append(full_box(b'stsz', 0, 0, u32.pack(0) + u32.pack(track.sample_count)
+                               + _pack_table('I', track.sample_sizes)))
+
+    if chunk_offsets and chunk_offsets[-1] > 0xFFFFFFFF:
+        tables.append(full_box(b'co64', 0, 0, u32.pack(len(chunk_offsets)) + _pack_table('Q', chunk_offsets)))
+    else:
+        tables.append(full_box(b'stco', 0, 0, u32.pack(len(chunk_offsets)) + _pack_table('I', chunk_offsets)))
+    return box(b'stbl', b''.join(tables))
+
+
+def _edts(payload, track, duration):
+    """
+    Complete an edit list that spans the duration of the fragments, which was unknown
+
+    @returns    (payload, duration of the track in the movie timescale)
+    """
+    boxes = parse_boxes(payload)
+    elst = next((elst for box_type, elst in boxes if box_type == b'elst'), None)
+    if not elst:
+        return payload, duration
+    version, flags = _full_box_header(elst)
+    entry = struct.Struct('>Qq' if version == 1 else '>Ii')
+    # Each entry is followed by its media rate
+    entries = [entry.unpack_from(elst, 8 + index * (entry.size + 4)) for index in range(u32.unpack_from(elst, 4)[0])]
+    if entries and all(segment_duration for segment_duration, _ in entries):
+        # The track lasts as long as its edits
+        return payload, sum(segment_duration for segment_duration, _ in entries)
+    elif len(entries) != 1 or entries[0][1] < 0:
+        return payload, duration
+    media_time = entries[0][1]
+
+    media_duration = max(track.duration - media_time, 0)
+    segment_duration = duration * media_duration // track.duration if track.duration else 0
+    version = max(version, segment_duration > 0xFFFFFFFF)
+    elst = full_box(b'elst', version, flags, b''.join((
+        u32.pack(1), struct.pack('>Qq' if version == 1 else '>Ii', segment_duration, media_time),
+        elst[8 + entry.size:])))
+    return b''.join(elst if box_type == b'elst' else box(box_type, child) for box_type, child in boxes), segment_duration
+
+
+def _mdia(payload, track, chunk_offsets):
+    for box_type, child in parse_boxes(payload):
+        if box_type == b'mdhd':
+            yield _with_duration(b'mdhd', child, track.duration)
+        elif box_type == b'minf':
+            yield box(b'minf', b''.join(
+                _stbl(track, chunk_offsets) if minf_type == b'stbl' else box(minf_type, minf_child)
+                for minf_type, minf_child in parse_boxes(child)))
+        else:
+            yield box(box_type, child)
+
+
+def _trak(track, movie_timescale, chunk_offsets):
+    """@returns (trak box, duration of the track in the movie timescale)"""
+    duration = track.duration * movie_timescale // track.timescale
+    children = []
+    for box_type, payload in track.trak:
+        if box_type == b'edts':
+            payload, duration = _edts(payload, track, duration)
+        elif box_type == b'mdia':
+            payload = b''.join(_mdia(payload, track, chunk_offsets))
+        elif box_type == b'tkhd':
+            continue
+        children.append(box(box_type, payload))
+    return box(b'trak', _with_duration(b'tkhd', track.tkhd, duration) + b''.join(children)), duration
+
+
+def _moov(moov, tracks, chunk_offsets):
+    boxes = parse_boxes(moov)
+    mvhd = _find_box(boxes, b'mvhd')
+    movie_timescale = u32.unpack_from(mvhd, _field_after_times(mvhd))[0]
+    if not movie_timescale:
+        raise MP4Error('Invalid timescale of the movie')
+
+    children, movie_duration, traks = [], 0, iter(tracks.values())
+    for box_type, payload in boxes:
+        if box_type == b'trak':
+            track = next(traks)
+            trak, duration = _trak(track, movie_timescale, chunk_offsets[track.track_id])
+            children.append(trak)
+            movie_duration = max(movie_duration, duration)
+        elif box_type not in (b'mvhd', b'mvex'):
+            children.append(box(box_type, payload))
+    return box(b'moov', _with_duration(b'mvhd', mvhd, movie_duration) + b''.join(children))
+
+
+def _copy_range(src, dst, offset, size):
+    src.seek(offset)
+    while size:
+        data = src.read(min(size, _COPY_BLOCK_SIZE))
+        if not data:
+            raise MP4Error('Truncated file')
+        dst.write(data)
+        size -= len(data)
+
+
+def _read_fragments(src):
+    """@returns (moov payload, tracks by ID, (start, end) of the media data boxes)"""
+    moov, tracks, media_data = None, {}, []
+    for box_type, offset, size in iter_boxes(src):
+        if box_type == b'moov':
+            payload = _read_exactly(src, size)
+            if moov is not None:
+                if payload != moov:
+                    raise MP4Error('The file has different initialization segments')
+                continue
+            moov = payload
+            boxes = parse_boxes(moov)
+            if any(box_type == b'pssh' for box_type, _ in boxes):
+                raise MP4Error('The file is encrypted')
+            trexs = {u32.unpack_from(trex, 4)[0]: trex for box_type, trex in parse_boxes(
+                _find_box(boxes, b'mvex')) if box_type == b'trex'}
+            for box_type, trak in boxes:
+                if box_type == b'trak':
+                    track = _Track.from_trak(trak, trexs)
+                    if tracks.setdefault(track.track_id, track) is not track:
+                        raise MP4Error(f'Duplicate track {track.track_id}')
+        elif box_type == b'moof':
+            if moov is None:
+                raise MP4Error('Movie fragment before the movie box')
+            _parse_moof(_read_exactly(src, size), offset, tracks)
+        elif box_type == b'mdat':
+            media_data.append((src.tell(), src.tell() + size))
+    if moov is None:
+        raise MP4Error('Missing moov box')
+    return moov, tracks, media_data
+
+
+# The file type of the files that are written
+_FTYP = box(b'ftyp', b'isom' + u32.pack(0x200) + b'isom' + b'iso2' + b'mp41')
+
+
+def defragment(src, dst):
+    """
+    Rewrite the fragmented MP4 file read from src as a regular MP4 file into dst
+
+    The movie box is written first, followed by the samples in the order of the file.
+    Repeated initialization segments are dropped if they are identical to the first one
+
+    @raises MP4Error    If the file can not be rewritten, e.g. if it is not fragmented,
+                        is encrypted, or has discontinuous timestamps
+    """
+    try:
+        moov, tracks, media_data = _read_fragments(src)
+    except struct.error as e:
+        raise MP4Error(f'Invalid box: {e}') from e
+    if not any(track.chunks for track in tracks.values()):
+        raise MP4Error('The file has no movie fragments')
+    elif len({fractions.Fraction(track.first_decode_time, track.timescale)
+              for track in tracks.values() if track.chunks}) > 1:
+        raise MP4Error('The tracks do not start at the same time')
+
+    chunks = sorted((offset, size, track_id) for track_id, track in tracks.items() for offset, size, _, _ in track.chunks)
+    starts = [start for start, _ in media_data]
+    for offset, size, _ in chunks:
+        index = bisect.bisect_right(starts, offset) - 1
+        if index < 0 or offset + size > media_data[index][1]:
+            raise MP4Error('The samples are outside of the media data')
+    data_size = sum(size for _, size, _ in chunks)
+
+    mdat_header = (u32.pack(1) + b'mdat' + u64.pack(16 + data_size) if 8 + data_size > 0xFFFFFFFF
+                   else u32.pack(8 + data_size) + b'mdat')
+
+    def layout(moov_size):
+        data_offset = len(_FTYP) + moov_size + len(mdat_header)
+        chunk_offsets = {track_id: array.array('Q') for track_id in tracks}
+        for _, size, track_id in chunks:
+            chunk_offsets[track_id].append(data_offset)
+            data_offset += size
+        return _moov(moov, tracks, chunk_offsets)
+
+    # The offsets only change the size of the movie box if they need co64 instead of stco
+    moov_size = len(layout(0))
+    while len(new_moov := layout(moov_size)) != moov_size:
+        moov_size = len(new_moov)
+
+    dst.write(_FTYP)
+    dst.write(new_moov)
+    dst.write(mdat_header)
+    for offset, size, _ in chunks:
+        _copy_range(src, dst, offset, size)
+
+
+_MOVIE_TIMESCALE = 1000
+_MPEGTS_TIMESCALE = 90000
+_UNITY_MATRIX = struct.pack('>9i', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+# The sampling frequencies of AAC, by index
+_AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+_AAC_FRAME_SIZE = 1024
+# The profiles of H.264 whose sequence parameter sets have the chroma format and bit depths
+_AVC_HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+
+class _BitReader:
+    def __init__(self, data):
+        self._value, self._size, self._position = int.from_bytes(data, 'big'), len(data) * 8, 0
+
+    def bits(self, count):
+        self._position += count
+        if self._position > self._size:
+            raise MP4Error('Truncated parameter set')
+        return (self._value >> (self._size - self._position)) & ((1 << count) - 1)
+
+    def ue(self):
+        """Read an unsigned Exp-Golomb code"""
+        leading_zeros = 0
+        while not self.bits(1):
+            leading_zeros += 1
+            if leading_zeros > 31:
+                raise MP4Error('Invalid parameter set')
+        return (1 << leading_zeros) - 1 + self.bits(leading_zeros)
+
+    def se(self):
+        """Read a signed Exp-Golomb code"""
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def _parse_sps(sps):
+    """@returns A dict of the properties of an H.264 sequence parameter set that an MP4 file needs"""
+    # Remove the emulation prevention bytes and the NAL unit header
+    reader = _BitReader(sps.replace(b'\0\0\3', b'\0\0')[1:])
+    properties = {
+        'profile': reader.bits(8),
+        'compatibility': reader.bits(8),
+        'level': reader.bits(8),
+        'chroma_format': 1,
+        'bit_depth_luma': 8,
+        'bit_depth_chroma': 8,
+    }
+    reader.ue()  # seq_parameter_set_id
+    separate_colour_planes = False
+    if properties['profile'] in _AVC_HIGH_PROFILES:
+        properties['chroma_format'] = reader.ue()
+        if properties['chroma_format'] == 3:
+            separate_colour_planes = reader.bits(1)
+        properties['bit_depth_luma'] = 8 + reader.ue()
+        properties['bit_depth_chroma'] = 8 + reader.ue()
+        reader.bits(1)  # qpprime_y_zero_transform_bypass_flag
+        if reader.bits(1):  # seq_scaling_matrix_present_flag
+            for index in range(12 if properties['chroma_format'] == 3 else 8):
+                if not reader.bits(1):
+                    continue
+                last_scale = next_scale = 8
+                for _ in range(16 if index < 6 else 64):
+                    if next_scale:
+                        next_scale = (last_scale + reader.se()) % 256
+                    last_scale = next_scale or last_scale
+    reader.ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = reader.ue()
+    if pic_order_cnt_type == 0:
+        reader.ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif pic_order_cnt_type == 1:
+        reader.bits(1)  # delta_pic_order_always_zero_flag
+        reader.se()  # offset_for_non_ref_pic
+        reader.se()  # offset_for_top_to_bottom_field
+        for _ in range(reader.ue()):
+            reader.se()  # offset_for_ref_frame
+    reader.ue()  # max_num_ref_frames
+    reader.bits(1)  # gaps_in_frame_num_value_allowed_flag
+    width_in_mbs, height_in_map_units = reader.ue() + 1, reader.ue() + 1
+    frame_mbs_only = reader.bits(1)
+    if not frame_mbs_only:
+        reader.bits(1)  # mb_adaptive_frame_field_flag
+    reader.bits(1)  # direct_8x8_inference_flag
+    crop_left = crop_right = crop_top = crop_bottom = 0
+    if reader.bits(1):  # frame_cropping_flag
+        crop_left, crop_right, crop_top, crop_bottom = (reader.ue() for _ in range(4))
+
+    if properties['chroma_format'] == 0 or separate_colour_planes:
+        crop_unit_x, crop_unit_y = 1, 2 - frame_mbs_only
+    else:
+        crop_unit_x = 1 if properties['chroma_format'] == 3 else 2
+        crop_unit_y = (2 if properties['chroma_format'] == 1 else 1) * (2 - frame_mbs_only)
+    properties['width'] = width_in_mbs * 16 - crop_unit_x * (crop_left + crop_right)
+    properties['height'] = (2 - frame_mbs_only) * height_in_map_units * 16 - crop_unit_y * (crop_top + crop_bottom)
+    return properties
+
+
+def _descriptor(tag, payload):
+    """An MPEG-4 descriptor, as in the esds box"""
+    size, length = len(payload), []
+    while True:
+        length.insert(0, (size & 0x7F) | (0x80 if length else 0))
+        size >>= 7
+        if not size:
+            break
+    return bytes((tag, *length)) + payload
+
+
+class _ElementaryStream:
+    """An elementary stream of an MPEG transport stream, written as the samples of a track"""
+
+    HANDLER = None
+
+    def __init__(self, track_id):
+        self.track_id = track_id
+        self.track = None
+        # The sample whose duration is known once the next one is added, as
+        # (decode time, composition offset, offset in the file, size, flags)
+        self._pending = None
+        self._last_duration = None
+        self._first_presentation_time = None
+
+    def _write_sample(self, dst, data, decode_time, composition_offset=0, sync=True):
+        if self._pending:
+            self._add_pending(decode_time - self._pending[0])
+        self._pending = (decode_time, composition_offset, dst.tell(), len(data), 0 if sync else _SAMPLE_IS_NON_SYNC)
+        dst.write(data)
+        presentation_time = decode_time + composition_offset
+        if self._first_presentation_time is None or presentation_time < self._first_presentation_time:
+            self._first_presentation_time = presentation_time
+
+    def _add_pending(self, duration):
+        if duration <= 0:
+            raise MP4Error(f'The timestamps of track {self.track_id} are not increasing')
+        decode_time, composition_offset, offset, size, flags = self._pending
+        self.track.add_samples(decode_time, offset, 1, [(duration, size, flags, composition_offset)])
+        self._last_duration = duration
+
+    def finish(self):
+        """Add the last sample, whose duration is assumed to be that of the previous one"""
+        if self._pending:
+            self._add_pending(self._last_duration or 1)
+            self._pending = None
+
+    @property
+    def start_time(self):
+        """The presentation time of the first sample, in seconds"""
+        return fractions.Fraction(self._first_presentation_time, self.track.timescale)
+
+    def trak(self, start_time):
+        """
+        Create the boxes of the track, but for its sample table
+
+        @param start_time   The presentation time at which the movie starts, in seconds
+        """
+        track = self.track
+        # The sample times start from zero, so the track is shifted to its own start time
+        media_time = self._first_presentation_time - track.first_decode_time
+        delay = round((self.start_time - start_time) * _MOVIE_TIMESCALE)
+        edits = [(delay, -1)] if delay else []
+        edits.append(((track.duration - media_time) * _MOVIE_TIMESCALE // track.timescale, media_time))
+        edts = box(b'edts', full_box(b'elst', 0, 0, u32.pack(len(edits)) + b''.join(
+            struct.pack('>Iih', segment_duration, media_time, 1) + b'\0\0' for segment_duration, media_time in edits)))
+
+        width, height = self._dimensions
+        tkhd = full_box(b'tkhd', 0, 0x3, b''.join((
+            struct.pack('>IIIII', 0, 0, track.track_id, 0, 0), bytes(8),
+            struct.pack('>hhhH', 0, 0, 0x100 if self.HANDLER == b'soun' else 0, 0),
+            _UNITY_MATRIX, u1616.pack(width), u1616.pack(height))))
+        # The language is "und"
+        mdhd = full_box(b'mdhd', 0, 0, struct.pack('>IIIIHH', 0, 0, track.timescale, 0, 0x55C4, 0))
+        handler_name = b'VideoHandler\0' if self.HANDLER == b'vide' else b'SoundHandler\0'
+        hdlr = full_box(b'hdlr', 0, 0, bytes(4) + self.HANDLER + bytes(12) + handler_name)
+        media_header = full_box(b'vmhd', 0, 1, bytes(8)) if self.HANDLER == b'vide' else full_box(b'smhd', 0, 0, bytes(4))
+        dinf = box(b'dinf', full_box(b'dref', 0, 0, u32.pack(1) + full_box(b'url ', 0, 1, b'')))
+        track.stsd = u32.pack(0) + u32.pack(1) + self._sample_entry()
+        minf = box(b'minf', media_header + dinf + box(b'stbl', b''))
+        track.trak = parse_boxes(tkhd + edts + box(b'mdia', mdhd + hdlr + minf))
+        return box(b'trak', b''.join(box(box_type, payload) for box_type, payload in track.trak))
+
+
+class _AVCStream(_ElementaryStream):
+    """H.264 video, whose NAL units are prefixed by their length instead of start codes in MP4"""
+
+    HANDLER = b'vide'
+
+    def __init__(self, track_id):
+        super().__init__(track_id)
+        self.track = _Track(track_id, _MPEGTS_TIMESCALE)
+        self._sequence_parameter_sets, self._picture_parameter_sets = [], []
+        self._has_sync_sample = False
+
+    def add(self, pts, dts, data, dst):
+        if pts is None:
+            raise MP4Error('The video has no timestamps')
+        nal_units, sync = [], False
+        # A start code may have 3 or 4 bytes; the NAL units can not end with a zero byte
+        for nal_unit in data.split(b'\0\0\1')[1:]:
+            nal_unit = nal_unit.rstrip(b'\0')
+            nal_unit_type = nal_unit[0] & 0x1F if nal_unit else None
+            if nal_unit_type in (None, 9):  # Access unit delimiter
+                continue
+            elif nal_unit_type in (7, 8):
+                parameter_sets = self._sequence_parameter_sets if nal_unit_type == 7 else self._picture_parameter_sets
+                if nal_unit in parameter_sets:
+                    continue
+                # Those of the first keyframe are in the sample entry; any other ones are left in the samples
+                elif not self._has_sync_sample:
+                    parameter_sets.append(nal_unit)
+                    continue
+            elif nal_unit_type == 5:  # IDR picture
+                sync = True
+            nal_units.append(u32.pack(len(nal_unit)) + nal_unit)
+        if nal_units:
+            self._write_sample(dst, b''.join(nal_units), dts, pts - dts, sync)
+            self._has_sync_sample = self._has_sync_sample or sync
+
+    @property
+    def _sequence_parameter_set(self):
+        if not self._sequence_parameter_sets or not self._picture_parameter_sets:
+            raise MP4Error('The video has no parameter sets')
+        return _parse_sps(self._sequence_parameter_sets[0])
+
+    @property
+    def _dimensions(self):
+        sps = self._sequence_parameter_set
+        return sps['width'], sps['height']
+
+    def _sample_entry(self):
+        sps = self._sequence_parameter_set
+        # The NAL unit lengths have 4 bytes
+        avcc = bytes((1, sps['profile'], sps['compatibility'], sps['level'], 0xFF))
+        avcc += u8.pack(0xE0 | len(self._sequence_parameter_sets)) + b''.join(
+            u16.pack(len(sps_data)) + sps_data for sps_data in self._sequence_parameter_sets)
+        avcc += u8.pack(len(self._picture_parameter_sets)) + b''.join(
+            u16.pack(len(pps)) + pps for pps in self._picture_parameter_sets)
+        if sps['profile'] in _AVC_HIGH_PROFILES:
+            avcc += bytes((0xFC | sps['chroma_format'], 0xF8 | (sps['bit_depth_luma'] - 8),
+                           0xF8 | (sps['bit_depth_chroma'] - 8), 0))
+        return box(b'avc1', b''.join((
+            bytes(6), u16.pack(1),  # data_reference_index
+            bytes(16), u16.pack(sps['width']), u16.pack(sps['height']),
+            u32.pack(0x480000) * 2,  # 72 dpi
+            bytes(4), u16.pack(1),  # frame_count
+            bytes(32), u16.pack(0x18), s16.pack(-1),  # compressorname, depth, pre_defined
+            box(b'avcC', avcc))))
+
+
+class _AACStream(_ElementaryStream):
+    """AAC audio, whose frames have ADTS headers in MPEG-TS and an audio specific config in MP4"""
+
+    HANDLER = b'soun'
+    _dimensions = (0, 0)
+
+    def __init__(self, track_id):
+        super().__init__(track_id)
+        self._audio_specific_config = self._channels = None
+        self._remainder = b''
+        self._next_decode_time = None
+
+    def add(self, pts, dts, data, dst):
+        data, offset = self._remainder + data, 0
+        # The timestamp is that of the first frame that starts in the PES packet
+        pts_offset = len(self._remainder) if pts is not None else None
+        while len(data) - offset >= 7:
+            if data[offset] != 0xFF or data[offset + 1] & 0xF6 != 0xF0:
+                raise MP4Error('Invalid ADTS frame')
+            header_size = 7 if data[offset + 1] & 0x1 else 9
+            profile, sample_rate_index = data[offset + 2] >> 6, (data[offset + 2] >> 2) & 0xF
+            channels = (data[offset + 2] & 0x1) << 2 | data[offset + 3] >> 6
+            frame_size = (data[offset + 3] & 0x3) << 11 | data[offset + 4] << 3 | data[offset + 5] >> 5
+            if data[offset + 6] & 0x3:
+                raise MP4Error('ADTS frames with several raw data blocks are not supported')
+            elif frame_size < header_size:
+                raise MP4Error('Invalid ADTS frame')
+            elif offset + frame_size > len(data):
+                break
+            self._configure(profile, sample_rate_index, channels)
+
+            sample_rate = _AAC_SAMPLE_RATES[sample_rate_index]
+            decode_time = self._next_decode_time
+            if pts_offset is not None and offset >= pts_offset:
+                pts_time = pts * sample_rate // _MPEGTS_TIMESCALE
+                # Small differences are rounding errors of the timestamps, but a gap is kept
+                if decode_time is None or pts_time - decode_time > _AAC_FRAME_SIZE:
+                    decode_time = pts_time
+                pts_offset = None
+            if decode_time is None:
+                raise MP4Error('The audio has no timestamps')
+            self._write_sample(dst, data[offset + header_size:offset + frame_size], decode_time)
+            self._next_decode_time = decode_time + _AAC_FRAME_SIZE
+            offset += frame_size
+        self._remainder = data[offset:]
+
+    def _configure(self, profile, sample_rate_index, channels):
+        if sample_rate_index >= len(_AAC_SAMPLE_RATES) or not channels:
+            raise MP4Error('Unsupported AAC configuration')
+        # The audio object type is one more than the profile
+        audio_specific_config = u16.pack((profile + 1) << 11 | sample_rate_index << 7 | channels << 3)
+        if self._audio_specific_config is None:
+            self._audio_specific_config, self._channels = audio_specific_config, 8 if channels == 7 else channels
+            self.track = _Track(self.track_id, _AAC_SAMPLE_RATES[sample_rate_index])
+        elif audio_specific_config != self._audio_specific_config:
+            raise MP4Error('The audio configuration changes')
+
+    def _bitrates(self):
+        """@returns (maximum bitrate over a second, average bitrate)"""
+        track = self.track
+        sizes_by_second, decode_time, sample_index = collections.Counter(), 0, 0
+        for count, duration in zip(track.sample_durations[::2], track.sample_durations[1::2], strict=True):
+            for _ in range(count):
+                sizes_by_second[decode_time // track.timescale] += track.sample_sizes[sample_index]
+                decode_time += duration
+                sample_index += 1
+        return max(sizes_by_second.values()) * 8, sum(track.sample_sizes) * 8 * track.timescale // track.duration
+
+    def _sample_entry(self):
+        max_bitrate, average_bitrate = self._bitrates()
+        decoder_config = b''.join((
+            # MPEG-4 audio, in an audio stream
+            u8.pack(0x40), u8.pack(0x05 << 2 | 0x1),
+            u32.pack(max(self.track.sample_sizes))[1:], u32.pack(max_bitrate), u32.pack(average_bitrate),
+            _descriptor(0x05, self._audio_specific_config)))
+        es_descriptor = _descriptor(0x03, u16.pack(self.track_id) + u8.pack(0) + _descriptor(0x04, decoder_config)
+                                    + _descriptor(0x06, u8.pack(0x02)))
+        return box(b'mp4a', b''.join((
+            bytes(6), u16.pack(1),  # data_reference_index
+            bytes(8), u16.pack(self._channels), u16.pack(16),  # channelcount, samplesize
+            # The sample rate is a 16.16 fixed point number, which the higher ones do not fit in
+            bytes(4), u1616.pack(self.track.timescale if self.track.timescale <= 0xFFFF else 0),
+            full_box(b'esds', 0, 0, es_descriptor))))
+
+
+def remux_mpegts(src, dst):
+    """
+    Remux the H.264 video and AAC audio of the MPEG transport stream read from src as an MP4 file into dst
+
+    The samples are written as they are read, followed by the movie box; dst must be seekable.
+    Streams without audio or video, such as ID3 tags, are left out
+
+    @raises MP4Error    If the file can not be remuxed, e.g. if it has other codecs or its parameters change
+    """
+    dst.write(_FTYP)
+    mdat_offset = dst.tell()
+    # The free box makes room for a 64-bit size of the media data box
+    dst.write(box(b'free', b'') + _box_header.pack(0, b'mdat'))
+
+    streams = {}
+    try:
+        for pid, stream_type, pts, dts, data in iter_pes(src):
+            if pid not in streams:
+                track_id = sum(1 for stream in streams.values() if stream) + 1
+                if stream_type == STREAM_TYPE_H264:
+                    streams[pid] = _AVCStream(track_id)
+                elif stream_type == STREAM_TYPE_AAC:
+                    streams[pid] = _AACStream(track_id)
+                elif stream_type in DATA_STREAM_TYPES:
+                    streams[pid] = None
+                else:
+                    raise MP4Error(f'Unsupported stream type 0x{stream_type:02X}')
+            if streams[pid]:
+                streams[pid].add(pts, dts, data, dst)
+    except MPEGTSError as e:
+        raise MP4Error(str(e)) from e
+    except (IndexError, struct.error) as e:
+        raise MP4Error(f'Invalid elementary stream: {e}') from e
+
+    for stream in streams.values():
+        if stream:
+            stream.finish()
+    streams = [stream for stream in streams.values() if stream and stream.track and stream.track.sample_count]
+    if not streams:
+        raise MP4Error('The file has no audio or video')
+
+    data_end = dst.tell()
+    if data_end - mdat_offset - 8 > 0xFFFFFFFF:
+        dst.seek(mdat_offset)
+        dst.write(u32.pack(1) + b'mdat' + u64.pack(data_end - mdat_offset))
+    else:
+        dst.seek(mdat_offset + 8)
+        dst.write(_box_header.pack(data_end - mdat_offset - 8, b'mdat'))
+    dst.seek(data_end)
+
+    start_time = min(stream.start_time for stream in streams)
+    mvhd = full_box(b'mvhd', 0, 0, b''.join((
+        struct.pack('>IIIIiH', 0, 0, _MOVIE_TIMESCALE, 0, 0x10000, 0x100), bytes(10),
+        _UNITY_MATRIX, bytes(24), u32.pack(len(streams) + 1))))
+    tracks = {stream.track_id: stream.track for stream in streams}
+    try:
+        moov = _moov(mvhd + b''.join(stream.trak(start_time) for stream in streams), tracks, {
+            track_id: [offset for offset, _, _, _ in track.chunks] for track_id, track in tracks.items()})
+    except (IndexError, struct.error) as e:
+        raise MP4Error(f'Invalid elementary stream: {e}') from e
+    dst.write(moov)
+
+
+def remux(src, dst):
+    """
+    Remux the MPEG transport stream or fragmented MP4 file read from src as a regular MP4 file into dst
+
+    @raises MP4Error    If the file can not be remuxed; see remux_mpegts and defragment
+    """
+    start = src.tell()
+    if is_mpegts(src):
+        src.seek(start)
+        return remux_mpegts(src, dst)
+    src.seek(start)
+    if not is_mp4(src):
+        raise MP4Error('The file is neither an MP4 file nor an MPEG transport stream')
+    src.seek(start)
+    return defragment(src, dst)
@@ -0,0 +1,199 @@
+"""
+A streaming demuxer of MPEG transport streams, as specified in ISO/IEC 13818-1
+
+Only the first program of the stream is demuxed, and its tables must not change.
+"""
+
+import struct
+
+PACKET_SIZE = 188
+_SYNC_BYTE = 0x47
+_READ_SIZE = PACKET_SIZE * 512
+
+STREAM_TYPE_AAC = 0x0F
+STREAM_TYPE_H264 = 0x1B
+# Streams without audio or video, which can be left out when remuxing
+DATA_STREAM_TYPES = (
+    0x05,  # Private sections
+    0x0B, 0x0C, 0x0D,  # DSM-CC
+    0x15,  # Metadata in PES packets, e.g. ID3 tags
+    0x86,  # SCTE-35 splice information
+)
+
+_PAT_PID = 0
+_TIMESTAMP_WRAP = 1 << 33
+# The PES packets of these streams have no optional header
+_STREAM_IDS_WITHOUT_HEADER = (0xBC, 0xBE, 0xBF, 0xF0, 0xF1, 0xF2, 0xF8, 0xFF)
+
+
+class MPEGTSError(Exception):
+    pass
+
+
+def is_mpegts(stream):
+    """Whether the stream, at its current position, looks like the start of an MPEG transport stream"""
+    data = stream.read(PACKET_SIZE * 2 + 1)
+    return len(data) > PACKET_SIZE and all(data[i] == _SYNC_BYTE for i in range(0, len(data), PACKET_SIZE))
+
+
+def _parse_timestamp(data, offset):
+    b = data[offset:offset + 5]
+    return ((b[0] >> 1) & 0x7) << 30 | b[1] << 22 | (b[2] >> 1) << 15 | b[3] << 7 | b[4] >> 1
+
+
+class _Section:
+    """A PSI section that may span several packets"""
+
+    def __init__(self, payload):
+        pointer_field = payload[0]
+        self.data = bytearray(payload[1 + pointer_field:])
+
+    @property
+    def complete(self):
+        return len(self.data) >= 3 and len(self.data) >= self.length
+
+    @property
+    def length(self):
+        return 3 + (struct.unpack_from('>H', self.data, 1)[0] & 0xFFF)
+
+
+class _Demuxer:
+    def __init__(self):
+        self.pmt_pid = None
+        # Stream type by PID, in the order of the program map table
+        self.streams = None
+        self._sections = {}
+        self._pes = {}
+        self._last_packets = {}
+        self._last_timestamp = None
+
+    def _unwrap(self, timestamp):
+        # Timestamps wrap around after about 26 hours
+        if self._last_timestamp is not None:
+            timestamp += (self._last_timestamp - timestamp + _TIMESTAMP_WRAP // 2) // _TIMESTAMP_WRAP * _TIMESTAMP_WRAP
+        self._last_timestamp = timestamp
+        return timestamp
+
+    def _parse_pat(self, section):
+        if section[0] != 0x00:
+            raise MPEGTSError('Invalid program association table')
+        # The entries follow the 8 byte header, and are followed by a CRC
+        for offset in range(8, len(section) - 4, 4):
+            program_number, pid = struct.unpack_from('>HH', section, offset)
+            if program_number:
+                return pid & 0x1FFF
+        raise MPEGTSError('The stream has no programs')
+
+    def _parse_pmt(self, section):
+        if section[0] != 0x02:
+            raise MPEGTSError('Invalid program map table')
+        program_info_length = struct.unpack_from('>H', section, 10)[0] & 0xFFF
+        streams, offset = {}, 12 + program_info_length
+        while offset < len(section) - 4:
+            stream_type, pid, es_info_length = struct.unpack_from('>BHH', section, offset)
+            streams[pid & 0x1FFF] = stream_type
+            offset += 5 + (es_info_length & 0xFFF)
+        return streams
+
+    def _parse_pes(self, pid, data):
+        if data[:3] != b'\0\0\1':
+            raise MPEGTSError(f'Invalid PES packet in stream {pid}')
+        if data[3] in _STREAM_IDS_WITHOUT_HEADER:
+            return None, None, bytes(data[6:])
+        pts_dts_flags = data[7] >> 6
+        pts = dts = None
+        if pts_dts_flags & 0x2:
+            pts = dts = self._unwrap(_parse_timestamp(data, 9))
+        if pts_dts_flags == 0x3:
+            dts = self._unwrap(_parse_timestamp(data, 14))
+        return pts, dts, bytes(data[9 + data[8]:])
+
+    def _end_pes(self, pid):
+        data = self._pes.pop(pid, None)
+        if data:
+            return (pid, self.streams[pid], *self._parse_pes(pid, data))
+
+    def _psi(self, pid, payload_unit_start, payload):
+        if payload_unit_start:
+            section = self._sections[pid] = _Section(payload)
+        elif pid in self._sections:
+            section = self._sections[pid]
+            section.data += payload
+        else:
+            return
+        if not section.complete:
+            return
+        del self._sections[pid]
+        data = bytes(section.data[:section.length])
+        if pid == _PAT_PID:
+            self.pmt_pid = self._parse_pat(data)
+        elif self.streams is None:
+            self.streams = self._parse_pmt(data)
+        elif self._parse_pmt(data) != self.streams:
+            raise MPEGTSError('The streams of the program change')
+
+    def packet(self, packet):
+        """@returns A completed PES packet as (pid, stream_type, pts, dts, data), if any"""
+        if packet[0] != _SYNC_BYTE:
+            raise MPEGTSError('Lost synchronization')
+        transport_error, payload_unit_start = packet[1] & 0x80, packet[1] & 0x40
+        pid = struct.unpack_from('>H', packet, 1)[0] & 0x1FFF
+        adaptation_field_control = (packet[3] >> 4) & 0x3
+        if transport_error or not adaptation_field_control & 0x1:
+            return None
+        discontinuity = False
+        offset = 4
+        if adaptation_field_control & 0x2:
+            discontinuity = packet[4] and packet[5] & 0x80
+            offset += 1 + packet[4]
+        # A packet may be sent twice in a row. The continuity counters are not compared by themselves,
+        # since they restart where streams were concatenated, e.g. the segments of HLS
+        if not discontinuity and self._last_packets.get(pid) == packet:
+            return None
+        self._last_packets[pid] = packet
+
+        payload = packet[offset:]
+        if pid == _PAT_PID or pid == self.pmt_pid:
+            self._psi(pid, payload_unit_start, payload)
+        elif self.streams and pid in self.streams:
+            pes = None
+            if payload_unit_start:
+                pes = self._end_pes(pid)
+                self._pes[pid] = bytearray()
+            if pid in self._pes:
+                self._pes[pid] += payload
+            return pes
+
+    def end(self):
+        """@returns The remaining PES packets"""
+        return [self._end_pes(pid) for pid in list(self._pes)]
+
+
+def iter_pes(stream):
+    """
+    Iterate over the PES packets of the elementary streams of the transport stream
+
+    The timestamps are in units of 90 kHz, and do not wrap around.
+    A packet is yielded once the start of the next one of its stream has been read
+
+    @returns    An iterator of (pid, stream_type, pts, dts, data). The timestamps may be None
+    """
+    demuxer = _Demuxer()
+    remainder = b''
+    try:
+        while data := stream.read(_READ_SIZE):
+            data = remainder + data
+            end = len(data) - len(data) % PACKET_SIZE
+            # A truncated packet at the end of the stream is ignored
+            remainder = data[end:]
+            view = memoryview(data)
+            for offset in range(0, end, PACKET_SIZE):
+                if pes := demuxer.packet(view[offset:offset + PACKET_SIZE]):
+                    yield pes
+        if demuxer.streams is None:
+            raise MPEGTSError('Missing program map table')
+        for pes in demuxer.end():
+            if pes:
+                yield pes
+    except (IndexError, struct.error) as e:
+        raise MPEGTSError(f'Invalid packet: {e}') from e
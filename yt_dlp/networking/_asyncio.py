@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import collections
+import functools
+import ssl
+import threading
+import urllib.parse
+import urllib.request
+import weakref
+import zlib
+
+from ._helper import (
+    CookieResponseAdapter,
+    add_accept_encoding_header,
+    create_proxied_connection,
+    get_redirect_method,
+)
+from ._urllib import HTTPHandler
+from .common import (
+    AsyncRequestHandler,
+    AsyncResponse,
+    Features,
+    register_preference,
+    register_rh,
+)
+from .exceptions import (
+    CertificateVerifyError,
+    HTTPError,
+    IncompleteRead,
+    ProxyError,
+    RequestError,
+    SSLError,
+    TransportError,
+)
+from ..dependencies import brotli
+from ..socks import ProxyError as SocksProxyError
+from ..utils.networking import normalize_url, select_proxy
+
+SUPPORTED_ENCODINGS = ['gzip', 'deflate']
+
+if brotli is not None:
+    SUPPORTED_ENCODINGS.append('br')
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 10
+_CHUNK_SIZE = 65536
+
+
+class _StaleConnectionError(Exception):
+    """A kept-alive connection was closed by the server before the response, so the request can be sent again"""
+
+
+class _Connection:
+    def __init__(self, reader, writer, pool):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+        # The idle connections to the same origin, in the same event loop
+        self._pool = pool
+
+    @property
+    def usable(self):
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def release(self):
+        if self.usable:
+            self.reused = True
+            self._pool.append(self)
+        else:
+            self.close()
+
+    def close(self):
+        self.writer.transport.abort()
+
+
+class _Decoder:
+    """Decode a content-encoded body chunk by chunk"""
+
+    def __init__(self, encodings):
+        self._encodings = encodings
+        # Only a single gzip or deflate encoding can be decoded incrementally
+        self._incremental = len(encodings) == 1 and encodings[0] in ('gzip', 'deflate')
+        self._decompressor = None
+        self._buffer = bytearray()
+
+    def decode(self, data):
+        if not self._incremental:
+            self._buffer += data
+            return b''
+        if self._decompressor is None:
+            if self._encodings[0] == 'gzip':
+                wbits = zlib.MAX_WBITS | 16
+            elif len(data) >= 2 and data[0] & 0x0F == 8 and ((data[0] << 8) | data[1]) % 31 == 0:
+                wbits = zlib.MAX_WBITS  # zlib header
+            else:
+                wbits = -zlib.MAX_WBITS  # raw deflate
+            self._decompressor = zlib.decompressobj(wbits)
+        if self._decompressor.eof:
+            # There may be junk added the end of the file
+            return b''
+        return self._decompressor.decompress(data)
+
+    def flush(self):
+        if self._incremental:
+            return self._decompressor.flush() if self._decompressor else b''
+        body = bytes(self._buffer)
+        for encoding in reversed(self._encodings):
+            if encoding == 'gzip':
+                body = HTTPHandler.gz(body)
+            elif encoding == 'deflate':
+                body = HTTPHandler.deflate(body)
+            elif encoding == 'br' and brotli:
+                body = HTTPHandler.brotli(body)
+        return body
+
+
+class AsyncioResponse(AsyncResponse):
+    def __init__(self, connection, url, headers, status, reason, length, chunked, keep_alive, timeout):
+        super().__init__(url=url, headers={}, status=status, reason=reason)
+        # Repeated headers such as Set-Cookie must be kept
+        for name, value in headers:
+            self.headers.add_header(name, value)
+        self._connection = connection
+        self._remaining = length  # None if the body ends with the connection
+        self._chunked = chunked
+        self._chunk_remaining = 0
+        self._received = 0
+        self._keep_alive = keep_alive
+        self._timeout = timeout
+        self._buffer = bytearray()
+        self._eof = length == 0 and not chunked
+        encodings = [e.strip() for e in (self.get_header('Content-Encoding') or '').split(',') if e.strip()]
+        self._decoder = _Decoder(encodings) if encodings and not self._eof else None
+        if self._eof:
+            self._finish()
+
+    async def _read_raw(self):
+        reader = self._connection.reader
+        if self._chunked:
+            if not self._chunk_remaining:
+                line = await reader.readline()
+                try:
+                    size = int(line.split(b';', 1)[0], 16)
+                except ValueError:
+                    raise IncompleteRead(partial=self._received)
+                if not size:
+                    # Trailers
+                    while (await reader.readline()).strip():
+                        pass
+                    return b''
+                self._chunk_remaining = size
+            data = await reader.read(min(self._chunk_remaining, _CHUNK_SIZE))
+            if not data:
+                raise IncompleteRead(partial=self._received, expected=self._chunk_remaining)
+            self._chunk_remaining -= len(data)
+            if not self._chunk_remaining:
+                await reader.readexactly(2)
+        elif self._remaining is not None:
+            if not self._remaining:
+                return b''
+            data = await reader.read(min(self._remaining, _CHUNK_SIZE))
+            if not data:
+                raise IncompleteRead(partial=self._received, expected=self._remaining)
+            self._remaining -= len(data)
+        else:
+            data = await reader.read(_CHUNK_SIZE)
+        self._received += len(data)
+        return data
+
+    async def _fill(self, size):
+        while not self._eof and (size is None or len(self._buffer) < size):
+            data = await asyncio.wait_for(self._read_raw(), self._timeout)
+            if not data:
+                self._eof = True
+                if self._decoder:
+                    self._buffer += self._decoder.flush()
+            else:
+                self._buffer += self._decoder.decode(data) if self._decoder else data
+
+    async def read(self, amt=None):
+        if self.closed:
+            return b''
+        try:
+            await self._fill(amt)
+        except RequestError:
+            self.close()
+            raise
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError, zlib.error) as e:
+            self.close()
+            raise TransportError(cause=e) from e
+        size = len(self._buffer) if amt is None else min(amt, len(self._buffer))
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        if self._eof and not self._buffer:
+            self.close()
+        return data
+
+    def _finish(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        # The end of the body is only known without reading until the connection is closed
+        if self._eof and self._keep_alive and (self._chunked or self._remaining is not None):
+            connection.release()
+        else:
+            connection.close()
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+@register_rh
+class AsyncioRH(AsyncRequestHandler):
+
+    """HTTP/1.1 RequestHandler using asyncio streams
+
+    The connections are kept alive and reused within the event loop they were opened in.
+    When used as a blocking handler, the requests are sent in an event loop of the handler.
+    """
+    _SUPPORTED_URL_SCHEMES = ('http', 'https')
+    _SUPPORTED_ENCODINGS = tuple(SUPPORTED_ENCODINGS)
+    _SUPPORTED_PROXY_SCHEMES = ('http', 'socks4', 'socks4a', 'socks5', 'socks5h')
+    _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY)
+    RH_NAME = 'asyncio'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pools_lock = threading.Lock()
+        # Idle connections of each event loop, by origin
+        self._pools = weakref.WeakKeyDictionary()
+
+    def _check_extensions(self, extensions):
+        super()._check_extensions(extensions)
+        extensions.pop('cookiejar', None)
+        extensions.pop('timeout', None)
+        extensions.pop('legacy_ssl', None)
+        extensions.pop('keep_header_casing', None)
+
+    def _prepare_headers(self, _, headers):
+        add_accept_encoding_header(headers, SUPPORTED_ENCODINGS)
+
+    def _print_verbose(self, msg):
+        if self.verbose:
+            self._logger.stdout(f'{self.RH_NAME}: {msg}')
+
+    def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = collections.defaultdict(list)
+            return pool
+
+    async def _aclose(self):
+        for connections in self._get_pool().values():
+            for connection in connections:
+                connection.close()
+
+    def close(self):
+        with self._pools_lock:
+            pools = [(loop, pool) for loop, pool in self._pools.items() if loop is not self._loop]
+        for loop, pool in pools:
+            if loop.is_closed():
+                continue
+            for connections in pool.values():
+                for connection in connections:
+                    loop.call_soon_threadsafe(connection.close)
+        # The connections of the event loop of the handler are closed in _aclose
+        super().close()
+        with self._pools_lock:
+            self._pools.clear()
+
+    @staticmethod
+    def _forward_proxy(url, proxy):
+        """The HTTP proxy that http urls are requested from directly, instead of through a tunnel"""
+        if proxy and url.lower().startswith('http:') and urllib.parse.urlsplit(proxy).scheme.lower() == 'http':
+            return proxy
+        return None
+
+    async def _open(self, request, url, proxy, timeout):
+        parsed = urllib.parse.urlsplit(url)
+        host, port = parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80)
+        address = (host, port)
+        if self._forward_proxy(url, proxy):
+            proxy_url = urllib.parse.urlsplit(proxy)
+            address, proxy = (proxy_url.hostname, proxy_url.port or 80), None
+        try:
+            # Connecting, including the proxy handshakes, is blocking and done in a thread
+            sock = await asyncio.wait_for(asyncio.to_thread(
+                create_proxied_connection, address, proxy, timeout,
+                (self.source_address, 0) if self.source_address else None), timeout)
+            sock.settimeout(None)
+            ssl_context = None
+            if parsed.scheme == 'https':
+                ssl_context = self._make_sslcontext(legacy_ssl_support=request.extensions.get('legacy_ssl'))
+            try:
+                reader, writer = await asyncio.open_connection(
+                    sock=sock, ssl=ssl_context, limit=_CHUNK_SIZE,
+                    server_hostname=host if ssl_context else None,
+                    ssl_handshake_timeout=timeout if ssl_context else None)
+            except BaseException:
+                sock.close()
+                raise
+        except SocksProxyError as e:
+            raise ProxyError(cause=e) from e
+        except ssl.SSLCertVerificationError as e:
+            raise CertificateVerifyError(cause=e) from e
+        except ssl.SSLError as e:
+            raise SSLError(cause=e) from e
+        except (OSError, asyncio.TimeoutError) as e:
+            raise TransportError(cause=e) from e
+        self._print_verbose(f'Opened a connection to {host}:{port}')
+        return reader, writer
+
+    async def _get_connection(self, request, url, proxy, timeout, fresh=False):
+        parsed = urllib.parse.urlsplit(url)
+        pool = self._get_pool()[
+            (parsed.scheme, parsed.hostname, parsed.port, proxy, request.extensions.get('legacy_ssl'))]
+        while pool and not fresh:
+            connection = pool.pop()
+            if connection.usable:
+                return connection
+            connection.close()
+        return _Connection(*await self._open(request, url, proxy, timeout), pool)
+
+    def _encode_head(self, method, url, headers, proxy):
+        parsed = urllib.parse.urlsplit(url)
+        netloc = parsed.netloc.rpartition('@')[2]
+        target = urllib.parse.urlunsplit(('', '', parsed.path or '/', parsed.query, ''))
+        if proxy:
+            target = f'{parsed.scheme}://{netloc}{target}'
+            proxy_url = urllib.parse.urlsplit(proxy)
+            if proxy_url.username is not None:
+                credentials = f'{urllib.parse.unquote(proxy_url.username)}:{urllib.parse.unquote(proxy_url.password or "")}'
+                headers = {**headers, 'Proxy-Authorization': f'Basic {base64.b64encode(credentials.encode()).decode()}'}
+        if 'host' not in map(str.lower, headers):
+            headers = {'Host': netloc, **headers}
+        lines = [f'{method} {target} HTTP/1.1', *(f'{name}: {value}' for name, value in headers.items())]
+        for line in lines:
+            if any(c in line for c in '\r\n\0'):
+                raise RequestError(f'Invalid character in request: {line!r}')
+        try:
+            return ''.join(f'{line}\r\n' for line in lines).encode('latin-1') + b'\r\n'
+        except UnicodeEncodeError as e:
+            raise RequestError(cause=e) from e
+
+    @staticmethod
+    async def _write_body(writer, data, chunked, timeout):
+        if isinstance(data, bytes):
+            writer.write(data)
+        elif data is not None:
+            for chunk in iter(functools.partial(data.read, _CHUNK_SIZE), b'') if hasattr(data, 'read') else data:
+                if chunked and chunk:
+                    chunk = b'%x\r\n%s\r\n' % (len(chunk), chunk)
+                writer.write(chunk)
+                await asyncio.wait_for(writer.drain(), timeout)
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+        await asyncio.wait_for(writer.drain(), timeout)
+
+    @staticmethod
+    async def _read_head(reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise _StaleConnectionError
+            version, _, status = line.decode('latin-1').rstrip('\r\n').partition(' ')
+            status, _, reason = status.partition(' ')
+            if not version.startswith('HTTP/') or not status.isdigit():
+                raise TransportError(f'Invalid status line: {line!r}')
+            headers = []
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                line = line.decode('latin-1').rstrip('\r\n')
+                if line[:1] in (' ', '\t') and headers:
+                    # Obsolete line folding
+                    headers[-1] = (headers[-1][0], f'{headers[-1][1]} {line.strip()}')
+                    continue
+                name, _, value = line.partition(':')
+                headers.append((name.strip(), value.strip()))
+            # Interim responses such as 100 Continue are followed by the final response
+            if not 100 <= int(status) < 200:
+                return version, int(status), reason, headers
+
+    async def _send_once(self, request, method, url, headers, data, timeout):
+        proxy = select_proxy(url, self._get_proxies(request))
+        lower_headers = {name.lower() for name in headers}
+        chunked = False
+        if isinstance(data, bytes):
+            if 'content-length' not in lower_headers:
+                headers = {**headers, 'Content-Length': str(len(data))}
+        elif data is not None:
+            if 'content-length' not in lower_headers and 'transfer-encoding' not in lower_headers:
+                headers = {**headers, 'Transfer-Encoding': 'chunked'}
+                chunked = True
+        elif method in ('PATCH', 'POST', 'PUT') and 'content-length' not in lower_headers:
+            headers = {**headers, 'Content-Length': '0'}
+        head = self._encode_head(method, url, headers, self._forward_proxy(url, proxy))
+
+        for fresh in (False, True):
+            connection = await self._get_connection(request, url, proxy, timeout, fresh=fresh)
+            try:
+                connection.writer.write(head)
+                await self._write_body(connection.writer, data, chunked, timeout)
+                version, status, reason, response_headers = await asyncio.wait_for(
+                    self._read_head(connection.reader), timeout)
+            except BaseException as e:
+                connection.close()
+                if isinstance(e, (_StaleConnectionError, ConnectionError)) and connection.reused and not fresh:
+                    if data is None or isinstance(data, bytes):
+                        self._print_verbose('Retrying the request on a new connection')
+                        continue
+                if isinstance(e, _StaleConnectionError):
+                    raise TransportError(cause=ConnectionResetError('The server closed the connection')) from e
+                if isinstance(e, (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError)):
+                    raise TransportError(cause=e) from e
+                raise
+            break
+
+        def header_tokens(name):
+            return {
+                token.strip().lower() for header_name, value in response_headers if header_name.lower() == name
+                for token in value.split(',')}
+
+        length = None
+        chunked = 'chunked' in header_tokens('transfer-encoding')
+        if method == 'HEAD' or status in (204, 304):
+            length, chunked = 0, False
+        elif not chunked:
+            length = next((int(v) for n, v in response_headers if n.lower() == 'content-length' and v.isdigit()), None)
+        keep_alive = version == 'HTTP/1.1' and 'close' not in header_tokens('connection')
+        return AsyncioResponse(
+            connection, url, response_headers, status, reason or None, length, chunked, keep_alive, timeout)
+
+    async def _asend(self, request):
+        headers = self._get_headers(request)
+        cookiejar = self._get_cookiejar(request)
+        timeout = self._calculate_timeout(request)
+        method, url, data = request.method, request.url, request.data
+
+        for _ in range(_MAX_REDIRECTS + 1):
+            # The cookies are only added if there is no Cookie header
+            cookie_request = urllib.request.Request(url, headers=headers)
+            cookiejar.add_cookie_header(cookie_request)
+            response = await self._send_once(
+                request, method, url, {**headers, **cookie_request.unredirected_hdrs}, data, timeout)
+            cookiejar.extract_cookies(CookieResponseAdapter(response), cookie_request)
+
+            location = response.get_header('Location')
+            if response.status not in _REDIRECT_STATUSES or not location:
+                break
+            response.close()
+            # As of RFC 2616 default charset is iso-8859-1 that is respected by Python 3
+            url = normalize_url(urllib.parse.urljoin(url, location.encode('iso-8859-1').decode()))
+            new_method = get_redirect_method(method, response.status)
+            # The cookies are set again from the cookiejar for the new url
+            remove_headers = ['cookie']
+            # only remove payload if method changed (e.g. POST to GET)
+            if new_method != method:
+                data = None
+                remove_headers.extend(['content-length', 'content-type'])
+            headers = {k: v for k, v in headers.items() if k.lower() not in remove_headers}
+            method = new_method
+        else:
+            raise HTTPError(response, redirect_loop=True)
+
+        if not 200 <= response.status < 300:
+            raise HTTPError(response)
+        return response
+
+
+@register_preference(AsyncioRH)
+def asyncio_preference(rh, request):
+    # The blocking handlers are preferred for blocking requests, as every read is passed to the event loop
+    return -100
@@ -0,0 +1,636 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import functools
+import http.client
+import io
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from ._helper import (
+    CookieResponseAdapter,
+    add_accept_encoding_header,
+    create_proxied_connection,
+    get_redirect_method,
+)
+from ._urllib import HTTPHandler, UrllibResponseAdapter, handle_response_read_exceptions
+from .common import Features, RequestHandler, Response, register_preference, register_rh
+from .exceptions import (
+    CertificateVerifyError,
+    HTTPError,
+    ProxyError,
+    RequestError,
+    SSLError,
+    TransportError,
+)
+from ..dependencies import brotli, h2
+from ..socks import ProxyError as SocksProxyError
+from ..utils import int_or_none
+from ..utils.networking import normalize_url, select_proxy
+
+if h2 is None:
+    raise ImportError('h2 module is not installed')
+
+h2_version = tuple(int_or_none(x, default=0) for x in h2.__version__.split('.'))
+if h2_version < (4, 0):
+    h2._yt_dlp__version = f'{h2.__version__} (unsupported)'
+    raise ImportError('Only h2 >= 4.0 is supported')
+
+import h2.config
+import h2.connection
+import h2.errors
+import h2.events
+import h2.exceptions
+import h2.settings
+
+SUPPORTED_ENCODINGS = ['gzip', 'deflate']
+
+if brotli is not None:
+    SUPPORTED_ENCODINGS.append('br')
+
+# Connection-specific headers are not allowed in HTTP/2
+# https://datatracker.ietf.org/doc/html/rfc9113#section-8.2.2
+_CONNECTION_HEADERS = ('connection', 'host', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade')
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 10
+# Larger than the default of 64KiB so that a single stream is not limited by the round-trip time
+_WINDOW_SIZE = 16 * 1024 * 1024
+
+
+class _RetryableStreamError(Exception):
+    """The server did not process the stream, so the request can be sent again on another connection"""
+
+
+class _H2Stream:
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.headers = None
+        self.chunks = collections.deque()  # [data, unacknowledged flow-controlled length]
+        self.ended = False
+        self.error = None
+
+
+class H2Connection:
+    """
+    An HTTP/2 connection, on which the streams of several threads are multiplexed
+
+    The socket is only used by a background thread, since an SSL socket cannot be read
+    and written concurrently. The state of the connection is only modified while holding
+    the lock, and a change is signalled through the condition
+    """
+
+    def __init__(self, sock, name):
+        self.name = name
+        self._sock = sock
+        self._sock.setblocking(False)
+        # Frames are small and written as soon as they are ready
+        with contextlib.suppress(OSError):
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_writer.setblocking(False)
+        self._condition = threading.Condition()
+        self._streams = {}
+        self._outgoing = bytearray()
+        self._error = None
+        self._goaway = False
+        self._closing = False
+        self._h2 = h2.connection.H2Connection(h2.config.H2Configuration(client_side=True, header_encoding=None))
+        self._h2.initiate_connection()
+        self._h2.update_settings({
+            h2.settings.SettingCodes.ENABLE_PUSH: 0,
+            h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: _WINDOW_SIZE,
+        })
+        self._h2.increment_flow_control_window(_WINDOW_SIZE - self._h2.inbound_flow_control_window)
+        self._flush()
+        self._io_thread = threading.Thread(target=self._run, name=f'h2 connection to {name}', daemon=True)
+        self._io_thread.start()
+
+    @property
+    def usable(self):
+        return self._error is None and not self._goaway
+
+    def _flush(self):
+        # Must hold the lock
+        data = self._h2.data_to_send()
+        if data:
+            self._outgoing += data
+            self._wakeup()
+
+    def _wakeup(self):
+        with contextlib.suppress(OSError):  # A wakeup is already pending
+            self._wakeup_writer.send(b'\0')
+
+    def _wait(self, predicate, deadline):
+        # Must hold the lock
+        while not predicate():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._condition.wait(remaining):
+                if not predicate():
+                    raise TransportError(cause=TimeoutError('Timed out waiting for the server'))
+
+    def _receive(self):
+        # Decrypted data can remain buffered in the SSL object, so read until it would block
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+                return
+            if not data:
+                raise ConnectionResetError('The server closed the connection')
+            with self._condition:
+                for event in self._h2.receive_data(data):
+                    self._handle_event(event)
+                self._flush()
+                self._condition.notify_all()
+
+    def _send(self):
+        with self._condition:
+            data = bytes(self._outgoing)
+        sent = 0
+        with contextlib.suppress(ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+            while sent < len(data):
+                sent += self._sock.send(data[sent:])
+        with self._condition:
+            del self._outgoing[:sent]
+            return bool(self._outgoing)
+
+    def _run(self):
+        try:
+            while True:
+                self._receive()
+                pending = self._send()
+                if self._closing:
+                    break
+                readable, _, _ = select.select(
+                    [self._sock, self._wakeup_reader], [self._sock] if pending else [], [])
+                if self._wakeup_reader in readable:
+                    self._wakeup_reader.recv(1024)
+        except Exception as e:
+            with self._condition:
+                if self._error is None:
+                    self._error = e
+                self._condition.notify_all()
+        finally:
+            with contextlib.suppress(OSError):
+                self._sock.shutdown(socket.SHUT_RDWR)
+            self._sock.close()
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+
+    def _handle_event(self, event):
+        # Must hold the lock
+        stream = self._streams.get(getattr(event, 'stream_id', None))
+        if isinstance(event, h2.events.ResponseReceived) and stream:
+            stream.headers = event.headers
+        elif isinstance(event, h2.events.DataReceived):
+            if stream:
+                stream.chunks.append([event.data, event.flow_controlled_length])
+            else:  # The stream was closed by the client
+                self._h2.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded) and stream:
+            stream.ended = True
+        elif isinstance(event, h2.events.StreamReset) and stream:
+            stream.error = (
+                _RetryableStreamError() if event.error_code == h2.errors.ErrorCodes.REFUSED_STREAM
+                else ConnectionResetError(f'The server reset the stream: {event.error_code!r}'))
+        elif isinstance(event, h2.events.PushedStreamReceived):
+            self._h2.reset_stream(event.pushed_stream_id, h2.errors.ErrorCodes.REFUSED_STREAM)
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self._goaway = True
+            for stream_id, stream in self._streams.items():
+                if event.last_stream_id is None or stream_id > event.last_stream_id:
+                    stream.error = _RetryableStreamError()
+
+    def _check(self, stream=None):
+        # Must hold the lock
+        if stream is not None and stream.error is not None:
+            error = stream.error
+        elif self._error is not None and (stream is None or not stream.ended):
+            error = self._error
+        else:
+            return
+        if isinstance(error, _RetryableStreamError):
+            raise error
+        raise TransportError(cause=error) from error
+
+    def open_stream(self, headers, end_stream, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            # Wait for a slot if the server limits the number of concurrent streams
+            self._wait(lambda: (
+                not self.usable
+                or self._h2.open_outbound_streams < self._h2.remote_settings.max_concurrent_streams), deadline)
+            if not self.usable:
+                raise _RetryableStreamError
+            try:
+                stream_id = self._h2.get_next_available_stream_id()
+            except h2.exceptions.NoAvailableStreamIDError:
+                self._goaway = True
+                raise _RetryableStreamError
+            self._h2.send_headers(stream_id, headers, end_stream=end_stream)
+            stream = self._streams[stream_id] = _H2Stream(stream_id)
+            self._flush()
+        return stream
+
+    def send_data(self, stream, chunks, timeout):
+        for chunk in chunks:
+            view = memoryview(chunk)
+            while view:
+                with self._condition:
+                    deadline = time.monotonic() + timeout
+                    self._wait(lambda: (
+                        stream.error is not None or self._error is not None
+                        or self._h2.local_flow_control_window(stream.stream_id) > 0), deadline)
+                    self._check(stream)
+                    size = min(
+                        len(view), self._h2.local_flow_control_window(stream.stream_id),
+                        self._h2.max_outbound_frame_size)
+                    self._h2.send_data(stream.stream_id, view[:size].tobytes())
+                    self._flush()
+                view = view[size:]
+        with self._condition:
+            self._check(stream)
+            self._h2.end_stream(stream.stream_id)
+            self._flush()
+
+    def get_headers(self, stream, timeout):
+        with self._condition:
+            self._wait(lambda: (
+                stream.headers is not None or stream.error is not None
+                or stream.ended or self._error is not None), time.monotonic() + timeout)
+            self._check(stream)
+            if stream.headers is None:
+                raise TransportError(cause=ConnectionResetError('The server did not send a response'))
+            return stream.headers
+
+    def read(self, stream, size, timeout):
+        """Return up to size bytes of the response body, or an empty bytes object at the end"""
+        with self._condition:
+            self._wait(lambda: (
+                stream.chunks or stream.ended or stream.error is not None
+                or self._error is not None), time.monotonic() + timeout)
+            if not stream.chunks:
+                self._check(stream)
+                return b''
+            chunk = stream.chunks[0]
+            data, chunk[0] = chunk[0][:size], chunk[0][size:]
+            if not chunk[0]:
+                # The flow control window is only freed once the data is read
+                stream.chunks.popleft()
+                self._h2.acknowledge_received_data(chunk[1], stream.stream_id)
+                self._flush()
+            return data
+
+    def close_stream(self, stream):
+        with self._condition:
+            if self._streams.pop(stream.stream_id, None) is None:
+                return
+            for _, length in stream.chunks:
+                self._h2.acknowledge_received_data(length, stream.stream_id)
+            stream.chunks.clear()
+            if self._error is not None:
+                return
+            if not stream.ended and stream.error is None:
+                self._h2.reset_stream(stream.stream_id, h2.errors.ErrorCodes.CANCEL)
+            self._flush()
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            if self._error is None:
+                self._error = ConnectionAbortedError('The connection was closed')
+                with contextlib.suppress(h2.exceptions.ProtocolError):
+                    self._h2.close_connection()
+                    self._flush()
+            self._closing = True
+            self._wakeup()
+            self._condition.notify_all()
+
+
+class H2StreamReader(io.RawIOBase):
+    def __init__(self, connection, stream, timeout):
+        self._connection = connection
+        self._stream = stream
+        self._timeout = timeout
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.eof:
+            return 0
+        data = self._connection.read(self._stream, len(buffer), self._timeout)
+        buffer[:len(data)] = data
+        if not data:
+            self.eof = True
+        return len(data)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+        # Unlike a raw stream, read as much as requested like a buffered stream would
+        data = bytearray()
+        while len(data) < size and not self.eof:
+            chunk = self._connection.read(self._stream, size - len(data), self._timeout)
+            data += chunk
+            self.eof = not chunk
+        return bytes(data)
+
+    def close(self):
+        if not self.closed:
+            self._connection.close_stream(self._stream)
+        super().close()
+
+
+class H2ResponseAdapter(Response):
+    def __init__(self, fp, url, headers, status):
+        super().__init__(fp=fp, url=url, headers={}, status=status)
+        # Repeated headers such as Set-Cookie must be kept
+        for name, value in headers:
+            self.headers.add_header(name, value)
+
+    def read(self, amt=None):
+        if self.closed:
+            return b''
+        try:
+            data = self.fp.read(amt)
+        except RequestError:
+            self.close()
+            raise
+        except Exception as e:
+            self.close()
+            handle_response_read_exceptions(e)
+            raise TransportError(cause=e) from e
+        if isinstance(self.fp, H2StreamReader):
+            finished = self.fp.eof
+        else:  # decompressed body
+            finished = self.fp.tell() >= len(self.fp.getbuffer())
+        if finished:
+            self.close()
+        return data
+
+
+@register_rh
+class H2RH(RequestHandler):
+
+    """HTTP/2 RequestHandler
+    https://github.com/python-hyper/h2
+
+    Concurrent requests to the same origin are multiplexed over a single connection.
+    If the server does not negotiate HTTP/2, the request is sent over HTTP/1.1 instead
+    and the other handlers are preferred for later requests to that origin
+    """
+    _SUPPORTED_URL_SCHEMES = ('https',)
+    _SUPPORTED_ENCODINGS = tuple(SUPPORTED_ENCODINGS)
+    _SUPPORTED_PROXY_SCHEMES = ('http', 'socks4', 'socks4a', 'socks5', 'socks5h')
+    _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY)
+    RH_NAME = 'h2'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._connect_locks = collections.defaultdict(threading.Lock)
+        self._http1_origins = set()
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+    def _check_extensions(self, extensions):
+        super()._check_extensions(extensions)
+        extensions.pop('cookiejar', None)
+        extensions.pop('timeout', None)
+        extensions.pop('legacy_ssl', None)
+
+    def _prepare_headers(self, _, headers):
+        add_accept_encoding_header(headers, SUPPORTED_ENCODINGS)
+
+    def supports_http2(self, url):
+        """Whether the server of the url is not known to lack HTTP/2 support"""
+        parsed = urllib.parse.urlsplit(url)
+        return (parsed.hostname, parsed.port or 443) not in self._http1_origins
+
+    def _print_verbose(self, msg):
+        if self.verbose:
+            self._logger.stdout(f'{self.RH_NAME}: {msg}')
+
+    def _open(self, request, url, timeout):
+        """Return an H2Connection, or a socket if the server does not support HTTP/2"""
+        parsed = urllib.parse.urlsplit(url)
+        scheme, host = parsed.scheme.lower(), parsed.hostname
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        proxy = select_proxy(url, self._get_proxies(request))
+        try:
+            sock = create_proxied_connection(
+                (host, port), proxy, timeout, (self.source_address, 0) if self.source_address else None)
+            if scheme != 'https':
+                return sock
+            ssl_context = self._make_sslcontext(legacy_ssl_support=request.extensions.get('legacy_ssl'))
+            ssl_context.set_alpn_protocols(['h2', 'http/1.1'])
+            try:
+                sock = ssl_context.wrap_socket(sock, server_hostname=host)
+            except BaseException:
+                sock.close()
+                raise
+            if sock.selected_alpn_protocol() != 'h2':
+                self._print_verbose(f'{host}:{port} does not support HTTP/2')
+                with self._lock:
+                    self._http1_origins.add((host, port))
+                return sock
+            sock.settimeout(None)  # Reads are timed out by the waiting threads instead
+            self._print_verbose(f'Opened a connection to {host}:{port}')
+            return H2Connection(sock, f'{host}:{port}')
+        except SocksProxyError as e:
+            raise ProxyError(cause=e) from e
+        except ssl.SSLCertVerificationError as e:
+            raise CertificateVerifyError(cause=e) from e
+        except ssl.SSLError as e:
+            raise SSLError(cause=e) from e
+        except (OSError, h2.exceptions.ProtocolError) as e:
+            raise TransportError(cause=e) from e
+
+    def _get_connection(self, request, url, timeout, fresh=False):
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.hostname, parsed.port or 443, select_proxy(url, self._get_proxies(request)),
+               request.extensions.get('legacy_ssl'))
+        with self._connect_locks[key]:
+            with self._lock:
+                connection = self._connections.get(key)
+            if connection is not None and connection.usable and not fresh:
+                return connection
+            connection = self._open(request, url, timeout)
+            if isinstance(connection, H2Connection):
+                with self._lock:
+                    old_connection = self._connections.get(key)
+                    self._connections[key] = connection
+                if old_connection is not None and not old_connection.usable:
+                    old_connection.close()
+            return connection
+
+    def _send_http1(self, sock, method, url, headers, data, timeout):
+        parsed = urllib.parse.urlsplit(url)
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+        conn.sock = sock
+        sock.settimeout(timeout)
+        headers = {**headers, 'Connection': 'close'}
+        try:
+            conn.request(method, urllib.parse.urlunsplit(('', '', parsed.path or '/', parsed.query, '')),
+                         body=data, headers=headers)
+            res = conn.getresponse()
+        except (http.client.InvalidURL, ValueError) as e:
+            conn.close()
+            raise RequestError(cause=e) from e
+        except Exception as e:
+            conn.close()
+            handle_response_read_exceptions(e)
+            raise
+        res.url = url
+        return UrllibResponseAdapter(HTTPHandler().http_response(None, res))
+
+    @staticmethod
+    def _h2_headers(method, url, headers):
+        parsed = urllib.parse.urlsplit(url)
+        authority = parsed.netloc.rpartition('@')[2]
+        h2_headers = []
+        for name, value in headers.items():
+            name = name.lower()
+            if name == 'host':
+                authority = value
+            elif name not in _CONNECTION_HEADERS:
+                h2_headers.append((name, value))
+        return [
+            (':method', method),
+            (':scheme', parsed.scheme),
+            (':authority', authority),
+            (':path', urllib.parse.urlunsplit(('', '', parsed.path or '/', parsed.query, ''))),
+            *h2_headers,
+        ]
+
+    @staticmethod
+    def _iter_data(data):
+        if data is None:
+            return
+        if isinstance(data, bytes):
+            yield data
+        elif hasattr(data, 'read'):
+            yield from iter(functools.partial(data.read, 65536), b'')
+        else:
+            yield from data
+
+    def _send_h2(self, connection, method, url, headers, data, timeout):
+        if isinstance(data, bytes) and 'content-length' not in map(str.lower, headers):
+            headers = {**headers, 'Content-Length': str(len(data))}
+        try:
+            stream = connection.open_stream(self._h2_headers(method, url, headers), data is None, timeout)
+        except (h2.exceptions.ProtocolError, ValueError, TypeError) as e:
+            # h2 validates the headers before sending them
+            raise RequestError(cause=e) from e
+        except OSError as e:
+            raise TransportError(cause=e) from e
+        try:
+            if data is not None:
+                connection.send_data(stream, self._iter_data(data), timeout)
+            response_headers = connection.get_headers(stream, timeout)
+        except BaseException as e:
+            connection.close_stream(stream)
+            if isinstance(e, (OSError, h2.exceptions.ProtocolError)):
+                raise TransportError(cause=e) from e
+            raise
+
+        status, headers = None, []
+        for name, value in response_headers:
+            name, value = name.decode('latin-1'), value.decode('latin-1')
+            if name == ':status':
+                status = int(value)
+            elif not name.startswith(':'):
+                headers.append((name, value))
+
+        fp = H2StreamReader(connection, stream, timeout)
+        encodings = [e.strip() for e in ','.join(
+            value for name, value in headers if name == 'content-encoding').split(',') if e.strip()]
+        if encodings and method != 'HEAD':
+            # Decompress the whole body like the urllib handler does
+            try:
+                body = fp.read()
+            finally:
+                fp.close()
+            for encoding in reversed(encodings):
+                if encoding == 'gzip':
+                    body = HTTPHandler.gz(body)
+                elif encoding == 'deflate':
+                    body = HTTPHandler.deflate(body)
+                elif encoding == 'br' and brotli:
+                    body = HTTPHandler.brotli(body)
+            fp = io.BytesIO(body)
+        return H2ResponseAdapter(fp, url, headers, status)
+
+    def _send_once(self, request, method, url, headers, data, timeout):
+        if not url.lower().startswith('https:'):
+            # Only followed from a redirect, as HTTP/2 is negotiated over TLS
+            return self._send_http1(self._open(request, url, timeout), method, url, headers, data, timeout)
+
+        for fresh in (False, True):
+            connection = self._get_connection(request, url, timeout, fresh=fresh)
+            if not isinstance(connection, H2Connection):
+                return self._send_http1(connection, method, url, headers, data, timeout)
+            try:
+                return self._send_h2(connection, method, url, headers, data, timeout)
+            except _RetryableStreamError:
+                # e.g. the server closed the connection with GOAWAY before processing the request
+                if fresh or (data is not None and not isinstance(data, bytes)):
+                    raise TransportError(cause=ConnectionResetError('The server refused the request'))
+                self._print_verbose(f'Retrying the request on a new connection to {connection.name}')
+
+    def _send(self, request):
+        headers = self._get_headers(request)
+        cookiejar = self._get_cookiejar(request)
+        timeout = self._calculate_timeout(request)
+        method, url, data = request.method, request.url, request.data
+
+        for _ in range(_MAX_REDIRECTS + 1):
+            # The cookies are only added if there is no Cookie header
+            cookie_request = urllib.request.Request(url, headers=headers)
+            cookiejar.add_cookie_header(cookie_request)
+            response = self._send_once(
+                request, method, url, {**headers, **cookie_request.unredirected_hdrs}, data, timeout)
+            cookiejar.extract_cookies(CookieResponseAdapter(response), cookie_request)
+
+            location = response.get_header('Location')
+            if response.status not in _REDIRECT_STATUSES or not location:
+                break
+            response.close()
+            # As of RFC 2616 default charset is iso-8859-1 that is respected by Python 3
+            url = normalize_url(urllib.parse.urljoin(url, location.encode('iso-8859-1').decode()))
+            new_method = get_redirect_method(method, response.status)
+            # The cookies are set again from the cookiejar for the new url
+            remove_headers = ['cookie']
+            # only remove payload if method changed (e.g. POST to GET)
+            if new_method != method:
+                data = None
+                remove_headers.extend(['content-length', 'content-type'])
+            headers = {k: v for k, v in headers.items() if k.lower() not in remove_headers}
+            method = new_method
+        else:
+            raise HTTPError(response, redirect_loop=True)
+
+        if not 200 <= response.status < 300:
+            raise HTTPError(response)
+        return response
+
+
+@register_preference(H2RH)
+def h2_preference(rh, request):
+    # A single connection to each host does not make use of --http-connections and the pool sizes,
+    # so the HTTP/1.1 handlers are preferred unless prefer_http2 is set
+    return -100
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
+import base64
+import collections
 import contextlib
 import functools
+import http.client
+import itertools
 import os
 import socket
 import ssl
 import sys
+import threading
+import time
 import typing
 import urllib.parse
 import urllib.request
 
-from .exceptions import RequestError
+from .exceptions import ProxyError, RequestError
 from ..dependencies import certifi
+from ..socks import ProxyError as SocksProxyError
 from ..socks import ProxyType, sockssocket
 
 if typing.TYPE_CHECKING:
@@ -199,6 +206,101 @@ def wrapper(self, *args, **kwargs):
     return wrapper
 
 
+def _interleave_address_families(addrinfos):
+    """
+    Alternate between the address families, starting with the one preferred by the system,
+    so that an unreachable family only delays the connection by one attempt
+    See: https://datatracker.ietf.org/doc/html/rfc8305#section-4
+    """
+    families = collections.defaultdict(list)
+    for addrinfo in addrinfos:
+        families[addrinfo[0]].append(addrinfo)
+    return [
+        addrinfo for addrinfos in itertools.zip_longest(*families.values())
+        for addrinfo in addrinfos if addrinfo is not None]
+
+
+class DNSCache:
+    """
+    A cache of socket.getaddrinfo results, shared by all the request handlers
+
+    Since the TTL of the DNS records is not available, successful lookups are cached for `ttl` seconds.
+    Names that do not exist are cached for `negative_ttl` seconds, and other failures are not cached.
+    Concurrent lookups of the same name are only resolved once.
+    The addresses are ordered by interleaving the address families,
+    and an address that could not be connected to is moved to the end.
+
+    `stats` counts the `hits`, `negative_hits`, `misses` and `failures` (connections to an address).
+    """
+
+    MAX_ENTRIES = 1024
+
+    def __init__(self, ttl=300, negative_ttl=10):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = collections.Counter()
+        self._entries = {}  # key: (expiry, addrinfos or error)
+        self._pending = {}  # key: threading.Event
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        while True:
+            with self._lock:
+                expiry, result = self._entries.get(key, (None, None))
+                if expiry is not None and expiry > time.monotonic():
+                    if isinstance(result, socket.gaierror):
+                        self.stats['negative_hits'] += 1
+                        raise socket.gaierror(*result.args)
+                    self.stats['hits'] += 1
+                    return list(result)
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self.stats['misses'] += 1
+                    break
+            # Wait for the lookup by another thread
+            pending.wait()
+
+        try:
+            result = _interleave_address_families(socket.getaddrinfo(host, port, family, type, proto, flags))
+            self._store(key, result, self.ttl)
+            return list(result)
+        except socket.gaierror as e:
+            if e.errno == socket.EAI_NONAME:
+                self._store(key, e, self.negative_ttl)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def _store(self, key, result, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.MAX_ENTRIES:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                while len(self._entries) >= self.MAX_ENTRIES:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (now + ttl, result)
+
+    def report_failure(self, host, port, addrinfo):
+        """Try an address that could not be connected to after the other addresses of the host"""
+        self.stats['failures'] += 1
+        with self._lock:
+            for key, (_, result) in self._entries.items():
+                if key[:2] == (host, port) and isinstance(result, list) and addrinfo in result:
+                    result.remove(addrinfo)
+                    result.append(addrinfo)
+
+
+dns_cache = DNSCache()
+
+
 def _socket_connect(ip_addr, timeout, source_address):
     af, socktype, proto, _canonname, sa = ip_addr
     sock = socket.socket(af, socktype, proto)
@@ -216,7 +318,7 @@ def _socket_connect(ip_addr, timeout, source_address):
 
 def create_socks_proxy_socket(dest_addr, proxy_args, proxy_ip_addr, timeout, source_address):
     af, socktype, proto, _canonname, sa = proxy_ip_addr
-    sock = sockssocket(af, socktype, proto)
+    sock = sockssocket(af, socktype, proto, getaddrinfo=dns_cache.getaddrinfo)
     try:
         connect_proxy_args = proxy_args.copy()
         connect_proxy_args.update({'addr': sa[0], 'port': sa[1]})
@@ -243,7 +345,7 @@ def create_connection(
     # This filters the addresses based on the given source_address.
     # Based on: https://github.com/python/cpython/blob/main/Lib/socket.py#L810
     host, port = address
-    ip_addrs = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    ip_addrs = dns_cache.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
     if not ip_addrs:
         raise OSError('getaddrinfo returns an empty list')
     if source_address is not None:
@@ -264,6 +366,8 @@ def create_connection(
             return sock
         except OSError as e:
             err = e
+            if not isinstance(e, SocksProxyError):
+                dns_cache.report_failure(host, port, ip_addr)
 
     try:
         raise err
@@ -271,3 +375,50 @@ def create_connection(
         # Explicitly break __traceback__ reference cycle
         # https://bugs.python.org/issue36820
         err = None
+
+
+def create_proxied_connection(address, proxy, timeout, source_address=None):
+    """
+    Create a socket connected to address, directly if proxy is None,
+    or through a socks proxy or the tunnel of an HTTP proxy
+    """
+    host, port = address
+    if not proxy:
+        return create_connection(address, timeout=timeout, source_address=source_address)
+
+    proxy_url = urllib.parse.urlsplit(proxy)
+    if proxy_url.scheme.lower().startswith('socks'):
+        socks_proxy_options = make_socks_proxy_opts(proxy)
+        return create_connection(
+            address=(socks_proxy_options['addr'], socks_proxy_options['port']),
+            timeout=timeout,
+            source_address=source_address,
+            _create_socket_func=functools.partial(
+                create_socks_proxy_socket, (host, port), socks_proxy_options))
+
+    tunnel_headers = {}
+    if proxy_url.username is not None:
+        credentials = f'{urllib.parse.unquote(proxy_url.username)}:{urllib.parse.unquote(proxy_url.password or "")}'
+        tunnel_headers['Proxy-Authorization'] = f'Basic {base64.b64encode(credentials.encode()).decode()}'
+    proxy_conn = http.client.HTTPConnection(proxy_url.hostname, proxy_url.port or 80, timeout=timeout)
+    proxy_conn._create_connection = create_connection
+    proxy_conn.source_address = source_address
+    proxy_conn.set_tunnel(host, port, headers=tunnel_headers)
+    try:
+        proxy_conn.connect()
+    except OSError as e:
+        proxy_conn.close()
+        if 'tunnel connection failed' in str(e).lower():
+            raise ProxyError(cause=e) from e
+        raise
+    return proxy_conn.sock
+
+
+class CookieResponseAdapter:
+    """Adapts a Response for http.cookiejar.CookieJar.extract_cookies"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def info(self):
+        return self._response.headers
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import collections
 import functools
 import http.client
 import logging
 import re
+import socket
 import warnings
 
 from ..dependencies import brotli, requests, urllib3
@@ -158,23 +160,45 @@ def read(self, amt: int | None = None):
 
 
 class RequestsHTTPAdapter(requests.adapters.HTTPAdapter):
-    def __init__(self, ssl_context=None, proxy_ssl_context=None, source_address=None, **kwargs):
+    def __init__(self, ssl_context=None, proxy_ssl_context=None, source_address=None, connection_stats=None, **kwargs):
         self._pm_args = {}
         if ssl_context:
             self._pm_args['ssl_context'] = ssl_context
         if source_address:
             self._pm_args['source_address'] = (source_address, 0)
         self._proxy_ssl_context = proxy_ssl_context or ssl_context
+        self._connection_stats = connection_stats
         super().__init__(**kwargs)
 
+    def _track_pools(self, manager):
+        """Add the usage of each connection pool of the manager to the stats when it is discarded"""
+        if self._connection_stats is None or getattr(manager, '_yt_dlp__tracked', False):
+            return manager
+        dispose_func = manager.pools.dispose_func
+
+        def dispose(pool):
+            self._connection_stats['requests'] += pool.num_requests
+            self._connection_stats['connections'] += pool.num_connections
+            if dispose_func:
+                dispose_func(pool)
+
+        manager.pools.dispose_func = dispose
+        manager._yt_dlp__tracked = True
+        return manager
+
     def init_poolmanager(self, *args, **kwargs):
-        return super().init_poolmanager(*args, **kwargs, **self._pm_args)
+        super().init_poolmanager(*args, **kwargs, **self._pm_args)
+        self.poolmanager.pool_classes_by_scheme = DNS_CACHE_POOL_CLASSES_BY_SCHEME
+        self._track_pools(self.poolmanager)
 
     def proxy_manager_for(self, proxy, **proxy_kwargs):
         extra_kwargs = {}
         if not proxy.lower().startswith('socks') and self._proxy_ssl_context:
             extra_kwargs['proxy_ssl_context'] = self._proxy_ssl_context
-        return super().proxy_manager_for(proxy, **proxy_kwargs, **self._pm_args, **extra_kwargs)
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs, **self._pm_args, **extra_kwargs)
+        if not isinstance(manager, SocksProxyManager):
+            manager.pool_classes_by_scheme = DNS_CACHE_POOL_CLASSES_BY_SCHEME
+        return self._track_pools(manager)
 
     # Skip `requests` internal verification; we use our own SSLContext
     def cert_verify(*args, **kwargs):
@@ -250,6 +274,10 @@ class RequestsRH(RequestHandler, InstanceStoreMixin):
 
     """Requests RequestHandler
     https://github.com/psf/requests
+
+    @param pool_size: Number of connections per host to keep open for reuse.
+        Should be at least the number of concurrent requests to a host,
+        otherwise the connections that do not fit are closed after use.
     """
     _SUPPORTED_URL_SCHEMES = ('http', 'https')
     _SUPPORTED_ENCODINGS = tuple(SUPPORTED_ENCODINGS)
@@ -257,8 +285,10 @@ class RequestsRH(RequestHandler, InstanceStoreMixin):
     _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY)
     RH_NAME = 'requests'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, pool_size: int | None = None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.pool_size = max(pool_size or 0, requests.adapters.DEFAULT_POOLSIZE)
+        self._connection_stats = collections.Counter()
 
         # Forward urllib3 debug messages to our logger
         logger = logging.getLogger('urllib3')
@@ -280,9 +310,15 @@ def __init__(self, *args, **kwargs):
 
     def close(self):
         self._clear_instances()
+        logger = logging.getLogger('urllib3')
+        if self._connection_stats['connections']:
+            logger.debug(
+                'Sent %d requests over %d connections',
+                self._connection_stats['requests'], self._connection_stats['connections'])
+        self._connection_stats.clear()
         # Remove the logging handler that contains a reference to our logger
         # See: https://github.com/yt-dlp/yt-dlp/issues/8922
-        logging.getLogger('urllib3').removeHandler(self.__logging_handler)
+        logger.removeHandler(self.__logging_handler)
 
     def _check_extensions(self, extensions):
         super()._check_extensions(extensions)
@@ -297,6 +333,8 @@ def _create_instance(self, cookiejar, legacy_ssl_support=None):
             ssl_context=self._make_sslcontext(legacy_ssl_support=legacy_ssl_support),
             source_address=self.source_address,
             max_retries=urllib3.util.retry.Retry(False),
+            pool_maxsize=self.pool_size,
+            connection_stats=self._connection_stats,
         )
         session.adapters.clear()
         session.headers = requests.models.CaseInsensitiveDict()
@@ -368,6 +406,45 @@ def requests_preference(rh, request):
     return 100
 
 
+# Resolve hosts with the DNS cache shared by the request handlers
+class DNSCacheHTTPConnection(urllib3.connection.HTTPConnection):
+    def _new_conn(self):
+        try:
+            sock = create_connection(
+                address=(self._dns_host, self.port),
+                timeout=self.timeout,
+                source_address=self.source_address)
+        except socket.gaierror as e:
+            raise urllib3.exceptions.NameResolutionError(self.host, self, e) from e
+        except TimeoutError as e:
+            raise urllib3.exceptions.ConnectTimeoutError(
+                self, f'Connection to {self.host} timed out. (connect timeout={self.timeout})') from e
+        except OSError as e:
+            raise urllib3.exceptions.NewConnectionError(
+                self, f'Failed to establish a new connection: {e}') from e
+        for option in self.socket_options or ():
+            sock.setsockopt(*option)
+        return sock
+
+
+class DNSCacheHTTPSConnection(DNSCacheHTTPConnection, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class DNSCacheHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = DNSCacheHTTPConnection
+
+
+class DNSCacheHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = DNSCacheHTTPSConnection
+
+
+DNS_CACHE_POOL_CLASSES_BY_SCHEME = {
+    'http': DNSCacheHTTPConnectionPool,
+    'https': DNSCacheHTTPSConnectionPool,
+}
+
+
 # Use our socks proxy implementation with requests to avoid an extra dependency.
 class SocksHTTPConnection(urllib3.connection.HTTPConnection):
     def __init__(self, _socks_options, *args, **kwargs):  # must use _socks_options to pass PoolKey checks
@@ -307,8 +307,16 @@ def __init__(self, res: http.client.HTTPResponse | urllib.response.addinfourl):
     def read(self, amt=None):
         if self.closed:
             return b''
+        return self._read(lambda: self.fp.read(amt), amt)
+
+    def readinto(self, buffer):
+        if self.closed:
+            return 0
+        return self._read(lambda: self.fp.readinto(buffer), len(buffer))
+
+    def _read(self, read, amt):
         try:
-            data = self.fp.read(amt)
+            data = read()
             underlying = getattr(self.fp, 'fp', None)
             if isinstance(self.fp, http.client.HTTPResponse) and underlying is None:
                 # http.client.HTTPResponse automatically closes itself when fully read
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import email.message
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+import typing
+import urllib.parse
+import urllib.request
+import zlib
+
+from .common import Request, Response
+from .exceptions import HTTPError
+from ..dependencies import sqlite3
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from ..cookies import YoutubeDLCookieJar
+
+# Headers that describe the transfer rather than the content; cached bodies are stored decoded
+_TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+# Request headers that do not affect the response; e.g. the fake IP of geo bypass is random for each run
+_UNKEYED_HEADERS = {'x-forwarded-for'}
+
+
+def _max_age(cache_control):
+    """Return the freshness lifetime given by a Cache-Control header, or None if it does not set one"""
+    directives = {}
+    for directive in (cache_control or '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name] = value.strip('"')
+    if 'no-store' in directives:
+        return False
+    elif 'no-cache' in directives:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if re.fullmatch(r'\d+', directives.get(name, '')):
+            return int(directives[name])
+    return None
+
+
+class _CookieResponse:
+    """Adapts stored headers for http.cookiejar.CookieJar.extract_cookies"""
+
+    def __init__(self, headers):
+        self._headers = email.message.Message()
+        for name, value in headers:
+            self._headers[name] = value
+
+    def info(self):
+        return self._headers
+
+
+class ResponseCache:
+    """
+    An on-disk cache of HTTP responses, stored in an SQLite database
+
+    Only successful responses to GET requests without a body are cached. A cached
+    response is fresh for the TTL configured for its extractor or host, or else for the
+    max-age given by the server, or else for DEFAULT_TTL. Stale responses that have
+    an ETag or Last-Modified header are revalidated with a conditional request.
+    Responses with "Cache-Control: no-store" are not cached. The least recently used
+    responses are evicted once the bodies, which are stored compressed, exceed max_size.
+
+    The cookies that would be sent with a request are part of its key, so responses are
+    not shared between sessions. The cookies set by a cached response are set again
+    whenever it is used.
+
+    @param path         Path of the database
+    @param max_size     Maximum total size of the stored bodies, in bytes
+    @param ttls         Dictionary of TTLs in seconds by lowercase extractor key, or by host
+                        (which also applies to its subdomains). The key "default" overrides DEFAULT_TTL
+    """
+
+    DEFAULT_TTL = 3600
+
+    def __init__(self, path: str, max_size: int = 256 * 1024 * 1024, ttls: dict[str, float] | None = None):
+        if not sqlite3:
+            raise ImportError('sqlite3 is not available')
+        self.max_size = max_size
+        self._ttls = {key.lower(): ttl for key, ttl in (ttls or {}).items()}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY NOT NULL, url TEXT, status INTEGER, headers TEXT, body BLOB,
+            size INTEGER, max_age REAL, stored REAL, used REAL)''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _key(request: Request, cookiejar: YoutubeDLCookieJar | None = None):
+        impersonate = request.extensions.get('impersonate')
+        cookiejar = request.extensions.get('cookiejar') or cookiejar
+        return hashlib.sha256(json.dumps([
+            request.method, request.url,
+            sorted((k.lower(), v) for k, v in request.headers.items() if k.lower() not in _UNKEYED_HEADERS),
+            # The handlers add these from the cookiejar after the response has been looked up
+            cookiejar.get_cookie_header(request.url) if cookiejar is not None else None,
+            str(impersonate) if impersonate else None,
+        ]).encode()).hexdigest()
+
+    def _configured_ttl(self, url, ie_key):
+        if ie_key and ie_key.lower() in self._ttls:
+            return self._ttls[ie_key.lower()]
+        host = (urllib.parse.urlparse(url).hostname or '').lower()
+        while host:
+            if host in self._ttls:
+                return self._ttls[host]
+            host = host.partition('.')[2]
+        return None
+
+    def _load(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, status, headers, body, max_age, stored FROM responses WHERE key = ?', (key,)).fetchone()
+            if row:
+                self._conn.execute('UPDATE responses SET used = ? WHERE key = ?', (time.time(), key))
+        return row
+
+    def _store(self, key, url, status, headers, body, max_age, stored=None):
+        body = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, url, status, json.dumps(headers), body, len(body), max_age, stored or now, now))
+                total = self._conn.execute('SELECT SUM(size) FROM responses').fetchone()[0] or 0
+                if total > self.max_size:
+                    # Evict down to 90% of the limit so that eviction does not run on every store
+                    excess = total - int(self.max_size * 0.9)
+                    evicted = []
+                    for old_key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY used'):
+                        if excess <= 0:
+                            break
+                        evicted.append((old_key,))
+                        excess -= size
+                    self._conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _response(self, url, status, headers, body, cookiejar):
+        response = Response(io.BytesIO(body), url, {}, status)
+        for name, value in headers:
+            response.headers.add_header(name, value)
+        if cookiejar is not None:
+            cookiejar.extract_cookies(_CookieResponse(headers), urllib.request.Request(url))
+        return response
+
+    def urlopen(self, request: Request, opener: Callable[[Request], Response], ie_key: str | None = None,
+                cookiejar: YoutubeDLCookieJar | None = None) -> Response:
+        """Return the cached response to the request if it is fresh; otherwise use the opener and cache the result"""
+        if request.method != 'GET' or request.data is not None:
+            return opener(request)
+
+        key = self._key(request, cookiejar)
+        cached = self._load(key)
+        conditional = request
+        if cached:
+            url, status, headers, body, max_age, stored = cached
+            headers = json.loads(headers)
+            body = zlib.decompress(body)
+            ttl = self._configured_ttl(request.url, ie_key)
+            if ttl is None:
+                ttl = self._ttls.get('default', self.DEFAULT_TTL) if max_age is None else max_age
+            if time.time() - stored < ttl:
+                return self._response(url, status, headers, body, cookiejar)
+
+            validators = {name.lower(): value for name, value in headers}
+            if 'etag' in validators or 'last-modified' in validators:
+                conditional = request.copy()
+                if 'etag' in validators:
+                    conditional.headers['If-None-Match'] = validators['etag']
+                if 'last-modified' in validators:
+                    conditional.headers['If-Modified-Since'] = validators['last-modified']
+
+        try:
+            response = opener(conditional)
+        except HTTPError as error:
+            if not cached or error.status != 304:
+                raise
+            error.response.close()
+            self._store(key, url, status, headers, body, max_age)
+            return self._response(url, status, headers, body, cookiejar)
+
+        max_age = _max_age(response.headers.get('Cache-Control'))
+        if response.status != 200 or max_age is False:
+            return response
+        with response:
+            body = response.read()
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.lower() not in _TRANSFER_HEADERS]
+        self._store(key, response.url, response.status, headers, body, max_age)
+        # The cookies were set when the response was received
+        return self._response(response.url, response.status, headers, body, None)
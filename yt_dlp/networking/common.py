@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import abc
+import asyncio
+import collections
 import copy
 import enum
 import functools
 import io
+import threading
 import typing
 import urllib.parse
 import urllib.request
@@ -14,8 +17,9 @@
 from http import HTTPStatus
 from types import NoneType
 
-from ._helper import make_ssl_context, wrap_request_errors
+from ._helper import dns_cache, make_ssl_context, wrap_request_errors
 from .exceptions import (
+    HTTPError,
     NoSupportingHandlers,
     RequestError,
     TransportError,
@@ -59,18 +63,32 @@ class RequestDirector:
 
     @param logger: Logger instance.
     @param verbose: Print debug request information to stdout.
+    @param max_connections_per_host: Maximum number of open HTTP responses from the same host.
+        Further requests to the host wait until a response is closed, so that they reuse
+        its connection instead of opening a new one. Unlimited if None.
     """
 
-    def __init__(self, logger, verbose=False):
+    def __init__(self, logger, verbose=False, max_connections_per_host=None):
         self.handlers: dict[str, RequestHandler] = {}
         self.preferences: set[Preference] = set()
         self.logger = logger  # TODO(Grub4k): default logger
         self.verbose = verbose
+        self.max_connections_per_host = max_connections_per_host
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._host_stats = collections.defaultdict(collections.Counter)
+        self._lock = threading.Lock()
 
     def close(self):
         for handler in self.handlers.values():
             handler.close()
         self.handlers.clear()
+        for host, stats in self._host_stats.items():
+            self._print_verbose(
+                f'{host}: {stats["requests"]} requests, {stats["waits"]} waited for a connection')
+        self._host_stats.clear()
+        if dns_cache.stats:
+            self._print_verbose('DNS cache: {hits} hits, {negative_hits} negative hits, {misses} misses, '
+                                '{failures} failed connections'.format_map(dns_cache.stats))
 
     def add_handler(self, handler: RequestHandler):
         """Add a handler. If a handler of the same RH_KEY exists, it will overwrite it"""
@@ -91,6 +109,28 @@ def _print_verbose(self, msg):
         if self.verbose:
             self.logger.stdout(f'director: {msg}')
 
+    def _acquire_host_slot(self, request, timeout):
+        """Wait for a free slot for the host of the request. Returns the function that releases it"""
+        url = urllib.parse.urlparse(request.url)
+        if not self.max_connections_per_host or url.scheme.lower() not in ('http', 'https'):
+            return None
+        host = url.netloc.lower()
+        with self._lock:
+            slots = self._host_slots.get(host)
+            if slots is None:
+                slots = self._host_slots[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+            self._host_stats[host]['requests'] += 1
+        if slots.acquire(blocking=False):
+            return slots.release
+        self._host_stats[host]['waits'] += 1
+        self._print_verbose(f'Waiting for one of the {self.max_connections_per_host} connections to {host}')
+        # A response that is never closed holds its slot until it is garbage collected,
+        # so do not wait indefinitely
+        if slots.acquire(timeout=timeout):
+            return slots.release
+        self._print_verbose(f'Timed out waiting for a connection to {host}; exceeding the limit')
+        return None
+
     def send(self, request: Request) -> Response:
         """
         Passes a request onto a suitable RequestHandler
@@ -112,12 +152,20 @@ def send(self, request: Request) -> Response:
                 unsupported_errors.append(e)
                 continue
 
+            release_slot = self._acquire_host_slot(request, handler._calculate_timeout(request))
             self._print_verbose(f'Sending request via "{handler.RH_NAME}"')
             try:
                 response = handler.send(request)
-            except RequestError:
+            except RequestError as e:
+                if release_slot:
+                    if isinstance(getattr(e, 'response', None), Response):
+                        e.response._close_callbacks.append(release_slot)
+                    else:
+                        release_slot()
                 raise
             except Exception as e:
+                if release_slot:
+                    release_slot()
                 self.logger.error(
                     f'[{handler.RH_NAME}] Unexpected error: {error_to_str(e)}{bug_reports_message()}',
                     is_error=False)
@@ -125,6 +173,70 @@ def send(self, request: Request) -> Response:
                 continue
 
             assert isinstance(response, Response)
+            if release_slot:
+                response._close_callbacks.append(release_slot)
+            return response
+
+        raise NoSupportingHandlers(unsupported_errors, unexpected_errors)
+
+    async def asend(self, request: Request) -> AsyncResponse:
+        """
+        Passes a request onto a suitable RequestHandler without blocking the event loop
+
+        Handlers that support asyncio (AsyncRequestHandler) are tried first.
+        The other handlers are run in a thread, and so is the body of their response.
+        """
+        if not self.handlers:
+            raise RequestError('No request handlers configured')
+
+        assert isinstance(request, Request)
+
+        unexpected_errors = []
+        unsupported_errors = []
+        handlers = self._get_handlers(request)
+        # Stable sort, so that the preferences still apply within each group
+        handlers.sort(key=lambda rh: not isinstance(rh, AsyncRequestHandler))
+        for handler in handlers:
+            self._print_verbose(f'Checking if "{handler.RH_NAME}" supports this request.')
+            try:
+                handler.validate(request)
+            except UnsupportedRequest as e:
+                self._print_verbose(
+                    f'"{handler.RH_NAME}" cannot handle this request (reason: {error_to_str(e)})')
+                unsupported_errors.append(e)
+                continue
+
+            release_slot = None
+            if self.max_connections_per_host:
+                release_slot = await asyncio.to_thread(
+                    self._acquire_host_slot, request, handler._calculate_timeout(request))
+            self._print_verbose(f'Sending request via "{handler.RH_NAME}"')
+            try:
+                if isinstance(handler, AsyncRequestHandler):
+                    response = await handler.asend(request)
+                else:
+                    response = ThreadedAsyncResponse(await asyncio.to_thread(handler.send, request))
+            except RequestError as e:
+                if isinstance(getattr(e, 'response', None), Response) and not isinstance(handler, AsyncRequestHandler):
+                    e.response = ThreadedAsyncResponse(e.response)
+                if release_slot:
+                    if isinstance(getattr(e, 'response', None), AsyncResponse):
+                        e.response._close_callbacks.append(release_slot)
+                    else:
+                        release_slot()
+                raise
+            except Exception as e:
+                if release_slot:
+                    release_slot()
+                self.logger.error(
+                    f'[{handler.RH_NAME}] Unexpected error: {error_to_str(e)}{bug_reports_message()}',
+                    is_error=False)
+                unexpected_errors.append(e)
+                continue
+
+            assert isinstance(response, AsyncResponse)
+            if release_slot:
+                response._close_callbacks.append(release_slot)
             return response
 
         raise NoSupportingHandlers(unsupported_errors, unexpected_errors)
@@ -382,6 +494,75 @@ def __exit__(self, *args):
         self.close()
 
 
+class AsyncRequestHandler(RequestHandler):
+
+    """Asynchronous Request Handler class
+
+    A request handler that sends requests with asyncio.
+
+    Concrete subclasses need to redefine the _asend(request) coroutine,
+    which handles the underlying request logic and returns an AsyncResponse.
+    It is called in the running event loop of the caller of asend().
+
+    The handler can also be used as a blocking RequestHandler:
+    send() runs _asend() in an event loop of the handler, in a background thread,
+    and returns a Response that reads the body of the AsyncResponse in that loop.
+
+    Resources that are bound to an event loop, such as connections,
+    should be kept per event loop (see asyncio.get_running_loop()).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name=f'{self.RH_NAME} event loop', daemon=True).start()
+            return self._loop
+
+    def _run(self, coro):
+        """Run the coroutine in the event loop of the handler and return its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    async def asend(self, request: Request) -> AsyncResponse:
+        if not isinstance(request, Request):
+            raise TypeError('Expected an instance of Request')
+        try:
+            return await self._asend(request)
+        except RequestError as e:
+            if e.handler is None:
+                e.handler = self
+            raise
+
+    @abc.abstractmethod
+    async def _asend(self, request: Request) -> AsyncResponse:
+        """Handle a request from start to finish. Redefine in subclasses."""
+        pass
+
+    def _send(self, request: Request):
+        loop = self._get_loop()
+        try:
+            return AsyncResponseAdapter(self._run(self._asend(request)), loop)
+        except HTTPError as e:
+            e.response = AsyncResponseAdapter(e.response, loop)
+            raise
+
+    async def _aclose(self):  # noqa: B027
+        """Release the resources of the handler in the running event loop. To be extended by subclasses."""
+
+    def close(self):
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+
 class Request:
     """
     Represents a request to be made.
@@ -536,6 +717,8 @@ def __init__(
     ):
 
         self.fp = fp
+        # Called once when the response is closed
+        self._close_callbacks = []
         self.headers = Message()
         for name, value in headers.items():
             self.headers.add_header(name, value)
@@ -561,9 +744,18 @@ def read(self, amt: int | None = None) -> bytes:
         except Exception as e:
             raise TransportError(cause=e) from e
 
+    def readinto(self, buffer) -> int:
+        """Read up to len(buffer) bytes into the buffer and return the number of bytes read.
+        Subclasses should redefine this method to read without an intermediate copy, where possible."""
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
     def close(self):
         if not self.fp.closed:
             self.fp.close()
+        while self._close_callbacks:
+            self._close_callbacks.pop()()
         return super().close()
 
     def get_header(self, name, default=None):
@@ -601,6 +793,145 @@ def getheader(self, name, default=None):
         return self.get_header(name, default)
 
 
+class AsyncResponse:
+    """
+    Base class for the responses of asynchronous requests.
+
+    The interface is the same as Response, except that the body is read
+    with the read() and aclose() coroutines, or by iterating over it with `async for`.
+    Subclasses need to redefine read(amt), and should extend close() to release the connection.
+
+    @param url: URL that this is a response of.
+    @param headers: response headers.
+    @param status: Response HTTP status code. Default is 200 OK.
+    @param reason: HTTP status reason. Will use built-in reasons based on status code if not provided.
+    @param extensions: Dictionary of handler-specific response extensions.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            headers: Mapping[str, str],
+            status: int = 200,
+            reason: str | None = None,
+            extensions: dict | None = None,
+    ):
+        self.closed = False
+        # Called once when the response is closed
+        self._close_callbacks = []
+        self.headers = Message()
+        for name, value in headers.items():
+            self.headers.add_header(name, value)
+        self.status = status
+        self.url = url
+        try:
+            self.reason = reason or HTTPStatus(status).phrase
+        except ValueError:
+            self.reason = None
+        self.extensions = extensions or {}
+
+    async def read(self, amt: int | None = None) -> bytes:
+        """Read up to amt bytes of the body, or all of it. Returns an empty bytes object at the end"""
+        raise NotImplementedError
+
+    def close(self):
+        """Close the response without waiting for the connection to be released"""
+        self.closed = True
+        while self._close_callbacks:
+            self._close_callbacks.pop()()
+
+    async def aclose(self):
+        self.close()
+
+    async def __aiter__(self):
+        while chunk := await self.read(io.DEFAULT_BUFFER_SIZE):
+            yield chunk
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    get_header = Response.get_header
+
+
+class ThreadedAsyncResponse(AsyncResponse):
+    """An AsyncResponse that reads the body of a blocking Response in a thread"""
+
+    def __init__(self, response: Response):
+        super().__init__(
+            url=response.url, headers={}, status=response.status,
+            reason=response.reason, extensions=response.extensions)
+        self.headers = response.headers
+        self.response = response
+
+    async def read(self, amt=None):
+        return await asyncio.to_thread(self.response.read, amt)
+
+    def close(self):
+        self.response.close()
+        super().close()
+
+    async def aclose(self):
+        await asyncio.to_thread(self.response.close)
+        super().close()
+
+
+class _AsyncResponseReader(io.RawIOBase):
+    def __init__(self, response: AsyncResponse, loop):
+        self._response = response
+        self._loop = loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read(self, size=-1):
+        data = self._run(self._response.read(None if size is None or size < 0 else size))
+        if size is None or size < 0 or (size and not data):
+            self.close()
+        return data
+
+    def close(self):
+        if not self.closed:
+            if self._loop.is_running():
+                self._run(self._response.aclose())
+            else:
+                self._response.close()
+        super().close()
+
+
+class AsyncResponseAdapter(Response):
+    """A blocking Response for an AsyncResponse, which is read in the running event loop `loop`"""
+
+    def __init__(self, response: AsyncResponse, loop):
+        super().__init__(
+            fp=_AsyncResponseReader(response, loop), url=response.url, headers={},
+            status=response.status, reason=response.reason, extensions=response.extensions)
+        self.headers = response.headers
+
+    def read(self, amt=None):
+        try:
+            data = self.fp.read(amt)
+        except RequestError:
+            self.close()
+            raise
+        except Exception as e:
+            self.close()
+            raise TransportError(cause=e) from e
+        if self.fp.closed:
+            self.close()
+        return data
+
+
 if typing.TYPE_CHECKING:
     RequestData = bytes | Iterable[bytes] | typing.IO | None
     Preference = typing.Callable[[RequestHandler, Request], int]
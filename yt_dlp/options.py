@@ -568,6 +568,7 @@ def _preset_alias_callback(option, opt_str, value, parser):
                 'embed-metadata', 'seperate-video-versions', 'no-clean-infojson', 'no-keep-subs', 'no-certifi',
                 'no-youtube-channel-redirect', 'no-youtube-unavailable-videos', 'no-youtube-prefer-utc-upload-date',
                 'prefer-legacy-http-handler', 'manifest-filesize-approx', 'allow-unsafe-ext', 'prefer-vp9-sort', 'mtime-by-default',
+                'no-fused-postprocessors',
             }, 'aliases': {
                 'youtube-dl': ['all', '-multistreams', '-playlist-match-filter', '-manifest-filesize-approx', '-allow-unsafe-ext', '-prefer-vp9-sort'],
                 'youtube-dlc': ['all', '-no-youtube-channel-redirect', '-no-live-chat', '-playlist-match-filter', '-manifest-filesize-approx', '-allow-unsafe-ext', '-prefer-vp9-sort'],
@@ -618,6 +619,20 @@ def _preset_alias_callback(option, opt_str, value, parser):
         metavar='IP', dest='source_address', default=None,
         help='Client-side IP address to bind to',
     )
+    network.add_option(
+        '--max-connections-per-host',
+        metavar='N', dest='max_connections_per_host', default=None, type=int,
+        help=(
+            'Maximum number of concurrent HTTP connections to each host. '
+            'Further requests wait for a connection to be free instead of opening a new one (default is unlimited)'),
+    )
+    network.add_option(
+        '--prefer-http2',
+        action='store_true', dest='prefer_http2', default=False,
+        help=(
+            'Use HTTP/2 for HTTPS requests if the server supports it. Concurrent requests to a host '
+            'then share one connection. Requires the h2 package'),
+    )
     network.add_option(
         '--impersonate',
         metavar='CLIENT[:OS]', dest='impersonate', default=None,
@@ -778,11 +793,21 @@ def _preset_alias_callback(option, opt_str, value, parser):
     selection.add_option(
         '--download-archive', metavar='FILE',
         dest='download_archive',
-        help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it')
+        help=(
+            'Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it. '
+            'Prefix the path with "sqlite:" to use an SQLite database instead, e.g. sqlite:archive.db'))
     selection.add_option(
         '--no-download-archive',
         dest='download_archive', action='store_const', const=None,
         help='Do not use archive file (default)')
+    selection.add_option(
+        '--import-download-archive', metavar='FILE',
+        dest='import_download_archive', default=None,
+        help='Add the IDs listed in the archive file FILE to the --download-archive')
+    selection.add_option(
+        '--export-download-archive', metavar='FILE',
+        dest='export_download_archive', default=None,
+        help='Write the IDs in the --download-archive to the archive file FILE')
     selection.add_option(
         '--max-downloads',
         dest='max_downloads', metavar='NUMBER', type=int, default=None,
@@ -934,6 +959,10 @@ def _preset_alias_callback(option, opt_str, value, parser):
         '--no-check-formats',
         action='store_false', dest='check_formats',
         help='Do not check that the formats are actually downloadable')
+    video_format.add_option(
+        '--concurrent-format-checks',
+        dest='concurrent_format_checks', metavar='N', default=4, type=int,
+        help='Number of formats that are checked concurrently by the options above (default is %default)')
     video_format.add_option(
         '-F', '--list-formats',
         action='store_true', dest='listformats',
@@ -953,6 +982,16 @@ def _preset_alias_callback(option, opt_str, value, parser):
             'Containers that may be used when merging formats, separated by "/", e.g. "mp4/mkv". '
             'Ignored if no merge is required. '
             f'(currently supported: {", ".join(sorted(FFmpegMergerPP.SUPPORTED_EXTS))})'))
+    video_format.add_option(
+        '--merge-while-downloading',
+        action='store_true', dest='merge_while_downloading', default=False,
+        help=(
+            'Download the formats to be merged at the same time, muxing them with ffmpeg as they arrive. '
+            'Formats that ffmpeg may need to seek in, e.g. non-DASH mp4, are still merged after downloading them'))
+    video_format.add_option(
+        '--no-merge-while-downloading',
+        action='store_false', dest='merge_while_downloading',
+        help='Download the formats to be merged one after the other and merge them afterwards (default)')
     video_format.add_option(
         '--allow-unplayable-formats',
         action='store_true', dest='allow_unplayable_formats', default=False,
@@ -1006,6 +1045,25 @@ def _preset_alias_callback(option, opt_str, value, parser):
         '-N', '--concurrent-fragments',
         dest='concurrent_fragment_downloads', metavar='N', default=1, type=int,
         help='Number of fragments of a dash/hlsnative video that should be downloaded concurrently (default is %default)')
+    downloader.add_option(
+        '--concurrent-downloads',
+        dest='concurrent_downloads', metavar='N', default=1, type=int,
+        help=(
+            'Number of input URLs that should be extracted and downloaded concurrently (default is %default). '
+            'The output of each URL is still printed in the order of the URLs'))
+    downloader.add_option(
+        '--concurrent-playlist-entries',
+        dest='concurrent_playlist_entries', metavar='N', default=1, type=int,
+        help=(
+            'Number of upcoming playlist entries that should be extracted concurrently (default is %default). '
+            'The entries are still downloaded one after another, in the playlist order'))
+    downloader.add_option(
+        '--concurrent-postprocessing',
+        dest='concurrent_postprocessing', metavar='N', default=0, type=int,
+        help=(
+            'Number of downloaded videos that can be post-processed in the background while the next ones are downloaded '
+            '(default is %default). The download archive and "after_video" actions of a video are handled once it is '
+            'post-processed. Has no effect with --concurrent-downloads'))
     downloader.add_option(
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
@@ -1073,6 +1131,12 @@ def _preset_alias_callback(option, opt_str, value, parser):
         help=(
             'Size of a chunk for chunk-based HTTP downloading, e.g. 10485760 or 10M (default is disabled). '
             'May be useful for bypassing bandwidth throttling imposed by a webserver (experimental)'))
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help=(
+            'Number of connections to use for downloading a file over HTTP (default is %default). '
+            'The file is split into ranges that are downloaded in parallel, if the server supports it'))
     downloader.add_option(
         '--test',
         action='store_true', dest='test', default=False,
@@ -1565,6 +1629,33 @@ def _preset_alias_callback(option, opt_str, value, parser):
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
         help='Delete all filesystem cache files')
+    filesystem.add_option(
+        '--http-cache',
+        action='store_true', dest='http_cache', default=False,
+        help=(
+            'Store the webpages and API responses downloaded by the extractors in the cache directory, '
+            'so that later runs can reuse them'))
+    filesystem.add_option(
+        '--no-http-cache',
+        action='store_false', dest='http_cache',
+        help='Do not cache the responses to extractor requests (default)')
+    filesystem.add_option(
+        '--http-cache-ttl',
+        metavar='[KEY:]SECONDS', dest='http_cache_ttl', default={}, type='str',
+        action='callback', callback=_dict_from_options_callback,
+        callback_kwargs={
+            'allowed_keys': r'[\w.-]+',
+            'default_key': 'default',
+            'process': float,
+        }, help=(
+            'Time in seconds for which a cached response is used without checking with the server, '
+            'optionally prefixed by an extractor key or host to apply it to. '
+            'Without a key, it applies to the responses that do not specify their own max-age (default 3600). '
+            'This option can be used multiple times, e.g. --http-cache-ttl 600 --http-cache-ttl youtube:86400'))
+    filesystem.add_option(
+        '--http-cache-size',
+        metavar='SIZE', dest='http_cache_size', default=None,
+        help='Maximum size of the HTTP cache, e.g. 500M (default is 256M)')
 
     thumbnail = optparse.OptionGroup(parser, 'Thumbnail Options')
     thumbnail.add_option(
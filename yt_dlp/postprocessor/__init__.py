@@ -14,6 +14,7 @@
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
     FFmpegFixupTimestampPP,
+    FFmpegFusedPP,
     FFmpegMergerPP,
     FFmpegMetadataPP,
     FFmpegPostProcessor,
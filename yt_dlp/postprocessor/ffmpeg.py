@@ -1,4 +1,5 @@
 import collections
+import contextlib
 import contextvars
 import functools
 import itertools
@@ -6,10 +7,14 @@
 import os
 import re
 import subprocess
+import threading
 import time
+import weakref
 
 from .common import PostProcessor
 from ..compat import imghdr
+from ..mp4 import MP4Error, is_mp4, remux
+from ..mpegts import is_mpegts
 from ..utils import (
     MEDIA_EXTENSIONS,
     ISO639Utils,
@@ -83,8 +88,61 @@ class FFmpegPostProcessorError(PostProcessingError):
     pass
 
 
+_StreamCopy = collections.namedtuple('_StreamCopy', ('options', 'inputs', 'ext', 'files_to_delete', 'temp_files'))
+
+
+class _ProbeCache:
+    """The ffprobe results of the files, shared by the postprocessors of a YoutubeDL instance
+
+    The results are keyed by the path, size, mtime, ctime and inode of the file,
+    since the postprocessors restore the mtime of the files they rewrite
+    """
+    _MAX_SIZE = 100
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino
+
+    def get(self, path, opts):
+        with self._lock:
+            stat_key, result = self._results.get((path, opts), (None, None))
+            if stat_key is None or stat_key != self._stat_key(path):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return result
+
+    def set(self, path, opts, result):
+        stat_key = self._stat_key(path)
+        if stat_key is None:
+            return
+        with self._lock:
+            self._results.pop((path, opts), None)
+            self._results[(path, opts)] = stat_key, result
+            while len(self._results) > self._MAX_SIZE:
+                self._results.pop(next(iter(self._results)))
+
+    def invalidate(self, path):
+        with self._lock:
+            for key in [key for key in self._results if key[0] == path]:
+                del self._results[key]
+
+
 class FFmpegPostProcessor(PostProcessor):
     _ffmpeg_location = contextvars.ContextVar('ffmpeg_location', default=None)
+    _probe_caches, _probe_caches_lock = weakref.WeakKeyDictionary(), threading.Lock()
+    # Whether the postprocessor only modifies the file through _stream_copy,
+    # so that its stream copies can be deferred to FFmpegFusedPP
+    _FUSABLE = False
 
     def __init__(self, downloader=None):
         PostProcessor.__init__(self, downloader)
@@ -232,38 +290,30 @@ def check_version(self):
     def get_audio_codec(self, path):
         if not self.probe_available and not self.available:
             raise PostProcessingError('ffprobe and ffmpeg not found. Please install or provide the path using --ffmpeg-location')
+        if self.probe_available:
+            try:
+                streams = self._get_probe_result(path)['streams']
+            except (OSError, ValueError, KeyError):
+                return None
+            return traverse_obj(streams, (lambda _, v: v['codec_type'] == 'audio', 'codec_name', any))
         try:
-            if self.probe_available:
-                cmd = [
-                    self.probe_executable,
-                    encodeArgument('-show_streams')]
-            else:
-                cmd = [
-                    self.executable,
-                    encodeArgument('-i')]
-            cmd.append(self._ffmpeg_filename_argument(path))
+            cmd = [
+                self.executable,
+                encodeArgument('-i'),
+                self._ffmpeg_filename_argument(path)]
             self.write_debug(f'{self.basename} command line: {shell_quote(cmd)}')
-            stdout, stderr, returncode = Popen.run(
+            _, stderr, returncode = Popen.run(
                 cmd, text=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if returncode != (0 if self.probe_available else 1):
+            if returncode != 1:
                 return None
         except OSError:
             return None
-        output = stdout if self.probe_available else stderr
-        if self.probe_available:
-            audio_codec = None
-            for line in output.split('\n'):
-                if line.startswith('codec_name='):
-                    audio_codec = line.split('=')[1].strip()
-                elif line.strip() == 'codec_type=audio' and audio_codec is not None:
-                    return audio_codec
-        else:
-            # Stream #FILE_INDEX:STREAM_INDEX[STREAM_ID](LANGUAGE): CODEC_TYPE: CODEC_NAME
-            mobj = re.search(
-                r'Stream\s*#\d+:\d+(?:\[0x[0-9a-f]+\])?(?:\([a-z]{3}\))?:\s*Audio:\s*([0-9a-z]+)',
-                output)
-            if mobj:
-                return mobj.group(1)
+        # Stream #FILE_INDEX:STREAM_INDEX[STREAM_ID](LANGUAGE): CODEC_TYPE: CODEC_NAME
+        mobj = re.search(
+            r'Stream\s*#\d+:\d+(?:\[0x[0-9a-f]+\])?(?:\([a-z]{3}\))?:\s*Audio:\s*([0-9a-z]+)',
+            stderr)
+        if mobj:
+            return mobj.group(1)
         return None
 
     def get_metadata_object(self, path, opts=[]):
@@ -272,6 +322,20 @@ def get_metadata_object(self, path, opts=[]):
                 self.report_warning('Only ffprobe is supported for metadata extraction')
             raise PostProcessingError('ffprobe not found. Please install or provide the path using --ffmpeg-location')
         self.check_version()
+        return self._get_probe_result(path, opts)
+
+    @property
+    def _probe_cache(self):
+        with self._probe_caches_lock:
+            return self._probe_caches.setdefault(self._downloader or self, _ProbeCache())
+
+    def _get_probe_result(self, path, opts=()):
+        cache, opts = self._probe_cache, tuple(opts)
+        result = cache.get(path, opts)
+        if result is not None:
+            self.write_debug(
+                f'Using cached ffprobe result for "{path}" (cache hits: {cache.hits}, misses: {cache.misses})')
+            return result
 
         cmd = [
             self.probe_executable,
@@ -285,8 +349,12 @@ def get_metadata_object(self, path, opts=[]):
         cmd += opts
         cmd.append(self._ffmpeg_filename_argument(path))
         self.write_debug(f'ffprobe command line: {shell_quote(cmd)}')
-        stdout, _, _ = Popen.run(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
-        return json.loads(stdout)
+        stdout, _, returncode = Popen.run(
+            cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+        result = json.loads(stdout)
+        if returncode == 0:
+            cache.set(path, opts, result)
+        return result
 
     def get_stream_number(self, path, keys, value):
         streams = self.get_metadata_object(path)['streams']
@@ -298,6 +366,7 @@ def get_stream_number(self, path, keys, value):
     def _fixup_chapters(self, info):
         last_chapter = traverse_obj(info, ('chapters', -1))
         if last_chapter and not last_chapter.get('end_time'):
+            self._run_fused_pp(info)
             last_chapter['end_time'] = self._get_real_video_duration(info['filepath'])
 
     def _get_real_video_duration(self, filepath, fatal=True):
@@ -323,7 +392,7 @@ def run_ffmpeg_multiple_files(self, input_paths, out_path, opts, **kwargs):
             [(path, []) for path in input_paths],
             [(out_path, opts)], **kwargs)
 
-    def real_run_ffmpeg(self, input_path_opts, output_path_opts, *, expected_retcodes=(0,)):
+    def real_run_ffmpeg(self, input_path_opts, output_path_opts, *, expected_retcodes=(0,), pass_fds=()):
         self.check_version()
 
         oldest_mtime = min(
@@ -354,7 +423,7 @@ def make_args(file, args, name, number):
 
         self.write_debug(f'ffmpeg command line: {shell_quote(cmd)}')
         _, stderr, returncode = Popen.run(
-            cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+            cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE, pass_fds=pass_fds)
         if returncode not in variadic(expected_retcodes):
             self.write_debug(stderr)
             raise FFmpegPostProcessorError(stderr.strip().splitlines()[-1])
@@ -366,6 +435,90 @@ def make_args(file, args, name, number):
     def run_ffmpeg(self, path, out_path, opts, **kwargs):
         return self.run_ffmpeg_multiple_files([path], out_path, opts, **kwargs)
 
+    def try_utime(self, path, *args, **kwargs):
+        # The file may have been modified in place without changing its size
+        self._probe_cache.invalidate(path)
+        return super().try_utime(path, *args, **kwargs)
+
+    def _stream_copy(self, info, options=(), *, inputs=(), ext=None, files_to_delete=(), temp_files=()):
+        """Copy the streams of the media file, with the given extra inputs and output options
+
+        The extra inputs are numbered from 1 in the options, as if the media file were the only other input.
+        The copy is deferred to the FFmpegFusedPP of the info dict if possible, so that it can be
+        run in the same ffmpeg command as the stream copies of the neighbouring postprocessors
+
+        @param ext              Extension of the output file, if it is to be remuxed
+        @param files_to_delete  Files to return as deletable once the copy has been run
+        @param temp_files       Files to delete once the copy has been run
+        @returns                The files that can be deleted, as for PostProcessor.run
+        """
+        copy = _StreamCopy(list(options), list(inputs), ext, list(files_to_delete), list(temp_files))
+        fused_pp = info.get('__ffmpeg_fused_pp')
+        if fused_pp and self._FUSABLE and not self._has_own_configuration_args():
+            if not fused_pp.can_fuse(copy):
+                self._run_fused_pp(info)
+            fused_pp.add(info, copy)
+            return []
+        filename = info['filepath']
+        out_path = replace_extension(filename, ext, info['ext']) if ext else filename
+        return self._run_stream_copies(filename, out_path, [copy])
+
+    def _run_stream_copies(self, path, out_path, copies):
+        input_files, opts = [path], [*self.stream_copy_opts()]
+        for copy in copies:
+            opts.extend(self._shift_inputs(copy.options, len(input_files) - 1))
+            input_files.extend(copy.inputs)
+
+        temp_path = prepend_extension(out_path, 'temp') if out_path == path else out_path
+        self.run_ffmpeg_multiple_files(input_files, temp_path, opts)
+        self._delete_downloaded_files(*itertools.chain.from_iterable(copy.temp_files for copy in copies))
+        if temp_path != out_path:
+            os.replace(temp_path, out_path)
+        return list(itertools.chain.from_iterable(copy.files_to_delete for copy in copies))
+
+    @staticmethod
+    def _shift_inputs(opts, offset):
+        opts = list(opts)
+        for i, opt in enumerate(opts[:-1]):
+            mobj = opt in ('-map', '-map_metadata') and re.fullmatch(r'(-?)(\d+)(.*)', opts[i + 1])
+            if mobj and int(mobj.group(2)):
+                opts[i + 1] = f'{mobj.group(1)}{int(mobj.group(2)) + offset}{mobj.group(3)}'
+        return opts
+
+    def _remux_natively(self, path, out_path):
+        """
+        Remux an MPEG transport stream or fragmented MP4 file as a regular MP4 file, without ffmpeg
+
+        @returns    Whether the file could be remuxed; see yt_dlp.mp4.remux
+        """
+        temp_path = prepend_extension(out_path, 'temp') if out_path == path else out_path
+        mtime = os.stat(path).st_mtime
+        try:
+            with open(path, 'rb') as src, open(temp_path, 'wb') as dst:
+                remux(src, dst)
+        except BaseException as e:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            if not isinstance(e, MP4Error):
+                raise
+            self.write_debug(f'Unable to remux "{path}" natively: {e}')
+            return False
+        if temp_path != out_path:
+            os.replace(temp_path, out_path)
+        self.try_utime(out_path, mtime, mtime)
+        return True
+
+    def _has_own_configuration_args(self):
+        pp_key = self.pp_key().lower()
+        return any(
+            key == pp_key or key.startswith(f'{pp_key}+')
+            for key in self.get_param('postprocessor_args') or {})
+
+    def _run_fused_pp(self, info):
+        """Run the stream copies that were deferred by the previous postprocessors, e.g. before probing the file"""
+        if self._downloader:
+            self._downloader._run_fused_pp(info)
+
     @staticmethod
     def _ffmpeg_filename_argument(fn):
         # Always use 'file:' because the filename may contain ':' (ffmpeg
@@ -429,6 +582,70 @@ def _concat_spec(cls, in_files, concat_opts=None):
                     yield f'{directive} {opts[directive]}\n'
 
 
+class FFmpegFusedPP(FFmpegPostProcessor):
+    """Runs the stream copies deferred by consecutive postprocessors as a single ffmpeg command
+
+    YoutubeDL.run_all_pps runs the pending copies before any postprocessor that is not _FUSABLE.
+    Copies that cannot be fused with the pending ones are run after them, as a new command
+    """
+    # Options that can be given by more than one of the fused copies
+    _MERGEABLE_OPTS = ('-map', '-c:s', '-write_id3v1')
+    # Options that apply to the streams of every input
+    _GLOBAL_OPTS = {'-bsf', '-ss'}
+
+    def __init__(self, downloader=None):
+        super().__init__(downloader)
+        self._copies = []
+        self._source = None
+
+    @property
+    def pending(self):
+        return bool(self._copies)
+
+    @staticmethod
+    def _option_names(copy):
+        return {opt for opt in copy.options if re.match(r'-\D', opt)}
+
+    def can_fuse(self, copy):
+        names = self._option_names(copy)
+        drops_streams = any(
+            opt == '-map' and value.startswith('-') for opt, value in itertools.pairwise(copy.options))
+        for other in self._copies:
+            other_names = self._option_names(other)
+            if any(name not in self._MERGEABLE_OPTS and not name.startswith('-metadata')
+                   for name in names & other_names):
+                return False
+            # Attachments are placed after all the mapped streams, so their stream numbers would change
+            elif '-attach' in other_names:
+                return False
+            elif other.inputs and (drops_streams or names & self._GLOBAL_OPTS):
+                return False
+            elif copy.inputs and other_names & self._GLOBAL_OPTS:
+                return False
+            elif (copy.ext or '-f' in names) and (other.ext or '-f' in other_names):
+                return False
+        return True
+
+    def add(self, info, copy):
+        if not self._copies:
+            self._source = info['filepath'], {key: info[key] for key in ('filepath', 'ext', 'format') if key in info}
+        self._copies.append(copy)
+
+    def run(self, info):
+        copies, self._copies = self._copies, []
+        if not copies:
+            return [], info
+        path, original_info = self._source
+        if len(copies) > 1:
+            self.to_screen(f'Running {len(copies)} stream copies of "{path}" in a single pass')
+        try:
+            files_to_delete = self._run_stream_copies(path, info['filepath'], copies)
+        except Exception:
+            info.update(original_info)
+            raise
+        return files_to_delete, info
+
+
 class FFmpegExtractAudioPP(FFmpegPostProcessor):
     COMMON_AUDIO_EXTS = (*MEDIA_EXTENSIONS.common_audio, 'wma')
     SUPPORTED_EXTS = tuple(ACODECS.keys())
@@ -542,6 +759,8 @@ class FFmpegVideoConvertorPP(FFmpegPostProcessor):
     )
     FORMAT_RE = create_mapping_re(SUPPORTED_EXTS)
     _ACTION = 'converting'
+    # The target extensions that MPEG-TS and fragmented MP4 files can be remuxed to without ffmpeg
+    _NATIVE_EXTS = ()
 
     def __init__(self, downloader=None, preferedformat=None):
         super().__init__(downloader)
@@ -563,15 +782,25 @@ def run(self, info):
 
         outpath = replace_extension(filename, target_ext, source_ext)
         self.to_screen(f'{self._ACTION.title()} video from {source_ext} to {target_ext}; Destination: {outpath}')
-        self.run_ffmpeg(filename, outpath, self._options(target_ext))
+        fused_pp = info.get('__ffmpeg_fused_pp')
+        if (target_ext in self._NATIVE_EXTS and not self._has_own_configuration_args()
+                and not (fused_pp and fused_pp.pending) and self._remux_natively(filename, outpath)):
+            files_to_delete = [filename]
+        elif self._FUSABLE:
+            files_to_delete = self._stream_copy(info, ext=target_ext, files_to_delete=[filename])
+        else:
+            self.run_ffmpeg(filename, outpath, self._options(target_ext))
+            files_to_delete = [filename]
 
         info['filepath'] = outpath
         info['format'] = info['ext'] = target_ext
-        return [filename], info
+        return files_to_delete, info
 
 
 class FFmpegVideoRemuxerPP(FFmpegVideoConvertorPP):
     _ACTION = 'remuxing'
+    _FUSABLE = True
+    _NATIVE_EXTS = ('mp4', 'm4a')
 
     @staticmethod
     def _options(target_ext):
@@ -580,6 +809,7 @@ def _options(target_ext):
 
 class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
     SUPPORTED_EXTS = ('mp4', 'mov', 'm4a', 'webm', 'mkv', 'mka')
+    _FUSABLE = True
 
     def __init__(self, downloader=None, already_have_subtitle=False):
         super().__init__(downloader)
@@ -634,14 +864,13 @@ def run(self, info):
         if not sub_langs:
             return [], info
 
-        input_files = [filename, *sub_filenames]
-
         opts = [
-            *self.stream_copy_opts(ext=info['ext']),
             # Don't copy the existing subtitles, we may be running the
             # postprocessor a second time
             '-map', '-0:s',
         ]
+        if ext in ('mp4', 'mov', 'm4a'):
+            opts.extend(['-c:s', 'mov_text'])
         for i, (lang, name) in enumerate(zip(sub_langs, sub_names, strict=True)):
             opts.extend(['-map', f'{i + 1}:0'])
             lang_code = ISO639Utils.short2long(lang) or lang
@@ -650,16 +879,14 @@ def run(self, info):
                 opts.extend([f'-metadata:s:s:{i}', f'handler_name={name}',
                              f'-metadata:s:s:{i}', f'title={name}'])
 
-        temp_filename = prepend_extension(filename, 'temp')
         self.to_screen(f'Embedding subtitles in "{filename}"')
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
-        os.replace(temp_filename, filename)
-
-        files_to_delete = [] if self._already_have_subtitle else sub_filenames
-        return files_to_delete, info
+        return self._stream_copy(
+            info, opts, inputs=sub_filenames,
+            files_to_delete=[] if self._already_have_subtitle else sub_filenames), info
 
 
 class FFmpegMetadataPP(FFmpegPostProcessor):
+    _FUSABLE = True
 
     def __init__(self, downloader, add_metadata=True, add_chapters=True, add_infojson='if_exists'):
         FFmpegPostProcessor.__init__(self, downloader)
@@ -667,13 +894,6 @@ def __init__(self, downloader, add_metadata=True, add_chapters=True, add_infojso
         self._add_chapters = add_chapters
         self._add_infojson = add_infojson
 
-    @staticmethod
-    def _options(target_ext):
-        audio_only = target_ext == 'm4a'
-        yield from FFmpegPostProcessor.stream_copy_opts(not audio_only)
-        if audio_only:
-            yield from ('-vn', '-acodec', 'copy')
-
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
         self._fixup_chapters(info)
@@ -699,14 +919,12 @@ def run(self, info):
             self.to_screen('There isn\'t any metadata to add')
             return [], info
 
-        temp_filename = prepend_extension(filename, 'temp')
+        if info['ext'] == 'm4a':
+            options.append(('-vn',))
         self.to_screen(f'Adding metadata to "{filename}"')
-        self.run_ffmpeg_multiple_files(
-            (filename, metadata_filename), temp_filename,
-            itertools.chain(self._options(info['ext']), *options))
-        self._delete_downloaded_files(*files_to_delete)
-        os.replace(temp_filename, filename)
-        return [], info
+        return self._stream_copy(
+            info, itertools.chain.from_iterable(options), inputs=filter(None, [metadata_filename]),
+            temp_files=files_to_delete), info
 
     @staticmethod
     def _get_chapter_opts(chapters, metadata_filename):
@@ -798,6 +1016,7 @@ def _get_infojson_opts(self, info, infofn):
             write_json_file(self._downloader.sanitize_info(info, self.get_param('clean_infojson', True)), infofn)
             info['infojson_filename'] = infofn
 
+        self._run_fused_pp(info)
         old_stream, new_stream = self.get_stream_number(info['filepath'], ('tags', 'mimetype'), 'application/json')
         if old_stream is not None:
             yield ('-map', f'-0:{old_stream}')
@@ -817,9 +1036,16 @@ class FFmpegMergerPP(FFmpegPostProcessor):
     def run(self, info):
         filename = info['filepath']
         temp_filename = prepend_extension(filename, 'temp')
+        self.to_screen(f'Merging formats into "{filename}"')
+        self.merge(info['requested_formats'], info['__files_to_merge'], temp_filename)
+        os.rename(temp_filename, filename)
+        return info['__files_to_merge'], info
+
+    def merge(self, formats, input_paths, out_path, opts=(), **kwargs):
+        """Merge the streams of the formats, read from input_paths, into out_path"""
         args = ['-c', 'copy']
         audio_streams = 0
-        for (i, fmt) in enumerate(info['requested_formats']):
+        for (i, fmt) in enumerate(formats):
             if fmt.get('acodec') != 'none':
                 args.extend(['-map', f'{i}:a:0'])
                 aac_fixup = fmt['protocol'].startswith('m3u8') and self.get_audio_codec(fmt['filepath']) == 'aac'
@@ -828,10 +1054,7 @@ def run(self, info):
                 audio_streams += 1
             if fmt.get('vcodec') != 'none':
                 args.extend(['-map', f'{i}:v:0'])
-        self.to_screen(f'Merging formats into "{filename}"')
-        self.run_ffmpeg_multiple_files(info['__files_to_merge'], temp_filename, args)
-        os.rename(temp_filename, filename)
-        return info['__files_to_merge'], info
+        self.run_ffmpeg_multiple_files(input_paths, out_path, [*args, *opts], **kwargs)
 
     def can_merge(self):
         # TODO: figure out merge-capable ffmpeg version
@@ -839,6 +1062,10 @@ def can_merge(self):
 
 
 class FFmpegFixupPostProcessor(FFmpegPostProcessor):
+    _FUSABLE = True
+    # Whether the fixup can be done without ffmpeg, for the files that usually need it
+    _NATIVE = False
+
     def _fixup(self, msg, filename, options):
         temp_filename = prepend_extension(filename, 'temp')
 
@@ -847,29 +1074,61 @@ def _fixup(self, msg, filename, options):
 
         os.replace(temp_filename, filename)
 
+    def _fixup_copy(self, msg, info, options=()):
+        filename = info['filepath']
+        self.to_screen(f'{msg} of "{filename}"')
+        self._stream_copy(info, options)
+
+    def _fixup_remux(self, msg, info, options=()):
+        """Remux the file as a regular MP4 file, natively unless ffmpeg is needed"""
+        filename = info['filepath']
+        if self._has_own_configuration_args():
+            return self._fixup_copy(msg, info, options)
+
+        self._run_fused_pp(info)
+        self.to_screen(f'{msg} of "{filename}"')
+        if self._remux_natively(filename, filename):
+            return
+        elif not self.available:
+            self.report_warning(f'{msg} requires ffmpeg for this file. Install ffmpeg to fix this automatically')
+            return
+        self._stream_copy(info, options)
+
 
 class FFmpegFixupStretchedPP(FFmpegFixupPostProcessor):
     @PostProcessor._restrict_to(images=False, audio=False)
     def run(self, info):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio not in (None, 1):
-            self._fixup('Fixing aspect ratio', info['filepath'], [
-                *self.stream_copy_opts(), '-aspect', f'{stretched_ratio:f}'])
+            self._fixup_copy('Fixing aspect ratio', info, ['-aspect', f'{stretched_ratio:f}'])
         return [], info
 
 
 class FFmpegFixupM4aPP(FFmpegFixupPostProcessor):
+    _NATIVE = True
+
     @PostProcessor._restrict_to(images=False, video=False)
     def run(self, info):
         if info.get('container') == 'm4a_dash':
-            self._fixup('Correcting container', info['filepath'], [*self.stream_copy_opts(), '-f', 'mp4'])
+            self._fixup_remux('Correcting container', info, ['-f', 'mp4'])
         return [], info
 
 
 class FFmpegFixupM3u8PP(FFmpegFixupPostProcessor):
+    _NATIVE = True
+
     def _needs_fixup(self, info):
         yield info['ext'] in ('mp4', 'm4a')
         yield info['protocol'].startswith('m3u8')
+        self._run_fused_pp(info)
+        with open(info['filepath'], 'rb') as f:
+            if is_mpegts(f):
+                # No need to probe the file
+                return
+            f.seek(0)
+            # e.g. HLS with fMP4 segments
+            yield not is_mp4(f)
+        yield self.available
         try:
             metadata = self.get_metadata_object(info['filepath'])
         except PostProcessingError as e:
@@ -878,14 +1137,16 @@ def _needs_fixup(self, info):
         else:
             yield traverse_obj(metadata, ('format', 'format_name'), casesense=False) == 'mpegts'
 
+    def _fixup_options(self, info):
+        yield from ('-f', 'mp4')
+        if self.get_audio_codec(info['filepath']) == 'aac':
+            yield from ('-bsf:a', 'aac_adtstoasc')
+
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
         if all(self._needs_fixup(info)):
-            args = ['-f', 'mp4']
-            if self.get_audio_codec(info['filepath']) == 'aac':
-                args.extend(['-bsf:a', 'aac_adtstoasc'])
-            self._fixup('Fixing MPEG-TS in MP4 container', info['filepath'], [
-                *self.stream_copy_opts(), *args])
+            # The options are only needed, and the file probed, if ffmpeg is used
+            self._fixup_remux('Fixing MPEG-TS in MP4 container', info, self._fixup_options(info))
         return [], info
 
 
@@ -903,10 +1164,11 @@ def run(self, info):
             self.report_warning(
                 'A re-encode is needed to fix timestamps in older versions of ffmpeg. '
                 'Please install ffmpeg 4.4 or later to fixup without re-encoding')
-            opts = ['-vf', 'setpts=PTS-STARTPTS']
+            self._run_fused_pp(info)
+            self._fixup('Fixing frame timestamp', info['filepath'], [
+                '-vf', 'setpts=PTS-STARTPTS', *self.stream_copy_opts(False), '-ss', self.trim])
         else:
-            opts = ['-c', 'copy', '-bsf', 'setts=ts=TS-STARTPTS']
-        self._fixup('Fixing frame timestamp', info['filepath'], [*opts, *self.stream_copy_opts(False), '-ss', self.trim])
+            self._fixup_copy('Fixing frame timestamp', info, ['-bsf', 'setts=ts=TS-STARTPTS', '-ss', self.trim])
         return [], info
 
 
@@ -915,7 +1177,7 @@ class FFmpegCopyStreamPP(FFmpegFixupPostProcessor):
 
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
-        self._fixup(self.MESSAGE, info['filepath'], self.stream_copy_opts())
+        self._fixup_copy(self.MESSAGE, info)
         return [], info
 
 
@@ -925,6 +1187,12 @@ class FFmpegFixupDurationPP(FFmpegCopyStreamPP):
 
 class FFmpegFixupDuplicateMoovPP(FFmpegCopyStreamPP):
     MESSAGE = 'Fixing duplicate MOOV atoms'
+    _NATIVE = True
+
+    @PostProcessor._restrict_to(images=False)
+    def run(self, info):
+        self._fixup_remux(self.MESSAGE, info)
+        return [], info
 
 
 class FFmpegSubtitlesConvertorPP(FFmpegPostProcessor):
@@ -103,8 +103,10 @@ class ProxyType:
 
 
 class sockssocket(socket.socket):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, getaddrinfo=socket.getaddrinfo, **kwargs):
         self._proxy = None
+        # Used to resolve the destination if the proxy does not do it
+        self._getaddrinfo = getaddrinfo
         super().__init__(*args, **kwargs)
 
     def setproxy(self, proxytype, addr, port, rdns=True, username=None, password=None):
@@ -144,7 +146,7 @@ def _resolve_address(self, destaddr, default, use_remote_dns, family=None):
         if use_remote_dns and self._proxy.remote_dns:
             return 0, default
         else:
-            res = socket.getaddrinfo(destaddr, None, family=family or 0)
+            res = self._getaddrinfo(destaddr, None, family or 0)
             f, _, _, _, ipaddr = res[0]
             return f, socket.inet_pton(f, ipaddr[0])
 
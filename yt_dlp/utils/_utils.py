@@ -5424,6 +5424,8 @@ class FormatSorter:
 
     def __init__(self, ydl, field_preference):
         self.ydl = ydl
+        # The sort order changes the settings, so they must not be shared between instances
+        self.settings = {field: dict(setting) for field, setting in self.settings.items()}
         self._order = []
         self.evaluate_params(self.ydl.params, field_preference)
         if ydl.params.get('verbose'):
@@ -5538,6 +5540,9 @@ def add_item(field, reverse, closest, limit_text):
                          else limits[0] if has_limit and not has_multiple_limits
                          else None)
 
+        # The settings are resolved once, rather than for every format that is sorted
+        self._preferences = [self._compile_field_preference(field) for field in self._order]
+
     def print_verbose_info(self, write_debug):
         if self._sort_user:
             write_debug('Sort order given by user: {}'.format(', '.join(self._sort_user)))
@@ -5551,46 +5556,79 @@ def print_verbose_info(self, write_debug):
             if self._get_field_setting(field, 'limit_text') is not None else '')
             for field in self._order if self._get_field_setting(field, 'visible')])))
 
-    def _calculate_field_preference_from_value(self, format_, field, type_, value):
-        reverse = self._get_field_setting(field, 'reverse')
-        closest = self._get_field_setting(field, 'closest')
-        limit = self._get_field_setting(field, 'limit')
+    def _compile_order(self, field):
+        """Return a function that resolves the position of a value in the order of the field"""
+        if self._get_field_setting(field, 'convert') != 'order':
+            return lambda value: self._resolve_field_value(field, value, True)
+        order_list = (self._use_free_order and self._get_field_setting(field, 'order_free')) or self._get_field_setting(field, 'order')
+        list_length = len(order_list)
+        empty_pos = order_list.index('') if '' in order_list else list_length + 1
+        positions = {}
+        for i, value in reversed(list(enumerate(order_list))):
+            positions[value] = list_length - i
+        none_position = positions.get(None, list_length - empty_pos)
+        if not self._get_field_setting(field, 'regex'):
+            return lambda value: positions.get(value and value.lower(), list_length - empty_pos)
+
+        patterns = [(list_length - i, re.compile(regex)) for i, regex in enumerate(order_list) if regex]
+        cache = {}
+
+        def resolve(value):
+            if value is None:
+                return none_position
+            if value not in cache:
+                lowered = value.lower()
+                cache[value] = next(
+                    (position for position, pattern in patterns if pattern.match(lowered)), list_length - empty_pos)
+            return cache[value]
+        return resolve
+
+    def _compile_field_preference(self, field):
+        """Return a function that calculates the preference of a format for the field"""
+        setting = functools.partial(self._get_field_setting, field)
+        type_ = setting('type')  # extractor, boolean, ordered, field, multiple
+        if type_ == 'multiple':
+            type_ = 'field'  # Only 'field' is allowed in multiple for now
+            keys = [self._get_field_setting(f, 'field') for f in setting('field')]
+            function = setting('function')
+            get_value = lambda format_: function(format_.get(key) for key in keys)
+        else:
+            key = setting('field')
+            get_value = lambda format_: format_.get(key)
 
         if type_ == 'extractor':
-            maximum = self._get_field_setting(field, 'max')
-            if value is None or (maximum is not None and value >= maximum):
-                value = -1
+            maximum = setting('max')
+            convert = lambda value: -1 if value is None or (maximum is not None and value >= maximum) else value
         elif type_ == 'boolean':
-            in_list = self._get_field_setting(field, 'in_list')
-            not_in_list = self._get_field_setting(field, 'not_in_list')
-            value = 0 if ((in_list is None or value in in_list) and (not_in_list is None or value not in not_in_list)) else -1
+            in_list, not_in_list = setting('in_list'), setting('not_in_list')
+            convert = lambda value: 0 if ((in_list is None or value in in_list)
+                                          and (not_in_list is None or value not in not_in_list)) else -1
         elif type_ == 'ordered':
-            value = self._resolve_field_value(field, value, True)
-
-        # try to convert to number
-        val_num = float_or_none(value, default=self._get_field_setting(field, 'default'))
-        is_num = self._get_field_setting(field, 'convert') != 'string' and val_num is not None
-        if is_num:
-            value = val_num
-
-        return ((-10, 0) if value is None
-                else (1, value, 0) if not is_num  # if a field has mixed strings and numbers, strings are sorted higher
-                else (0, -abs(value - limit), value - limit if reverse else limit - value) if closest
-                else (0, value, 0) if not reverse and (limit is None or value <= limit)
-                else (0, -value, 0) if limit is None or (reverse and value == limit) or value > limit
-                else (-1, value, 0))
-
-    def _calculate_field_preference(self, format_, field):
-        type_ = self._get_field_setting(field, 'type')  # extractor, boolean, ordered, field, multiple
-        get_value = lambda f: format_.get(self._get_field_setting(f, 'field'))
-        if type_ == 'multiple':
-            type_ = 'field'  # Only 'field' is allowed in multiple for now
-            actual_fields = self._get_field_setting(field, 'field')
-
-            value = self._get_field_setting(field, 'function')(get_value(f) for f in actual_fields)
+            convert = self._compile_order(field)
         else:
-            value = get_value(field)
-        return self._calculate_field_preference_from_value(format_, field, type_, value)
+            convert = None
+
+        reverse, closest, limit = setting('reverse'), setting('closest'), setting('limit')
+        default, is_string = setting('default'), setting('convert') == 'string'
+
+        def preference(format_):
+            value = get_value(format_)
+            if convert:
+                value = convert(value)
+
+            # try to convert to number
+            val_num = float_or_none(value, default=default)
+            is_num = not is_string and val_num is not None
+            if is_num:
+                value = val_num
+
+            return ((-10, 0) if value is None
+                    else (1, value, 0) if not is_num  # if a field has mixed strings and numbers, strings are sorted higher
+                    else (0, -abs(value - limit), value - limit if reverse else limit - value) if closest
+                    else (0, value, 0) if not reverse and (limit is None or value <= limit)
+                    else (0, -value, 0) if limit is None or (reverse and value == limit) or value > limit
+                    else (-1, value, 0))
+        return preference
 
     @staticmethod
     def _fill_sorting_fields(format):
@@ -5630,7 +5668,7 @@ def _fill_sorting_fields(format):
 
     def calculate_preference(self, format):
         self._fill_sorting_fields(format)
-        return tuple(self._calculate_field_preference(format, field) for field in self._order)
+        return tuple(preference(format) for preference in self._preferences)
 
 
 def filesize_from_tbr(tbr, duration):
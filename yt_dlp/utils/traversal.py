@@ -8,6 +8,7 @@
 import inspect
 import itertools
 import re
+import types
 import typing
 import xml.etree.ElementTree
 
@@ -15,7 +16,6 @@
     IDENTITY,
     NO_DEFAULT,
     ExtractorError,
-    LazyList,
     deprecation_warning,
     get_elements_html_by_class,
     get_elements_html_by_attribute,
@@ -105,212 +105,353 @@ def traverse_obj(
     if is_user_input is not NO_DEFAULT:
         deprecation_warning('The is_user_input parameter is deprecated and no longer works')
 
-    casefold = lambda k: k.casefold() if isinstance(k, str) else k
-
     if isinstance(expected_type, type):
         type_test = lambda val: val if isinstance(val, expected_type) else None
     else:
         type_test = lambda val: try_call(expected_type or IDENTITY, args=(val,))
 
-    def apply_key(key, obj, is_last):
-        branching = False
-        result = None
+    options = _TraversalOptions(default, type_test, get_all, casesense, traverse_string)
+    for index, path in enumerate(paths, 1):
+        is_last = index == len(paths)
+        try:
+            result = compile_path(path)._traverse(obj, options, is_last, True)
+            if result is not None:
+                return result
+        except _RequiredError as e:
+            if is_last:
+                # Reraise to get cleaner stack trace
+                raise ExtractorError(e.orig_msg, expected=e.expected) from None
+
+    return None if default is NO_DEFAULT else default
+
+
+class _TraversalOptions(typing.NamedTuple):
+    default: typing.Any
+    type_test: collections.abc.Callable
+    get_all: bool
+    casesense: bool
+    traverse_string: bool
+
 
-        if obj is None and traverse_string:
-            if key is ... or callable(key) or isinstance(key, slice):
-                branching = True
-                result = ()
+_PATH_CACHE_SIZE = 4096
+_path_cache = {}
 
-        elif key is None:
-            result = obj
+
+def compile_path(path):
+    """
+    Compile a `traverse_obj` path into a reusable traverser
+
+    The returned object can be used as a path in `traverse_obj`. The keys of the path are
+    classified once, instead of on every traversal. The path must not be modified afterwards.
+
+    Paths that are made up only of constants (like `('a', 0, ..., 'b')`) are cached by identity,
+    so that literal paths are compiled only once. Other paths, like those containing functions
+    or sets, are usually rebuilt on every call, so they should be compiled explicitly to be reused.
+    """
+    if isinstance(path, _CompiledPath):
+        return path
+    cached = _path_cache.get(id(path))
+    if cached and cached[0] is path:
+        return cached[1]
+    compiled = _CompiledPath(path)
+    if compiled._constant:
+        if len(_path_cache) >= _PATH_CACHE_SIZE:
+            _path_cache.clear()
+        _path_cache[id(path)] = (path, compiled)
+    return compiled
+
+
+_verified_code = set()
+_SIMPLE_TYPES = (str, int, type(None))
+_CONSTANT_TYPES = (*_SIMPLE_TYPES, bytes, float, type(...))
+
+
+def _casefold(key):
+    return key.casefold() if isinstance(key, str) else key
+
+
+class _CompiledPath:
+    __slots__ = ('_constant', '_is_dict', '_keys', '_simple', '_steps', '_test_type')
+
+    def __init__(self, path):
+        self._keys = keys = tuple(variadic(path, (str, bytes, dict, set)))
+        last_key = keys[-1] if keys else None
+        self._is_dict = isinstance(last_key, dict)
+        self._test_type = not isinstance(last_key, (dict, list, tuple))
+        self._constant = isinstance(path, (tuple, *_CONSTANT_TYPES))
+        # Paths of plain keys and sets, which are the most common, are run without building iterators
+        simple = []
+        for key in keys:
+            if simple is not None:
+                simple = self._add_simple_key(key, simple)
+            if self._constant and not isinstance(key, _CONSTANT_TYPES):
+                self._constant = isinstance(key, tuple) and compile_path(key)._constant
+        self._simple = None if simple is None else tuple(simple)
+        # The steps are only needed if the path cannot be run as a simple path
+        self._steps = None
+
+    @staticmethod
+    def _add_simple_key(key, simple):
+        if type(key) in _SIMPLE_TYPES:
+            simple.append((_ITEM, key))
+            return simple
+        elif not isinstance(key, set):
+            return None
+        item = next(iter(key))
+        if len(key) > 1 or isinstance(item, type):
+            assert all(isinstance(item, type) for item in key)
+            simple.append((_TYPES, tuple(key)))
+        else:
+            simple.append((_CALL, item))
+        return simple
+
+    def _get_steps(self):
+        if self._steps is None:
+            self._steps = tuple(
+                (index == len(self._keys), self._compile_key(key)) for index, key in enumerate(self._keys, 1))
+        return self._steps
+
+    @staticmethod
+    def _compile_key(key):
+        """Return `any`, `all`, `filter` or a function that applies the key to an object"""
+        if key in (any, all) or key is filter:
+            return key
+
+        if __debug__ and callable(key):
+            # Verify function signature, once for each function definition since lambdas are recreated
+            if not isinstance(key, types.FunctionType) or key.__code__ not in _verified_code:
+                inspect.signature(key).bind(None, None)
+                if isinstance(key, types.FunctionType):
+                    _verified_code.add(key.__code__)
+
+        if key is None:
+            return lambda obj, is_last, options: (False, (obj,))
 
         elif isinstance(key, set):
             item = next(iter(key))
             if len(key) > 1 or isinstance(item, type):
                 assert all(isinstance(item, type) for item in key)
-                if isinstance(obj, tuple(key)):
-                    result = obj
-            else:
-                result = try_call(item, args=(obj,))
+                allowed_types = tuple(key)
+                return lambda obj, is_last, options: (False, (obj if isinstance(obj, allowed_types) else None,))
+            return lambda obj, is_last, options: (False, (
+                None if obj is None and options.traverse_string else try_call(item, args=(obj,)),))
 
         elif isinstance(key, (list, tuple)):
-            branching = True
-            result = itertools.chain.from_iterable(
-                apply_path(obj, branch, is_last)[0] for branch in key)
+            branches = tuple(map(compile_path, key))
+
+            def apply_branches(obj, is_last, options):
+                if obj is None and options.traverse_string:
+                    return False, (None,)
+                return True, itertools.chain.from_iterable(
+                    branch._iter(obj, is_last, options) for branch in branches)
+            return apply_branches
 
         elif key is ...:
-            branching = True
-            if isinstance(obj, http.cookies.Morsel):
-                obj = dict(obj, key=obj.key, value=obj.value)
-            if isinstance(obj, collections.abc.Mapping):
-                result = obj.values()
-            elif is_iterable_like(obj) or isinstance(obj, xml.etree.ElementTree.Element):
-                result = obj
-            elif isinstance(obj, re.Match):
-                result = obj.groups()
-            elif traverse_string:
-                branching = False
-                result = str(obj)
-            else:
-                result = ()
+            return _apply_ellipsis
 
         elif callable(key):
-            branching = True
-            if isinstance(obj, http.cookies.Morsel):
-                obj = dict(obj, key=obj.key, value=obj.value)
-            if isinstance(obj, collections.abc.Mapping):
-                iter_obj = obj.items()
-            elif is_iterable_like(obj) or isinstance(obj, xml.etree.ElementTree.Element):
-                iter_obj = enumerate(obj)
-            elif isinstance(obj, re.Match):
-                iter_obj = itertools.chain(
-                    enumerate((obj.group(), *obj.groups())),
-                    obj.groupdict().items())
-            elif traverse_string:
-                branching = False
-                iter_obj = enumerate(str(obj))
-            else:
-                iter_obj = ()
-
-            result = (v for k, v in iter_obj if try_call(key, args=(k, v)))
-            if not branching:  # string traversal
-                result = ''.join(result)
+            return lambda obj, is_last, options: _apply_function(key, obj, options)
 
         elif isinstance(key, dict):
-            iter_obj = ((k, _traverse_obj(obj, v, False, is_last)) for k, v in key.items())
-            result = {
-                k: v if v is not None else default for k, v in iter_obj
-                if v is not None or default is not NO_DEFAULT
-            } or None
-
-        elif isinstance(obj, collections.abc.Mapping):
-            if isinstance(obj, http.cookies.Morsel):
-                obj = dict(obj, key=obj.key, value=obj.value)
-            result = (try_call(obj.get, args=(key,)) if casesense or try_call(obj.__contains__, args=(key,)) else
-                      next((v for k, v in obj.items() if casefold(k) == key), None))
-
-        elif isinstance(obj, re.Match):
-            if isinstance(key, int) or casesense:
-                with contextlib.suppress(IndexError):
-                    result = obj.group(key)
-
-            elif isinstance(key, str):
-                result = next((v for k, v in obj.groupdict().items() if casefold(k) == key), None)
-
-        elif isinstance(key, (int, slice)):
-            if is_iterable_like(obj, (collections.abc.Sequence, xml.etree.ElementTree.Element)):
-                branching = isinstance(key, slice)
-                with contextlib.suppress(IndexError):
-                    result = obj[key]
-            elif traverse_string:
-                with contextlib.suppress(IndexError):
-                    result = str(obj)[key]
-
-        elif isinstance(obj, xml.etree.ElementTree.Element) and isinstance(key, str):
-            xpath, _, special = key.rpartition('/')
-            if not special.startswith('@') and not special.endswith('()'):
-                xpath = key
-                special = None
-
-            # Allow abbreviations of relative paths, absolute paths error
-            if xpath.startswith('/'):
-                xpath = f'.{xpath}'
-            elif xpath and not xpath.startswith('./'):
-                xpath = f'./{xpath}'
-
-            def apply_specials(element):
-                if special is None:
-                    return element
-                if special == '@':
-                    return element.attrib
-                if special.startswith('@'):
-                    return try_call(element.attrib.get, args=(special[1:],))
-                if special == 'text()':
-                    return element.text
-                raise SyntaxError(f'apply_specials is missing case for {special!r}')
-
-            if xpath:
-                result = list(map(apply_specials, obj.iterfind(xpath)))
-            else:
-                result = apply_specials(obj)
-
-        return branching, result if branching else (result,)
-
-    def lazy_last(iterable):
-        iterator = iter(iterable)
-        prev = next(iterator, NO_DEFAULT)
-        if prev is NO_DEFAULT:
-            return
-
-        for item in iterator:
-            yield False, prev
-            prev = item
-
-        yield True, prev
-
-    def apply_path(start_obj, path, test_type):
+            paths = tuple((k, compile_path(v)) for k, v in key.items())
+
+            def apply_dict(obj, is_last, options):
+                if obj is None and options.traverse_string:
+                    return False, (None,)
+                iter_obj = ((k, path._traverse(obj, options, False, is_last)) for k, path in paths)
+                return False, ({
+                    k: v if v is not None else options.default for k, v in iter_obj
+                    if v is not None or options.default is not NO_DEFAULT
+                } or None,)
+            return apply_dict
+
+        folded = _casefold(key)
+        return lambda obj, is_last, options: _apply_item(key if options.casesense else folded, obj, options)
+
+    def _apply(self, start_obj, test_type, options):
         objs = (start_obj,)
         has_branched = False
 
-        key = None
-        for last, key in lazy_last(variadic(path, (str, bytes, dict, set))):
-            if not casesense and isinstance(key, str):
-                key = key.casefold()
-
-            if key in (any, all):
+        for is_last, step in self._get_steps():
+            if step is any or step is all:
                 has_branched = False
                 filtered_objs = (obj for obj in objs if obj not in (None, {}))
-                if key is any:
+                if step is any:
                     objs = (next(filtered_objs, None),)
                 else:
                     objs = (list(filtered_objs),)
                 continue
 
-            if key is filter:
+            if step is filter:
                 objs = filter(None, objs)
                 continue
 
-            if __debug__ and callable(key):
-                # Verify function signature
-                inspect.signature(key).bind(None, None)
-
             new_objs = []
             for obj in objs:
-                branching, results = apply_key(key, obj, last)
+                branching, results = step(obj, is_last, options)
                 has_branched |= branching
                 new_objs.append(results)
 
             objs = itertools.chain.from_iterable(new_objs)
 
-        if test_type and not isinstance(key, (dict, list, tuple)):
-            objs = map(type_test, objs)
+        if test_type and self._test_type:
+            objs = map(options.type_test, objs)
+
+        return objs, has_branched
 
-        return objs, has_branched, isinstance(key, dict)
+    def _iter(self, obj, test_type, options):
+        if self._simple is not None and options.casesense and not options.traverse_string:
+            result = _get_simple(obj, self._simple, options)
+            return (options.type_test(result) if test_type else result,)
+        return self._apply(obj, test_type, options)[0]
 
-    def _traverse_obj(obj, path, allow_empty, test_type):
-        results, has_branched, is_dict = apply_path(obj, path, test_type)
-        results = LazyList(item for item in results if item not in (None, {}))
-        if get_all and has_branched:
+    def _traverse(self, obj, options, allow_empty, test_type):
+        if self._simple is not None and options.casesense and not options.traverse_string:
+            result = _get_simple(obj, self._simple, options)
+            if test_type:
+                result = options.type_test(result)
+            return None if result in (None, {}) else result
+
+        results, has_branched = self._apply(obj, test_type, options)
+        results = (item for item in results if item not in (None, {}))
+        if options.get_all and has_branched:
+            results = list(results)
             if results:
-                return results.exhaust()
+                return results
             if allow_empty:
-                return [] if default is NO_DEFAULT else default
+                return [] if options.default is NO_DEFAULT else options.default
             return None
 
-        return results[0] if results else {} if allow_empty and is_dict else None
+        return next(results, {} if allow_empty and self._is_dict else None)
 
-    for index, path in enumerate(paths, 1):
-        is_last = index == len(paths)
-        try:
-            result = _traverse_obj(obj, path, is_last, True)
-            if result is not None:
-                return result
-        except _RequiredError as e:
-            if is_last:
-                # Reraise to get cleaner stack trace
-                raise ExtractorError(e.orig_msg, expected=e.expected) from None
 
-    return None if default is NO_DEFAULT else default
+_ITEM, _TYPES, _CALL = range(3)
+
+
+def _get_simple(obj, steps, options):
+    for kind, key in steps:
+        if kind == _TYPES:
+            obj = obj if isinstance(obj, key) else None
+        elif kind == _CALL:
+            obj = try_call(key, args=(obj,))
+        elif obj is None or key is None:
+            continue
+        elif type(obj) is dict:
+            obj = obj.get(key)
+        elif type(obj) is list and type(key) is int:
+            try:
+                obj = obj[key]
+            except IndexError:
+                obj = None
+        else:
+            obj = _apply_item(key, obj, options)[1][0]
+    return obj
+
+
+def _morsel_to_dict(obj):
+    return dict(obj, key=obj.key, value=obj.value) if isinstance(obj, http.cookies.Morsel) else obj
+
+
+def _apply_ellipsis(obj, is_last, options):
+    if obj is None and options.traverse_string:
+        return True, ()
+    obj = _morsel_to_dict(obj)
+    if isinstance(obj, collections.abc.Mapping):
+        return True, obj.values()
+    elif is_iterable_like(obj) or isinstance(obj, xml.etree.ElementTree.Element):
+        return True, obj
+    elif isinstance(obj, re.Match):
+        return True, obj.groups()
+    elif options.traverse_string:
+        return False, (str(obj),)
+    return True, ()
+
+
+def _apply_function(key, obj, options):
+    if obj is None and options.traverse_string:
+        return True, ()
+    branching = True
+    obj = _morsel_to_dict(obj)
+    if isinstance(obj, collections.abc.Mapping):
+        iter_obj = obj.items()
+    elif is_iterable_like(obj) or isinstance(obj, xml.etree.ElementTree.Element):
+        iter_obj = enumerate(obj)
+    elif isinstance(obj, re.Match):
+        iter_obj = itertools.chain(
+            enumerate((obj.group(), *obj.groups())),
+            obj.groupdict().items())
+    elif options.traverse_string:
+        branching = False
+        iter_obj = enumerate(str(obj))
+    else:
+        iter_obj = ()
+
+    result = (v for k, v in iter_obj if try_call(key, args=(k, v)))
+    if not branching:  # string traversal
+        return False, (''.join(result),)
+    return True, result
+
+
+def _apply_item(key, obj, options):
+    branching = False
+    result = None
+
+    if obj is None and options.traverse_string:
+        if isinstance(key, slice):
+            branching = True
+            result = ()
+
+    elif isinstance(obj, collections.abc.Mapping):
+        obj = _morsel_to_dict(obj)
+        result = (try_call(obj.get, args=(key,)) if options.casesense or try_call(obj.__contains__, args=(key,)) else
+                  next((v for k, v in obj.items() if _casefold(k) == key), None))
+
+    elif isinstance(obj, re.Match):
+        if isinstance(key, int) or options.casesense:
+            with contextlib.suppress(IndexError):
+                result = obj.group(key)
+
+        elif isinstance(key, str):
+            result = next((v for k, v in obj.groupdict().items() if _casefold(k) == key), None)
+
+    elif isinstance(key, (int, slice)):
+        if is_iterable_like(obj, (collections.abc.Sequence, xml.etree.ElementTree.Element)):
+            branching = isinstance(key, slice)
+            with contextlib.suppress(IndexError):
+                result = obj[key]
+        elif options.traverse_string:
+            with contextlib.suppress(IndexError):
+                result = str(obj)[key]
+
+    elif isinstance(obj, xml.etree.ElementTree.Element) and isinstance(key, str):
+        xpath, _, special = key.rpartition('/')
+        if not special.startswith('@') and not special.endswith('()'):
+            xpath = key
+            special = None
+
+        # Allow abbreviations of relative paths, absolute paths error
+        if xpath.startswith('/'):
+            xpath = f'.{xpath}'
+        elif xpath and not xpath.startswith('./'):
+            xpath = f'./{xpath}'
+
+        def apply_specials(element):
+            if special is None:
+                return element
+            if special == '@':
+                return element.attrib
+            if special.startswith('@'):
+                return try_call(element.attrib.get, args=(special[1:],))
+            if special == 'text()':
+                return element.text
+            raise SyntaxError(f'apply_specials is missing case for {special!r}')
+
+        if xpath:
+            result = list(map(apply_specials, obj.iterfind(xpath)))
+        else:
+            result = apply_specials(obj)
+
+    return branching, result if branching else (result,)
 
 
 def value(value, /):